@@ -12,6 +12,7 @@ from django.core.exceptions import ValidationError
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
+from .authentication import UserPrincipalCache
 from .models import User
 
 
@@ -312,6 +313,7 @@ class UserAdmin(BaseUserAdmin):
             queryset: Selected users queryset
         """
         updated = queryset.update(is_verified=True)
+        UserPrincipalCache.invalidate_many(queryset.values_list("id", flat=True))
         self.message_user(
             request, _("%(count)d usuarios han sido verificados.") % {"count": updated}
         )
@@ -327,6 +329,7 @@ class UserAdmin(BaseUserAdmin):
             queryset: Selected users queryset
         """
         updated = queryset.update(is_verified=False)
+        UserPrincipalCache.invalidate_many(queryset.values_list("id", flat=True))
         self.message_user(
             request,
             _("%(count)d usuarios han sido marcados como no " + "verificados.")
@@ -364,6 +367,7 @@ class UserAdmin(BaseUserAdmin):
             queryset: Selected users queryset
         """
         updated = queryset.update(is_active=True)
+        UserPrincipalCache.invalidate_many(queryset.values_list("id", flat=True))
         self.message_user(
             request, _("%(count)d usuarios han sido activados.") % {"count": updated}
         )
@@ -387,6 +391,7 @@ class UserAdmin(BaseUserAdmin):
             return
 
         updated = queryset.update(is_active=False)
+        UserPrincipalCache.invalidate_many(queryset.values_list("id", flat=True))
         self.message_user(
             request, _("%(count)d usuarios han sido desactivados.") % {"count": updated}
         )
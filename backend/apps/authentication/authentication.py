@@ -0,0 +1,280 @@
+"""
+JWT authentication backed by a cached user principal for ZentraQMS.
+
+Resolving the user of a JWT normally loads the full User row on every
+request. ``CachedJWTAuthentication`` instead builds the user from a small
+cache entry (identity, status and lock fields) keyed by the user id and a
+generation counter. The instance it returns is a regular User whose remaining
+fields are deferred, so they are loaded from the database only when a view
+actually touches them.
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+logger = logging.getLogger("authentication")
+
+
+class UserPrincipalCache:
+    """
+    Cache of the user fields needed to authenticate a request.
+
+    Each user has a generation counter; entries are stored under a key that
+    embeds the generation read before the row was loaded. Invalidating a user
+    only renews the counter, so an entry built concurrently from a stale row
+    is never served.
+
+    Principals are only cached in a cache shared by every process (see
+    ``enabled``); otherwise each request reads the user row.
+    """
+
+    CACHE_PREFIX = "auth_principal"
+    CACHE_TIMEOUT = getattr(settings, "AUTH_PRINCIPAL_CACHE_TIMEOUT", 300)  # 5 minutes
+
+    # Fields kept in the principal; everything else stays deferred
+    FIELDS = (
+        "id",
+        "email",
+        "first_name",
+        "last_name",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+        "is_verified",
+        "locked_until",
+    )
+    PASSWORD_HASH = "password_hash"
+
+    @classmethod
+    def generation_key(cls, user_id) -> str:
+        return f"{cls.CACHE_PREFIX}:gen:{user_id}"
+
+    @classmethod
+    def get_generation(cls, user_id) -> int:
+        """
+        Get the current generation of a user, initializing it if missing.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            int: Generation counter (0 if the cache backend keeps no values)
+        """
+        key = cls.generation_key(user_id)
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, time.time_ns(), None)
+            generation = cache.get(key, 0)
+        return generation
+
+    @classmethod
+    def entry_key(cls, user_id, generation: int) -> str:
+        return f"{cls.CACHE_PREFIX}:{user_id}:g{generation}"
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """
+        Whether principals are cached.
+
+        With a per-process cache (LocMemCache), deactivating or locking a
+        user in one worker would leave the other workers serving the cached
+        principal until it expires.
+        """
+        # apps.common.utils imports DRF, which loads this module from settings
+        from apps.common.utils import cache_is_shared
+
+        return cache_is_shared(cache)
+
+    @classmethod
+    def get(cls, user_id) -> Optional[Dict]:
+        """
+        Get the principal entry of a user, loading it on a cache miss.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            dict: Principal fields plus the password hash used for token
+            revocation checks, or None if the user does not exist
+        """
+        if not cls.enabled():
+            return cls.load(user_id)
+
+        key = cls.entry_key(user_id, cls.get_generation(user_id))
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+        row = cls.load(user_id)
+        if row is not None:
+            cache.set(key, row, cls.CACHE_TIMEOUT)
+        return row
+
+    @classmethod
+    def load(cls, user_id) -> Optional[Dict]:
+        """Read the principal entry of a user from the database."""
+        User = get_user_model()
+        row = User.objects.filter(pk=user_id).values(*cls.FIELDS, "password").first()
+        if row is None:
+            return None
+
+        # Only a digest of the password hash is kept in the cache
+        password = row.pop("password")
+        row[cls.PASSWORD_HASH] = get_md5_hash_password(password) if password else ""
+        return row
+
+    @classmethod
+    def invalidate(cls, user_id) -> None:
+        """Renew the generation of a user so its cached principal is dropped."""
+        cache.set(cls.generation_key(user_id), time.time_ns(), None)
+        logger.debug(f"User principal invalidated: {user_id}")
+
+    @classmethod
+    def invalidate_many(cls, user_ids) -> None:
+        """
+        Invalidate several users at once (e.g. after ``QuerySet.update``).
+
+        Args:
+            user_ids: IDs of the users
+        """
+        generation = time.time_ns()
+        cache.set_many(
+            {cls.generation_key(user_id): generation for user_id in user_ids}, None
+        )
+
+    @classmethod
+    def build_user(cls, entry: Dict):
+        """
+        Build a User instance from a principal entry.
+
+        The instance behaves like one loaded from the database with only the
+        principal fields selected: it can be assigned to foreign keys and
+        compared with other users, and the first access to any other field
+        loads the rest of the row.
+
+        Args:
+            entry: Principal entry returned by ``get``
+
+        Returns:
+            User: Partially loaded user instance
+        """
+        User = get_user_model()
+        field_names = []
+        values = []
+        for field in User._meta.concrete_fields:
+            if field.attname in entry:
+                field_names.append(field.attname)
+                values.append(entry[field.attname])
+
+        user = User.from_db(DEFAULT_DB_ALIAS, field_names, values)
+        user._from_principal_cache = True
+        return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from ``UserPrincipalCache``.
+
+    Inactive and locked accounts are rejected from the cached entry, so
+    deactivating or locking a user takes effect on the next request. The
+    validated token is kept on the request, so middleware that already
+    read it (e.g. for rate limiting) doesn't make DRF verify it again.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_request_token(request, raw_token)
+        return self.get_user(validated_token), validated_token
+
+    def get_request_token(self, request, raw_token):
+        """
+        Validate the bearer token of a request once per request.
+
+        Args:
+            request: Django or DRF request
+            raw_token (bytes): Raw token from the Authorization header
+
+        Returns:
+            Token: Validated token
+
+        Raises:
+            InvalidToken: If the token is invalid or expired
+        """
+        http_request = getattr(request, "_request", request)
+        validated = getattr(http_request, "_validated_jwt", None)
+        if validated is not None and validated[0] == raw_token:
+            return validated[1]
+
+        validated_token = self.get_validated_token(raw_token)
+        http_request._validated_jwt = (raw_token, validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        """
+        Return the user of a validated token without loading its full row.
+
+        Args:
+            validated_token: Validated SimpleJWT token
+
+        Returns:
+            User: Partially loaded user instance
+
+        Raises:
+            InvalidToken: If the token has no user identification
+            AuthenticationFailed: If the user is missing, inactive or locked
+        """
+        if api_settings.USER_ID_FIELD != "id":
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            entry = UserPrincipalCache.get(user_id)
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if entry is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not entry["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        locked_until = entry.get("locked_until")
+        if locked_until and locked_until > timezone.now():
+            raise AuthenticationFailed(
+                _("Cuenta bloqueada temporalmente."), code="user_locked"
+            )
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if (
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+                != entry[UserPrincipalCache.PASSWORD_HASH]
+            ):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return UserPrincipalCache.build_user(entry)
@@ -7,14 +7,19 @@ and request logging.
 
 import logging
 import time
-from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
 
 from apps.common.utils import get_client_ip
+from .authentication import CachedJWTAuthentication
+from .ratelimit import RateLimiter
 from .utils import log_security_event, is_suspicious_ip
 
 User = get_user_model()
@@ -69,7 +74,7 @@ class JWTAuthenticationMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.jwt_auth = JWTAuthentication()
+        self.jwt_auth = CachedJWTAuthentication()
 
     def __call__(self, request):
         # Skip authentication for certain paths
@@ -124,6 +129,28 @@ class JWTAuthenticationMiddleware:
                     status=401,
                 )
 
+        except AuthenticationFailed as e:
+            # Inactive, locked or deleted account behind a valid token
+            ip_address = get_client_ip(request)
+            log_security_event(
+                "jwt_auth_rejected",
+                "unknown",
+                ip_address,
+                {"error": str(e.detail), "path": request.path},
+            )
+
+            if request.path.startswith("/api/"):
+                return JsonResponse(
+                    {
+                        "success": False,
+                        "error": {
+                            "message": "Cuenta inactiva o bloqueada.",
+                            "code": "ACCOUNT_UNAVAILABLE",
+                        },
+                    },
+                    status=401,
+                )
+
         response = self.get_response(request)
         return response
 
@@ -185,7 +212,7 @@ class IPSecurityMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
         self.blocked_ips = set()  # In production, use Redis or database
-        self.rate_limit_cache = {}  # In production, use Redis
+        self.jwt_auth = CachedJWTAuthentication()
 
     def __call__(self, request):
         ip_address = get_client_ip(request)
@@ -216,16 +243,17 @@ class IPSecurityMiddleware:
                 {"path": request.path},
             )
 
-        # Basic rate limiting (simplified implementation)
-        if self._is_rate_limited(ip_address, request):
+        # Shared rate limiting (per route, keyed by user or IP)
+        rate_limit = self._check_rate_limit(ip_address, request)
+        if rate_limit is not None and not rate_limit.allowed:
             log_security_event(
                 "rate_limit_exceeded",
                 getattr(request.user, "email", "unknown"),
                 ip_address,
-                {"path": request.path},
+                {"path": request.path, "retry_after": rate_limit.retry_after},
             )
 
-            return JsonResponse(
+            response = JsonResponse(
                 {
                     "success": False,
                     "error": {
@@ -235,44 +263,64 @@ class IPSecurityMiddleware:
                 },
                 status=429,
             )
+            response["Retry-After"] = str(rate_limit.retry_after)
+            response["X-RateLimit-Limit"] = str(rate_limit.limit)
+            response["X-RateLimit-Remaining"] = "0"
+            return response
 
-        return self.get_response(request)
+        response = self.get_response(request)
+        if rate_limit is not None:
+            response["X-RateLimit-Limit"] = str(rate_limit.limit)
+            response["X-RateLimit-Remaining"] = str(rate_limit.remaining)
+        return response
 
-    def _is_rate_limited(self, ip_address, request):
+    def _check_rate_limit(self, ip_address, request):
         """
-        Check if IP should be rate limited.
+        Check the request against the rate limit policy of its route.
 
-        This is a simplified implementation. In production,
-        use Redis with sliding window or token bucket algorithm.
-        """
-        if not request.path.startswith("/api/"):
-            return False
+        Args:
+            ip_address (str): Client IP address
+            request: Django request object
 
-        current_time = timezone.now()
-        window_minutes = 15
-        max_requests = 100
+        Returns:
+            RateLimitResult: Result of the check, or None if the route is not limited
+        """
+        policy = RateLimiter.policy_for_path(request.path)
+        if policy is None:
+            return None
 
-        # Clean old entries
-        cutoff_time = current_time - timezone.timedelta(minutes=window_minutes)
+        identifier = None
+        if policy.key in ("user", "user_or_ip"):
+            user_id = self._get_user_id(request)
+            if user_id:
+                identifier = f"user:{user_id}"
+            elif policy.key == "user":
+                return None
 
-        if ip_address not in self.rate_limit_cache:
-            self.rate_limit_cache[ip_address] = []
+        return RateLimiter.hit(policy, identifier or f"ip:{ip_address}")
 
-        # Remove old requests
-        self.rate_limit_cache[ip_address] = [
-            req_time
-            for req_time in self.rate_limit_cache[ip_address]
-            if req_time > cutoff_time
-        ]
+    def _get_user_id(self, request):
+        """
+        Get the ID of the authenticated user, if any.
 
-        # Check if over limit
-        if len(self.rate_limit_cache[ip_address]) >= max_requests:
-            return True
+        DRF authentication runs after the middleware, so a bearer token is
+        verified here (signature and expiry only, no database access) and
+        kept on the request for DRF to reuse.
+        """
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.pk
 
-        # Record this request
-        self.rate_limit_cache[ip_address].append(current_time)
+        header = self.jwt_auth.get_header(request)
+        raw_token = self.jwt_auth.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
 
-        return False
+        try:
+            validated_token = self.jwt_auth.get_request_token(request, raw_token)
+        except (InvalidToken, TokenError):
+            return None
+        return validated_token.get(api_settings.USER_ID_CLAIM)
 
 
 class CORSMiddleware:
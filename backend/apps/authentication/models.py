@@ -13,10 +13,12 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q
 
+from apps.common.models import VersionedModel
+
 from .managers import UserManager
 
 
-class User(AbstractUser):
+class User(VersionedModel, AbstractUser):
     """
     Custom User model for ZentraQMS.
 
@@ -31,6 +33,7 @@ class User(AbstractUser):
     - Security features (failed login attempts, account locking)
     - Organizational fields (department, position)
     - Audit fields (created_by, updated_at)
+    - Row version (updated_at) renewed on every save
     """
 
     # Override primary key to use UUID
@@ -309,6 +312,22 @@ class User(AbstractUser):
 
         super().save(*args, **kwargs)
 
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        """
+        Reload fields from the database.
+
+        Users built by ``CachedJWTAuthentication`` only carry the principal
+        fields; the first access to a deferred field loads all of them in a
+        single query instead of one query per field.
+        """
+        if fields and getattr(self, "_from_principal_cache", False):
+            deferred = self.get_deferred_fields()
+            if deferred and set(fields) <= deferred:
+                self._from_principal_cache = False
+                fields = deferred
+
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
     # RBAC Integration Methods
     @property
     def roles(self):
@@ -437,9 +456,16 @@ class User(AbstractUser):
         Args:
             role_code (str): Code of the role to remove
         """
+        from apps.authorization.counters import ROLE_ACTIVE_MEMBERS
         from apps.authorization.models import UserRole
+        from apps.common import counters as counter_store
+
+        user_roles = UserRole.objects.filter(user=self, role__code=role_code)
+        role_ids = list(user_roles.values_list("role_id", flat=True))
+        user_roles.update(is_active=False)
 
-        UserRole.objects.filter(user=self, role__code=role_code).update(is_active=False)
+        # update() sends no signals
+        counter_store.recount(ROLE_ACTIVE_MEMBERS, role_ids)
 
         # Clear permission cache
         from apps.authorization.permissions import PermissionChecker
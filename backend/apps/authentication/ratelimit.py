@@ -0,0 +1,410 @@
+"""
+Shared rate limiting for ZentraQMS.
+
+Limits are enforced with GCRA (generic cell rate algorithm), an equivalent
+formulation of a token bucket that stores a single timestamp per key: the
+theoretical arrival time (TAT) of the next request. Memory is O(1) per key
+and every check is a single read-modify-write.
+
+With Redis (production) the update runs as a Lua script, so it is atomic
+across workers and uses the Redis clock. Other cache backends (LocMem) fall
+back to a process-local lock around the cache read and write. A cache that
+stores nothing (DummyCache in development and tests) is replaced by a
+process-local LRU of TATs, so the limits still hold within one process.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.common.utils import cache_persists
+
+try:
+    from django_redis import get_redis_connection
+except ImportError:  # pragma: no cover - django_redis is a production dependency
+    get_redis_connection = None
+
+logger = logging.getLogger("authentication")
+
+# KEYS[1]: limiter key; ARGV: emission interval (ms), burst tolerance (ms), cost
+# Returns {allowed, TAT offset from now (ms), retry after (ms)}
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval * cost
+local allow_at = new_tat - tolerance
+if now < allow_at then
+    return {0, tat - now, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(new_tat - now, 1))
+return {1, new_tat - now, 0}
+"""
+
+PERIOD_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    Parse a rate string such as ``"100/15m"`` or ``"5/s"``.
+
+    Args:
+        rate (str): Requests and period (s, m, h or d with an optional multiplier)
+
+    Returns:
+        tuple: (limit, period in seconds)
+
+    Raises:
+        ValueError: If the rate string is malformed
+    """
+    match = RATE_PATTERN.match(rate or "")
+    if not match:
+        raise ValueError(f"Invalid rate: {rate!r}")
+
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * PERIOD_UNITS[unit]
+
+
+class RateLimitPolicy:
+    """
+    A named limit: ``limit`` requests per ``period`` seconds.
+
+    Attributes:
+        name (str): Policy name, part of the cache key
+        limit (int): Requests allowed per period (also the burst size)
+        period (int): Period in seconds
+        key (str): What the limit is keyed by: 'ip', 'user' or 'user_or_ip'
+    """
+
+    def __init__(self, name: str, limit: int, period: int, key: str = "ip"):
+        if limit <= 0 or period <= 0:
+            raise ValueError(f"Invalid rate limit policy: {name}")
+
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.key = key
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict) -> "RateLimitPolicy":
+        """
+        Build a policy from a ``RATE_LIMIT_POLICIES`` entry.
+
+        Args:
+            name (str): Policy name
+            config (dict): {'rate': '100/15m', 'key': 'ip'}
+
+        Returns:
+            RateLimitPolicy: Parsed policy
+        """
+        limit, period = parse_rate(config["rate"])
+        return cls(name, limit, period, key=config.get("key", "ip"))
+
+    @property
+    def emission_interval_ms(self) -> int:
+        """Milliseconds between requests at the sustained rate."""
+        return max(1, round(self.period * 1000 / self.limit))
+
+    @property
+    def tolerance_ms(self) -> int:
+        """Burst tolerance: a full bucket of ``limit`` requests."""
+        return self.emission_interval_ms * self.limit
+
+
+class RateLimitResult:
+    """
+    Outcome of a rate limit check.
+
+    Attributes:
+        allowed (bool): Whether the request fits within the limit
+        limit (int): Requests allowed per period
+        remaining (int): Requests still available right now
+        retry_after (int): Seconds until the next request is allowed (0 if allowed)
+        reset_after (int): Seconds until the bucket is full again
+    """
+
+    def __init__(
+        self,
+        allowed: bool,
+        limit: int,
+        remaining: int,
+        retry_after: int = 0,
+        reset_after: int = 0,
+    ):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+        self.reset_after = reset_after
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        return (
+            f"RateLimitResult(allowed={self.allowed}, remaining={self.remaining}, "
+            f"retry_after={self.retry_after})"
+        )
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter over the shared cache.
+
+    Policies come from ``settings.RATE_LIMIT_POLICIES`` and routes are mapped
+    to policies by path prefix with ``settings.RATE_LIMIT_ROUTES``.
+    """
+
+    CACHE_PREFIX = "ratelimit"
+    LOCAL_MAX_KEYS = 10000
+
+    _local_lock = threading.Lock()
+    _local_store: "OrderedDict[str, int]" = OrderedDict()
+    _script = None
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return getattr(settings, "RATE_LIMIT_ENABLED", True)
+
+    @classmethod
+    def get_cache(cls):
+        return caches[getattr(settings, "RATE_LIMIT_CACHE", "default")]
+
+    @classmethod
+    def get_policy(cls, name: str) -> Optional[RateLimitPolicy]:
+        """
+        Get a configured policy by name.
+
+        Args:
+            name (str): Policy name in ``RATE_LIMIT_POLICIES``
+
+        Returns:
+            RateLimitPolicy: The policy, or None if it is not configured
+        """
+        config = getattr(settings, "RATE_LIMIT_POLICIES", {}).get(name)
+        if not config:
+            return None
+        return RateLimitPolicy.from_config(name, config)
+
+    @classmethod
+    def policy_for_path(cls, path: str) -> Optional[RateLimitPolicy]:
+        """
+        Resolve the policy of a request path (first matching prefix wins).
+
+        Args:
+            path (str): Request path
+
+        Returns:
+            RateLimitPolicy: Matching policy, or None if the path is not limited
+        """
+        for prefix, name in getattr(settings, "RATE_LIMIT_ROUTES", []):
+            if path.startswith(prefix):
+                return cls.get_policy(name)
+        return None
+
+    @classmethod
+    def make_key(cls, policy: RateLimitPolicy, identifier: str) -> str:
+        return f"{cls.CACHE_PREFIX}:{policy.name}:{identifier}"
+
+    @classmethod
+    def hit(
+        cls, policy: RateLimitPolicy, identifier: str, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        Atomically check and consume ``cost`` requests for an identifier.
+
+        Args:
+            policy (RateLimitPolicy): Policy to enforce
+            identifier (str): IP address, user ID, email, etc.
+            cost (int): Requests consumed by this call
+
+        Returns:
+            RateLimitResult: Whether the request is allowed and the remaining quota
+        """
+        if not cls.enabled():
+            return RateLimitResult(True, policy.limit, policy.limit)
+
+        key = cls.make_key(policy, identifier)
+        try:
+            client = cls._get_redis_client()
+            if client is not None:
+                return cls._hit_redis(client, policy, key, cost)
+            return cls._hit_local(policy, key, cost)
+        except Exception as e:
+            # Fail open: an unavailable cache must not take the API down
+            logger.error(f"Rate limiter error for {key}: {str(e)}")
+            return RateLimitResult(True, policy.limit, policy.limit)
+
+    @classmethod
+    def peek(cls, policy: RateLimitPolicy, identifier: str) -> RateLimitResult:
+        """
+        Check the quota of an identifier without consuming it.
+
+        Args:
+            policy (RateLimitPolicy): Policy to check
+            identifier (str): IP address, user ID, email, etc.
+
+        Returns:
+            RateLimitResult: Whether one more request would be allowed
+        """
+        if not cls.enabled():
+            return RateLimitResult(True, policy.limit, policy.limit)
+
+        backend = cls.get_cache()
+        key = cls.make_key(policy, identifier)
+        try:
+            client = cls._get_redis_client()
+            if client is not None:
+                raw = client.get(backend.make_key(key))
+                now_ms = cls._redis_now_ms(client)
+            else:
+                now_ms = cls._now_ms()
+                with cls._local_lock:
+                    raw = cls._local_get(backend, key, now_ms)
+        except Exception as e:
+            logger.error(f"Rate limiter error for {key}: {str(e)}")
+            return RateLimitResult(True, policy.limit, policy.limit)
+
+        tat = max(int(raw), now_ms) if raw is not None else now_ms
+        tat_offset = tat - now_ms
+        allow_in = tat_offset + policy.emission_interval_ms - policy.tolerance_ms
+        return cls._build_result(policy, allow_in <= 0, tat_offset, allow_in)
+
+    @classmethod
+    def reset(cls, policy: RateLimitPolicy, identifier: str) -> None:
+        """Clear the quota usage of an identifier."""
+        key = cls.make_key(policy, identifier)
+        backend = cls.get_cache()
+        if cache_persists(backend):
+            backend.delete(key)
+        else:
+            with cls._local_lock:
+                cls._local_store.pop(key, None)
+
+    @classmethod
+    def _evaluate(
+        cls, policy: RateLimitPolicy, tat_offset: int, cost: int
+    ) -> RateLimitResult:
+        """
+        Apply GCRA to a TAT expressed as an offset from now.
+
+        Returns:
+            RateLimitResult: Result; on success the offset includes ``cost``
+        """
+        interval = policy.emission_interval_ms
+        new_offset = tat_offset + interval * cost
+        allow_in = new_offset - policy.tolerance_ms
+        if allow_in > 0:
+            return cls._build_result(policy, False, tat_offset, allow_in)
+        return cls._build_result(policy, True, new_offset, 0)
+
+    @classmethod
+    def _build_result(
+        cls, policy: RateLimitPolicy, allowed: bool, tat_offset: int, retry_ms: int
+    ) -> RateLimitResult:
+        interval = policy.emission_interval_ms
+        remaining = max(0, (policy.tolerance_ms - tat_offset) // interval)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=policy.limit,
+            remaining=min(policy.limit, remaining),
+            retry_after=math.ceil(retry_ms / 1000) if retry_ms > 0 else 0,
+            reset_after=math.ceil(max(tat_offset, 0) / 1000),
+        )
+
+    @classmethod
+    def _hit_local(
+        cls, policy: RateLimitPolicy, key: str, cost: int
+    ) -> RateLimitResult:
+        """GCRA over a non-Redis cache, serialized with a process-local lock."""
+        backend = cls.get_cache()
+        with cls._local_lock:
+            now_ms = cls._now_ms()
+            raw = cls._local_get(backend, key, now_ms)
+            tat = max(int(raw), now_ms) if raw is not None else now_ms
+
+            result = cls._evaluate(policy, tat - now_ms, cost)
+            if result.allowed:
+                new_tat = tat + policy.emission_interval_ms * cost
+                cls._local_set(backend, key, new_tat, now_ms)
+        return result
+
+    @classmethod
+    def _local_get(cls, backend, key: str, now_ms: int) -> Optional[int]:
+        """Read a TAT from the cache, or from the local store if it does not persist."""
+        if cache_persists(backend):
+            return backend.get(key)
+
+        tat = cls._local_store.get(key)
+        if tat is not None and tat <= now_ms:
+            # Expired: the bucket is full again
+            del cls._local_store[key]
+            return None
+        return tat
+
+    @classmethod
+    def _local_set(cls, backend, key: str, tat: int, now_ms: int) -> None:
+        """Write a TAT to the cache, or to the bounded local store."""
+        if cache_persists(backend):
+            backend.set(key, tat, math.ceil((tat - now_ms) / 1000) or 1)
+            return
+
+        cls._local_store[key] = tat
+        cls._local_store.move_to_end(key)
+        while len(cls._local_store) > cls.LOCAL_MAX_KEYS:
+            cls._local_store.popitem(last=False)
+
+    @classmethod
+    def _hit_redis(
+        cls, client, policy: RateLimitPolicy, key: str, cost: int
+    ) -> RateLimitResult:
+        """GCRA as an atomic Lua script on the Redis server."""
+        if cls._script is None:
+            cls._script = client.register_script(GCRA_SCRIPT)
+
+        allowed, tat_offset, retry_ms = cls._script(
+            keys=[cls.get_cache().make_key(key)],
+            args=[policy.emission_interval_ms, policy.tolerance_ms, cost],
+            client=client,
+        )
+        return cls._build_result(policy, bool(allowed), int(tat_offset), int(retry_ms))
+
+    @classmethod
+    def _get_redis_client(cls):
+        """Return a raw Redis client when the limiter cache is Redis-backed."""
+        backend = cls.get_cache()
+        module = type(backend).__module__
+
+        if get_redis_connection is not None and module.startswith("django_redis"):
+            return get_redis_connection(
+                getattr(settings, "RATE_LIMIT_CACHE", "default")
+            )
+        if module == "django.core.cache.backends.redis":
+            return backend._cache.get_client(write=True)
+        return None
+
+    @staticmethod
+    def _redis_now_ms(client) -> int:
+        seconds, microseconds = client.time()
+        return int(seconds) * 1000 + int(microseconds) // 1000
+
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000
@@ -14,6 +14,8 @@ from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .exceptions import RateLimitExceededException
+from .ratelimit import RateLimiter
 from .validators import validate_password_confirmation, validate_colombian_phone
 from apps.common.utils import get_client_ip
 
@@ -513,6 +515,13 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         # Add RBAC information
         try:
+            from apps.authorization.claims import RBACTokenClaims
+
+            # Compact claims (role codes + permission bitset + RBAC version)
+            if RBACTokenClaims.enabled():
+                RBACTokenClaims.add_to_token(token, user)
+                return token
+
             # Get user roles
             from apps.authorization.models import UserRole
             from django.utils import timezone
@@ -538,6 +547,54 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return token
 
+    def check_login_rate_limit(self, email):
+        """
+        Check the login rate limits before the credentials are verified.
+
+        Every attempt consumes the IP limit. The email limit is only checked
+        here; it is charged by ``record_failed_login`` so that nobody can
+        lock an account out with logins that never reach its password.
+
+        Args:
+            email (str): Normalized email of the login attempt
+
+        Raises:
+            RateLimitExceededException: If either limit is exhausted
+        """
+        request = self.context.get("request")
+        ip_address = get_client_ip(request) if request else None
+
+        if ip_address:
+            policy = RateLimiter.get_policy("login_ip")
+            if policy is not None:
+                self._raise_if_limited(RateLimiter.hit(policy, ip_address))
+
+        policy = RateLimiter.get_policy("login_email")
+        if policy is not None:
+            self._raise_if_limited(RateLimiter.peek(policy, email))
+
+    def record_failed_login(self, email):
+        """
+        Charge a failed authentication to the email rate limit.
+
+        Args:
+            email (str): Normalized email of the login attempt
+
+        Raises:
+            RateLimitExceededException: If the attempt exceeds the limit
+        """
+        policy = RateLimiter.get_policy("login_email")
+        if policy is not None:
+            self._raise_if_limited(RateLimiter.hit(policy, email))
+
+    def _raise_if_limited(self, result):
+        if not result.allowed:
+            raise RateLimitExceededException(
+                message="Demasiados intentos de inicio de sesión. "
+                "Intente más tarde.",
+                retry_after=result.retry_after,
+            )
+
     def validate(self, attrs):
         """
         Validate credentials and account status.
@@ -562,10 +619,14 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Normalize email
         email = email.lower().strip()
 
+        # Throttle credential stuffing by client IP and by target account
+        self.check_login_rate_limit(email)
+
         # Try to get user
         try:
             user = User.objects.get(email__iexact=email)
         except User.DoesNotExist:
+            self.record_failed_login(email)
             # Don't reveal if email exists or not
             raise serializers.ValidationError(
                 {"detail": "Las credenciales proporcionadas no son válidas."}
@@ -597,12 +658,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not user.check_password(password):
             # Increment failed attempts
             user.increment_failed_login()
+            self.record_failed_login(email)
             raise serializers.ValidationError(
                 {"detail": "Las credenciales proporcionadas no son válidas."}
             )
 
         # Authentication successful - reset failed attempts
         user.reset_failed_login_attempts()
+        policy = RateLimiter.get_policy("login_email")
+        if policy is not None:
+            RateLimiter.reset(policy, email)
 
         # Update last login IP if request is available
         request = self.context.get("request")
@@ -7,16 +7,28 @@ such as user creation, login attempts, etc.
 
 import logging
 from django.contrib.auth.signals import user_logged_in, user_login_failed
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
 from apps.common.utils import get_client_ip
+from .authentication import UserPrincipalCache
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
+def _invalidate_principal(user_id, using):
+    """
+    Drop the cached JWT principal of a user once the change commits.
+
+    Renewing the generation before the commit would let a concurrent
+    request cache the old row again under the new generation.
+    """
+    transaction.on_commit(lambda: UserPrincipalCache.invalidate(user_id), using=using)
+
+
 @receiver(post_save, sender=User)
 def user_post_save(sender, instance, created, **kwargs):
     """
@@ -28,6 +40,9 @@ def user_post_save(sender, instance, created, **kwargs):
         created (bool): True if this is a new user
         **kwargs: Additional keyword arguments
     """
+    # Drop the cached JWT principal (status, lock and identity fields)
+    _invalidate_principal(instance.pk, kwargs.get("using", "default"))
+
     if created:
         logger.info(f"New user created: {instance.email}")
 
@@ -38,6 +53,19 @@ def user_post_save(sender, instance, created, **kwargs):
         logger.info(f"User updated: {instance.email}")
 
 
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance, **kwargs):
+    """
+    Handle user deletion events.
+
+    Args:
+        sender: The User model class
+        instance: The User instance that was deleted
+        **kwargs: Additional keyword arguments
+    """
+    _invalidate_principal(instance.pk, kwargs.get("using", "default"))
+
+
 @receiver(user_logged_in)
 def user_logged_in_handler(sender, request, user, **kwargs):
     """
@@ -7,13 +7,18 @@ including login, logout, token refresh, and user profile endpoints.
 
 import json
 from datetime import timedelta
+from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import CachedJWTAuthentication
 from .utils import lock_account
 
 User = get_user_model()
@@ -467,6 +472,19 @@ class CurrentUserTests(JWTAuthenticationTestCase):
         self.assertEqual(response.data["data"]["roles"], [])
         self.assertEqual(response.data["data"]["permissions"], [])
 
+    def test_get_current_user_conditional(self):
+        """Test the profile is answered with 304 until the user changes."""
+        self.authenticate_user(self.user)
+
+        etag = self.client.get(self.user_url)["ETag"]
+        response = self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.user.verify_email()
+        response = self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
     def test_get_current_user_unauthenticated(self):
         """Test getting current user data without authentication."""
         response = self.client.get(self.user_url)
@@ -682,3 +700,134 @@ class SecurityTests(JWTAuthenticationTestCase):
 
         self.assertEqual(response1.status_code, response2.status_code)
         self.assertEqual(response1.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "auth-principal-tests",
+        }
+    }
+)
+class CachedPrincipalTests(JWTAuthenticationTestCase):
+    """Tests for JWT user resolution through the cached principal."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # LocMemCache stands in for the shared cache (Redis) of production
+        patcher = patch("apps.common.utils.cache_is_shared", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.auth = CachedJWTAuthentication()
+
+    def build_request(self, user):
+        tokens = self.get_tokens_for_user(user)
+        return self.factory.get(
+            "/api/auth/user/", HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+
+    def authenticate_request(self, user):
+        return self.auth.authenticate(self.build_request(user))
+
+    def test_cached_principal_skips_user_query(self):
+        """Test that a warm principal authenticates without querying users."""
+        request = self.build_request(self.user)
+        self.auth.authenticate(request)
+
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate(request)
+
+        self.assertIsInstance(user, User)
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.is_authenticated)
+
+    def test_deferred_fields_load_in_one_query(self):
+        """Test that touching a model-only field materializes the full row."""
+        self.user.department = "Calidad"
+        self.user.position = "Coordinador"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        user, _ = self.authenticate_request(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.department, "Calidad")
+            self.assertEqual(user.position, "Coordinador")
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a user invalidates the cached principal."""
+        self.authenticate_request(self.user)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate_request(self.user)
+
+    def test_locked_user_rejected(self):
+        """Test that locked accounts are rejected from the cached entry."""
+        self.authenticate_request(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            lock_account(self.user, minutes=30)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate_request(self.user)
+
+    def test_current_user_endpoint(self):
+        """Test that views receive a usable user instance."""
+        self.authenticate_user(self.user)
+        self.client.get(self.user_url)
+
+        response = self.client.get(self.user_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["email"], self.user.email)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "auth-principal-local-tests",
+        }
+    }
+)
+class LocalCachePrincipalTests(JWTAuthenticationTestCase):
+    """Tests for JWT user resolution with a per-process cache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.factory = RequestFactory()
+        self.auth = CachedJWTAuthentication()
+
+    def test_principal_not_cached(self):
+        """Test that each request reads the user row without a shared cache."""
+        tokens = self.get_tokens_for_user(self.user)
+        request = self.factory.get(
+            "/api/auth/user/", HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        self.auth.authenticate(request)
+
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate(request)
+
+        self.assertEqual(user, self.user)
+
+    def test_deactivation_applies_without_invalidation(self):
+        """Test that a deactivated user is rejected even if no hook ran."""
+        tokens = self.get_tokens_for_user(self.user)
+        request = self.factory.get(
+            "/api/auth/user/", HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+        )
+        self.auth.authenticate(request)
+
+        # Another worker's change: this process's cache is never told
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(request)
@@ -0,0 +1,242 @@
+"""
+Tests for the shared GCRA rate limiter in ZentraQMS.
+
+This module covers the limiter engine, the rate limiting helpers in utils,
+and its integration with IPSecurityMiddleware and the login endpoint.
+"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .ratelimit import RateLimiter, RateLimitPolicy, parse_rate
+from .utils import check_rate_limit, record_request
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "rate-limit-tests",
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, RATE_LIMIT_ENABLED=True)
+class RateLimiterTests(TestCase):
+    """Tests for the RateLimiter engine."""
+
+    def setUp(self):
+        cache.clear()
+        self.policy = RateLimitPolicy("test", limit=3, period=60)
+
+    def test_parse_rate(self):
+        """Test parsing of rate strings."""
+        self.assertEqual(parse_rate("100/15m"), (100, 900))
+        self.assertEqual(parse_rate("5/s"), (5, 1))
+        self.assertEqual(parse_rate("1000/d"), (1000, 86400))
+
+        with self.assertRaises(ValueError):
+            parse_rate("100 per minute")
+
+    def test_allows_burst_then_denies(self):
+        """Test that a full burst is allowed and the next request is denied."""
+        results = [RateLimiter.hit(self.policy, "1.2.3.4") for _ in range(3)]
+
+        self.assertTrue(all(result.allowed for result in results))
+        self.assertEqual([result.remaining for result in results], [2, 1, 0])
+
+        denied = RateLimiter.hit(self.policy, "1.2.3.4")
+        self.assertFalse(denied.allowed)
+        self.assertGreater(denied.retry_after, 0)
+        self.assertLessEqual(denied.retry_after, 20)
+
+    def test_identifiers_are_independent(self):
+        """Test that each identifier has its own quota."""
+        for _ in range(3):
+            RateLimiter.hit(self.policy, "1.2.3.4")
+
+        self.assertTrue(RateLimiter.hit(self.policy, "5.6.7.8").allowed)
+
+    def test_quota_recovers_over_time(self):
+        """Test that quota is restored at the sustained rate."""
+        with patch.object(RateLimiter, "_now_ms", return_value=1_000_000):
+            for _ in range(3):
+                RateLimiter.hit(self.policy, "1.2.3.4")
+            self.assertFalse(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+
+        # One emission interval (60s / 3) later a single request fits again
+        with patch.object(RateLimiter, "_now_ms", return_value=1_020_000):
+            self.assertTrue(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+            self.assertFalse(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+
+    def test_single_value_per_key(self):
+        """Test that the limiter stores one timestamp per key."""
+        for _ in range(3):
+            RateLimiter.hit(self.policy, "1.2.3.4")
+
+        stored = cache.get(RateLimiter.make_key(self.policy, "1.2.3.4"))
+        self.assertIsInstance(stored, int)
+
+    def test_peek_does_not_consume(self):
+        """Test that peek reports quota without consuming it."""
+        for _ in range(5):
+            self.assertTrue(RateLimiter.peek(self.policy, "1.2.3.4").allowed)
+
+        self.assertEqual(RateLimiter.hit(self.policy, "1.2.3.4").remaining, 2)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        """Test that requests are always allowed when limiting is disabled."""
+        for _ in range(5):
+            self.assertTrue(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+
+    def test_check_and_record_helpers(self):
+        """Test the check_rate_limit and record_request helpers."""
+        self.assertEqual(check_rate_limit("client", max_requests=2), (True, 2))
+
+        record_request("client", max_requests=2)
+        self.assertEqual(check_rate_limit("client", max_requests=2), (True, 1))
+
+        record_request("client", max_requests=2)
+        self.assertEqual(check_rate_limit("client", max_requests=2), (False, 0))
+
+
+@override_settings(RATE_LIMIT_ENABLED=True)
+class LocalRateLimiterTests(TestCase):
+    """Tests for the process-local store used when the cache stores nothing."""
+
+    def setUp(self):
+        RateLimiter._local_store.clear()
+        self.addCleanup(RateLimiter._local_store.clear)
+        self.policy = RateLimitPolicy("test", limit=3, period=60)
+
+    def test_limits_without_persistent_cache(self):
+        """Test that the testing DummyCache still enforces the limit."""
+        for _ in range(3):
+            self.assertTrue(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+
+        self.assertFalse(RateLimiter.hit(self.policy, "1.2.3.4").allowed)
+        self.assertFalse(RateLimiter.peek(self.policy, "1.2.3.4").allowed)
+        self.assertIsNone(cache.get(RateLimiter.make_key(self.policy, "1.2.3.4")))
+
+    def test_reset_clears_local_quota(self):
+        """Test that reset empties the local bucket of an identifier."""
+        for _ in range(3):
+            RateLimiter.hit(self.policy, "1.2.3.4")
+
+        RateLimiter.reset(self.policy, "1.2.3.4")
+
+        self.assertEqual(RateLimiter.hit(self.policy, "1.2.3.4").remaining, 2)
+
+    def test_local_store_is_bounded(self):
+        """Test that the least recently used keys are evicted."""
+        with patch.object(RateLimiter, "LOCAL_MAX_KEYS", 2):
+            for ip in ("1.1.1.1", "2.2.2.2", "3.3.3.3"):
+                RateLimiter.hit(self.policy, ip)
+
+        self.assertEqual(len(RateLimiter._local_store), 2)
+        self.assertNotIn(
+            RateLimiter.make_key(self.policy, "1.1.1.1"), RateLimiter._local_store
+        )
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMIT_POLICIES={
+        "api": {"rate": "100/m", "key": "user_or_ip"},
+        "login_ip": {"rate": "20/m", "key": "ip"},
+        "login_email": {"rate": "2/m", "key": "email"},
+    },
+    RATE_LIMIT_ROUTES=[("/api/", "api")],
+)
+class RateLimitIntegrationTests(APITestCase):
+    """Tests for rate limiting in the middleware and the login endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="ratelimit@zentraqms.com",
+            password="TestPass123!",
+            first_name="Rate",
+            last_name="Limit",
+            is_active=True,
+            is_verified=True,
+        )
+        self.login_url = reverse("authentication:login")
+        self.user_url = reverse("authentication:current_user")
+
+    @override_settings(RATE_LIMIT_POLICIES={"api": {"rate": "2/m", "key": "ip"}})
+    def test_middleware_limits_api_requests(self):
+        """Test that IPSecurityMiddleware returns 429 once the quota is used."""
+        for _ in range(2):
+            response = self.client.get(self.user_url)
+            self.assertNotEqual(response.status_code, 429)
+            self.assertIn("X-RateLimit-Remaining", response)
+
+        response = self.client.get(self.user_url)
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.json()["error"]["code"], "RATE_LIMITED")
+        self.assertIn("Retry-After", response)
+
+    def test_bearer_token_is_validated_once(self):
+        """Test that DRF reuses the token the middleware validated."""
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        with patch.object(
+            JWTAuthentication,
+            "get_validated_token",
+            autospec=True,
+            side_effect=JWTAuthentication.get_validated_token,
+        ) as get_validated_token:
+            response = self.client.get(self.user_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_validated_token.call_count, 1)
+
+    def test_login_limited_per_email(self):
+        """Test that repeated logins against one account are throttled."""
+        data = {"email": self.user.email, "password": "WrongPassword123!"}
+
+        for _ in range(2):
+            response = self.client.post(self.login_url, data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.login_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 2)
+
+    def test_successful_logins_do_not_consume_email_limit(self):
+        """Test that only failed authentications are charged to the account."""
+        data = {"email": self.user.email, "password": "TestPass123!"}
+
+        for _ in range(3):
+            response = self.client.post(self.login_url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_successful_login_resets_email_limit(self):
+        """Test that a successful login refunds earlier failed attempts."""
+        wrong = {"email": self.user.email, "password": "WrongPassword123!"}
+        right = {"email": self.user.email, "password": "TestPass123!"}
+
+        self.client.post(self.login_url, wrong)
+        response = self.client.post(self.login_url, right)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for _ in range(2):
+            response = self.client.post(self.login_url, wrong)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
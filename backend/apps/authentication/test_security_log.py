@@ -0,0 +1,134 @@
+"""
+Tests for the batched security event log in ZentraQMS.
+
+This module covers BatchedJSONLinesHandler and the structured records
+produced by log_security_event.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from apps.common.log_handlers import BatchedJSONLinesHandler
+from .utils import log_security_event
+
+
+class BatchedJSONLinesHandlerTests(SimpleTestCase):
+    """Tests for the asynchronous JSON lines handler."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "security.log")
+        self.logger = logging.getLogger(f"test.security.{self._testMethodName}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.tmpdir.cleanup()
+
+    def attach(self, **kwargs):
+        handler = BatchedJSONLinesHandler(self.path, flush_interval=0.05, **kwargs)
+        self.logger.addHandler(handler)
+        return handler
+
+    def read_lines(self):
+        with open(self.path, encoding="utf-8") as stream:
+            return [json.loads(line) for line in stream]
+
+    def test_writes_structured_json_lines(self):
+        """Test that records are written as JSON with their event fields."""
+        handler = self.attach()
+
+        self.logger.info(
+            "Security event: login",
+            extra={"event": {"event_type": "login", "ip_address": "10.0.0.1"}},
+        )
+        handler.flush()
+
+        [line] = self.read_lines()
+        self.assertEqual(line["message"], "Security event: login")
+        self.assertEqual(line["event_type"], "login")
+        self.assertEqual(line["ip_address"], "10.0.0.1")
+        self.assertEqual(line["level"], "INFO")
+
+    def test_writes_from_background_thread(self):
+        """Test that the file is written by the writer thread, not the caller."""
+        handler = self.attach()
+        writer_threads = []
+        original_write = handler._write_batch
+
+        def recording_write(batch):
+            writer_threads.append(threading.current_thread())
+            original_write(batch)
+
+        handler._write_batch = recording_write
+
+        for i in range(50):
+            self.logger.info("event %s", i)
+        handler.flush()
+
+        self.assertEqual(len(self.read_lines()), 50)
+        self.assertNotIn(threading.current_thread(), writer_threads)
+
+    def test_drop_new_when_buffer_full(self):
+        """Test that a full buffer drops records instead of blocking."""
+        handler = self.attach(max_queue_size=5)
+        release = threading.Event()
+        original_write = handler._write_batch
+
+        def slow_write(batch):
+            release.wait(timeout=5)
+            original_write(batch)
+
+        handler._write_batch = slow_write
+
+        for i in range(50):
+            self.logger.info("event %s", i)
+        self.assertGreater(handler.dropped, 0)
+
+        release.set()
+        handler.flush()
+        lines = self.read_lines()
+
+        self.assertLess(len(lines), 51)
+        self.assertEqual(lines[-1]["event_type"], "log_records_dropped")
+
+    def test_close_drains_queue(self):
+        """Test that closing the handler writes every pending record."""
+        handler = self.attach()
+        for i in range(20):
+            self.logger.info("event %s", i)
+
+        self.logger.removeHandler(handler)
+        handler.close()
+
+        self.assertEqual(len(self.read_lines()), 20)
+
+    def test_log_security_event_fields(self):
+        """Test that log_security_event emits a structured record."""
+        handler = BatchedJSONLinesHandler(self.path, flush_interval=0.05)
+        auth_logger = logging.getLogger("authentication")
+        previous_level = auth_logger.level
+        auth_logger.setLevel(logging.INFO)
+        auth_logger.addHandler(handler)
+        try:
+            log_security_event(
+                "jwt_auth_failed", "user@zentraqms.com", "10.0.0.2", {"path": "/api/"}
+            )
+            handler.flush()
+        finally:
+            auth_logger.setLevel(previous_level)
+            auth_logger.removeHandler(handler)
+            handler.close()
+
+        [line] = self.read_lines()
+        self.assertEqual(line["event_type"], "jwt_auth_failed")
+        self.assertEqual(line["user_email"], "user@zentraqms.com")
+        self.assertEqual(line["details"], {"path": "/api/"})
@@ -13,6 +13,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from apps.common.utils import get_client_ip
+from .ratelimit import RateLimiter, RateLimitPolicy
 
 User = get_user_model()
 logger = logging.getLogger("authentication")
@@ -169,7 +170,9 @@ def log_security_event(
         "details": details or {},
     }
 
-    logger.info(f"Security event: {log_data}")
+    # Structured fields go to the JSON log handlers, which write them from a
+    # background thread
+    logger.info(f"Security event: {event_type}", extra={"event": log_data})
 
 
 def validate_user_access(user, request=None) -> tuple[bool, str]:
@@ -282,14 +285,20 @@ def calculate_token_expiry(token_string: str) -> Optional[timezone.datetime]:
 # ================================
 
 
+def _adhoc_policy(max_requests: int, window_minutes: int) -> RateLimitPolicy:
+    """Build a policy for a limit passed directly by the caller."""
+    return RateLimitPolicy(
+        f"adhoc:{max_requests}:{window_minutes}", max_requests, window_minutes * 60
+    )
+
+
 def check_rate_limit(
     identifier: str, max_requests: int = 10, window_minutes: int = 15
 ) -> tuple[bool, int]:
     """
-    Check if a request should be rate limited.
+    Check if a request should be rate limited, without recording it.
 
-    This is a basic implementation. In production, consider using Redis
-    or a dedicated rate limiting service.
+    Use ``RateLimiter.hit`` to check and record atomically in one step.
 
     Args:
         identifier (str): Unique identifier (IP, user ID, etc.)
@@ -299,20 +308,22 @@ def check_rate_limit(
     Returns:
         tuple: (is_allowed, remaining_requests)
     """
-    # TODO: Implement proper rate limiting with Redis or similar
-    # For now, always allow requests
-    return True, max_requests
+    result = RateLimiter.peek(_adhoc_policy(max_requests, window_minutes), identifier)
+    return result.allowed, result.remaining
 
 
-def record_request(identifier: str) -> None:
+def record_request(
+    identifier: str, max_requests: int = 10, window_minutes: int = 15
+) -> None:
     """
     Record a request for rate limiting purposes.
 
     Args:
         identifier (str): Unique identifier for the request source
+        max_requests (int): Maximum requests allowed in window
+        window_minutes (int): Time window in minutes
     """
-    # TODO: Implement request recording for rate limiting
-    pass
+    RateLimiter.hit(_adhoc_policy(max_requests, window_minutes), identifier)
 
 
 # ================================
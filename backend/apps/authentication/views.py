@@ -11,16 +11,25 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .exceptions import RateLimitExceededException
 from .serializers import (
     CustomTokenObtainPairSerializer,
     LoginSerializer,
     LogoutSerializer,
     UserSerializer,
 )
+from apps.authorization.rbac_cache import RBACCache
+from apps.common.conditional import (
+    is_not_modified,
+    last_modified_of,
+    make_etag,
+    set_validators,
+)
 from apps.common.utils import (
     create_success_response,
     create_error_response,
@@ -89,6 +98,18 @@ class LoginView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST,
                 )
 
+        except RateLimitExceededException as e:
+            logger.warning(
+                f"Login rate limit exceeded from IP: {get_client_ip(request)}"
+            )
+            response = create_error_response(
+                message=e.message,
+                errors=e.details,
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            response["Retry-After"] = str(e.details.get("retry_after") or 0)
+            return response
+
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return create_error_response(
@@ -193,7 +214,8 @@ class CurrentUserView(APIView):
     View to get current authenticated user information.
 
     Returns detailed user information for the authenticated user,
-    including roles and permissions (empty for now).
+    including roles and permissions (empty for now). Responses carry an ETag
+    so clients polling the profile get 304 while it is unchanged.
     """
 
     permission_classes = [IsAuthenticated]
@@ -210,6 +232,18 @@ class CurrentUserView(APIView):
         """
         try:
             user = request.user
+
+            # Version-only lookup: the principal user has most fields deferred
+            updated_at = (
+                User.objects.filter(pk=user.pk).values_list("updated_at", flat=True).get()
+            )
+            etag = make_etag(updated_at, RBACCache.version_stamp(user.pk))
+            last_modified = last_modified_of(updated_at)
+            if is_not_modified(request, etag, last_modified):
+                return set_validators(
+                    Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified
+                )
+
             serializer = UserSerializer(user)
 
             # Add additional data for frontend
@@ -219,8 +253,12 @@ class CurrentUserView(APIView):
                 []
             )  # Empty for now, will be populated in RBAC phase
 
-            return create_success_response(
-                data=user_data, message="Datos del usuario obtenidos exitosamente."
+            return set_validators(
+                create_success_response(
+                    data=user_data, message="Datos del usuario obtenidos exitosamente."
+                ),
+                etag,
+                last_modified,
             )
 
         except Exception as e:
@@ -5,3 +5,7 @@ class AuthorizationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.authorization"
     verbose_name = "Sistema de Autorización (RBAC)"
+
+    def ready(self):
+        """Registrar las señales del sistema RBAC."""
+        import apps.authorization.signals  # noqa F401
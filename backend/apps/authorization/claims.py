@@ -0,0 +1,161 @@
+"""
+Claims RBAC compactos en los tokens JWT.
+
+Con ``RBAC_TRUST_TOKEN_CLAIMS`` activo, el token de acceso lleva los roles del
+usuario y sus permisos como un bitset sobre el catálogo compilado, junto con
+un sello de versión RBAC. Mientras el sello siga vigente, los roles y
+permisos del request se toman del token sin consultar la base de datos ni la
+entrada de roles del usuario; ante cualquier discrepancia se usa el camino
+normal de ``PermissionService``.
+
+El sello solo detecta revocaciones si el caché que lo guarda persiste y se
+comparte entre procesos (ej. Redis). Con DummyCache o LocMemCache los claims
+nunca se confían y cada request usa el camino normal.
+"""
+
+import base64
+import logging
+import time
+from typing import Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.common.utils import cache_is_shared
+
+from .rbac_cache import RBACCache
+from .registry import CompiledRegistry, PermissionRegistry
+from .services import PermissionService
+
+logger = logging.getLogger(__name__)
+
+
+def encode_mask(mask: int) -> str:
+    """Codificar una máscara de bits como base64 URL-safe sin relleno."""
+    raw = mask.to_bytes(max(1, (mask.bit_length() + 7) // 8), "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_mask(value: str) -> int:
+    """Decodificar una máscara generada por ``encode_mask``."""
+    padded = value + "=" * (-len(value) % 4)
+    return int.from_bytes(base64.urlsafe_b64decode(padded), "big")
+
+
+class RBACTokenClaims:
+    """
+    Emisión y verificación de claims RBAC embebidos en el token.
+    """
+
+    ROLES = "roles"
+    PERMISSION_BITS = "perm_bits"
+    CATALOG = "perm_cat"
+    VERSION = "rbac_v"
+    EXPIRES = "rbac_exp"
+
+    _warned = False
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return getattr(settings, "RBAC_TRUST_TOKEN_CLAIMS", False)
+
+    @classmethod
+    def trusted(cls) -> bool:
+        """
+        Indica si los claims pueden reemplazar la consulta de permisos.
+
+        Requiere un caché compartido y persistente: en DummyCache el sello es
+        siempre el mismo y en LocMemCache cada proceso tiene el suyo, de modo
+        que un rol revocado seguiría vigente hasta que expire el token.
+        """
+        if not cls.enabled():
+            return False
+        if cache_is_shared(cache):
+            return True
+        if not cls._warned:
+            cls._warned = True
+            logger.warning(
+                "RBAC_TRUST_TOKEN_CLAIMS está activo pero el caché no es "
+                "compartido ni persistente; se ignoran los claims RBAC"
+            )
+        return False
+
+    @classmethod
+    def add_to_token(cls, token, user) -> None:
+        """
+        Agregar los claims RBAC compactos a un token.
+
+        Args:
+            token: Token de SimpleJWT (refresh o access)
+            user: Usuario dueño del token
+        """
+        from .models import UserRole
+
+        stamp = RBACCache.version_stamp(user.id)
+        role_codes, registry, grant_mask, _ = PermissionService.resolve_user(user)
+
+        token[cls.ROLES] = sorted(role_codes)
+        token[cls.PERMISSION_BITS] = encode_mask(grant_mask)
+        token[cls.CATALOG] = registry.fingerprint
+        token[cls.VERSION] = stamp
+
+        # Los claims dejan de ser válidos cuando expira el primer rol temporal
+        next_expiry = (
+            UserRole.objects.filter(
+                user=user,
+                is_active=True,
+                expires_at__isnull=False,
+                expires_at__gt=timezone.now(),
+            )
+            .aggregate(next_expiry=Min("expires_at"))
+            .get("next_expiry")
+        )
+        if next_expiry is not None:
+            token[cls.EXPIRES] = int(next_expiry.timestamp())
+
+    @classmethod
+    def resolve(
+        cls, token, user
+    ) -> Optional[Tuple[Set[str], CompiledRegistry, int, int]]:
+        """
+        Resolver roles y máscaras desde los claims de un token verificado.
+
+        Returns:
+            La misma tupla que ``PermissionService.resolve_user``, o None si
+            el token no trae claims RBAC o están desactualizados
+        """
+        if not cls.trusted() or token is None or not hasattr(token, "get"):
+            return None
+
+        bits = token.get(cls.PERMISSION_BITS)
+        stamp = token.get(cls.VERSION)
+        if bits is None or stamp is None:
+            return None
+
+        if str(token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"])) != str(user.id):
+            return None
+
+        expires = token.get(cls.EXPIRES)
+        if expires is not None and time.time() >= expires:
+            return None
+
+        if stamp != RBACCache.version_stamp(user.id):
+            logger.debug(f"Stale RBAC claims for user {user.id}, using fallback")
+            return None
+
+        registry = PermissionRegistry.get()
+        if token.get(cls.CATALOG) != registry.fingerprint:
+            return None
+
+        try:
+            grant_mask = decode_mask(bits)
+        except (TypeError, ValueError):
+            return None
+
+        if grant_mask > registry.full_mask:
+            return None
+
+        role_codes = set(token.get(cls.ROLES) or [])
+        return role_codes, registry, grant_mask, registry.expand_mask(grant_mask)
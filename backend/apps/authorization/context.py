@@ -0,0 +1,133 @@
+"""
+Contexto RBAC por request.
+
+Los roles y permisos del usuario se resuelven de forma perezosa la primera vez
+que se consultan, desde los claims del token JWT (si están habilitados y
+vigentes) o desde una única entrada de caché (o una sola consulta), y se
+reutilizan durante el resto del request por el middleware, las permission
+classes de DRF y los mixins.
+"""
+
+import logging
+from typing import Iterable, Set
+
+from .claims import RBACTokenClaims
+from .services import PermissionService
+
+logger = logging.getLogger(__name__)
+
+SUPER_ADMIN_ROLE = "super_admin"
+SUPER_ADMIN_PERMISSION = "*.all"
+
+
+class RBACContext:
+    """
+    Roles y permisos de un usuario, cargados bajo demanda.
+    """
+
+    def __init__(self, user, token=None):
+        self.user = user
+        self.token = token
+        self._loaded = False
+        self._assigned_roles: Set[str] = set()
+        self._roles: Set[str] = set()
+        self._permissions: Set[str] = set()
+        self._registry = None
+        self._effective_mask = 0
+
+    @classmethod
+    def for_request(cls, request) -> "RBACContext":
+        """
+        Obtener el contexto del request, creándolo si no existe.
+
+        Acepta tanto ``HttpRequest`` como ``rest_framework.request.Request``;
+        el contexto se guarda en el ``HttpRequest`` subyacente. Si el usuario
+        cambió desde que se creó (por ejemplo, tras la autenticación JWT de
+        DRF), se crea uno nuevo.
+        """
+        http_request = getattr(request, "_request", request)
+        user = getattr(request, "user", None)
+
+        context = getattr(http_request, "_rbac_context", None)
+        if context is None or context.user is not user:
+            context = cls(user, token=getattr(request, "auth", None))
+            http_request._rbac_context = context
+        return context
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(self.user and self.user.is_authenticated)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not self.is_authenticated:
+            return
+
+        try:
+            # Claims RBAC del token si son confiables y vigentes
+            state = RBACTokenClaims.resolve(self.token, self.user)
+            if state is None:
+                state = PermissionService.resolve_user(self.user)
+            role_codes, registry, grant_mask, effective_mask = state
+        except Exception as e:
+            # En caso de error, mantener valores vacíos
+            logger.error(f"Error loading RBAC context for user {self.user.id}: {e}")
+            return
+
+        self._assigned_roles = role_codes
+        self._roles = set(role_codes)
+        self._permissions = registry.decode(grant_mask)
+        self._registry = registry
+        self._effective_mask = effective_mask
+
+        # Agregar permisos especiales para superusuarios
+        if self.user.is_superuser:
+            self._roles.add(SUPER_ADMIN_ROLE)
+            self._permissions = {SUPER_ADMIN_PERMISSION}
+
+    @property
+    def assigned_roles(self) -> Set[str]:
+        """Códigos de los roles vigentes asignados al usuario."""
+        self._load()
+        return self._assigned_roles
+
+    @property
+    def roles(self) -> Set[str]:
+        """Roles del usuario; los superusuarios incluyen ``super_admin``."""
+        self._load()
+        return self._roles
+
+    @property
+    def permissions(self) -> Set[str]:
+        """Permisos asignados; los superusuarios tienen ``*.all``."""
+        self._load()
+        return self._permissions
+
+    def has_permission(self, permission_code: str) -> bool:
+        """Verificar un permiso (con wildcards) sin volver al caché."""
+        if not self.is_authenticated:
+            return False
+
+        # Los superusuarios tienen todos los permisos
+        if self.user.is_superuser:
+            return True
+
+        self._load()
+        if self._registry is None:
+            return False
+        return self._registry.has_permission(self._effective_mask, permission_code)
+
+    def has_any_permission(self, permission_codes: Iterable[str]) -> bool:
+        return any(self.has_permission(code) for code in permission_codes)
+
+    def has_all_permissions(self, permission_codes: Iterable[str]) -> bool:
+        return all(self.has_permission(code) for code in permission_codes)
+
+    def has_role(self, role_code: str) -> bool:
+        return self.is_authenticated and role_code in self.roles
+
+    def has_any_role(self, role_codes: Iterable[str]) -> bool:
+        return self.is_authenticated and bool(self.roles.intersection(role_codes))
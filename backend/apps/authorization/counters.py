@@ -0,0 +1,49 @@
+"""
+Contadores materializados del sistema RBAC.
+
+Se registran en ``signals``. Los cambios de estado de usuarios y permisos
+recalculan los roles afectados; las expiraciones de asignaciones se aplican
+con el comando ``reconcile_counters``.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from apps.common.counters import CounterSpec
+
+from .models import Permission, RolePermission, UserRole
+
+ROLE_ACTIVE_MEMBERS = "role.active_members"
+ROLE_PERMISSIONS = "role.permissions"
+
+
+def _is_active_member(values):
+    if not values["is_active"]:
+        return False
+    if values["expires_at"] is not None and values["expires_at"] < timezone.now():
+        return False
+    return get_user_model().objects.filter(pk=values["user_id"], is_active=True).exists()
+
+
+role_active_members = CounterSpec(
+    ROLE_ACTIVE_MEMBERS,
+    UserRole,
+    condition=Q(is_active=True, user__is_active=True)
+    & ~Q(expires_at__lt=Now(), expires_at__isnull=False),
+    matches=_is_active_member,
+    fields=["is_active", "expires_at", "user_id"],
+    scope="role_id",
+)
+
+role_permissions = CounterSpec(
+    ROLE_PERMISSIONS,
+    RolePermission,
+    condition=Q(permission__is_active=True),
+    matches=lambda values: Permission.objects.filter(
+        pk=values["permission_id"], is_active=True
+    ).exists(),
+    fields=["permission_id"],
+    scope="role_id",
+)
@@ -205,9 +205,8 @@ def require_any_permission(*permission_codes):
         @login_required
         def _wrapped_view(request, *args, **kwargs):
             # Verificar si el usuario tiene alguno de los permisos
-            has_permission = any(
-                PermissionChecker.user_has_permission(request.user, code)
-                for code in permission_codes
+            has_permission = PermissionChecker.user_has_any_permission(
+                request.user, permission_codes
             )
 
             if not has_permission:
@@ -4,7 +4,7 @@ Permission classes para Django REST Framework con sistema RBAC.
 
 from rest_framework import permissions
 from rest_framework.permissions import BasePermission
-from .permissions import PermissionChecker
+from .context import RBACContext
 
 
 class HasPermission(BasePermission):
@@ -30,7 +30,7 @@ class HasPermission(BasePermission):
             return True  # Si no se especifica permiso, permitir acceso
 
         # Verificar permiso
-        return PermissionChecker.user_has_permission(request.user, permission)
+        return RBACContext.for_request(request).has_permission(permission)
 
     def has_object_permission(self, request, view, obj):
         # Por defecto, usar la misma lógica que has_permission
@@ -60,10 +60,7 @@ class HasAnyPermission(BasePermission):
             return True  # Si no se especifican permisos, permitir acceso
 
         # Verificar cualquier permiso
-        return any(
-            PermissionChecker.user_has_permission(request.user, perm)
-            for perm in permissions
-        )
+        return RBACContext.for_request(request).has_any_permission(permissions)
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -92,16 +89,7 @@ class HasRole(BasePermission):
             return True  # Si no se especifica rol, permitir acceso
 
         # Verificar rol
-        from .models import UserRole
-        from django.utils import timezone
-
-        return (
-            UserRole.objects.filter(
-                user=request.user, role__code=role, role__is_active=True, is_active=True
-            )
-            .exclude(expires_at__lt=timezone.now())
-            .exists()
-        )
+        return role in RBACContext.for_request(request).assigned_roles
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -130,19 +118,8 @@ class HasAnyRole(BasePermission):
             return True  # Si no se especifican roles, permitir acceso
 
         # Verificar cualquier rol
-        from .models import UserRole
-        from django.utils import timezone
-
-        return (
-            UserRole.objects.filter(
-                user=request.user,
-                role__code__in=roles,
-                role__is_active=True,
-                is_active=True,
-            )
-            .exclude(expires_at__lt=timezone.now())
-            .exists()
-        )
+        assigned_roles = RBACContext.for_request(request).assigned_roles
+        return bool(assigned_roles.intersection(roles))
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -207,7 +184,7 @@ class DynamicPermission(BasePermission):
             return True  # Si no se puede determinar el permiso, permitir acceso
 
         # Verificar permiso
-        return PermissionChecker.user_has_permission(request.user, permission)
+        return RBACContext.for_request(request).has_permission(permission)
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
@@ -237,7 +214,7 @@ class IsOwnerOrHasPermission(BasePermission):
         if getattr(view, "action", None) in ["list", "create"]:
             permission = getattr(view, "required_permission", self.required_permission)
             if permission:
-                return PermissionChecker.user_has_permission(request.user, permission)
+                return RBACContext.for_request(request).has_permission(permission)
 
         return True  # Permitir acceso, la verificación real se hace en has_object_permission
 
@@ -260,7 +237,7 @@ class IsOwnerOrHasPermission(BasePermission):
         # Si no es propietario, verificar permiso
         permission = getattr(view, "required_permission", self.required_permission)
         if permission:
-            return PermissionChecker.user_has_permission(request.user, permission)
+            return RBACContext.for_request(request).has_permission(permission)
 
         return False
 
@@ -290,7 +267,7 @@ class ReadOnlyOrHasPermission(BasePermission):
         # Para escritura, verificar permiso
         permission = getattr(view, "write_permission", self.write_permission)
         if permission:
-            return PermissionChecker.user_has_permission(request.user, permission)
+            return RBACContext.for_request(request).has_permission(permission)
 
         return False
 
@@ -3,62 +3,38 @@ Middleware para el sistema RBAC.
 """
 
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 from django.contrib.auth import get_user_model
-from .permissions import PermissionChecker
+from .context import RBACContext
 
 User = get_user_model()
 
 
 class RBACMiddleware(MiddlewareMixin):
     """
-    Middleware que carga roles y permisos del usuario autenticado en el request.
+    Middleware que expone los roles y permisos del usuario autenticado en el request.
 
     Agrega al request:
     - request.user_roles: Set de códigos de roles del usuario
     - request.user_permissions: Set de códigos de permisos del usuario
     - request.has_permission(code): Método helper para verificar permisos
     - request.has_role(code): Método helper para verificar roles
+
+    Todo se resuelve mediante un ``RBACContext`` perezoso compartido con las
+    permission classes de DRF: los requests que no verifican permisos no
+    consultan ni la base de datos ni el caché.
     """
 
     def process_request(self, request):
         """
-        Procesa cada request para cargar información RBAC.
+        Procesa cada request para preparar la información RBAC.
         """
-        # Inicializar valores por defecto
-        request.user_roles = set()
-        request.user_permissions = set()
-
-        # Solo procesar usuarios autenticados
-        if hasattr(request, "user") and request.user.is_authenticated:
-            try:
-                # Cargar roles del usuario
-                from .models import UserRole
-                from django.utils import timezone
-
-                user_roles = (
-                    UserRole.objects.filter(
-                        user=request.user, is_active=True, role__is_active=True
-                    )
-                    .exclude(expires_at__lt=timezone.now())
-                    .select_related("role")
-                )
-
-                request.user_roles = set(ur.role.code for ur in user_roles)
-
-                # Cargar permisos del usuario
-                request.user_permissions = PermissionChecker.get_user_permissions(
-                    request.user
-                )
-
-                # Agregar permisos especiales para superusuarios
-                if request.user.is_superuser:
-                    request.user_permissions.add("*.all")
-                    request.user_roles.add("super_admin")
-
-            except Exception:
-                # En caso de error, mantener valores vacíos
-                request.user_roles = set()
-                request.user_permissions = set()
+        request.user_roles = SimpleLazyObject(
+            lambda: RBACContext.for_request(request).roles
+        )
+        request.user_permissions = SimpleLazyObject(
+            lambda: RBACContext.for_request(request).permissions
+        )
 
         # Agregar métodos helper al request
         request.has_permission = lambda code: self._has_permission(request, code)
@@ -71,32 +47,19 @@ class RBACMiddleware(MiddlewareMixin):
         """
         Verificar si el usuario tiene un permiso específico.
         """
-        if not hasattr(request, "user") or not request.user.is_authenticated:
-            return False
-
-        # Los superusuarios tienen todos los permisos
-        if request.user.is_superuser:
-            return True
-
-        return permission_code in request.user_permissions
+        return RBACContext.for_request(request).has_permission(permission_code)
 
     def _has_role(self, request, role_code):
         """
         Verificar si el usuario tiene un rol específico.
         """
-        if not hasattr(request, "user") or not request.user.is_authenticated:
-            return False
-
-        return role_code in request.user_roles
+        return RBACContext.for_request(request).has_role(role_code)
 
     def _has_any_role(self, request, role_codes):
         """
         Verificar si el usuario tiene alguno de los roles especificados.
         """
-        if not hasattr(request, "user") or not request.user.is_authenticated:
-            return False
-
-        return bool(request.user_roles.intersection(set(role_codes)))
+        return RBACContext.for_request(request).has_any_role(role_codes)
 
 
 class PermissionCacheMiddleware(MiddlewareMixin):
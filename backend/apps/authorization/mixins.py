@@ -5,6 +5,7 @@ Mixins para ViewSets con verificación de permisos RBAC.
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
 from django.core.exceptions import ImproperlyConfigured
+from .context import RBACContext
 from .permissions import PermissionChecker
 
 
@@ -63,11 +64,12 @@ class PermissionRequiredMixin:
         Verificar permisos antes de ejecutar la acción.
         """
         super().check_permissions(request)
+        rbac = RBACContext.for_request(request)
 
         # Verificar permiso específico de la acción
         permission_code = self.get_permission_required()
         if permission_code:
-            if not PermissionChecker.user_has_permission(request.user, permission_code):
+            if not rbac.has_permission(permission_code):
                 raise PermissionDenied(
                     f"No tienes permiso para realizar esta acción: {permission_code}"
                 )
@@ -78,7 +80,7 @@ class PermissionRequiredMixin:
             if isinstance(permissions, str):
                 permissions = [permissions]
 
-            if not PermissionChecker.user_has_any_permission(request.user, permissions):
+            if not rbac.has_any_permission(permissions):
                 raise PermissionDenied(
                     f'Necesitas al menos uno de estos permisos: {", ".join(permissions)}'
                 )
@@ -89,9 +91,7 @@ class PermissionRequiredMixin:
             if isinstance(permissions, str):
                 permissions = [permissions]
 
-            if not PermissionChecker.user_has_all_permissions(
-                request.user, permissions
-            ):
+            if not rbac.has_all_permissions(permissions):
                 raise PermissionDenied(
                     f'Necesitas todos estos permisos: {", ".join(permissions)}'
                 )
@@ -129,7 +129,7 @@ class RBACPermission(permissions.BasePermission):
             return True  # Si no hay permiso definido, permitir
 
         # Verificar permiso
-        return PermissionChecker.user_has_permission(request.user, permission_code)
+        return RBACContext.for_request(request).has_permission(permission_code)
 
     def has_object_permission(self, request, view, obj):
         """
@@ -265,7 +265,7 @@ class OwnerOrPermissionMixin:
             action = action_map.get(self.action, self.action)
             permission_code = f"{self.owner_permission}.{action}"
 
-            if PermissionChecker.user_has_permission(user, permission_code):
+            if RBACContext.for_request(request).has_permission(permission_code):
                 return
 
         raise PermissionDenied("No tienes permiso para acceder a este objeto")
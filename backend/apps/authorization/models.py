@@ -10,6 +10,8 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.db.models import Q
 
+from apps.common.models import LoadedValuesModel
+
 User = get_user_model()
 
 
@@ -164,25 +166,24 @@ class Role(models.Model):
         return self.permissions.filter(is_active=True).values_list("code", flat=True)
 
     def has_permission(self, permission_code):
-        """Verificar si el rol tiene un permiso específico."""
-        # Verificar permiso super admin
-        if self.permissions.filter(code="*.all", is_active=True).exists():
-            return True
-
-        # Verificar permiso específico
-        if self.permissions.filter(code=permission_code, is_active=True).exists():
-            return True
+        """
+        Verificar si el rol tiene un permiso específico.
 
-        # Verificar wildcard de recurso
-        if "." in permission_code:
-            resource = permission_code.split(".")[0]
-            if self.permissions.filter(code=f"{resource}.*", is_active=True).exists():
-                return True
+        Se responde en memoria desde el registro compilado de permisos, con la
+        misma precedencia que PermissionService (specific > wildcard > global);
+        el registro se invalida con las señales de RolePermission.
+        """
+        from .rbac_cache import RBACCache
+        from .registry import PermissionRegistry
 
-        return False
+        role_id = str(self.id)
+        registry = PermissionRegistry.get(
+            RBACCache.get_generations(RBACCache.ROLE, [role_id])
+        )
+        return registry.has_permission(registry.role_mask(role_id), permission_code)
 
 
-class RolePermission(models.Model):
+class RolePermission(LoadedValuesModel):
     """
     Tabla intermedia para la relación Role-Permission.
     Incluye información de auditoría.
@@ -226,7 +227,7 @@ class RolePermission(models.Model):
         return f"{self.role.name} - {self.permission.name}"
 
 
-class UserRole(models.Model):
+class UserRole(LoadedValuesModel):
     """
     Modelo para asignar roles a usuarios.
     Un usuario puede tener múltiples roles.
@@ -2,11 +2,12 @@
 Utilidades para verificación de permisos RBAC.
 """
 
-from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from typing import List, Set, Optional
 from .models import UserRole, Permission
+from .rbac_cache import RBACCache
+from .services import PermissionService
 
 User = get_user_model()
 
@@ -17,43 +18,18 @@ class PermissionChecker:
     Incluye caché para mejorar el rendimiento.
     """
 
-    CACHE_TIMEOUT = 300  # 5 minutos
-    CACHE_PREFIX = "user_permissions"
+    CACHE_TIMEOUT = RBACCache.CACHE_TIMEOUT
+    CACHE_PREFIX = RBACCache.CACHE_PREFIX
 
     @classmethod
     def get_cache_key(cls, user_id: str, permission_code: str = None) -> str:
-        """Generar clave de caché para permisos de usuario."""
-        if permission_code:
-            return f"{cls.CACHE_PREFIX}:{user_id}:{permission_code}"
-        return f"{cls.CACHE_PREFIX}:{user_id}:all"
+        """Generar clave de caché (con generación) para permisos de usuario."""
+        return RBACCache.user_key(user_id, permission_code or "all")
 
     @classmethod
     def clear_user_cache(cls, user_id: str):
         """Limpiar caché de permisos de un usuario."""
-        # Intentar limpiar con delete_pattern si está disponible (Redis)
-        try:
-            cache_pattern = f"{cls.CACHE_PREFIX}:{user_id}:*"
-            cache.delete_pattern(cache_pattern)
-        except AttributeError:
-            # Si no tiene delete_pattern, limpiar manualmente algunas claves comunes
-            cache.delete(f"{cls.CACHE_PREFIX}:{user_id}:all")
-            # Limpiar algunos permisos comunes
-            common_permissions = [
-                "users.create",
-                "users.read",
-                "users.update",
-                "users.delete",
-                "roles.create",
-                "roles.read",
-                "roles.update",
-                "roles.delete",
-                "reports.create",
-                "reports.read",
-                "dashboard.view",
-                "*.all",
-            ]
-            for perm in common_permissions:
-                cache.delete(f"{cls.CACHE_PREFIX}:{user_id}:{perm}")
+        RBACCache.bump_user(user_id)
 
     @classmethod
     def user_has_permission(cls, user: User, permission_code: str) -> bool:
@@ -67,26 +43,8 @@ class PermissionChecker:
         Returns:
             bool: True si el usuario tiene el permiso
         """
-        if not user or not user.is_authenticated:
-            return False
-
-        # Los superusuarios tienen todos los permisos
-        if user.is_superuser:
-            return True
-
-        # Verificar en caché
-        cache_key = cls.get_cache_key(str(user.id), permission_code)
-        cached_result = cache.get(cache_key)
-        if cached_result is not None:
-            return cached_result
-
-        # Verificar permisos del usuario
-        result = cls._check_user_permission(user, permission_code)
-
-        # Guardar en caché
-        cache.set(cache_key, result, cls.CACHE_TIMEOUT)
-
-        return result
+        # Comparte caché y máscaras compiladas con PermissionService
+        return PermissionService.evaluate_permission(user, permission_code)
 
     @classmethod
     def _check_user_permission(cls, user: User, permission_code: str) -> bool:
@@ -125,31 +83,7 @@ class PermissionChecker:
         if user.is_superuser:
             return {"*.all"}
 
-        # Verificar en caché
-        cache_key = cls.get_cache_key(str(user.id))
-        cached_permissions = cache.get(cache_key)
-        if cached_permissions is not None:
-            return set(cached_permissions)
-
-        permissions = set()
-
-        # Obtener roles activos del usuario
-        user_roles = (
-            UserRole.objects.filter(user=user, is_active=True, role__is_active=True)
-            .exclude(expires_at__lt=timezone.now())
-            .select_related("role")
-            .prefetch_related("role__permissions")
-        )
-
-        for user_role in user_roles:
-            # Obtener permisos del rol
-            role_permissions = user_role.role.get_all_permissions()
-            permissions.update(role_permissions)
-
-        # Guardar en caché
-        cache.set(cache_key, list(permissions), cls.CACHE_TIMEOUT)
-
-        return permissions
+        return PermissionService.get_user_permissions_set(user)
 
     @classmethod
     def user_has_any_permission(cls, user: User, permission_codes: List[str]) -> bool:
@@ -163,10 +97,8 @@ class PermissionChecker:
         Returns:
             bool: True si tiene al menos un permiso
         """
-        for permission_code in permission_codes:
-            if cls.user_has_permission(user, permission_code):
-                return True
-        return False
+        results = PermissionService.evaluate_permissions(user, permission_codes)
+        return any(results.values())
 
     @classmethod
     def user_has_all_permissions(cls, user: User, permission_codes: List[str]) -> bool:
@@ -180,10 +112,8 @@ class PermissionChecker:
         Returns:
             bool: True si tiene todos los permisos
         """
-        for permission_code in permission_codes:
-            if not cls.user_has_permission(user, permission_code):
-                return False
-        return True
+        results = PermissionService.evaluate_permissions(user, permission_codes)
+        return all(results.values())
 
     @classmethod
     def get_users_with_permission(cls, permission_code: str) -> List[User]:
@@ -0,0 +1,139 @@
+"""
+Contadores de generación para invalidar el caché RBAC.
+
+Cada usuario y cada rol tienen un contador de generación en caché. Las claves
+de un usuario incluyen su generación, y las entradas que dependen de roles
+guardan la generación de cada rol con la que fueron calculadas. Invalidar es
+renovar un contador (O(1)), sin buscar ni enumerar claves, y funciona igual
+en LocMem, archivo o Redis.
+"""
+
+import logging
+import time
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Catálogo de respuestas versionadas (apps.common.catalog_cache) de permisos y roles
+RBAC_CATALOG = "rbac"
+
+
+class RBACCache:
+    """
+    Gestión de generaciones y claves de caché del sistema RBAC.
+    """
+
+    CACHE_PREFIX = "rbac_permissions"
+    CACHE_TIMEOUT = getattr(settings, "RBAC_CACHE_TIMEOUT", 300)  # 5 minutos
+
+    USER = "user"
+    ROLE = "role"
+    CATALOG = "catalog"
+
+    @classmethod
+    def generation_key(cls, scope: str, obj_id) -> str:
+        """Clave del contador de generación de un usuario, rol o del catálogo."""
+        return f"{cls.CACHE_PREFIX}:gen:{scope}:{obj_id}"
+
+    @classmethod
+    def get_generations(cls, scope: str, obj_ids: Iterable) -> Dict[str, int]:
+        """
+        Obtener las generaciones actuales de varios objetos en una sola lectura.
+
+        Los contadores inexistentes (nuevos o desalojados del caché) se
+        inicializan con una marca de tiempo en nanosegundos, de modo que nunca
+        vuelven a un valor ya usado y no reactivan entradas antiguas. Si el
+        backend no conserva valores (DummyCache) la generación es 0.
+
+        Args:
+            scope: USER o ROLE
+            obj_ids: IDs de los objetos
+
+        Returns:
+            Dict {id: generación}
+        """
+        keys = {cls.generation_key(scope, obj_id): str(obj_id) for obj_id in obj_ids}
+        if not keys:
+            return {}
+
+        found = cls._read_generations(keys)
+        return {obj_id: found[key] for key, obj_id in keys.items()}
+
+    @classmethod
+    def _read_generations(cls, keys: Iterable[str]) -> Dict[str, int]:
+        """Leer contadores por clave, inicializando los que no existan."""
+        keys = list(keys)
+        found = cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            initial = time.time_ns()
+            for key in missing:
+                cache.add(key, initial, None)
+            found.update(cache.get_many(missing))
+
+        return {key: found.get(key, 0) for key in keys}
+
+    @classmethod
+    def get_generation(cls, scope: str, obj_id) -> int:
+        """Obtener la generación actual de un usuario o rol."""
+        return cls.get_generations(scope, [obj_id])[str(obj_id)]
+
+    @classmethod
+    def bump(cls, scope: str, obj_id) -> None:
+        """
+        Renovar la generación de un usuario o rol.
+
+        Todas las entradas calculadas con la generación anterior dejan de
+        usarse y expiran solas por su TTL.
+        """
+        # Una marca de tiempo nueva nunca coincide con una generación previa,
+        # aunque el contador haya sido desalojado entre medias
+        cache.set(cls.generation_key(scope, obj_id), time.time_ns(), None)
+        logger.debug(f"RBAC generation bumped: {scope} {obj_id}")
+
+    @classmethod
+    def bump_user(cls, user_id) -> None:
+        """Invalidar todo el caché RBAC de un usuario."""
+        cls.bump(cls.USER, user_id)
+
+    @classmethod
+    def bump_role(cls, role_id) -> None:
+        """Invalidar el caché RBAC de todos los usuarios que tienen el rol."""
+        cls.bump(cls.ROLE, role_id)
+
+    @classmethod
+    def bump_catalog(cls) -> None:
+        """Registrar un cambio en el catálogo de permisos o en algún rol."""
+        cls.bump(cls.CATALOG, "all")
+
+    @classmethod
+    def version_stamp(cls, user_id) -> str:
+        """
+        Sello de versión RBAC de un usuario, con una sola lectura de caché.
+
+        Cambia cuando cambian los roles del usuario o cualquier rol o permiso
+        del catálogo. Se embebe en los tokens JWT para detectar claims RBAC
+        desactualizados.
+        """
+        user_key = cls.generation_key(cls.USER, user_id)
+        catalog_key = cls.generation_key(cls.CATALOG, "all")
+        found = cls._read_generations([user_key, catalog_key])
+        return f"{found[user_key]:x}.{found[catalog_key]:x}"
+
+    @classmethod
+    def user_key(cls, user_id, suffix: str) -> str:
+        """
+        Clave de caché de un usuario con su generación embebida.
+
+        Args:
+            user_id: ID del usuario
+            suffix: Nombre de la entrada (ej: 'assignments')
+
+        Returns:
+            str: Clave con formato prefix:user_id:gN:suffix
+        """
+        generation = cls.get_generation(cls.USER, user_id)
+        return f"{cls.CACHE_PREFIX}:{user_id}:g{generation}:{suffix}"
@@ -0,0 +1,220 @@
+"""
+Registro compilado de permisos RBAC.
+
+Cada código de permiso activo se asigna a un índice entero estable y cada rol
+se compila a una máscara de bits con los wildcards (``resource.*`` y
+``*.all``) ya expandidos. Los permisos efectivos de un usuario se reducen a un
+único entero (OR de las máscaras de sus roles) y cada verificación es una
+prueba de bit.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from .rbac_cache import RBACCache
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_WILDCARD = "*.all"
+
+
+def _resource_of(code: str) -> str:
+    """Obtener el recurso de un código ``recurso.accion``."""
+    return code.split(".", 1)[0] if "." in code else ""
+
+
+class CompiledRegistry:
+    """
+    Snapshot inmutable del catálogo de permisos y de las máscaras por rol.
+
+    Attributes:
+        codes: Códigos de permisos activos, ordenados (índice = posición)
+        index: Mapa código -> índice de bit
+        role_grants: Máscara de permisos asignados directamente por rol
+        role_masks: Máscara efectiva por rol (wildcards expandidos)
+        fingerprint: Huella del catálogo de códigos (orden de los bits)
+    """
+
+    def __init__(self, codes: Iterable[str], role_codes: Dict[str, Set[str]]):
+        self.codes: Tuple[str, ...] = tuple(sorted(set(codes)))
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self.full_mask = (1 << len(self.codes)) - 1
+
+        # Máscara de todos los permisos de cada recurso (para expandir resource.*)
+        self._resource_masks: Dict[str, int] = {}
+        for code, bit in self.index.items():
+            resource = _resource_of(code)
+            self._resource_masks[resource] = self._resource_masks.get(resource, 0) | (
+                1 << bit
+            )
+
+        self.role_grants: Dict[str, int] = {}
+        self.role_masks: Dict[str, int] = {}
+        for role_id, granted in role_codes.items():
+            grant_mask = self.mask_of(granted)
+            self.role_grants[role_id] = grant_mask
+            self.role_masks[role_id] = self._expand(granted, grant_mask)
+
+        self._check_masks: Dict[str, int] = {}
+        self.fingerprint = self._compute_fingerprint()
+
+    def _expand(self, granted: Set[str], grant_mask: int) -> int:
+        """Expandir los wildcards de un conjunto de permisos a bits concretos."""
+        if GLOBAL_WILDCARD in granted:
+            return self.full_mask
+
+        mask = grant_mask
+        for code in granted:
+            if code.endswith(".*"):
+                mask |= self._resource_masks.get(_resource_of(code), 0)
+        return mask
+
+    def _compute_fingerprint(self) -> str:
+        return hashlib.sha1("\n".join(self.codes).encode("utf-8")).hexdigest()[:12]
+
+    def mask_of(self, codes: Iterable[str]) -> int:
+        """Máscara de bits de un conjunto de códigos (ignora los desconocidos)."""
+        mask = 0
+        for code in codes:
+            bit = self.index.get(code)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def check_mask(self, permission_code: str) -> int:
+        """
+        Máscara que concede ``permission_code``.
+
+        Para códigos del catálogo basta su propio bit, porque los wildcards ya
+        están expandidos en las máscaras de rol. Para códigos desconocidos solo
+        pueden concederlo ``resource.*`` o ``*.all``.
+        """
+        mask = self._check_masks.get(permission_code)
+        if mask is None:
+            bit = self.index.get(permission_code)
+            if bit is not None:
+                mask = 1 << bit
+            else:
+                mask = self.mask_of(
+                    [f"{_resource_of(permission_code)}.*", GLOBAL_WILDCARD]
+                    if "." in permission_code
+                    else [GLOBAL_WILDCARD]
+                )
+            self._check_masks[permission_code] = mask
+        return mask
+
+    def masks_for_roles(self, role_ids: Iterable[str]) -> Tuple[int, int]:
+        """
+        Combinar las máscaras de varios roles.
+
+        Returns:
+            Tuple (máscara asignada, máscara efectiva)
+        """
+        grants = 0
+        effective = 0
+        for role_id in role_ids:
+            grants |= self.role_grants.get(role_id, 0)
+            effective |= self.role_masks.get(role_id, 0)
+        return grants, effective
+
+    def expand_mask(self, grant_mask: int) -> int:
+        """Máscara efectiva a partir de una máscara de permisos asignados."""
+        return self._expand(self.decode(grant_mask), grant_mask)
+
+    def role_mask(self, role_id: str) -> int:
+        """Máscara efectiva de un rol (0 si no tiene permisos activos)."""
+        return self.role_masks.get(role_id, 0)
+
+    def has_permission(self, mask: int, permission_code: str) -> bool:
+        """Prueba de bit de un permiso sobre una máscara efectiva."""
+        return bool(mask & self.check_mask(permission_code))
+
+    def decode(self, mask: int) -> Set[str]:
+        """Convertir una máscara en el conjunto de códigos que representa."""
+        codes = set()
+        while mask:
+            low_bit = mask & -mask
+            codes.add(self.codes[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return codes
+
+
+class PermissionRegistry:
+    """
+    Contenedor del registro compilado a nivel de proceso.
+
+    El snapshot se compila de forma perezosa y se descarta localmente cuando
+    cambian permisos, roles o asignaciones de permisos (ver ``signals.py``).
+    Entre procesos, cada snapshot recuerda la generación de cada rol con la
+    que fue compilado; si un rol consultado trae otra generación, se recompila.
+    """
+
+    _snapshot = None
+    _role_generations: Dict[str, int] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, role_generations: Optional[Dict[str, int]] = None) -> CompiledRegistry:
+        """
+        Obtener el snapshot vigente, compilándolo si es necesario.
+
+        Args:
+            role_generations: Generaciones actuales de los roles que se van a
+                evaluar, tal como las devuelve ``RBACCache.get_generations``
+        """
+        snapshot = cls._snapshot
+        if snapshot is not None and not cls._is_stale(role_generations):
+            return snapshot
+
+        with cls._lock:
+            if cls._snapshot is None or cls._is_stale(role_generations):
+                cls._compile()
+            return cls._snapshot
+
+    @classmethod
+    def _is_stale(cls, role_generations: Optional[Dict[str, int]]) -> bool:
+        if not role_generations:
+            return False
+        return any(
+            cls._role_generations.get(role_id) != generation
+            for role_id, generation in role_generations.items()
+        )
+
+    @classmethod
+    def _compile(cls) -> None:
+        """
+        Compilar el catálogo desde la base de datos.
+
+        Las generaciones de los roles se leen antes que los permisos, de modo
+        que un cambio concurrente deja el snapshot marcado como desactualizado.
+        """
+        from .models import Permission, Role, RolePermission
+
+        role_ids = Role.objects.values_list("id", flat=True)
+        generations = RBACCache.get_generations(RBACCache.ROLE, role_ids)
+
+        codes = Permission.objects.filter(is_active=True).values_list("code", flat=True)
+
+        role_codes: Dict[str, Set[str]] = {}
+        # Se compilan también los roles inactivos: Role.has_permission no
+        # depende del estado del rol y las consultas de usuario ya los excluyen
+        assignments = RolePermission.objects.filter(
+            permission__is_active=True
+        ).values_list("role_id", "permission__code")
+        for role_id, code in assignments:
+            role_codes.setdefault(str(role_id), set()).add(code)
+
+        cls._snapshot = CompiledRegistry(codes, role_codes)
+        cls._role_generations = generations
+        logger.debug(
+            f"RBAC registry compiled: {len(cls._snapshot.codes)} permissions, "
+            f"{len(cls._snapshot.role_masks)} roles ({cls._snapshot.fingerprint})"
+        )
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Descartar el snapshot local para recompilarlo en el próximo uso."""
+        with cls._lock:
+            cls._snapshot = None
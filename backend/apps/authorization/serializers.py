@@ -5,10 +5,19 @@ Serializers para el sistema RBAC.
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+
+from apps.common import counters as counter_store
+from apps.common.counters import counter_value
+from apps.common.query_planning import requires
+from .counters import ROLE_ACTIVE_MEMBERS, ROLE_PERMISSIONS
 from .models import Permission, Role, RolePermission, UserRole
 
 User = get_user_model()
 
+# Los conteos por rol se leen de los contadores materializados
+PERMISSIONS_COUNTER = counter_value(ROLE_PERMISSIONS)
+ACTIVE_MEMBERS_COUNTER = counter_value(ROLE_ACTIVE_MEMBERS)
+
 
 class PermissionSerializer(serializers.ModelSerializer):
     """
@@ -57,6 +66,8 @@ class PermissionListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Permission
+        # Listados renderizados desde filas, ver apps.common.compiled
+        compiled = True
         fields = ["id", "name", "code", "resource", "action", "is_active"]
 
 
@@ -115,17 +126,21 @@ class RoleSerializer(serializers.ModelSerializer):
             "code": {"validators": []},
         }
 
+    @requires(annotate={"permissions_counter": PERMISSIONS_COUNTER})
     def get_total_permissions(self, obj):
         """Obtener cantidad total de permisos del rol."""
-        return obj.permissions.filter(is_active=True).count()
+        value = getattr(obj, "permissions_counter", None)
+        if value is None:
+            value = counter_store.get(ROLE_PERMISSIONS, obj.pk)
+        return value
 
+    @requires(annotate={"active_members_counter": ACTIVE_MEMBERS_COUNTER})
     def get_active_users_count(self, obj):
         """Obtener cantidad de usuarios activos con este rol."""
-        return (
-            UserRole.objects.filter(role=obj, is_active=True, user__is_active=True)
-            .exclude(expires_at__lt=timezone.now())
-            .count()
-        )
+        value = getattr(obj, "active_members_counter", None)
+        if value is None:
+            value = counter_store.get(ROLE_ACTIVE_MEMBERS, obj.pk)
+        return value
 
     def validate_code(self, value):
         """Validar unicidad del código del rol."""
@@ -191,10 +206,17 @@ class RoleListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Role
+        expandable_fields = {
+            "permissions": (PermissionListSerializer, {"many": True}),
+        }
         fields = ["id", "name", "code", "is_system", "is_active", "total_permissions"]
 
+    @requires(annotate={"permissions_counter": PERMISSIONS_COUNTER})
     def get_total_permissions(self, obj):
-        return obj.permissions.filter(is_active=True).count()
+        value = getattr(obj, "permissions_counter", None)
+        if value is None:
+            value = counter_store.get(ROLE_PERMISSIONS, obj.pk)
+        return value
 
 
 class UserRoleSerializer(serializers.ModelSerializer):
@@ -217,6 +239,11 @@ class UserRoleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserRole
+        # Columnas que leen las propiedades del modelo
+        source_columns = {
+            "is_expired": ("expires_at",),
+            "is_valid": ("is_active", "expires_at"),
+        }
         fields = [
             "id",
             "user",
@@ -234,6 +261,7 @@ class UserRoleSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "assigned_at", "assigned_by"]
 
+    @requires(select=["user"])
     def get_user_name(self, obj):
         """Obtener nombre completo del usuario."""
         return f"{obj.user.first_name} {obj.user.last_name}".strip()
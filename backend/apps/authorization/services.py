@@ -6,13 +6,14 @@ import logging
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.conf import settings
-from typing import List, Set, Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from .models import UserRole, Permission, Role
-from .permissions import PermissionChecker
+from .rbac_cache import RBACCache
+from .registry import CompiledRegistry, PermissionRegistry
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("audit")
 
 
 class PermissionService:
@@ -23,8 +24,8 @@ class PermissionService:
     evaluación de wildcards (specific > wildcard).
     """
 
-    CACHE_TIMEOUT = getattr(settings, "RBAC_CACHE_TIMEOUT", 300)  # 5 minutos
-    CACHE_PREFIX = "rbac_permissions"
+    CACHE_TIMEOUT = RBACCache.CACHE_TIMEOUT
+    CACHE_PREFIX = RBACCache.CACHE_PREFIX
 
     @classmethod
     def evaluate_permission(cls, user: User, permission_code: str) -> bool:
@@ -47,26 +48,50 @@ class PermissionService:
         if user.is_superuser:
             return True
 
-        # Verificar en caché primero
-        cache_key = f"{cls.CACHE_PREFIX}:{user.id}:{permission_code}"
-        cached_result = cache.get(cache_key)
-        if cached_result is not None:
-            logger.debug(
-                f"Permission {permission_code} for user {user.id} found in cache: {cached_result}"
-            )
-            return cached_result
-
-        # Evaluar permisos con lógica de precedencia
+        # Prueba de bit sobre la máscara efectiva compilada del usuario
         result = cls._evaluate_permission_logic(user, permission_code)
-
-        # Guardar en caché
-        cache.set(cache_key, result, cls.CACHE_TIMEOUT)
         logger.debug(
             f"Permission {permission_code} for user {user.id} evaluated: {result}"
         )
 
         return result
 
+    @classmethod
+    def evaluate_permissions(
+        cls, user: User, permission_codes: Iterable[str]
+    ) -> Dict[str, bool]:
+        """
+        Evaluar varios permisos de un usuario en un solo paso.
+
+        Las máscaras del usuario se resuelven una única vez (una entrada de
+        caché o una consulta) y cada código se resuelve con una prueba de bit,
+        sin importar cuántos códigos se evalúen.
+
+        Args:
+            user: Usuario a evaluar
+            permission_codes: Códigos de permisos
+
+        Returns:
+            Dict {código: bool}
+        """
+        permission_codes = list(dict.fromkeys(permission_codes))
+
+        if not user or not user.is_authenticated:
+            return {code: False for code in permission_codes}
+
+        # Superusuarios tienen todos los permisos
+        if user.is_superuser:
+            return {code: True for code in permission_codes}
+
+        if not permission_codes:
+            return {}
+
+        registry, _, effective_mask = cls.get_user_masks(user)
+        return {
+            code: registry.has_permission(effective_mask, code)
+            for code in permission_codes
+        }
+
     @classmethod
     def _evaluate_permission_logic(cls, user: User, permission_code: str) -> bool:
         """
@@ -76,81 +101,115 @@ class PermissionService:
         1. Permiso específico exacto
         2. Wildcard de recurso (resource.*)
         3. Wildcard global (*.all)
-        """
-        user_permissions = cls.get_user_permissions_set(user)
-
-        # 1. Verificar permiso específico exacto
-        if permission_code in user_permissions:
-            return True
-
-        # 2. Verificar wildcard de recurso
-        if "." in permission_code:
-            resource, _ = permission_code.split(".", 1)
-            resource_wildcard = f"{resource}.*"
-            if resource_wildcard in user_permissions:
-                return True
 
-        # 3. Verificar wildcard global
-        if "*.all" in user_permissions:
-            return True
-
-        return False
+        Los wildcards se expanden al compilar las máscaras de rol, por lo que
+        los tres casos se resuelven con una sola prueba de bit.
+        """
+        registry, _, effective_mask = cls.get_user_masks(user)
+        return registry.has_permission(effective_mask, permission_code)
 
     @classmethod
-    def get_user_permissions_set(cls, user: User) -> Set[str]:
-        """
-        Obtener set completo de permisos de un usuario desde caché o DB.
+    def _get_role_assignments_entry(
+        cls, user: User
+    ) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
         """
-        cache_key = f"{cls.CACHE_PREFIX}:{user.id}:all"
-        cached_permissions = cache.get(cache_key)
+        Obtener los roles vigentes de un usuario y sus generaciones.
 
-        if cached_permissions is not None:
-            return set(cached_permissions)
+        La entrada se guarda bajo una clave con la generación del usuario y
+        recuerda la generación de cada rol; si alguno cambió desde entonces,
+        la entrada se descarta y se reconstruye con una sola consulta. Su
+        duración se acota a la expiración más próxima de los roles.
 
-        # Obtener desde base de datos
-        permissions = set()
+        Returns:
+            Tuple (lista de pares (role_id, code), {role_id: generación})
+        """
+        cache_key = RBACCache.user_key(user.id, "assignments")
+        entry = cache.get(cache_key)
+
+        if entry is not None:
+            role_generations = RBACCache.get_generations(
+                RBACCache.ROLE, [role_id for role_id, _ in entry["roles"]]
+            )
+            if role_generations == entry["generations"]:
+                return [tuple(role) for role in entry["roles"]], role_generations
 
-        # Obtener roles activos del usuario
-        user_roles = (
+        now = timezone.now()
+        rows = (
             UserRole.objects.filter(user=user, is_active=True, role__is_active=True)
-            .exclude(expires_at__lt=timezone.now())
-            .select_related("role")
-            .prefetch_related("role__permissions")
+            .exclude(expires_at__lt=now)
+            .values_list("role_id", "role__code", "expires_at")
         )
 
-        for user_role in user_roles:
-            role_permissions = user_role.role.get_all_permissions()
-            permissions.update(role_permissions)
+        assignments = []
+        timeout = cls.CACHE_TIMEOUT
+        for role_id, role_code, expires_at in rows:
+            assignments.append((str(role_id), role_code))
+            if expires_at is not None:
+                seconds_left = int((expires_at - now).total_seconds())
+                timeout = max(1, min(timeout, seconds_left))
 
-        # Guardar en caché
-        cache.set(cache_key, list(permissions), cls.CACHE_TIMEOUT)
+        role_generations = RBACCache.get_generations(
+            RBACCache.ROLE, [role_id for role_id, _ in assignments]
+        )
+        entry = {
+            "roles": [list(assignment) for assignment in assignments],
+            "generations": role_generations,
+        }
+        cache.set(cache_key, entry, timeout)
 
-        return permissions
+        return assignments, role_generations
 
     @classmethod
-    def get_user_roles_set(cls, user: User) -> Set[str]:
+    def get_user_role_assignments(cls, user: User) -> List[Tuple[str, str]]:
         """
-        Obtener set de códigos de roles de un usuario.
+        Obtener los roles vigentes de un usuario como pares (role_id, code).
         """
-        cache_key = f"{cls.CACHE_PREFIX}:{user.id}:roles"
-        cached_roles = cache.get(cache_key)
+        assignments, _ = cls._get_role_assignments_entry(user)
+        return assignments
 
-        if cached_roles is not None:
-            return set(cached_roles)
+    @classmethod
+    def resolve_user(cls, user: User) -> Tuple[Set[str], CompiledRegistry, int, int]:
+        """
+        Resolver roles y máscaras de un usuario desde una única entrada de caché.
 
-        # Obtener desde base de datos
-        user_roles = (
-            UserRole.objects.filter(user=user, is_active=True, role__is_active=True)
-            .exclude(expires_at__lt=timezone.now())
-            .select_related("role")
+        Returns:
+            Tuple (códigos de rol, registro compilado, máscara de permisos
+            asignados, máscara efectiva)
+        """
+        assignments, role_generations = cls._get_role_assignments_entry(user)
+        registry = PermissionRegistry.get(role_generations)
+        grant_mask, effective_mask = registry.masks_for_roles(
+            role_id for role_id, _ in assignments
         )
+        role_codes = {role_code for _, role_code in assignments}
+        return role_codes, registry, grant_mask, effective_mask
+
+    @classmethod
+    def get_user_masks(cls, user: User) -> Tuple[CompiledRegistry, int, int]:
+        """
+        Obtener las máscaras de permisos de un usuario (OR de sus roles).
 
-        roles = set(ur.role.code for ur in user_roles)
+        Returns:
+            Tuple (registro compilado, máscara de permisos asignados,
+            máscara efectiva)
+        """
+        _, registry, grant_mask, effective_mask = cls.resolve_user(user)
+        return registry, grant_mask, effective_mask
 
-        # Guardar en caché
-        cache.set(cache_key, list(roles), cls.CACHE_TIMEOUT)
+    @classmethod
+    def get_user_permissions_set(cls, user: User) -> Set[str]:
+        """
+        Obtener set completo de permisos de un usuario desde caché o DB.
+        """
+        registry, grant_mask, _ = cls.get_user_masks(user)
+        return registry.decode(grant_mask)
 
-        return roles
+    @classmethod
+    def get_user_roles_set(cls, user: User) -> Set[str]:
+        """
+        Obtener set de códigos de roles de un usuario.
+        """
+        return set(role_code for _, role_code in cls.get_user_role_assignments(user))
 
     @classmethod
     def check_multiple_permissions(
@@ -167,10 +226,7 @@ class PermissionService:
         Returns:
             Dict con resultado de cada permiso o bool si require_all=True
         """
-        results = {}
-
-        for permission_code in permission_codes:
-            results[permission_code] = cls.evaluate_permission(user, permission_code)
+        results = cls.evaluate_permissions(user, permission_codes)
 
         if require_all:
             return all(results.values())
@@ -276,75 +332,21 @@ class PermissionService:
         Args:
             user: Usuario cuyo cache se va a limpiar
         """
-        cache_keys = [
-            f"user_permissions_{user.id}",
-            f"user_roles_{user.id}",
-            f"user_permissions_tree_{user.id}",
-            f"{cls.CACHE_PREFIX}:{user.id}:all",
-            f"{cls.CACHE_PREFIX}:{user.id}:roles",
-        ]
-
-        for key in cache_keys:
-            cache.delete(key)
+        cls.invalidate_user_cache(user.id)
 
     @classmethod
     def invalidate_user_cache(cls, user_id: str):
         """
         Invalidar todo el caché de permisos de un usuario.
 
+        Incrementa la generación del usuario, lo que deja obsoletas todas sus
+        claves sin necesidad de conocerlas ni de usar ``delete_pattern``.
+
         Args:
             user_id: ID del usuario
         """
-        try:
-            # Intentar usar delete_pattern si está disponible (Redis)
-            cache_pattern = f"{cls.CACHE_PREFIX}:{user_id}:*"
-            cache.delete_pattern(cache_pattern)
-            logger.info(f"Cache pattern deleted for user {user_id}: {cache_pattern}")
-        except AttributeError:
-            # Fallback para otros backends de caché
-            keys_to_delete = [
-                f"{cls.CACHE_PREFIX}:{user_id}:all",
-                f"{cls.CACHE_PREFIX}:{user_id}:roles",
-            ]
-
-            # Limpiar algunos permisos comunes
-            common_permissions = [
-                "users.create",
-                "users.read",
-                "users.update",
-                "users.delete",
-                "roles.create",
-                "roles.read",
-                "roles.update",
-                "roles.delete",
-                "audits.create",
-                "audits.read",
-                "audits.update",
-                "audits.delete",
-                "documents.create",
-                "documents.read",
-                "documents.update",
-                "documents.delete",
-                "processes.create",
-                "processes.read",
-                "processes.update",
-                "processes.delete",
-                "reports.create",
-                "reports.read",
-                "reports.update",
-                "reports.delete",
-                "dashboard.view",
-                "dashboard.export",
-                "*.all",
-            ]
-
-            for perm in common_permissions:
-                keys_to_delete.append(f"{cls.CACHE_PREFIX}:{user_id}:{perm}")
-
-            cache.delete_many(keys_to_delete)
-            logger.info(
-                f"Cache keys deleted for user {user_id}: {len(keys_to_delete)} keys"
-            )
+        RBACCache.bump_user(user_id)
+        logger.info(f"RBAC cache invalidated for user {user_id}")
 
     @classmethod
     def get_permission_tree(cls, user: User) -> Dict[str, List[str]]:
@@ -432,9 +434,8 @@ class PermissionService:
             granted: Si el permiso fue concedido
             context: Contexto adicional (IP, endpoint, etc.)
         """
-        # Implementación básica de auditoría
-        # En producción, esto podría usar un sistema de logging más sofisticado
         audit_data = {
+            "event_type": "permission_check",
             "user_id": str(user.id),
             "user_email": user.email,
             "permission": permission_code,
@@ -443,10 +444,10 @@ class PermissionService:
             "context": context or {},
         }
 
-        logger.info(f"Permission audit: {audit_data}")
-
-        # Aquí se podría integrar con sistemas de auditoría externos
-        # como Elasticsearch, Splunk, etc.
+        # El logger "audit" escribe líneas JSON desde un hilo en segundo plano
+        audit_logger.info(
+            f"Permission audit: {permission_code}", extra={"event": audit_data}
+        )
 
 
 # Alias para mantener compatibilidad con código existente
@@ -0,0 +1,150 @@
+"""
+Señales del sistema RBAC.
+
+Mantienen sincronizados el registro compilado de permisos y los contadores de
+generación del caché con los cambios en permisos, roles y asignaciones. Las
+asignaciones se auditan desde ``apps.organization``, dueña del motor de
+auditoría.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.common import catalog_cache
+from apps.common import counters as counter_store
+from apps.common.signals import records_rolled_back
+
+from .counters import (
+    ROLE_ACTIVE_MEMBERS,
+    ROLE_PERMISSIONS,
+    role_active_members,
+    role_permissions,
+)
+from .models import Permission, Role, RolePermission, UserRole
+from .rbac_cache import RBAC_CATALOG, RBACCache
+from .registry import PermissionRegistry
+
+counter_store.register(role_active_members)
+counter_store.register(role_permissions)
+
+
+def _invalidate_registry(using="default"):
+    """
+    Descartar el registro compilado cuando se confirme la transacción.
+
+    Descartarlo antes permitiría que otra petición lo recompilara con las
+    filas previas al cambio y lo conservara hasta el siguiente cambio.
+    """
+    transaction.on_commit(PermissionRegistry.invalidate, using=using)
+
+
+def _bump_generations(using="default", role_ids=(), user_ids=(), catalog=False):
+    """
+    Renovar generaciones del caché RBAC cuando se confirme la transacción.
+
+    Con la generación nueva antes del commit, una petición concurrente
+    guardaría los permisos previos al cambio bajo esa generación, y nada los
+    descartaría hasta la siguiente renovación.
+    """
+    role_ids = list(role_ids)
+    user_ids = list(user_ids)
+
+    def renew():
+        for role_id in role_ids:
+            RBACCache.bump_role(role_id)
+        for user_id in user_ids:
+            RBACCache.bump_user(user_id)
+        if catalog:
+            RBACCache.bump_catalog()
+
+    transaction.on_commit(renew, using=using)
+
+
+@receiver(post_save, sender=Permission)
+def permission_changed(sender, instance, created, **kwargs):
+    """Invalidar los roles que tienen el permiso modificado."""
+    using = kwargs.get("using", "default")
+    _invalidate_registry(using)
+    catalog_cache.bump(RBAC_CATALOG)
+    if created:
+        _bump_generations(using, catalog=True)
+    else:
+        role_ids = list(
+            RolePermission.objects.filter(permission=instance).values_list(
+                "role_id", flat=True
+            )
+        )
+        _bump_generations(using, role_ids=role_ids, catalog=True)
+        # El estado del permiso cambia el conteo de permisos de sus roles
+        counter_store.recount(ROLE_PERMISSIONS, role_ids)
+
+
+@receiver(post_delete, sender=Permission)
+def permission_deleted(sender, instance, **kwargs):
+    """Recompilar el registro tras eliminar un permiso."""
+    # Las asignaciones se eliminan en cascada e invalidan sus roles
+    using = kwargs.get("using", "default")
+    _invalidate_registry(using)
+    _bump_generations(using, catalog=True)
+    catalog_cache.bump(RBAC_CATALOG)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_changed(sender, instance, **kwargs):
+    """Invalidar a todos los usuarios que tienen el rol."""
+    using = kwargs.get("using", "default")
+    _invalidate_registry(using)
+    _bump_generations(using, role_ids=[instance.id], catalog=True)
+    catalog_cache.bump(RBAC_CATALOG)
+
+
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def role_permission_changed(sender, instance, **kwargs):
+    """Invalidar a todos los usuarios del rol cuyos permisos cambiaron."""
+    using = kwargs.get("using", "default")
+    _invalidate_registry(using)
+    _bump_generations(using, role_ids=[instance.role_id], catalog=True)
+    catalog_cache.bump(RBAC_CATALOG)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_changed(sender, instance, **kwargs):
+    """Invalidar el caché RBAC del usuario afectado."""
+    _bump_generations(kwargs.get("using", "default"), user_ids=[instance.user_id])
+
+
+@receiver(records_rolled_back, sender=RolePermission)
+def role_permissions_rolled_back(sender, instances, **kwargs):
+    """Invalidar los roles de las asignaciones revertidas en bloque."""
+    role_ids = {instance.role_id for instance in instances}
+    using = kwargs.get("using", "default")
+    _invalidate_registry(using)
+    _bump_generations(using, role_ids=role_ids, catalog=True)
+    catalog_cache.bump(RBAC_CATALOG)
+    counter_store.recount(ROLE_PERMISSIONS, role_ids)
+
+
+@receiver(records_rolled_back, sender=UserRole)
+def user_roles_rolled_back(sender, instances, **kwargs):
+    """Invalidar el caché RBAC de los usuarios con asignaciones revertidas."""
+    _bump_generations(
+        kwargs.get("using", "default"),
+        user_ids={instance.user_id for instance in instances},
+    )
+    counter_store.recount(
+        ROLE_ACTIVE_MEMBERS, {instance.role_id for instance in instances}
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_status_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Recalcular los miembros activos de los roles del usuario."""
+    if created or (update_fields is not None and "is_active" not in update_fields):
+        return
+    role_ids = UserRole.objects.filter(user=instance).values_list("role_id", flat=True)
+    counter_store.recount(ROLE_ACTIVE_MEMBERS, list(role_ids))
@@ -39,6 +39,8 @@ from .drf_permissions import (
     DynamicPermission,
     IsOwnerOrHasPermission,
 )
+from .claims import RBACTokenClaims
+from .context import RBACContext
 from .services import PermissionService
 
 User = get_user_model()
@@ -111,6 +113,27 @@ class RBACMiddlewareTests(TestCase):
         self.assertIn("*.all", request.user_permissions)
         self.assertIn("super_admin", request.user_roles)
 
+    def test_middleware_is_lazy(self):
+        """Test que el middleware no consulta nada si no se usan permisos."""
+        request = self.factory.get("/test/")
+        request.user = self.user
+
+        with self.assertNumQueries(0):
+            self.middleware(request)
+
+    def test_context_shared_with_drf_permission_classes(self):
+        """Test que HasPermission reutiliza el contexto cargado por el request."""
+        request = self.factory.get("/test/")
+        request.user = self.user
+        self.middleware(request)
+
+        self.assertTrue(request.has_permission("documents.read"))
+
+        view = MagicMock(required_permission="documents.read")
+        with self.assertNumQueries(0):
+            self.assertTrue(HasPermission().has_permission(request, view))
+            self.assertIn("doc_reader", request.user_roles)
+
 
 class PermissionCacheMiddlewareTests(TestCase):
     """
@@ -435,6 +458,22 @@ class PermissionServiceTests(TestCase):
         result = PermissionService.evaluate_permission(self.user, "documents.read")
         self.assertFalse(result)
 
+    def test_evaluate_permissions_batch(self):
+        """Test evaluación en lote con una sola resolución del usuario."""
+        UserRole.objects.create(user=self.user, role=self.specific_role)
+        codes = ["documents.create", "documents.read"] + [
+            f"module{i}.read" for i in range(20)
+        ]
+        PermissionService.evaluate_permission(self.user, "documents.create")
+
+        with self.assertNumQueries(1):
+            results = PermissionService.evaluate_permissions(self.user, codes)
+
+        self.assertEqual(len(results), len(codes))
+        self.assertTrue(results["documents.create"])
+        self.assertFalse(results["documents.read"])
+        self.assertFalse(any(results[f"module{i}.read"] for i in range(20)))
+
     def test_evaluate_permission_wildcard_match(self):
         """Test evaluación de permiso wildcard."""
         UserRole.objects.create(user=self.user, role=self.wildcard_role)
@@ -630,6 +669,35 @@ class AuthenticationEndpointsTests(APITestCase):
         permissions_list = data["data"]["permissions_list"]
         self.assertIn("*.all", permissions_list)
 
+    def test_check_permissions_batch_endpoint(self):
+        """Test endpoint de verificación de permisos en lote."""
+        users_read = Permission.objects.create(name="Ver Usuarios", code="users.read")
+        RolePermission.objects.create(role=self.role, permission=users_read)
+
+        url = reverse("user-permissions-check-permissions")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        response = self.client.post(
+            url,
+            {"permission_codes": ["documents.read", "documents.delete"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["permissions"],
+            {"documents.read": True, "documents.delete": False},
+        )
+
+    def test_check_permissions_batch_requires_users_read(self):
+        """Test que el endpoint en lote aplica las permission classes."""
+        url = reverse("user-permissions-check-permissions")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        response = self.client.post(
+            url, {"permission_codes": ["documents.read"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 403)
+
 
 class RBACIntegrationTests(APITestCase):
     """
@@ -817,3 +885,135 @@ class RBACIntegrationTests(APITestCase):
         # Verificar que el método devuelve None (no falla)
         result = PermissionService.clear_user_cache(test_user)
         self.assertIsNone(result, "clear_user_cache debe retornar None")
+
+
+@override_settings(
+    RBAC_TRUST_TOKEN_CLAIMS=True,
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "rbac-token-claims-tests",
+        }
+    },
+)
+class RBACTokenClaimsTests(TestCase):
+    """
+    Tests para los claims RBAC compactos embebidos en el token JWT.
+    """
+
+    def setUp(self):
+        cache.clear()
+        # LocMemCache hace las veces del caché compartido (Redis) de producción
+        patcher = patch(
+            "apps.authorization.claims.cache_is_shared", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(
+            email="claims@zentraqms.test", first_name="Claims", last_name="User"
+        )
+        self.read_perm = Permission.objects.create(
+            name="Ver Documentos", code="documents.read"
+        )
+        self.wildcard_perm = Permission.objects.create(
+            name="Todos los Reportes", code="reports.*"
+        )
+        self.report_perm = Permission.objects.create(
+            name="Ver Reportes", code="reports.read"
+        )
+        self.role = Role.objects.create(name="Document Reader", code="doc_reader")
+        RolePermission.objects.create(role=self.role, permission=self.read_perm)
+        RolePermission.objects.create(role=self.role, permission=self.wildcard_perm)
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def _access_token(self):
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+
+        return CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def test_token_carries_compact_claims(self):
+        """Test que el token lleva un bitset en lugar de la lista de permisos."""
+        token = self._access_token()
+
+        self.assertNotIn("permissions", token.payload)
+        self.assertEqual(token["roles"], ["doc_reader"])
+        self.assertIn(RBACTokenClaims.PERMISSION_BITS, token.payload)
+        self.assertIn(RBACTokenClaims.VERSION, token.payload)
+
+    def test_context_resolves_from_claims_without_queries(self):
+        """Test que el contexto usa los claims sin consultar la DB."""
+        token = self._access_token()
+        context = RBACContext(self.user, token=token)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(context.has_permission("documents.read"))
+            self.assertTrue(context.has_permission("reports.export"))
+            self.assertFalse(context.has_permission("users.read"))
+            self.assertEqual(context.permissions, {"documents.read", "reports.*"})
+            self.assertIn("doc_reader", context.roles)
+
+    def test_stale_claims_fall_back_after_role_change(self):
+        """Test que un cambio de roles invalida los claims del token."""
+        token = self._access_token()
+        self.assertIsNotNone(RBACTokenClaims.resolve(token, self.user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRole.objects.filter(user=self.user).delete()
+
+        self.assertIsNone(RBACTokenClaims.resolve(token, self.user))
+        context = RBACContext(self.user, token=token)
+        self.assertFalse(context.has_permission("documents.read"))
+
+    def test_claims_ignored_when_disabled(self):
+        """Test que los claims no se usan si la opción está desactivada."""
+        token = self._access_token()
+
+        with self.settings(RBAC_TRUST_TOKEN_CLAIMS=False):
+            self.assertIsNone(RBACTokenClaims.resolve(token, self.user))
+
+    def test_claims_ignored_without_shared_cache(self):
+        """Test que los claims no se usan si el caché no es compartido."""
+        token = self._access_token()
+
+        with patch(
+            "apps.authorization.claims.cache_is_shared", return_value=False
+        ), patch.object(RBACTokenClaims, "_warned", False):
+            with self.assertLogs("apps.authorization.claims", level="WARNING"):
+                self.assertIsNone(RBACTokenClaims.resolve(token, self.user))
+
+            # Sin claims confiables los permisos salen de la DB
+            context = RBACContext(self.user, token=token)
+            self.assertTrue(context.has_permission("documents.read"))
+
+
+@override_settings(RBAC_TRUST_TOKEN_CLAIMS=True)
+class RBACTokenClaimsCacheBackendTests(TestCase):
+    """
+    Tests de la detección del caché compartido, sin simularla.
+    """
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "rbac-token-claims-backend-tests",
+            }
+        }
+    )
+    def test_claims_not_trusted_with_per_process_cache(self):
+        """Test que LocMemCache (un caché por proceso) no habilita los claims."""
+        with patch.object(RBACTokenClaims, "_warned", False):
+            with self.assertLogs("apps.authorization.claims", level="WARNING"):
+                self.assertFalse(RBACTokenClaims.trusted())
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:6379/0",
+            }
+        }
+    )
+    def test_claims_trusted_with_shared_cache(self):
+        """Test que un caché compartido (Redis) habilita los claims."""
+        self.assertTrue(RBACTokenClaims.trusted())
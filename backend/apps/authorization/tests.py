@@ -2,14 +2,18 @@
 Tests para el sistema RBAC.
 """
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
 
 from .models import Permission, Role, RolePermission, UserRole
 from .permissions import PermissionChecker
+from .rbac_cache import RBACCache
+from .registry import PermissionRegistry
+from .services import PermissionService
 
 User = get_user_model()
 
@@ -124,6 +128,30 @@ class RoleModelTests(TestCase):
         self.assertTrue(role.has_permission("users.delete"))
         self.assertFalse(role.has_permission("documents.read"))
 
+    def test_role_has_permission_without_queries(self):
+        """Test que has_permission responde desde memoria una vez compilado."""
+        role = Role.objects.create(name="Test Role", code="test_role")
+        RolePermission.objects.create(role=role, permission=self.permission1)
+        role.has_permission("users.read")
+
+        with self.assertNumQueries(0):
+            self.assertTrue(role.has_permission("users.read"))
+            self.assertFalse(role.has_permission("users.create"))
+
+    def test_role_has_permission_after_revocation(self):
+        """Test que revocar un permiso invalida el índice del rol."""
+        with self.captureOnCommitCallbacks(execute=True):
+            role = Role.objects.create(name="Test Role", code="test_role")
+            grant = RolePermission.objects.create(
+                role=role, permission=self.permission1
+            )
+        self.assertTrue(role.has_permission("users.read"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.delete()
+
+        self.assertFalse(role.has_permission("users.read"))
+
 
 class UserRoleModelTests(TestCase):
     """
@@ -365,3 +393,335 @@ class RBACManagementCommandTests(TestCase):
         quality_coord = Role.objects.get(code="quality_coordinator")
         self.assertTrue(quality_coord.has_permission("reports.create"))
         self.assertFalse(quality_coord.has_permission("*.all"))
+
+
+class PermissionRegistryTests(TestCase):
+    """
+    Tests para el registro compilado de máscaras de permisos.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="registry@example.com", first_name="Registry", last_name="User"
+        )
+        # El registro se invalida al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            self.read_perm = Permission.objects.create(
+                name="Ver Documentos", code="documents.read"
+            )
+            self.create_perm = Permission.objects.create(
+                name="Crear Documentos", code="documents.create"
+            )
+            self.wildcard_perm = Permission.objects.create(
+                name="Todos los documentos", code="documents.*"
+            )
+            self.users_perm = Permission.objects.create(
+                name="Ver Usuarios", code="users.read"
+            )
+
+            self.reader = Role.objects.create(name="Lector", code="doc_reader")
+            RolePermission.objects.create(role=self.reader, permission=self.read_perm)
+
+            self.manager = Role.objects.create(name="Gestor", code="doc_manager")
+            RolePermission.objects.create(
+                role=self.manager, permission=self.wildcard_perm
+            )
+
+    def test_wildcards_expanded_at_compile_time(self):
+        """Test que resource.* se expande a los bits de su recurso."""
+        registry = PermissionRegistry.get()
+        mask = registry.role_masks[str(self.manager.id)]
+
+        self.assertTrue(registry.has_permission(mask, "documents.create"))
+        self.assertTrue(registry.has_permission(mask, "documents.read"))
+        self.assertTrue(registry.has_permission(mask, "documents.archive"))
+        self.assertFalse(registry.has_permission(mask, "users.read"))
+
+    def test_user_mask_is_or_of_role_masks(self):
+        """Test que la máscara del usuario combina las de sus roles."""
+        UserRole.objects.create(user=self.user, role=self.reader)
+
+        self.assertTrue(
+            PermissionService.evaluate_permission(self.user, "documents.read")
+        )
+        self.assertFalse(
+            PermissionService.evaluate_permission(self.user, "documents.create")
+        )
+
+        UserRole.objects.create(user=self.user, role=self.manager)
+
+        self.assertTrue(
+            PermissionService.evaluate_permission(self.user, "documents.create")
+        )
+        self.assertEqual(
+            PermissionService.get_user_permissions_set(self.user),
+            {"documents.read", "documents.*"},
+        )
+
+    def test_global_wildcard_grants_unknown_codes(self):
+        """Test que *.all concede incluso códigos fuera del catálogo."""
+        with self.captureOnCommitCallbacks(execute=True):
+            super_perm = Permission.objects.create(name="Super Admin", code="*.all")
+            admin = Role.objects.create(name="Admin", code="admin")
+            RolePermission.objects.create(role=admin, permission=super_perm)
+        UserRole.objects.create(user=self.user, role=admin)
+
+        self.assertTrue(PermissionService.evaluate_permission(self.user, "any.thing"))
+        self.assertTrue(PermissionService.evaluate_permission(self.user, "users.read"))
+
+    def test_registry_recompiled_after_role_permission_change(self):
+        """Test que las señales invalidan el registro compilado."""
+        UserRole.objects.create(user=self.user, role=self.reader)
+        self.assertFalse(PermissionService.evaluate_permission(self.user, "users.read"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RolePermission.objects.create(role=self.reader, permission=self.users_perm)
+
+        self.assertTrue(PermissionService.evaluate_permission(self.user, "users.read"))
+
+    def test_registry_invalidated_only_on_commit(self):
+        """Test que el registro no se descarta antes de confirmar el cambio."""
+        snapshot = PermissionRegistry.get()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            RolePermission.objects.create(role=self.reader, permission=self.users_perm)
+
+        self.assertIs(PermissionRegistry.get(), snapshot)
+
+        for callback in callbacks:
+            callback()
+
+        self.assertIsNot(PermissionRegistry.get(), snapshot)
+
+    def test_evaluation_uses_single_query_once_compiled(self):
+        """Test que una verificación en frío solo consulta los roles del usuario."""
+        UserRole.objects.create(user=self.user, role=self.manager)
+        PermissionRegistry.get()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                PermissionService.evaluate_permission(self.user, "documents.read")
+            )
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "rbac-generation-tests",
+        }
+    }
+)
+class RBACCacheGenerationTests(TestCase):
+    """
+    Tests para la invalidación del caché RBAC por generaciones.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="generations@example.com", first_name="Gen", last_name="User"
+        )
+        self.read_perm = Permission.objects.create(
+            name="Ver Reportes", code="reports.read"
+        )
+        self.export_perm = Permission.objects.create(
+            name="Exportar Reportes", code="reports.export"
+        )
+        self.role = Role.objects.create(name="Analista", code="analyst")
+        RolePermission.objects.create(role=self.role, permission=self.read_perm)
+        UserRole.objects.create(user=self.user, role=self.role)
+
+    def test_user_keys_embed_generation(self):
+        """Test que invalidar un usuario cambia todas sus claves."""
+        key_before = PermissionChecker.get_cache_key(str(self.user.id), "reports.read")
+
+        PermissionService.invalidate_user_cache(str(self.user.id))
+
+        key_after = PermissionChecker.get_cache_key(str(self.user.id), "reports.read")
+        self.assertNotEqual(key_before, key_after)
+
+    def test_role_bump_invalidates_holders(self):
+        """Test que renovar la generación del rol invalida a sus usuarios."""
+        self.assertFalse(
+            PermissionService.evaluate_permission(self.user, "reports.export")
+        )
+
+        # Cambio sin señales, como lo vería otro proceso
+        RolePermission.objects.bulk_create(
+            [RolePermission(role=self.role, permission=self.export_perm)]
+        )
+        self.assertFalse(
+            PermissionService.evaluate_permission(self.user, "reports.export")
+        )
+
+        RBACCache.bump_role(self.role.id)
+
+        self.assertTrue(
+            PermissionService.evaluate_permission(self.user, "reports.export")
+        )
+
+    def test_signals_bump_generations_on_commit(self):
+        """Test que las señales renuevan las generaciones al confirmar."""
+        generation = RBACCache.get_generation(RBACCache.ROLE, self.role.id)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            RolePermission.objects.create(role=self.role, permission=self.export_perm)
+
+        self.assertEqual(
+            RBACCache.get_generation(RBACCache.ROLE, self.role.id), generation
+        )
+
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(
+            RBACCache.get_generation(RBACCache.ROLE, self.role.id), generation
+        )
+
+    def test_remove_role_invalidates_cached_permissions(self):
+        """Test que remove_role (update sin señales) invalida el caché."""
+        self.assertTrue(self.user.has_permission("reports.read"))
+
+        self.user.remove_role("analyst")
+
+        self.assertFalse(self.user.has_permission("reports.read"))
+
+    def test_warm_check_does_not_query_database(self):
+        """Test que una verificación con caché caliente no consulta la DB."""
+        PermissionService.evaluate_permission(self.user, "reports.read")
+
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                PermissionService.evaluate_permission(self.user, "reports.read")
+            )
+
+
+class SerializerQueryPlanTests(TestCase):
+    """
+    Tests para la planificación de consultas de los serializers RBAC.
+    """
+
+    def setUp(self):
+        self.permission = Permission.objects.create(
+            name="Ver Reportes", code="reports.read"
+        )
+        for i in range(3):
+            role = Role.objects.create(name=f"Rol {i}", code=f"role_{i}")
+            RolePermission.objects.create(role=role, permission=self.permission)
+            user = User.objects.create_user(
+                email=f"plan{i}@example.com", first_name="Plan", last_name=str(i)
+            )
+            UserRole.objects.create(user=user, role=role)
+
+    def test_role_counts_are_annotated(self):
+        """Test que los conteos de RoleSerializer no consultan por rol."""
+        from apps.common.query_planning import plan_queryset
+
+        from .serializers import RoleSerializer
+
+        queryset = plan_queryset(Role.objects.order_by("name"), RoleSerializer)
+
+        # Roles con anotaciones + prefetch de permisos
+        with self.assertNumQueries(2):
+            data = RoleSerializer(queryset, many=True).data
+
+        self.assertEqual([role["total_permissions"] for role in data], [1, 1, 1])
+        self.assertEqual([role["active_users_count"] for role in data], [1, 1, 1])
+
+    def test_user_roles_do_not_query_per_row(self):
+        """Test que UserRoleSerializer carga usuario y rol en bloque."""
+        from apps.common.query_planning import plan_queryset
+
+        from .serializers import UserRoleSerializer
+
+        queryset = plan_queryset(UserRole.objects.all(), UserRoleSerializer)
+
+        # Asignaciones con usuarios + roles anotados
+        with self.assertNumQueries(2):
+            data = UserRoleSerializer(queryset, many=True).data
+
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]["role"]["total_permissions"], 1)
+        self.assertTrue(data[0]["user_email"].startswith("plan"))
+
+    def test_role_list_expands_permissions(self):
+        """Test que expand=permissions agrega los permisos en una sola consulta extra."""
+        from apps.common.fieldsets import apply_fieldset, get_fieldset_plan
+
+        from .serializers import RoleListSerializer
+
+        plan = get_fieldset_plan(RoleListSerializer, ("name",), ("permissions",))
+        queryset = plan.apply(Role.objects.order_by("name"), defer=True)
+
+        # Roles + prefetch de permisos
+        with self.assertNumQueries(2):
+            serializer = RoleListSerializer(queryset, many=True)
+            data = apply_fieldset(serializer, ("name",), ("permissions",)).data
+
+        self.assertEqual(set(data[0]), {"id", "name", "permissions"})
+        self.assertEqual(data[0]["permissions"][0]["code"], "reports.read")
+
+    def test_permission_list_compiled_parity(self):
+        """Test que el listado compilado de permisos coincide con el serializer."""
+        from apps.common.compiled import assert_compiled_parity
+
+        from .serializers import PermissionListSerializer
+
+        Permission.objects.create(name="Crear Reportes", code="reports.create")
+        assert_compiled_parity(
+            PermissionListSerializer, Permission.objects.order_by("code"), self
+        )
+
+
+class RoleCounterTests(TestCase):
+    """
+    Tests para los contadores materializados de roles.
+    """
+
+    def setUp(self):
+        self.permission = Permission.objects.create(
+            name="Ver Reportes", code="reports.read"
+        )
+        self.role = Role.objects.create(name="Analista", code="analyst")
+        RolePermission.objects.create(role=self.role, permission=self.permission)
+        self.user = User.objects.create_user(
+            email="counter@example.com", first_name="Count", last_name="User"
+        )
+
+    def test_active_members_follow_assignments(self):
+        """Test que asignar y remover roles mueve el contador."""
+        from apps.common import counters
+
+        from .counters import ROLE_ACTIVE_MEMBERS
+
+        self.user.add_role("analyst")
+        self.assertEqual(counters.get(ROLE_ACTIVE_MEMBERS, self.role.pk), 1)
+
+        self.user.remove_role("analyst")
+        self.assertEqual(counters.get(ROLE_ACTIVE_MEMBERS, self.role.pk), 0)
+
+    def test_inactive_users_are_not_members(self):
+        """Test que desactivar un usuario recalcula sus roles."""
+        from apps.common import counters
+
+        from .counters import ROLE_ACTIVE_MEMBERS
+
+        UserRole.objects.create(user=self.user, role=self.role)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(counters.get(ROLE_ACTIVE_MEMBERS, self.role.pk), 0)
+
+    def test_permission_status_recounts_roles(self):
+        """Test que desactivar un permiso actualiza el conteo de sus roles."""
+        from apps.common import counters
+
+        from .counters import ROLE_PERMISSIONS
+
+        self.assertEqual(counters.get(ROLE_PERMISSIONS, self.role.pk), 1)
+
+        self.permission.is_active = False
+        self.permission.save()
+
+        self.assertEqual(counters.get(ROLE_PERMISSIONS, self.role.pk), 0)
@@ -10,6 +10,12 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from apps.common.catalog_cache import catalog_response
+from apps.common.compiled import CompiledListMixin
+from apps.common.fieldsets import SparseFieldsetMixin
+from apps.common.pagination import KeysetPagination
+from apps.common.query_planning import QueryPlanningMixin, plan_queryset
+
 from .models import Permission, Role, UserRole
 from .serializers import (
     PermissionSerializer,
@@ -21,11 +27,19 @@ from .serializers import (
 )
 from .mixins import PermissionRequiredMixin
 from .permissions import PermissionChecker
+from .rbac_cache import RBAC_CATALOG
+from .services import PermissionService
 
 User = get_user_model()
 
 
-class PermissionViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
+class PermissionViewSet(
+    PermissionRequiredMixin,
+    CompiledListMixin,
+    SparseFieldsetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet para gestión de permisos.
     """
@@ -37,6 +51,7 @@ class PermissionViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
     filterset_fields = ["resource", "action", "is_active"]
     search_fields = ["name", "code", "description", "resource", "action"]
     ordering_fields = ["name", "code", "resource", "action", "created_at"]
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         """Usar serializer simplificado para lista."""
@@ -45,6 +60,7 @@ class PermissionViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
         return PermissionSerializer
 
     @action(detail=False, methods=["get"])
+    @catalog_response(RBAC_CATALOG)
     def resources(self, request):
         """Obtener lista de recursos únicos."""
         resources = (
@@ -56,6 +72,7 @@ class PermissionViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
         return Response(list(resources))
 
     @action(detail=False, methods=["get"])
+    @catalog_response(RBAC_CATALOG)
     def actions(self, request):
         """Obtener lista de acciones únicas."""
         resource = request.query_params.get("resource")
@@ -70,7 +87,12 @@ class PermissionViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
         return Response(list(actions))
 
 
-class RoleViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
+class RoleViewSet(
+    PermissionRequiredMixin,
+    SparseFieldsetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet para gestión de roles.
     """
@@ -130,19 +152,27 @@ class RoleViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
         return Response({"users": users})
 
     @action(detail=False, methods=["get"])
+    @catalog_response(RBAC_CATALOG)
     def system_roles(self, request):
         """Obtener solo roles del sistema."""
-        roles = Role.objects.filter(is_system=True, is_active=True)
+        roles = plan_queryset(
+            Role.objects.filter(is_system=True, is_active=True), RoleListSerializer
+        )
         serializer = RoleListSerializer(roles, many=True)
         return Response(serializer.data)
 
 
-class UserRoleViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
+class UserRoleViewSet(
+    PermissionRequiredMixin,
+    SparseFieldsetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet para gestión de asignaciones de roles a usuarios.
     """
 
-    queryset = UserRole.objects.all().select_related("user", "role", "assigned_by")
+    queryset = UserRole.objects.all()
     permission_classes = [IsAuthenticated]
     permission_required = "roles"  # Base resource
     serializer_class = UserRoleSerializer
@@ -151,6 +181,8 @@ class UserRoleViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
     search_fields = ["user__email", "user__first_name", "user__last_name", "role__name"]
     ordering_fields = ["assigned_at", "expires_at"]
     ordering = ["-assigned_at"]
+    pagination_class = KeysetPagination
+    planned_actions = QueryPlanningMixin.planned_actions + ("by_user",)
 
     @action(detail=False, methods=["post"])
     def assign_role(self, request):
@@ -208,7 +240,7 @@ class UserRoleViewSet(PermissionRequiredMixin, viewsets.ModelViewSet):
         """Obtener roles de un usuario específico."""
         try:
             user = User.objects.get(id=user_id)
-            user_roles = self.queryset.filter(user=user)
+            user_roles = self.get_queryset().filter(user=user)
             serializer = self.get_serializer(user_roles, many=True)
             return Response(serializer.data)
 
@@ -309,20 +341,27 @@ class UserPermissionsViewSet(viewsets.ReadOnlyModelViewSet):
             }
         )
 
-    @action(detail=False, methods=["post"])
-    def check_permissions(self, request):
-        """Verificar múltiples permisos del usuario actual."""
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="check_permissions",
+        url_name="check-permissions",
+    )
+    def check_permissions_batch(self, request):
+        """
+        Verificar múltiples permisos del usuario actual.
+
+        Las máscaras del usuario se resuelven una sola vez para todo el lote.
+        (El método no se llama ``check_permissions`` para no ocultar el
+        método homónimo de DRF que aplica las permission classes.)
+        """
         permission_codes = request.data.get("permission_codes", [])
-        if not permission_codes:
+        if not permission_codes or not isinstance(permission_codes, list):
             return Response(
                 {"error": "permission_codes es requerido"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        results = {}
-        for permission_code in permission_codes:
-            results[permission_code] = PermissionChecker.user_has_permission(
-                request.user, permission_code
-            )
+        results = PermissionService.evaluate_permissions(request.user, permission_codes)
 
         return Response({"user_id": request.user.id, "permissions": results})
@@ -0,0 +1,138 @@
+"""
+Versioned catalog responses for ZentraQMS.
+
+Each catalog (e.g. ``rbac``, ``sector_templates``) has a version stamp in
+the cache that is renewed after every committed write to its models.
+``catalog_response`` serves a view's data from the cache under the current
+version and emits a strong ETag derived from it, so a request whose
+``If-None-Match`` still matches is answered with 304 without running the
+view (and without any database query).
+
+The version stamp must be seen by every process, so the views run
+uncached and emit no ETag unless the cache is shared (see
+``cache_is_shared``). DummyCache can't hold the stamp, and a constant stamp
+would answer 304 for data that has changed; on the per-process LocMemCache,
+``bump()`` only renews the stamp of the worker that handled the write, and
+the others would answer 304 for stale data until restarted.
+"""
+
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conditional import etag_matches
+from .utils import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "catalog"
+
+
+def get_cache_timeout() -> int:
+    """Lifetime of cached catalog responses, from CATALOG_CACHE_TIMEOUT."""
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 86400)
+
+
+def version_key(catalog: str) -> str:
+    return f"{CACHE_PREFIX}:version:{catalog}"
+
+
+def get_version(catalog: str) -> int:
+    """
+    Current version stamp of a catalog.
+
+    A missing stamp (new or evicted) starts at a nanosecond timestamp, so it
+    never repeats a version whose entries may still be cached.
+    """
+    key = version_key(catalog)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump(catalog: str, using: str = "default") -> None:
+    """
+    Renew the version stamp of a catalog once the current transaction commits.
+
+    Bumping after the commit keeps a concurrent request from caching data
+    read before the write under the new version.
+    """
+
+    def renew():
+        cache.set(version_key(catalog), time.time_ns(), None)
+        logger.debug(f"Catalog version bumped: {catalog}")
+
+    transaction.on_commit(renew, using=using)
+
+
+def catalog_response(catalog: str):
+    """
+    Serve a GET view from the versioned catalog cache with a strong ETag.
+
+    The cache key and ETag cover the full path with query string, the
+    rendered format and the active language, so each distinct
+    representation gets its own tag. Only 200 responses are cached, and
+    nothing is cached or tagged when the cache is not shared.
+
+    Usage:
+        @action(detail=False, methods=["get"])
+        @catalog_response("rbac")
+        def resources(self, request):
+            ...
+
+    Args:
+        catalog (str): Catalog whose version the data depends on
+
+    Returns:
+        callable: View method decorator
+    """
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not cache_is_shared(cache):
+                return view_method(self, request, *args, **kwargs)
+
+            renderer = getattr(request, "accepted_renderer", None)
+            variant = "|".join(
+                [
+                    request.get_full_path(),
+                    getattr(renderer, "format", "") or "",
+                    get_language() or "",
+                ]
+            )
+            digest = hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]
+            version = get_version(catalog)
+            etag = f'"{catalog}-{version:x}-{digest}"'
+
+            if etag_matches(request.headers.get("If-None-Match", ""), etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                key = f"{CACHE_PREFIX}:{catalog}:{version}:{digest}"
+                data = cache.get(key)
+                if data is not None:
+                    response = Response(data)
+                else:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, get_cache_timeout())
+
+            response["ETag"] = etag
+            # Revalidate every time; the 304 makes that cheap
+            response["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
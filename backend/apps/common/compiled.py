@@ -0,0 +1,437 @@
+"""
+Compiled read-only serializers for ZentraQMS list endpoints.
+
+Rendering a list with a ``ModelSerializer`` builds a model instance per row
+and runs the field machinery (``get_attribute``, None checks,
+``to_representation``) per field per row. ``compile_serializer`` does that
+analysis once per serializer and generates a row-to-dict function:
+
+- Rows are read with ``values_list()`` (only the columns the fields need,
+  taken from the serializer's query plan) and turned into bare model
+  instances without running ``Model.__init__``; related rows read by
+  method fields come from the same query through a join.
+- Plain columns whose representation is the value itself are copied
+  as they are; other fields call the same field or method the serializer
+  would, so the output is identical.
+
+Serializers opt in with ``Meta.compiled = True``; those that can not be
+compiled (nested serializers, prefetches, method fields whose columns are
+unknown) are rendered as usual. ``assert_compiled_parity`` checks a
+compiled serializer against the regular one.
+
+Usage:
+    class LocationListSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Location
+            compiled = True
+            fields = ["id", "nombre", "organization"]
+
+        @requires(select=["organization"], columns=["organization__razon_social"])
+        def get_organization(self, obj):
+            ...
+
+    class LocationViewSet(
+        CompiledListMixin, SparseFieldsetMixin, QueryPlanningMixin,
+        viewsets.ModelViewSet,
+    ):
+        ...
+"""
+
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models.base import ModelState
+from django.db.models.query import ValuesListIterable
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+
+from .query_planning import plan_serializer
+
+# Serializer fields that represent a value of these model fields unchanged
+IDENTITY_FIELDS = (
+    (
+        (serializers.CharField, serializers.EmailField, serializers.URLField),
+        (models.CharField, models.TextField),
+    ),
+    ((serializers.BooleanField,), (models.BooleanField,)),
+    ((serializers.IntegerField,), (models.IntegerField,)),
+)
+
+SKIP = object()
+
+
+class NotCompilable(Exception):
+    """The serializer reads data a compiled row can not provide."""
+
+
+def _render_field(field, obj):
+    """Render one field exactly as ``Serializer.to_representation`` does."""
+    try:
+        attribute = field.get_attribute(obj)
+    except SkipField:
+        return SKIP
+    check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+    if check_for_none is None:
+        return None
+    return field.to_representation(attribute)
+
+
+def _is_identity(field, model_field) -> bool:
+    for field_classes, model_field_classes in IDENTITY_FIELDS:
+        if type(field) in field_classes and isinstance(model_field, model_field_classes):
+            return not model_field.choices
+    return False
+
+
+def _get_relation(opts, name):
+    try:
+        field = opts.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _bare_instance(model, db, values):
+    # What Model.from_db leaves behind, without running __init__
+    instance = model.__new__(model)
+    instance._state = ModelState()
+    instance._state.adding = False
+    instance._state.db = db
+    instance.__dict__.update(values)
+    return instance
+
+
+class CompiledSerializer:
+    """
+    Row reader and renderer generated for a serializer.
+
+    Attributes:
+        model: Model of the rows
+        lookups (tuple): ``values_list()`` lookups of a row
+        names (tuple): Serializer fields rendered, in order
+    """
+
+    def __init__(self, serializer, keep: Iterable[str] = ()):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        meta = getattr(serializer, "Meta", None)
+        model = getattr(meta, "model", None)
+        if model is None:
+            raise NotCompilable("Not a model serializer")
+
+        plan = plan_serializer(serializer)
+        if plan.columns is None:
+            raise NotCompilable("Fields read unknown columns")
+        if plan.prefetch:
+            raise NotCompilable("Fields read prefetched relations")
+
+        self.model = model
+        self._compile_lookups(plan, keep)
+        self._compile_render(serializer)
+
+    # ---- Rows ----
+
+    def _compile_lookups(self, plan, keep):
+        opts = self.model._meta
+        own = {opts.pk.attname}
+        related = {}
+        for name in plan.columns:
+            head, _, rest = name.partition("__")
+            if rest:
+                related.setdefault(head, set()).add(rest)
+                continue
+            try:
+                own.add(opts.get_field(name).attname)
+            except FieldDoesNotExist:
+                raise NotCompilable(f"Unknown column {name}")
+
+        # Ordering columns are read by keyset cursors
+        for name in [*keep, *(opts.ordering or ())]:
+            if not isinstance(name, str):
+                continue
+            try:
+                field = opts.get_field(name.lstrip("-"))
+            except FieldDoesNotExist:
+                continue
+            if field.concrete:
+                own.add(field.attname)
+
+        for lookup in plan.select:
+            if "__" in lookup or lookup not in related:
+                # The method reads columns of the relation it did not declare
+                raise NotCompilable(f"Undeclared columns of {lookup}")
+
+        relations = []
+        for name, columns in sorted(related.items()):
+            field = _get_relation(opts, name)
+            if field is None or not field.concrete or field.many_to_many:
+                raise NotCompilable(f"{name} is not a forward relation")
+            if not field.target_field.primary_key:
+                raise NotCompilable(f"{name} does not point to a primary key")
+            related_opts = field.related_model._meta
+            attnames = set()
+            for column in columns:
+                try:
+                    attnames.add(related_opts.get_field(column).attname)
+                except FieldDoesNotExist:
+                    raise NotCompilable(f"Unknown column {name}__{column}")
+            attnames = sorted(attnames - {related_opts.pk.attname})
+            own.add(field.attname)
+            relations.append((field, attnames))
+
+        self.own = tuple(sorted(own))
+        self.relations = tuple(relations)
+        self.annotations = tuple(sorted(plan.annotations))
+        self.annotation_expressions = dict(plan.annotations)
+        self.lookups = (
+            self.own
+            + self.annotations
+            + tuple(
+                f"{field.name}__{attname}"
+                for field, attnames in self.relations
+                for attname in attnames
+            )
+        )
+
+    def make_row(self, values, db="default"):
+        """Build a bare model instance from a ``values_list()`` tuple."""
+        width = len(self.own) + len(self.annotations)
+        instance = _bare_instance(self.model, db, zip(self.own, values))
+        instance.__dict__.update(zip(self.annotations, values[len(self.own):width]))
+
+        offset = width
+        for field, attnames in self.relations:
+            related_values = values[offset:offset + len(attnames)]
+            offset += len(attnames)
+            pk = instance.__dict__[field.attname]
+            related = None
+            if pk is not None:
+                related_model = field.related_model
+                related = _bare_instance(related_model, db, zip(attnames, related_values))
+                related.__dict__[related_model._meta.pk.attname] = pk
+            instance._state.fields_cache[field.name] = related
+        return instance
+
+    def rows(self, queryset):
+        """
+        Queryset yielding compiled rows instead of model instances.
+
+        It can still be filtered, ordered, sliced and paginated.
+        """
+        missing = {
+            name: expression
+            for name, expression in self.annotation_expressions.items()
+            if name not in queryset.query.annotations
+        }
+        if missing:
+            queryset = queryset.annotate(**missing)
+        queryset = queryset.prefetch_related(None).values_list(*self.lookups)
+        queryset._iterable_class = self.iterable_class
+        return queryset
+
+    @property
+    def iterable_class(self):
+        iterable_class = self.__dict__.get("_iterable_class")
+        if iterable_class is None:
+            compiled = self
+
+            class CompiledRowIterable(ValuesListIterable):
+                def __iter__(self):
+                    db = self.queryset.db
+                    for values in super().__iter__():
+                        yield compiled.make_row(values, db)
+
+            iterable_class = self.__dict__["_iterable_class"] = CompiledRowIterable
+        return iterable_class
+
+    # ---- Rendering ----
+
+    def _compile_render(self, serializer):
+        opts = self.model._meta
+        own = set(self.own)
+        names = []
+        lines = ["def render(obj, fields, methods):", "    d = obj.__dict__", "    out = {}"]
+
+        for index, (name, field) in enumerate(
+            (name, field)
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ):
+            names.append(name)
+            key = repr(field.field_name)
+
+            if isinstance(field, serializers.SerializerMethodField):
+                lines.append(f"    out[{key}] = methods[{index}](obj)")
+                continue
+            if isinstance(
+                field,
+                (serializers.BaseSerializer, serializers.ManyRelatedField),
+            ):
+                raise NotCompilable(f"{name} is a nested serializer")
+
+            model_field = None
+            if len(field.source_attrs) == 1:
+                try:
+                    model_field = opts.get_field(field.source_attrs[0])
+                except FieldDoesNotExist:
+                    model_field = None
+            direct = (
+                model_field is not None
+                and model_field.concrete
+                and not model_field.is_relation
+                and model_field.attname in own
+            )
+
+            if direct and _is_identity(field, model_field):
+                lines.append(f"    out[{key}] = d[{model_field.attname!r}]")
+            elif direct:
+                lines.append(f"    v = d[{model_field.attname!r}]")
+                lines.append(
+                    f"    out[{key}] = None if v is None "
+                    f"else fields[{index}].to_representation(v)"
+                )
+            else:
+                lines.append(f"    v = render_field(fields[{index}], obj)")
+                lines.append("    if v is not SKIP:")
+                lines.append(f"        out[{key}] = v")
+
+        lines.append("    return out")
+        namespace = {"render_field": _render_field, "SKIP": SKIP}
+        exec("\n".join(lines), namespace)
+        self.names = tuple(names)
+        self._render = namespace["render"]
+
+    def render(self, rows, serializer) -> List[dict]:
+        """
+        Render compiled rows with the fields of a serializer instance.
+
+        The serializer (of the compiled class, with the same fields) gives
+        the fields and methods their context, as in a regular render.
+        """
+        return list(self.iter_render(rows, serializer))
+
+    def iter_render(self, rows, serializer) -> Iterator[dict]:
+        """Render compiled rows one at a time (see ``render``)."""
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        fields = tuple(serializer.fields[name] for name in self.names)
+        methods = tuple(
+            getattr(serializer, field.method_name, None)
+            if isinstance(field, serializers.SerializerMethodField)
+            else None
+            for field in fields
+        )
+        render = self._render
+        for row in rows:
+            yield render(row, fields, methods)
+
+
+def compile_serializer(serializer, keep: Iterable[str] = ()) -> CompiledSerializer:
+    """
+    Compile a serializer instance.
+
+    Args:
+        serializer: Serializer instance, possibly pruned by a fieldset
+        keep (iterable): Columns to load besides the rendered ones (e.g.
+            ordering fields for keyset cursors)
+
+    Raises:
+        NotCompilable: If the serializer can not be rendered from rows
+    """
+    return CompiledSerializer(serializer, keep)
+
+
+@lru_cache(maxsize=256)
+def get_compiled_serializer(
+    serializer_class, fieldset: Optional[Tuple] = None, keep: Tuple[str, ...] = ()
+) -> Optional[CompiledSerializer]:
+    """
+    Compiled serializer of a class (and fieldset), or None if it can not
+    be compiled. Computed once.
+    """
+    if not getattr(getattr(serializer_class, "Meta", None), "compiled", False):
+        return None
+    serializer = serializer_class()
+    if fieldset is not None:
+        from .fieldsets import apply_fieldset
+
+        apply_fieldset(serializer, *fieldset)
+    try:
+        return compile_serializer(serializer, keep)
+    except NotCompilable:
+        return None
+
+
+def render_list(serializer_class, queryset, **kwargs) -> list:
+    """
+    Render every row of a queryset, from rows if the serializer compiles.
+
+    Args:
+        serializer_class: Serializer class rendering the rows
+        queryset: Rows to render
+        **kwargs: Serializer arguments (e.g. ``context``)
+    """
+    compiled = get_compiled_serializer(serializer_class)
+    if compiled is None:
+        return serializer_class(queryset, many=True, **kwargs).data
+    rows = list(compiled.rows(queryset))
+    return compiled.render(rows, serializer_class(rows, many=True, **kwargs))
+
+
+def assert_compiled_parity(serializer_class, queryset, test_case, **kwargs):
+    """
+    Assert that the compiled serializer renders a queryset like the regular one.
+
+    Args:
+        serializer_class: Serializer class to check
+        queryset: Rows to render
+        test_case: ``TestCase`` used for the assertions
+        **kwargs: Serializer arguments (e.g. ``context``)
+    """
+    compiled = compile_serializer(serializer_class(**kwargs))
+    expected = serializer_class(queryset, many=True, **kwargs).data
+    rows = list(compiled.rows(queryset))
+    actual = compiled.render(rows, serializer_class(rows, many=True, **kwargs))
+    test_case.assertEqual(
+        [dict(item) for item in actual], [dict(item) for item in expected]
+    )
+
+
+class CompiledListMixin:
+    """
+    ViewSet mixin rendering ``list`` with the compiled serializer.
+
+    Serializers opt in with ``Meta.compiled = True``; the sparse fieldset
+    of the request (``SparseFieldsetMixin``) is compiled separately.
+    """
+
+    def get_compiled_serializer(self) -> Optional[CompiledSerializer]:
+        get_fieldset = getattr(self, "get_fieldset", None)
+        ordering = getattr(self, "ordering", None) or ()
+        ordering_fields = getattr(self, "ordering_fields", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        if isinstance(ordering_fields, str):
+            ordering_fields = ()
+        return get_compiled_serializer(
+            self.get_serializer_class(),
+            get_fieldset() if get_fieldset else None,
+            tuple(sorted({*ordering, *ordering_fields})),
+        )
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = compiled.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        data = compiled.render(rows, self.get_serializer(rows, many=True))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,260 @@
+"""
+Conditional requests and optimistic concurrency for ZentraQMS.
+
+Detail views tag each representation with an ETag and a Last-Modified date
+built from row versions (``updated_at`` of the row and of the related rows
+it renders). ``ConditionalRequestMixin`` adds them to a ViewSet:
+
+- ``retrieve`` answers a matching ``If-None-Match`` (or ``If-Modified-Since``)
+  with 304 after a version-only lookup, without loading or serializing the
+  record.
+- ``update`` / ``partial_update`` with ``If-Match`` only save if the row is
+  still at the version of the tag; the check is part of the UPDATE
+  statement (see ``VersionedModel``), so two concurrent edits can not both
+  succeed. A stale tag gets 412 Precondition Failed.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import StaleVersionError
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _(
+        "El registro fue modificado por otra solicitud. "
+        "Vuelva a cargarlo e intente de nuevo."
+    )
+    default_code = "precondition_failed"
+
+
+# ================================
+# Version tokens
+# ================================
+
+
+def version_token(value) -> str:
+    """
+    Encode a version value as an ETag component.
+
+    Datetimes become their exact microseconds since the epoch, so the token
+    can be decoded back to the stored value; None becomes ``0`` and strings
+    (e.g. cache version stamps) are used as they are.
+    """
+    if value is None:
+        return "0"
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        delta = value - EPOCH
+        value = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f"{value:x}"
+
+
+def parse_version_token(token: str) -> Optional[datetime]:
+    """Decode a datetime ``version_token``, or None if it is not one."""
+    try:
+        microseconds = int(token, 16)
+    except ValueError:
+        return None
+    if microseconds <= 0:
+        return None
+    try:
+        return EPOCH + timedelta(microseconds=microseconds)
+    except OverflowError:
+        return None
+
+
+def make_etag(*versions) -> str:
+    """Strong ETag made of the tokens of ``versions``."""
+    return '"' + "-".join(version_token(value) for value in versions) + '"'
+
+
+def last_modified_of(*versions) -> Optional[datetime]:
+    """Latest of the datetime ``versions``."""
+    moments = [value for value in versions if isinstance(value, datetime)]
+    return max(moments) if moments else None
+
+
+# ================================
+# Request evaluation
+# ================================
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Weak comparison of ``If-None-Match`` against an ETag.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.removeprefix("W/") == etag for tag in parse_etags(header))
+
+
+def is_not_modified(request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Whether a GET can be answered with 304.
+
+    ``If-None-Match`` takes precedence; ``If-Modified-Since`` is only used
+    when it is absent.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+    if since is None or last_modified is None:
+        return False
+    return int(last_modified.timestamp()) <= since
+
+
+def set_validators(response, etag: str, last_modified: Optional[datetime]):
+    """Add ETag, Last-Modified and revalidation headers to a response."""
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Revalidate every time; the 304 makes that cheap
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def parse_if_match(header: Optional[str]) -> Optional[List[datetime]]:
+    """
+    Row versions accepted by an ``If-Match`` header.
+
+    Only the first component of each tag (the row's own version) is used,
+    so changes to related rows do not block updates of the record.
+
+    Returns:
+        list: Accepted versions; None when there is no header or it is ``*``
+
+    Raises:
+        PreconditionFailed: If no tag holds a row version (If-Match uses the
+            strong comparison, so weak tags never match)
+    """
+    if not header or header.strip() == "*":
+        return None
+
+    versions = []
+    for tag in parse_etags(header):
+        if tag.startswith("W/"):
+            continue
+        version = parse_version_token(tag.strip('"').split("-", 1)[0])
+        if version is not None:
+            versions.append(version)
+    if not versions:
+        raise PreconditionFailed()
+    return versions
+
+
+# ================================
+# ViewSet mixin
+# ================================
+
+
+class ConditionalRequestMixin:
+    """
+    ViewSet mixin adding ETags, 304 responses and ``If-Match`` checks to
+    detail views of ``VersionedModel`` records.
+
+    ``version_annotations`` adds related versions to the tag (e.g. the
+    latest ``updated_at`` of nested rows), as expressions over the record.
+
+    The 304 short-circuit runs after the view permissions but does not load
+    the record, so object permissions are not checked on it; do not use the
+    mixin on views whose object permissions depend on the row.
+    """
+
+    version_annotations: Dict = {}
+
+    def get_versions(self) -> Optional[tuple]:
+        """
+        Current versions of the requested record, with one small query.
+
+        Returns:
+            tuple: Row version followed by the ``version_annotations``, or
+            None if the record does not exist
+        """
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        model = queryset.model
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return (
+                queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+                .annotate(**self.version_annotations)
+                .values_list(model.version_field, *self.version_annotations)
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            # Malformed lookup value: the regular path answers 404
+            return None
+
+    def get_variant(self) -> tuple:
+        """
+        ETag component telling apart representations of the same versions
+        (e.g. sparse fieldsets chosen with query parameters).
+        """
+        query = self.request.GET.urlencode()
+        if not query:
+            return ()
+        return (hashlib.sha256(query.encode("utf-8")).hexdigest()[:16],)
+
+    def add_validators(self, response):
+        """Tag a successful response with the current versions."""
+        versions = self.get_versions()
+        if response.status_code == status.HTTP_200_OK and versions is not None:
+            set_validators(response, make_etag(*versions), last_modified_of(*versions))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a record, or answer 304 if the client's copy is current.
+        """
+        versions = self.get_versions()
+        if versions is None:
+            # Let the regular path produce the 404
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = make_etag(*versions, *self.get_variant())
+        last_modified = last_modified_of(*versions)
+        if is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return set_validators(response, etag, last_modified)
+
+    def get_object(self):
+        instance = super().get_object()
+        expected = getattr(self, "_expected_versions", None)
+        if expected is not None:
+            instance.expect_version(expected)
+        return instance
+
+    def update(self, request, *args, **kwargs):
+        """
+        Update a record; with ``If-Match``, only if it is still at that version.
+        """
+        self._expected_versions = parse_if_match(request.headers.get("If-Match"))
+        try:
+            with transaction.atomic():
+                response = super().update(request, *args, **kwargs)
+        except StaleVersionError:
+            raise PreconditionFailed()
+        finally:
+            self._expected_versions = None
+        return self.add_validators(response)
@@ -0,0 +1,376 @@
+"""
+Materialized counters for ZentraQMS.
+
+A ``CounterSpec`` describes how many rows of a model match a condition,
+globally or per scope (the value of a foreign key). ``register()`` connects
+signal handlers that move the stored count by ``F()`` increments in the same
+transaction as the save or delete that changed membership, so reading a
+count is a single-row lookup instead of a COUNT.
+
+Changes made without model signals (``QuerySet.update()``, bulk writes)
+and time-based conditions (e.g. expirations) are repaired by ``recount()``
+and the ``reconcile_counters`` management command.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import Counter
+
+
+class CounterSpec:
+    """
+    Definition of a materialized counter.
+
+    Args:
+        name (str): Counter name (e.g. ``organization.active_locations``)
+        model: Model whose rows are counted
+        condition (Q): Rows counted, as a filter on ``model``
+        matches (callable): Same condition evaluated on a dict of field
+            attnames to values; may query related rows
+        fields (iterable): Attnames ``matches`` reads
+        scope (str): Attname of the foreign key the count is grouped by,
+            or None for a global counter
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        condition: Q,
+        matches: Callable[[Dict], bool],
+        fields: Iterable[str],
+        scope: Optional[str] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.matches = matches
+        self.scope = scope
+        self.fields = tuple(fields) + ((scope,) if scope else ())
+
+    def queryset(self, using: str = "default"):
+        return self.model._base_manager.using(using).filter(self.condition)
+
+    def count(self, scopes: Optional[Iterable] = None, using: str = "default"):
+        """
+        Count the matching rows from the table.
+
+        Args:
+            scopes (iterable): Scopes to count (None = every scope)
+
+        Returns:
+            dict: Scope to count (key None for a global counter); scopes
+            without rows are left out
+        """
+        queryset = self.queryset(using)
+        if self.scope is None:
+            return {None: queryset.count()}
+        if scopes is not None:
+            queryset = queryset.filter(**{f"{self.scope}__in": list(scopes)})
+        return dict(
+            queryset.order_by()
+            .values_list(self.scope)
+            .annotate(count=Count("pk"))
+            .values_list(self.scope, "count")
+        )
+
+    def membership(self, values: Optional[Dict]):
+        """(scope, counted) of a row given its values (None = no row)."""
+        if values is None:
+            return None, False
+        scope = values[self.scope] if self.scope else None
+        return scope, bool(self.matches(values))
+
+
+_specs: Dict[str, CounterSpec] = {}
+_specs_by_model: Dict[type, List[CounterSpec]] = {}
+
+
+def register(spec: CounterSpec) -> CounterSpec:
+    """
+    Register a counter and connect the handlers that maintain it.
+
+    Args:
+        spec (CounterSpec): Counter definition
+
+    Returns:
+        CounterSpec: The registered spec
+    """
+    _specs[spec.name] = spec
+    model_specs = _specs_by_model.setdefault(spec.model, [])
+    if spec not in model_specs:
+        model_specs.append(spec)
+
+    label = spec.model._meta.label_lower
+    pre_save.connect(_on_pre_save, sender=spec.model, dispatch_uid=f"counters:{label}")
+    post_save.connect(
+        _on_post_save, sender=spec.model, dispatch_uid=f"counters:{label}"
+    )
+    post_delete.connect(
+        _on_post_delete, sender=spec.model, dispatch_uid=f"counters:{label}"
+    )
+    return spec
+
+
+def get_spec(name: str) -> CounterSpec:
+    """
+    Get a registered counter.
+
+    Raises:
+        LookupError: If no counter is registered with that name
+    """
+    try:
+        return _specs[name]
+    except KeyError:
+        raise LookupError(f"Counter '{name}' is not registered")
+
+
+def get_specs() -> List[CounterSpec]:
+    """Registered counters."""
+    return list(_specs.values())
+
+
+# ================================
+# Reading
+# ================================
+
+
+def get(name: str, scope=None, using: str = "default") -> int:
+    """
+    Current value of a counter.
+
+    A counter row that does not exist yet is created from a COUNT.
+
+    Args:
+        name (str): Counter name
+        scope: Scope of the count (None for global counters)
+
+    Returns:
+        int: Counter value
+    """
+    value = (
+        Counter.objects.using(using)
+        .filter(name=name, scope=scope)
+        .values_list("value", flat=True)
+        .first()
+    )
+    if value is None:
+        value = recount(name, [scope], using=using)[scope]
+    return value
+
+
+def get_many(name: str, scopes: Iterable, using: str = "default") -> Dict:
+    """
+    Values of a scoped counter for several scopes, with one query.
+
+    Returns:
+        dict: Scope to counter value
+    """
+    scopes = list(scopes)
+    values = dict(
+        Counter.objects.using(using)
+        .filter(name=name, scope__in=scopes)
+        .values_list("scope", "value")
+    )
+    missing = [scope for scope in scopes if scope not in values]
+    if missing:
+        values.update(recount(name, missing, using=using))
+    return values
+
+
+def counter_value(name: str, scope_field: str = "pk"):
+    """
+    Annotation reading a counter row for each row of a queryset.
+
+    Rows whose counter does not exist yet get None.
+
+    Args:
+        name (str): Counter name
+        scope_field (str): Field of the outer row holding the scope
+
+    Returns:
+        Expression: Counter value
+    """
+    return Subquery(
+        Counter.objects.filter(name=name, scope=OuterRef(scope_field)).values(
+            "value"
+        )[:1],
+        output_field=IntegerField(),
+    )
+
+
+# ================================
+# Writing
+# ================================
+
+
+def increment(name: str, scope=None, delta: int = 1, using: str = "default") -> None:
+    """
+    Move a counter by ``delta`` with an ``F()`` update.
+
+    If the row does not exist yet, it is created from a COUNT, which
+    already includes the change being counted.
+    """
+    updated = (
+        Counter.objects.using(using)
+        .filter(name=name, scope=scope)
+        .update(value=F("value") + delta)
+    )
+    if not updated:
+        recount(name, [scope], using=using)
+
+
+def recount(name: str, scopes: Optional[Iterable] = None, using: str = "default"):
+    """
+    Store the exact count of a counter for some (or all) scopes.
+
+    Args:
+        name (str): Counter name
+        scopes (iterable): Scopes to recount (None = every scope with rows
+            or a stored value)
+
+    Returns:
+        dict: Scope to counter value
+    """
+    spec = get_spec(name)
+    if spec.scope is None:
+        scopes = [None]
+    elif scopes is not None:
+        scopes = [scope for scope in scopes if scope is not None]
+
+    counts = spec.count(scopes, using=using)
+    if scopes is None:
+        stored = Counter.objects.using(using).filter(name=name).values_list(
+            "scope", flat=True
+        )
+        scopes = set(counts) | set(stored)
+
+    values = {}
+    for scope in scopes:
+        values[scope] = counts.get(scope, 0)
+        _store(name, scope, values[scope], using)
+    return values
+
+
+def _store(name, scope, value, using):
+    updated = (
+        Counter.objects.using(using)
+        .filter(name=name, scope=scope)
+        .exclude(value=value)
+        .update(value=value)
+    )
+    if updated or Counter.objects.using(using).filter(name=name, scope=scope).exists():
+        return
+    try:
+        with transaction.atomic(using=using):
+            Counter.objects.using(using).create(name=name, scope=scope, value=value)
+    except IntegrityError:
+        # Created concurrently; the other transaction counted the same rows
+        pass
+
+
+def reconcile(
+    names: Optional[Iterable[str]] = None, dry_run: bool = False, using: str = "default"
+) -> List[Dict]:
+    """
+    Compare stored counters with the tables and repair the drift.
+
+    Args:
+        names (iterable): Counters to check (None = all registered)
+        dry_run (bool): Only report the drift
+
+    Returns:
+        list: Dicts with name, scope, stored and actual values of every
+        counter that was (or would be) repaired
+    """
+    drift = []
+    for name in names or list(_specs):
+        spec = get_spec(name)
+        counts = spec.count(using=using)
+        stored = dict(
+            Counter.objects.using(using)
+            .filter(name=name)
+            .values_list("scope", "value")
+        )
+        for scope in set(counts) | set(stored):
+            actual = counts.get(scope, 0)
+            current = stored.get(scope)
+            if current == actual or (current is None and actual == 0):
+                continue
+            drift.append(
+                {"name": name, "scope": scope, "stored": current, "actual": actual}
+            )
+            if not dry_run:
+                _store(name, scope, actual, using)
+    return drift
+
+
+# ================================
+# Signal handlers
+# ================================
+
+
+def _previous_values(instance, fields, using):
+    if instance._state.adding or instance.pk is None:
+        return None
+
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    if all(field in loaded for field in fields):
+        return {field: loaded[field] for field in fields}
+    return (
+        type(instance)
+        ._base_manager.using(using)
+        .filter(pk=instance.pk)
+        .values(*fields)
+        .first()
+    )
+
+
+def _current_values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _on_pre_save(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if raw:
+        return
+    before = {}
+    for spec in _specs_by_model.get(sender, ()):
+        if update_fields is not None and not set(spec.fields) & set(update_fields):
+            continue
+        before[spec.name] = _previous_values(instance, spec.fields, using or "default")
+    instance._counter_previous_values = before
+
+
+def _on_post_save(sender, instance, created, raw=False, using=None, **kwargs):
+    before = getattr(instance, "_counter_previous_values", None)
+    if raw or before is None:
+        return
+    del instance._counter_previous_values
+
+    using = using or "default"
+    for spec in _specs_by_model.get(sender, ()):
+        if spec.name not in before:
+            continue
+        old_values = before[spec.name]
+        new_values = _current_values(instance, spec.fields)
+        if old_values == new_values:
+            continue
+
+        old_scope, was_counted = spec.membership(old_values)
+        new_scope, is_counted = spec.membership(new_values)
+        if was_counted and (not is_counted or old_scope != new_scope):
+            increment(spec.name, old_scope, -1, using=using)
+        if is_counted and (not was_counted or old_scope != new_scope):
+            increment(spec.name, new_scope, 1, using=using)
+
+
+def _on_post_delete(sender, instance, using=None, **kwargs):
+    using = using or "default"
+    for spec in _specs_by_model.get(sender, ()):
+        scope, was_counted = spec.membership(_current_values(instance, spec.fields))
+        if was_counted:
+            increment(spec.name, scope, -1, using=using)
@@ -0,0 +1,169 @@
+"""
+Sparse fieldsets for ZentraQMS list and detail endpoints.
+
+``?fields=id,razon_social`` limits the response to the named fields (``id``
+is always kept) and ``?expand=locations`` adds the related data a
+serializer offers in ``Meta.expandable_fields``. The query plan is built
+from the pruned serializer, so relations that are not rendered are not
+joined or prefetched and the columns no remaining field reads are
+deferred.
+
+Usage:
+    class OrganizationListSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Organization
+            fields = ["id", "razon_social", "nit"]
+            expandable_fields = {
+                "locations": (LocationListSerializer, {"many": True}),
+            }
+
+    class OrganizationViewSet(
+        SparseFieldsetMixin, QueryPlanningMixin, viewsets.ModelViewSet
+    ):
+        ...
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .query_planning import QueryPlan, plan_serializer
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+# Fields kept in every sparse response
+ALWAYS_INCLUDED = ("id",)
+
+
+def parse_names(value: Optional[str]) -> Tuple[str, ...]:
+    """Split a comma separated parameter into unique, sorted names."""
+    if not value:
+        return ()
+    return tuple(sorted({name.strip() for name in value.split(",") if name.strip()}))
+
+
+def get_expandable_fields(serializer_class) -> Dict:
+    """Expandable fields a serializer class declares in its Meta."""
+    return getattr(getattr(serializer_class, "Meta", None), "expandable_fields", {})
+
+
+def apply_fieldset(
+    serializer, fields: Optional[Tuple[str, ...]], expand: Tuple[str, ...]
+):
+    """
+    Prune and expand the fields of a serializer instance in place.
+
+    Args:
+        serializer: Serializer (or list serializer) instance
+        fields (tuple): Names of the fields to keep, or None for all
+        expand (tuple): Names of expandable fields to add
+
+    Returns:
+        The same serializer
+    """
+    target = (
+        serializer.child
+        if isinstance(serializer, serializers.ListSerializer)
+        else serializer
+    )
+    expandable = get_expandable_fields(type(target))
+    for name in expand:
+        field_class, kwargs = expandable[name]
+        target.fields[name] = field_class(read_only=True, **kwargs)
+
+    if fields is not None:
+        keep = set(fields) | set(expand) | set(ALWAYS_INCLUDED)
+        for name in list(target.fields):
+            if name not in keep:
+                target.fields.pop(name)
+    return serializer
+
+
+@lru_cache(maxsize=256)
+def get_fieldset_plan(
+    serializer_class, fields: Optional[Tuple[str, ...]], expand: Tuple[str, ...]
+) -> QueryPlan:
+    """Query plan of a serializer class rendering a fieldset, computed once."""
+    return plan_serializer(apply_fieldset(serializer_class(), fields, expand))
+
+
+@lru_cache(maxsize=128)
+def _readable_fields(serializer_class) -> frozenset:
+    return frozenset(
+        name
+        for name, field in serializer_class().fields.items()
+        if not field.write_only
+    )
+
+
+def validate_fieldset(serializer_class, fields, expand) -> None:
+    """
+    Check the requested names against the serializer.
+
+    Raises:
+        ValidationError: With the unknown names of each parameter
+    """
+    errors = {}
+    unknown = sorted(
+        set(fields or ()) - _readable_fields(serializer_class) - set(expand)
+    )
+    if unknown:
+        errors[FIELDS_PARAM] = [
+            _("Campos desconocidos: {}").format(", ".join(unknown))
+        ]
+    unknown = sorted(set(expand) - set(get_expandable_fields(serializer_class)))
+    if unknown:
+        errors[EXPAND_PARAM] = [
+            _("Relaciones no expandibles: {}").format(", ".join(unknown))
+        ]
+    if errors:
+        raise ValidationError(errors)
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin reading ``fields`` and ``expand`` on the read actions.
+
+    Place it before ``QueryPlanningMixin`` so the plan of the pruned
+    serializer is used for the queryset.
+    """
+
+    sparse_actions = ("list", "retrieve")
+
+    def get_fieldset(self):
+        """
+        Fieldset requested for the current action.
+
+        Returns:
+            tuple: (fields or None, expand), or None if the full
+            representation is requested
+        """
+        if getattr(self, "action", None) not in self.sparse_actions:
+            return None
+        if not hasattr(self, "_fieldset"):
+            params = self.request.query_params
+            fields = parse_names(params.get(FIELDS_PARAM)) or None
+            expand = parse_names(params.get(EXPAND_PARAM))
+            if fields is None and not expand:
+                self._fieldset = None
+            else:
+                validate_fieldset(self.get_serializer_class(), fields, expand)
+                self._fieldset = (fields, expand)
+        return self._fieldset
+
+    def get_query_plan(self) -> QueryPlan:
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return super().get_query_plan()
+        return get_fieldset_plan(self.get_serializer_class(), *fieldset)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            apply_fieldset(serializer, *fieldset)
+        return serializer
@@ -0,0 +1,277 @@
+"""
+Logging handlers for ZentraQMS.
+
+``BatchedJSONLinesHandler`` moves security and audit telemetry off the
+request thread: records are converted to dicts and pushed onto a bounded
+queue, and a background thread writes them as JSON lines in batches. When
+the queue is full the configured overflow policy decides whether the new
+record is dropped, the oldest one is dropped, or the caller waits briefly.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional
+
+# Attributes present on every LogRecord; anything else came from ``extra``
+RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None)).keys()
+) | {"message", "asctime"}
+
+OVERFLOW_DROP_NEW = "drop_new"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+
+_handlers = weakref.WeakSet()
+
+
+class BatchedJSONLinesHandler(logging.Handler):
+    """
+    Asynchronous handler that writes records as JSON lines in batches.
+
+    Args:
+        filename (str): File the JSON lines are appended to
+        max_queue_size (int): Bound of the in-memory buffer
+        batch_size (int): Maximum records written per batch
+        flush_interval (float): Seconds between flushes of a partial batch
+        overflow (str): 'drop_new', 'drop_oldest' or 'block'
+        block_timeout (float): Maximum wait in seconds with the 'block' policy
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        overflow: str = OVERFLOW_DROP_NEW,
+        block_timeout: float = 0.05,
+        level=logging.NOTSET,
+    ):
+        super().__init__(level)
+        if overflow not in (OVERFLOW_DROP_NEW, OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"Invalid overflow policy: {overflow}")
+
+        self.filename = os.fspath(filename)
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.dropped = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stream = None
+        _handlers.add(self)
+
+    # ================================
+    # Producer side (request threads)
+    # ================================
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Serialize a record to a dict and enqueue it without blocking on I/O."""
+        try:
+            payload = self.to_dict(record)
+            self._enqueue(payload)
+        except Exception:
+            self.handleError(record)
+
+    def to_dict(self, record: logging.LogRecord) -> dict:
+        """
+        Build the JSON payload of a record.
+
+        The fields of an ``event`` dict passed through ``extra`` are merged
+        into the payload, as are any other extra attributes.
+
+        Args:
+            record (LogRecord): Record to convert
+
+        Returns:
+            dict: JSON-serializable payload
+        """
+        payload = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, tz=dt_timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in record.__dict__.items():
+            if key in RESERVED_ATTRS or key.startswith("_"):
+                continue
+            if key == "event" and isinstance(value, dict):
+                payload.update(value)
+            else:
+                payload[key] = value
+
+        if record.exc_info:
+            payload["exception"] = logging.Formatter().formatException(record.exc_info)
+        return payload
+
+    def _enqueue(self, payload: dict) -> None:
+        event_queue = self._ensure_worker()
+
+        try:
+            event_queue.put_nowait(payload)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                event_queue.put(payload, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        elif self.overflow == OVERFLOW_DROP_OLDEST:
+            try:
+                event_queue.get_nowait()
+                event_queue.task_done()
+                self._count_dropped()
+                event_queue.put_nowait(payload)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+
+        self._count_dropped()
+
+    def _count_dropped(self) -> None:
+        # The writer thread swaps the counter; the handler lock is reentrant,
+        # so this is safe both inside handle() and from direct emit() calls
+        with self.lock:
+            self.dropped += 1
+
+    def _ensure_worker(self) -> queue.Queue:
+        """Start the writer thread lazily (again after a fork)."""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return self._queue
+
+        with self._start_lock:
+            if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+                self._stream = None
+                self._pid = pid
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._queue,),
+                    name="BatchedJSONLinesHandler",
+                    daemon=True,
+                )
+                self._thread.start()
+        return self._queue
+
+    # ================================
+    # Consumer side (writer thread)
+    # ================================
+
+    def _run(self, event_queue: queue.Queue) -> None:
+        stop = False
+        while not stop:
+            try:
+                first = event_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(event_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                # Sentinel from close(): write what came before it and stop
+                stop = True
+                batch = [item for item in batch if item is not None]
+
+            try:
+                self._write_batch(batch)
+            except Exception:
+                # Never let a disk error kill the writer thread
+                pass
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    event_queue.task_done()
+
+    def _write_batch(self, batch) -> None:
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            batch = batch + [
+                {
+                    "timestamp": datetime.now(tz=dt_timezone.utc).isoformat(),
+                    "level": "WARNING",
+                    "logger": __name__,
+                    "message": "Log records dropped: buffer full",
+                    "event_type": "log_records_dropped",
+                    "count": dropped,
+                }
+            ]
+        if not batch:
+            return
+
+        lines = "".join(
+            json.dumps(payload, default=str, ensure_ascii=False) + "\n"
+            for payload in batch
+        )
+        if self._stream is None:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            self._stream = open(self.filename, "a", encoding="utf-8")
+        self._stream.write(lines)
+        self._stream.flush()
+
+    # ================================
+    # Lifecycle
+    # ================================
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Wait until every queued record has been written.
+
+        Args:
+            timeout (float): Maximum seconds to wait
+        """
+        event_queue = self._queue
+        if event_queue is None or self._pid != os.getpid():
+            return
+
+        deadline = time.monotonic() + timeout
+        while event_queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def close(self) -> None:
+        """Write pending records, stop the writer thread and close the file."""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            try:
+                self._queue.put(None, timeout=1.0)
+            except queue.Full:
+                pass
+            thread.join(timeout=5.0)
+
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._thread = None
+        super().close()
+
+
+def _close_batched_handlers() -> None:
+    for handler in list(_handlers):
+        handler.close()
+
+
+# Registered after logging's own hook, so it runs first and drains the queues
+atexit.register(_close_batched_handlers)
@@ -0,0 +1,57 @@
+"""
+Management command to repair materialized counters in ZentraQMS.
+
+Recounts every registered counter from its table and fixes the stored
+values that drifted (changes made without model signals, expired role
+assignments). Safe to run periodically.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from apps.common import counters
+
+
+class Command(BaseCommand):
+    help = "Recount materialized counters and repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--counter",
+            action="append",
+            dest="names",
+            help="Counter to reconcile (repeatable; defaults to all)",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the drift without repairing it",
+        )
+
+    def handle(self, *args, **options):
+        names = options["names"]
+        dry_run = options["dry_run"]
+        using = options["database"]
+
+        for name in names or []:
+            try:
+                counters.get_spec(name)
+            except LookupError as e:
+                raise CommandError(str(e))
+
+        with transaction.atomic(using=using):
+            drift = counters.reconcile(names, dry_run=dry_run, using=using)
+
+        for item in drift:
+            scope = f" [{item['scope']}]" if item["scope"] else ""
+            self.stdout.write(
+                f"{item['name']}{scope}: {item['stored']} -> {item['actual']}"
+            )
+
+        verb = "Would repair" if dry_run else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} counters."))
@@ -7,7 +7,7 @@ and fields for other models in the system.
 
 import uuid
 from django.conf import settings
-from django.db import models
+from django.db import connections, models, router
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -252,7 +252,151 @@ class StatusModel(models.Model):
         self.save(update_fields=["is_active"])
 
 
-class FullBaseModel(BaseModel, SoftDeleteModel, StatusModel):
+class LoadedValuesModel(models.Model):
+    """
+    Abstract model that remembers the field values a record was loaded with.
+
+    The values are taken from the row Django already fetched, so change
+    tracking (e.g. audit logging) can diff against the stored state without
+    querying the record again before saving it.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Create an instance from a database row and keep its loaded values.
+
+        Args:
+            db (str): Database alias
+            field_names (list): Attribute names of the loaded fields
+            values (list): Values of the loaded fields
+
+        Returns:
+            Model: The loaded instance
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        """
+        Reload fields from the database and update the loaded values.
+        """
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, "_loaded_values", None) or {}
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is None or field.attname in fields or field.name in fields:
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+
+    def get_loaded_values(self):
+        """
+        Get the values the record had in the database when it was loaded.
+
+        Returns:
+            dict: Field attribute names to values, or None for new instances
+        """
+        return getattr(self, "_loaded_values", None)
+
+
+class StaleVersionError(Exception):
+    """
+    Raised when a conditional update finds the row at another version.
+    """
+
+
+class VersionedModel(models.Model):
+    """
+    Abstract model that uses ``updated_at`` as the row version.
+
+    Every save writes a new ``updated_at``, also saves limited with
+    ``update_fields``, so the version changes with any change to the row.
+    ``expect_version()`` makes the next save an optimistic-concurrency
+    update: the row is checked (and locked inside a transaction) before
+    anything is written, and the expected versions are also part of the
+    UPDATE statement's WHERE clause. ``StaleVersionError`` is raised if the
+    row is at another version; since it is raised before the write, the
+    surrounding transaction stays usable.
+    """
+
+    version_field = "updated_at"
+
+    class Meta:
+        abstract = True
+
+    def expect_version(self, versions):
+        """
+        Condition the next save on the row being at one of ``versions``.
+
+        Args:
+            versions (iterable): Accepted values of the version field
+        """
+        self._expected_versions = list(versions)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the record, always renewing its version.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields and self.version_field not in update_fields:
+            kwargs["update_fields"] = [*update_fields, self.version_field]
+        if not self._state.adding and hasattr(self, "_expected_versions"):
+            self._check_version(kwargs.get("using"))
+        super().save(*args, **kwargs)
+
+    def _check_version(self, using=None):
+        """
+        Raise ``StaleVersionError`` if the row is not at an expected version.
+
+        Runs before the save writes anything: an error raised by the UPDATE
+        itself would mark the surrounding atomic block for rollback.
+
+        Args:
+            using (str): Database alias, or None for the routed one
+        """
+        using = using or router.db_for_write(type(self), instance=self)
+        rows = type(self)._base_manager.using(using).filter(
+            pk=self.pk,
+            **{f"{self.version_field}__in": self._expected_versions},
+        )
+        if connections[using].in_atomic_block:
+            # Keep the row at this version until the UPDATE below
+            rows = rows.select_for_update()
+        if not rows.exists():
+            del self._expected_versions
+            raise StaleVersionError(
+                f"{self._meta.label} {self.pk} is not at the expected version"
+            )
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = self.__dict__.pop("_expected_versions", None)
+        if expected is None:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+
+        base_qs = base_qs.filter(**{f"{self.version_field}__in": expected})
+        if not super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        ):
+            # Changed since the check (no lock outside a transaction);
+            # without this, Django would fall back to an INSERT
+            raise StaleVersionError(
+                f"{self._meta.label} {pk_val} is not at the expected version"
+            )
+        return True
+
+
+class FullBaseModel(
+    LoadedValuesModel, VersionedModel, BaseModel, SoftDeleteModel, StatusModel
+):
     """
     Complete base model with all common functionality.
 
@@ -262,9 +406,44 @@ class FullBaseModel(BaseModel, SoftDeleteModel, StatusModel):
     - Created by and updated by user tracking
     - Soft delete functionality
     - Active/inactive status
+    - Loaded values for change tracking
+    - Row version for optimistic concurrency
 
     Use this for models that need all features.
     """
 
     class Meta:
         abstract = True
+
+
+class Counter(models.Model):
+    """
+    Materialized count maintained by ``apps.common.counters``.
+
+    One row per counter name and scope (the primary key of the record the
+    count belongs to, or NULL for global counters), incremented in the same
+    transaction as the change it counts.
+    """
+
+    name = models.CharField(_("name"), max_length=100)
+    scope = models.UUIDField(_("scope"), null=True, blank=True)
+    value = models.BigIntegerField(_("value"), default=0)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("counter")
+        verbose_name_plural = _("counters")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "scope"], name="common_counter_name_scope_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["name"],
+                condition=models.Q(scope__isnull=True),
+                name="common_counter_global_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        scope = f"[{self.scope}]" if self.scope else ""
+        return f"{self.name}{scope} = {self.value}"
@@ -0,0 +1,240 @@
+"""
+Pagination classes for ZentraQMS.
+
+``KeysetPagination`` pages through a queryset by the values of its ordering
+fields instead of an offset, so every page costs the same index range scan
+no matter how deep it is.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Matches no row; used when nothing can come after a cursor position
+_NOTHING = Q(pk__in=[])
+
+
+def _encode_value(value):
+    # Full precision: DjangoJSONEncoder truncates datetimes to milliseconds
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def _order_expression(name, descending, nulls_last):
+    expression = F(name).desc if descending else F(name).asc
+    return expression(nulls_last=True) if nulls_last else expression(nulls_first=True)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the ordering fields of the queryset.
+
+    The ordering comes from the queryset (the view's ``ordering`` or the
+    ``ordering`` query parameter of OrderingFilter, else the model's
+    Meta.ordering); the primary key is appended as a tie-breaker so the
+    key is unique. The cursor holds the ordering values of the first or
+    last row of the current page.
+
+    Query parameters:
+        cursor: Opaque position returned in ``next``/``previous``
+        page_size: Number of results (up to ``max_page_size``)
+        count: ``false`` to skip the total count query (``true`` to
+            request it when ``include_count`` is off)
+
+    NULL values sort last in both directions.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    include_count = True
+    invalid_cursor_message = _("Cursor inválido.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the page of results after (or before) the request cursor.
+
+        Args:
+            queryset: Filtered queryset
+            request: HTTP request object
+            view: View being paginated
+
+        Returns:
+            list: Objects of the page
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(queryset)
+        self.count = self.get_count(queryset, request)
+
+        reverse, position = self.decode_cursor(request)
+        order = [(name, descending != reverse) for name, descending in self.fields]
+
+        queryset = queryset.order_by(
+            *[
+                _order_expression(name, descending, nulls_last=not reverse)
+                for name, descending in order
+            ]
+        )
+        if position is not None:
+            queryset = queryset.filter(self._after(order, position, not reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        return results
+
+    def get_paginated_response(self, data):
+        fields = [("next", self.get_next_link()), ("previous", self.get_previous_link())]
+        if self.count is not None:
+            fields.insert(0, ("count", self.count))
+        fields.append(("results", data))
+        return Response(OrderedDict(fields))
+
+    # ---- Options ----
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_count(self, queryset, request):
+        """Total number of results, or None if not requested."""
+        value = request.query_params.get(self.count_query_param, "").lower()
+        if value in ("0", "false", "no"):
+            return None
+        if value in ("1", "true", "yes") or self.include_count:
+            return queryset.count()
+        return None
+
+    def get_ordering(self, queryset):
+        """
+        Ordering fields of the queryset as (attname, descending) pairs.
+
+        The primary key is appended unless the ordering already ends
+        with it.
+        """
+        opts = queryset.model._meta
+        ordering = list(queryset.query.order_by) or list(opts.ordering)
+
+        fields = []
+        for item in ordering:
+            if not isinstance(item, str):
+                continue
+            descending = item.startswith("-")
+            name = item.lstrip("-")
+            try:
+                field = opts.pk if name == "pk" else opts.get_field(name)
+            except FieldDoesNotExist:
+                # Only direct fields can be part of the key
+                continue
+            fields.append((field.attname, descending))
+
+        if not fields or fields[-1][0] != opts.pk.attname:
+            fields = [field for field in fields if field[0] != opts.pk.attname]
+            fields.append((opts.pk.attname, False))
+        self.model_fields = {
+            field.attname: field
+            for field in opts.concrete_fields
+            if field.attname in dict(fields)
+        }
+        return fields
+
+    # ---- Cursor ----
+
+    def decode_cursor(self, request):
+        """
+        Read the request cursor.
+
+        Returns:
+            tuple: (reverse: bool, position: list or None)
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            values = data["v"]
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                None if value is None else self.model_fields[name].to_python(value)
+                for (name, _descending), value in zip(self.fields, values)
+            ]
+            return bool(data.get("r")), position
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        values = [_encode_value(getattr(obj, name)) for name, _descending in self.fields]
+        data = json.dumps({"v": values, "r": int(reverse)})
+        encoded = base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.rstrip("=")
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    # ---- Filtering ----
+
+    @staticmethod
+    def _after(order, position, nulls_last):
+        """
+        Condition for rows strictly after a position in an ordering.
+
+        Expands the lexicographic comparison of the key tuple:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = _NOTHING
+        equal = Q()
+        for (name, descending), value in zip(order, position):
+            if value is None:
+                after = _NOTHING if nulls_last else Q(**{f"{name}__isnull": False})
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if descending else "gt"
+                after = Q(**{f"{name}__{lookup}": value})
+                if nulls_last:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
@@ -0,0 +1,474 @@
+"""
+Serializer-driven query planning for ZentraQMS.
+
+``plan_queryset`` walks the field graph of a serializer and applies the
+``select_related``, ``prefetch_related`` and annotations it needs, so
+rendering a page costs a fixed number of queries instead of one or more
+per row:
+
+- Nested serializers and dotted sources over a foreign key or one-to-one
+  relation are joined with ``select_related``.
+- Nested serializers and related fields over a to-many relation are
+  prefetched, with a queryset planned for the nested serializer.
+- Serializer method fields declare what they read with ``@requires``.
+- Columns no field reads are deferred on read-only actions. Properties
+  rendered as fields declare their columns in ``Meta.source_columns``; a
+  field whose columns are unknown disables the deferral.
+
+``QueryPlanningMixin`` applies the plan of the view's serializer to
+``get_queryset()``.
+"""
+
+import copy
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+REQUIREMENTS_ATTR = "query_requirements"
+
+
+def requires(
+    select: Iterable[str] = (),
+    prefetch: Iterable[Any] = (),
+    annotate: Optional[Dict[str, Any]] = None,
+    columns: Iterable[str] = (),
+):
+    """
+    Declare the data a serializer method field reads.
+
+    Usage:
+        @requires(select=["created_by"])
+        def get_user_name(self, obj):
+            return obj.created_by.email
+
+    Args:
+        select (iterable): Lookups to join with ``select_related``
+        prefetch (iterable): Lookups or ``Prefetch`` objects to prefetch
+        annotate (dict): Annotation name to expression
+        columns (iterable): Columns of the row the method reads, and
+            ``relation__column`` lookups of the joined rows it reads
+
+    Returns:
+        callable: Decorator storing the requirements on the method
+    """
+
+    def decorator(method):
+        setattr(
+            method,
+            REQUIREMENTS_ATTR,
+            {
+                "select": tuple(select),
+                "prefetch": tuple(prefetch),
+                "annotate": dict(annotate or {}),
+                "columns": tuple(columns),
+            },
+        )
+        return method
+
+    return decorator
+
+
+def count_of(queryset, field: str):
+    """
+    Annotation counting the rows of ``queryset`` related to each row.
+
+    A correlated subquery keeps several counts on the same queryset from
+    multiplying each other, which ``Count`` over joins would do.
+
+    Args:
+        queryset: Rows to count (already filtered)
+        field (str): Field of ``queryset`` pointing to the outer row
+
+    Returns:
+        Expression: Integer count, 0 when there is no row
+    """
+    counts = (
+        queryset.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(count=Count("pk"))
+        .values("count")[:1]
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class _PlannedPrefetch:
+    """Prefetch of a to-many relation whose queryset follows a sub-plan."""
+
+    def __init__(self, lookup: str, model, plan: "QueryPlan"):
+        self.lookup = lookup
+        self.model = model
+        self.plan = plan
+
+    def add_prefix(self, prefix: str) -> "_PlannedPrefetch":
+        return _PlannedPrefetch(f"{prefix}__{self.lookup}", self.model, self.plan)
+
+    def build(self):
+        if self.plan.is_empty() and not self.plan.deferred(self.model):
+            return self.lookup
+        # Prefetched rows are only rendered, so their unused columns are deferred
+        return Prefetch(
+            self.lookup,
+            queryset=self.plan.apply(self.model._default_manager.all(), defer=True),
+        )
+
+
+def _prefixed(prefetch, prefix: str):
+    if isinstance(prefetch, str):
+        return f"{prefix}__{prefetch}"
+    if isinstance(prefetch, _PlannedPrefetch):
+        return prefetch.add_prefix(prefix)
+    prefetch = copy.copy(prefetch)
+    prefetch.add_prefix(prefix)
+    return prefetch
+
+
+def _prefetch_key(prefetch) -> str:
+    if isinstance(prefetch, str):
+        return prefetch
+    if isinstance(prefetch, _PlannedPrefetch):
+        return prefetch.lookup
+    return prefetch.prefetch_to
+
+
+class QueryPlan:
+    """
+    Relations and annotations a serializer needs from its queryset.
+
+    Attributes:
+        select (set): Lookups for ``select_related``
+        prefetch (dict): Prefetches keyed by the attribute they fill
+        annotations (dict): Annotation name to expression
+        columns (set): Columns of the row the fields read, or None if some
+            field reads columns that are not known
+    """
+
+    def __init__(self):
+        self.select = set()
+        self.prefetch: Dict[str, Any] = {}
+        self.annotations: Dict[str, Any] = {}
+        self.columns: Optional[set] = set()
+
+    def is_empty(self) -> bool:
+        return not (self.select or self.prefetch or self.annotations)
+
+    def add_prefetch(self, prefetch) -> None:
+        self.prefetch.setdefault(_prefetch_key(prefetch), prefetch)
+
+    def add_columns(self, columns: Optional[Iterable[str]]) -> None:
+        """Add columns read by a field (None = unknown columns)."""
+        if self.columns is None:
+            return
+        if columns is None:
+            self.columns = None
+        else:
+            self.columns.update(columns)
+
+    def deferred(self, model, keep: Iterable[str] = ()) -> List[str]:
+        """
+        Columns of ``model`` no field reads.
+
+        The primary key and the foreign keys of joined relations are always
+        loaded.
+
+        Args:
+            model: Model of the planned queryset
+            keep (iterable): Other columns to load (e.g. ordering fields)
+        """
+        if self.columns is None:
+            return []
+        needed = set(self.columns) | set(keep)
+        for lookup in self.select:
+            needed.add(lookup.split("__", 1)[0])
+        return [
+            field.attname
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+            and field.attname not in needed
+            and field.name not in needed
+        ]
+
+    def merge(self, other: "QueryPlan", prefix: str = "") -> None:
+        """Add the requirements of a plan for a related model at ``prefix``."""
+        if not prefix:
+            self.select |= other.select
+            for prefetch in other.prefetch.values():
+                self.add_prefetch(prefetch)
+            self.annotations.update(other.annotations)
+            self.add_columns(other.columns)
+            return
+
+        self.select.add(prefix)
+        self.select.update(f"{prefix}__{lookup}" for lookup in other.select)
+        for prefetch in other.prefetch.values():
+            self.add_prefetch(_prefixed(prefetch, prefix))
+
+    def apply(self, queryset, defer: bool = False, keep: Iterable[str] = ()):
+        """
+        Return ``queryset`` with the plan applied.
+
+        Args:
+            queryset: Queryset to be serialized
+            defer (bool): Defer the columns no field reads; only for rows
+                that are rendered and not saved back
+            keep (iterable): Columns to load even if no field reads them
+        """
+        if defer:
+            deferred = self.deferred(queryset.model, keep)
+            if deferred:
+                queryset = queryset.defer(*deferred)
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(
+                *[
+                    prefetch.build() if isinstance(prefetch, _PlannedPrefetch) else prefetch
+                    for prefetch in self.prefetch.values()
+                ]
+            )
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset
+
+
+def _get_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+DISPLAY_METHOD = re.compile(r"^get_(\w+)_display$")
+
+
+def _attr_columns(model, attr, source_columns=None):
+    """
+    Columns of ``model`` read through the attribute ``attr``.
+
+    Returns:
+        list: Column attnames (empty for reverse and many-to-many
+        relations), or None if the attribute is not a field and its columns
+        are not declared
+    """
+    if source_columns and attr in source_columns:
+        return list(source_columns[attr])
+    try:
+        field = model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        match = DISPLAY_METHOD.match(attr)
+        if match:
+            return _attr_columns(model, match.group(1))
+        return None
+    return [field.attname] if field.concrete else []
+
+
+def _plan_source(plan, model, source_attrs, target, exclude=None, source_columns=None):
+    """
+    Plan the relations traversed by a field's source.
+
+    Args:
+        plan (QueryPlan): Plan to add to
+        model: Model the source starts from
+        source_attrs (list): Attribute names of the source
+        target: Nested serializer rendering the end of the source, or the
+            field itself
+        exclude (str): Relation already cached on the rows (the parent of
+            a prefetched reverse relation)
+        source_columns (dict): Columns read by properties of ``model``
+    """
+    nested = target if isinstance(target, serializers.BaseSerializer) else None
+    path = []
+    plan.add_columns(_attr_columns(model, source_attrs[0], source_columns))
+    if exclude:
+        plan.add_columns(_attr_columns(model, exclude))
+
+    for index, attr in enumerate(source_attrs):
+        relation = _get_relation(model, attr)
+        if relation is None:
+            # A column or property of the current row
+            break
+        last = index == len(source_attrs) - 1
+        lookup = "__".join(path + [attr])
+
+        if relation.many_to_many or relation.one_to_many:
+            # The parent of a reverse foreign key is cached by the prefetch
+            remote = relation.remote_field.name if relation.one_to_many else None
+            if not last:
+                sub_plan = QueryPlan()
+                _plan_source(
+                    sub_plan,
+                    relation.related_model,
+                    source_attrs[index + 1:],
+                    target,
+                    remote,
+                )
+            elif nested is not None:
+                sub_plan = plan_serializer(nested, exclude=remote)
+            else:
+                sub_plan = QueryPlan()
+                if remote:
+                    sub_plan.add_columns(_attr_columns(relation.related_model, remote))
+            plan.add_prefetch(_PlannedPrefetch(lookup, relation.related_model, sub_plan))
+            return
+
+        if (
+            last
+            and nested is None
+            and relation.concrete
+            and isinstance(target, PrimaryKeyRelatedField)
+        ):
+            # Rendered from the local foreign key column
+            break
+
+        path.append(attr)
+        model = relation.related_model
+
+    prefix = "__".join(path)
+    if not prefix or prefix == exclude:
+        return
+
+    sub_plan = QueryPlan()
+    if nested is not None and len(path) == len(source_attrs):
+        sub_plan = plan_serializer(nested)
+    if sub_plan.annotations:
+        # Annotations can not follow a join: fetch the related rows instead
+        plan.add_prefetch(_PlannedPrefetch(prefix, model, sub_plan))
+    else:
+        plan.merge(sub_plan, prefix=prefix)
+
+
+def plan_serializer(serializer, exclude: Optional[str] = None) -> QueryPlan:
+    """
+    Build the query plan of a serializer instance.
+
+    Args:
+        serializer: Serializer (or list serializer) instance
+        exclude (str): Relation to leave out (already cached on the rows)
+
+    Returns:
+        QueryPlan: Requirements of the readable fields
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    plan = QueryPlan()
+    meta = getattr(serializer, "Meta", None)
+    model = getattr(meta, "model", None)
+    if model is None:
+        return plan
+    source_columns = getattr(meta, "source_columns", {})
+    if exclude:
+        plan.add_columns(_attr_columns(model, exclude))
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, field.method_name, None)
+            requirements = getattr(method, REQUIREMENTS_ATTR, None)
+            if requirements:
+                plan.select.update(requirements["select"])
+                for prefetch in requirements["prefetch"]:
+                    plan.add_prefetch(prefetch)
+                plan.annotations.update(requirements["annotate"])
+                plan.add_columns(requirements["columns"])
+            else:
+                # What the method reads is unknown
+                plan.add_columns(None)
+            continue
+
+        if field.source == "*":
+            plan.add_columns(None)
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            target = field.child
+        elif isinstance(field, ManyRelatedField):
+            target = field.child_relation
+        else:
+            target = field
+        _plan_source(plan, model, field.source_attrs, target, exclude, source_columns)
+
+    if exclude:
+        plan.select.discard(exclude)
+    return plan
+
+
+_plans: Dict[type, QueryPlan] = {}
+
+
+def get_query_plan(serializer_class) -> QueryPlan:
+    """Query plan of a serializer class, computed once."""
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        plan = _plans[serializer_class] = plan_serializer(serializer_class())
+    return plan
+
+
+def plan_queryset(queryset, serializer_class):
+    """
+    Apply the query plan of a serializer class to a queryset.
+
+    Querysets of another model than the serializer's are returned as is.
+
+    Args:
+        queryset: Queryset to be serialized
+        serializer_class: Serializer class rendering its rows
+
+    Returns:
+        QuerySet: Queryset with the plan applied
+    """
+    model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+    if model is None or queryset.model is not model:
+        return queryset
+    return get_query_plan(serializer_class).apply(queryset)
+
+
+class QueryPlanningMixin:
+    """
+    ViewSet mixin applying the query plan of the serializer class to
+    ``get_queryset()``.
+
+    Only actions in ``planned_actions`` render the serializer; other
+    actions (e.g. custom detail actions that only need the object) get the
+    plain queryset. Actions in ``deferred_actions`` only render the rows,
+    so the columns no field reads are deferred (the ordering fields of the
+    view are always loaded, for keyset cursors).
+    """
+
+    planned_actions = ("list", "retrieve", "update", "partial_update")
+    deferred_actions = ("list", "retrieve")
+
+    def get_query_plan(self) -> QueryPlan:
+        """Query plan of the rows rendered by the current action."""
+        return get_query_plan(self.get_serializer_class())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        action = getattr(self, "action", None)
+        if action not in self.planned_actions:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+        if model is None or queryset.model is not model:
+            return queryset
+
+        ordering = getattr(self, "ordering", None) or ()
+        ordering_fields = getattr(self, "ordering_fields", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        if isinstance(ordering_fields, str):
+            # "__all__": any column may be used
+            ordering_fields = ()
+        keep = [name.lstrip("-") for name in [*ordering, *ordering_fields]]
+        return self.get_query_plan().apply(
+            queryset, defer=action in self.deferred_actions, keep=keep
+        )
@@ -0,0 +1,11 @@
+"""
+Signals shared by the ZentraQMS apps.
+"""
+
+from django.dispatch import Signal
+
+# Sent after records are restored without model signals (e.g. by a bulk
+# rollback through ``bulk_update``), with sender=model class and
+# instances=list of the restored instances, for code that reacts to saves
+# (e.g. cache invalidation)
+records_rolled_back = Signal()
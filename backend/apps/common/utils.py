@@ -164,6 +164,59 @@ def get_client_ip(request) -> Optional[str]:
     return request.META.get("REMOTE_ADDR")
 
 
+def get_cache_backend(cache):
+    """
+    Resolve the backend behind a cache.
+
+    ``django.core.cache.cache`` is a proxy to the default alias, so type
+    checks against it never match a backend class.
+
+    Args:
+        cache: Cache backend, or the ``django.core.cache.cache`` proxy
+
+    Returns:
+        BaseCache: The concrete backend
+    """
+    from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+    from django.utils.connection import ConnectionProxy
+
+    if isinstance(cache, ConnectionProxy):
+        return caches[DEFAULT_CACHE_ALIAS]
+    return cache
+
+
+def cache_persists(cache) -> bool:
+    """
+    Whether a cache backend keeps the values written to it.
+
+    Args:
+        cache: Cache backend (e.g. ``django.core.cache.cache``)
+
+    Returns:
+        bool: False for DummyCache, which stores nothing
+    """
+    from django.core.cache.backends.dummy import DummyCache
+
+    return not isinstance(get_cache_backend(cache), DummyCache)
+
+
+def cache_is_shared(cache) -> bool:
+    """
+    Whether a cache backend keeps values visible to every process.
+
+    Args:
+        cache: Cache backend (e.g. ``django.core.cache.cache``)
+
+    Returns:
+        bool: False for DummyCache and for the per-process LocMemCache
+    """
+    from django.core.cache.backends.locmem import LocMemCache
+
+    return cache_persists(cache) and not isinstance(
+        get_cache_backend(cache), LocMemCache
+    )
+
+
 def send_notification_email(
     subject: str,
     message: str,
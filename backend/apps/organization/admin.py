@@ -5,7 +5,13 @@ Django Admin configuration for Organization module.
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from .models import Organization, Location, SectorTemplate, AuditLog
+from .models import (
+    Organization,
+    Location,
+    OrganizationMembership,
+    SectorTemplate,
+    AuditLog,
+)
 
 
 @admin.register(Organization)
@@ -257,6 +263,34 @@ class LocationAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(OrganizationMembership)
+class OrganizationMembershipAdmin(admin.ModelAdmin):
+    """
+    Admin interface for OrganizationMembership model.
+    """
+
+    list_display = ["user", "organization", "is_default", "created_at"]
+
+    list_filter = ["is_default", "created_at"]
+
+    search_fields = [
+        "user__email",
+        "organization__razon_social",
+        "organization__nit",
+    ]
+
+    raw_id_fields = ["user", "organization"]
+
+    readonly_fields = ["id", "created_at", "updated_at", "created_by", "updated_by"]
+
+    def save_model(self, request, obj, form, change):
+        """Override save to set audit fields."""
+        if not change:  # Creating new object
+            obj.created_by = request.user
+        obj.updated_by = request.user
+        super().save_model(request, obj, form, change)
+
+
 @admin.register(SectorTemplate)
 class SectorTemplateAdmin(admin.ModelAdmin):
     """
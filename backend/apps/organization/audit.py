@@ -0,0 +1,1147 @@
+"""
+Buffered, delta-encoded audit logging for registered models.
+
+Models opt into auditing with ``register()``, which compiles their audit
+plan (audited fields, encoders and decoders) once at startup and connects
+the signal handlers. The state before a save comes from the values the
+instance was loaded with (see ``LoadedValuesModel``) instead of a second
+query. Signal handlers only copy raw field values; encoding and diffing run
+once per change when the transaction commits, and the AuditLog rows of
+the transaction are written with one ``bulk_create`` per savepoint they
+were made in, a single one without savepoints (pending rows are written
+earlier when the transaction reads audit entries through
+``AuditLog.objects`` or ``flush_pending``). Outside a transaction the
+row is written immediately.
+
+Update rows store only the changed fields. Every record's changes are
+numbered (``AuditLog.version``) under a lock on the record's
+``AuditRecordVersion`` row, and creates plus every
+AUDIT_LOG_CHECKPOINT_INTERVAL-th update are checkpoints whose
+``new_values`` hold the full state, so the state at any point is rebuilt
+from the nearest checkpoint forward (see ``get_state_as_of``).
+"""
+
+import functools
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from .models import AuditLog, AuditRecordVersion
+
+logger = logging.getLogger(__name__)
+
+
+# ================================
+# Field encoding
+# ================================
+
+
+def _encode_identity(value):
+    return value
+
+
+def _encode_temporal(value):
+    return value.isoformat() if value is not None else None
+
+
+def _encode_string(value):
+    return str(value) if value is not None else None
+
+
+def _encode_file(value):
+    try:
+        return str(value) if value else None
+    except (ValueError, AttributeError):
+        return None
+
+
+_encoders: Dict[Tuple[type, Optional[type]], Callable[[Any], Any]] = {}
+
+
+def get_field_encoder(field) -> Callable[[Any], Any]:
+    """
+    Get the JSON encoder for a model field, cached per field type.
+
+    Args:
+        field: Model field
+
+    Returns:
+        callable: Function converting a raw field value to a JSON value
+    """
+    target = field.target_field if field.is_relation else None
+    key = (type(field), type(target) if target is not None else None)
+
+    encoder = _encoders.get(key)
+    if encoder is None:
+        if isinstance(field, models.FileField):
+            encoder = _encode_file
+        elif target is not None:
+            # Foreign keys are stored by the value of the referenced field
+            encoder = get_field_encoder(target)
+        elif isinstance(field, (models.DateField, models.TimeField)):
+            encoder = _encode_temporal
+        elif isinstance(
+            field, (models.UUIDField, models.DecimalField, models.DurationField)
+        ):
+            encoder = _encode_string
+        else:
+            encoder = _encode_identity
+        _encoders[key] = encoder
+    return encoder
+
+
+def _values_differ(old, new) -> bool:
+    if old == new:
+        return False
+    if old is None or new is None:
+        return True
+    # Same value with a different Python type (e.g. date vs. ISO string)
+    return str(old) != str(new)
+
+
+class AuditPlan:
+    """
+    Fields audited for a model, with their encoders, computed once.
+
+    Attributes:
+        table_name (str): Database table of the model
+        fields (tuple): (name, attname, encoder) of every audited field
+        tenant_attname (str): Attribute holding the organization of a
+            record, or None for models shared by every tenant
+    """
+
+    def __init__(
+        self, model, exclude: Iterable[str] = (), tenant_field: Optional[str] = None
+    ):
+        self.model = model
+        self.table_name = model._meta.db_table
+        self.tenant_attname = (
+            model._meta.get_field(tenant_field).attname if tenant_field else None
+        )
+
+        exclude = set(exclude)
+        audited = [
+            field
+            for field in model._meta.concrete_fields
+            if field.editable
+            and field.name not in exclude
+            and field.attname not in exclude
+        ]
+        self.fields = tuple(
+            (field.name, field.attname, get_field_encoder(field)) for field in audited
+        )
+        self.decoders = {
+            field.name: (field.attname, field.to_python) for field in audited
+        }
+
+    def raw_values(self, instance) -> Dict[str, Any]:
+        """Copy the current raw values of the audited fields."""
+        data = instance.__dict__
+        return {
+            attname: data[attname] if attname in data else getattr(instance, attname)
+            for _, attname, _ in self.fields
+        }
+
+    def tenant_of(self, instance):
+        """Organization id of an instance, or None."""
+        if self.tenant_attname is None:
+            return None
+        return getattr(instance, self.tenant_attname)
+
+    def encode(self, raw_values: Dict[str, Any]) -> Dict[str, Any]:
+        """Encode raw values into a JSON dict keyed by field name."""
+        return {
+            name: encoder(raw_values.get(attname))
+            for name, attname, encoder in self.fields
+        }
+
+    def restore(self, instance, values: Dict[str, Any]) -> List[str]:
+        """
+        Set encoded values (as stored in an AuditLog) back on an instance.
+
+        Foreign keys are restored through their attname, so no related
+        object is fetched. Fields no longer audited are ignored.
+
+        Args:
+            instance: Model instance to update (not saved)
+            values (dict): Encoded values keyed by field name
+
+        Returns:
+            list: Names of the fields whose value changed
+        """
+        current = self.encode(self.raw_values(instance))
+        changed_fields = []
+        for name, value in values.items():
+            decoder = self.decoders.get(name)
+            if decoder is None or not _values_differ(current[name], value):
+                continue
+            attname, to_python = decoder
+            setattr(instance, attname, to_python(value))
+            changed_fields.append(name)
+        return changed_fields
+
+
+# ================================
+# Registry
+# ================================
+
+
+_plans: Dict[type, AuditPlan] = {}
+_models_by_table: Dict[str, type] = {}
+
+
+def register(
+    model, exclude: Iterable[str] = (), tenant_field: Optional[str] = None
+) -> AuditPlan:
+    """
+    Enable audit logging for a model.
+
+    Compiles the audit plan of the model and connects the signal handlers
+    that capture its creates, updates and deletes. Call it once, from the
+    ``ready()`` of the app (or a module it imports).
+
+    Args:
+        model: Model class to audit
+        exclude (iterable): Names of fields left out of the snapshots
+        tenant_field (str): Field holding the organization of a record,
+            copied to ``AuditLog.organization_id`` (see ``tenancy``)
+
+    Returns:
+        AuditPlan: The compiled plan
+    """
+    plan = _plans[model] = AuditPlan(model, exclude, tenant_field)
+    _models_by_table[plan.table_name] = model
+
+    uid = f"audit:{model._meta.label}"
+    pre_save.connect(_on_pre_save, sender=model, dispatch_uid=uid)
+    post_save.connect(_on_post_save, sender=model, dispatch_uid=uid)
+    pre_delete.connect(_on_pre_delete, sender=model, dispatch_uid=uid)
+    return plan
+
+
+def is_registered(model) -> bool:
+    """Whether a model has audit logging enabled."""
+    return model in _plans
+
+
+def get_audit_plan(model) -> AuditPlan:
+    """
+    Get the audit plan of a registered model.
+
+    Raises:
+        LookupError: If the model is not registered
+    """
+    try:
+        return _plans[model]
+    except KeyError:
+        raise LookupError(f"{model._meta.label} is not registered for auditing")
+
+
+def get_tenant_id(instance):
+    """
+    Organization an instance belongs to, as stored in its audit entries.
+
+    Returns:
+        UUID, or None if the model is not registered or has no tenant
+    """
+    plan = _plans.get(type(instance))
+    return plan.tenant_of(instance) if plan is not None else None
+
+
+def get_model_for_table(table_name: str):
+    """
+    Get the registered model stored in a table.
+
+    Args:
+        table_name (str): Table name as saved in AuditLog.table_name
+
+    Returns:
+        Model class, or None if no registered model uses the table
+    """
+    return _models_by_table.get(table_name)
+
+
+# ================================
+# Pending changes
+# ================================
+
+
+class PendingChange:
+    """
+    A change captured in a signal handler, turned into an AuditLog on flush.
+    """
+
+    def __init__(self, plan, instance, action, old_raw, new_raw):
+        self.plan = plan
+        self.record_id = str(instance.pk)
+        self.organization_id = plan.tenant_of(instance)
+        self.action = action
+        self.old_raw = old_raw
+        self.new_raw = new_raw
+        # Time of the change; a buffered row is inserted later
+        self.created_at = timezone.now()
+
+        # Position among the buffered changes (see AuditBuffer)
+        self.sequence = 0
+        self.batch: Optional[_Batch] = None
+
+        # Audit context attached by set_audit_context()
+        self.user = getattr(instance, "_audit_user", None)
+        self.reason = getattr(instance, "_audit_reason", None)
+        self.request_context = AuditLog.get_request_context(
+            getattr(instance, "_audit_request", None)
+        )
+
+    def build(self) -> Optional[AuditLog]:
+        """
+        Encode and diff the captured values.
+
+        Updates keep only the changed fields; the full state after the
+        change is kept in ``self.snapshot`` in case the row becomes a
+        checkpoint.
+
+        Returns:
+            AuditLog: Unsaved audit row, or None if nothing changed
+        """
+        plan = self.plan
+        self.snapshot = None
+
+        if self.action == AuditLog.ACTION_CREATE:
+            old_values = {}
+            new_values = self.snapshot = plan.encode(self.new_raw)
+            changed_fields = list(new_values)
+        elif self.action == AuditLog.ACTION_DELETE:
+            old_values = plan.encode(self.old_raw)
+            new_values = {}
+            changed_fields = list(old_values)
+        else:
+            old_state = plan.encode(self.old_raw)
+            self.snapshot = plan.encode(self.new_raw)
+            changed_fields = [
+                name
+                for name, value in self.snapshot.items()
+                if _values_differ(old_state.get(name), value)
+            ]
+            if not changed_fields:
+                return None
+            old_values = {name: old_state[name] for name in changed_fields}
+            new_values = {name: self.snapshot[name] for name in changed_fields}
+
+        return AuditLog(
+            table_name=plan.table_name,
+            record_id=self.record_id,
+            organization_id=self.organization_id,
+            action=self.action,
+            old_values=old_values,
+            new_values=new_values,
+            changed_fields=changed_fields,
+            reason=self.reason,
+            created_by=self.user,
+            created_at=self.created_at,
+            **self.request_context,
+        )
+
+
+class _Batch:
+    """
+    Changes that share a commit hook, made in the same savepoint.
+
+    Django drops the commit hooks registered in a savepoint (or
+    transaction) that is rolled back, so a batch is alive while its hook is
+    registered or once it has run. ``rows`` batches stand for rows already
+    written by ``AuditBuffer.write_pending``: if their hook is dropped,
+    those rows were rolled back.
+    """
+
+    def __init__(self, connection, hook_owner, rows: bool = False):
+        self.changes: List[PendingChange] = []
+        self.rows = rows
+        self.written = rows
+        self.committed = False
+        self.savepoint_ids = set(connection.savepoint_ids)
+        # Django replaces this list on any rollback and on commit
+        self.commit_hooks = connection.run_on_commit
+        self.hook = functools.partial(hook_owner, self)
+
+    def accepts(self, connection) -> bool:
+        """
+        Whether changes made now share the fate of this batch: nothing was
+        rolled back or committed since it was registered, and the same
+        savepoints are active.
+        """
+        return (
+            not self.written
+            and not self.committed
+            and connection.run_on_commit is self.commit_hooks
+            and set(connection.savepoint_ids) == self.savepoint_ids
+        )
+
+
+class AuditBuffer:
+    """
+    Pending changes of the outermost transaction of a connection.
+
+    The buffer is kept on the connection. Changes made one after another in
+    the same savepoint form a batch with one commit hook, so a transaction
+    without savepoints registers a single hook. A hook that runs writes
+    the changes of every live batch up to its own, in the order they were
+    made, with one ``bulk_create``; the batches before it whose hooks did
+    not run were rolled back and are discarded. A committed hook thus also
+    writes the changes made before it when earlier hooks were registered
+    elsewhere (e.g. outside a test's ``captureOnCommitCallbacks``).
+
+    Rows written early by ``write_pending`` get a batch of their own in the
+    savepoint active at that time; if it is rolled back, their changes are
+    written again (unless they were rolled back too).
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.using = connection.alias
+        self.batches: List[_Batch] = []
+        self.sequence = 0
+        connection._audit_buffer = self
+
+    def add(self, changes: Iterable[PendingChange]) -> None:
+        """Enqueue changes, in the order they were made."""
+        if self.batches and self.batches[-1].accepts(self.connection):
+            batch = self.batches[-1]
+        else:
+            batch = self._register(_Batch(self.connection, self._commit))
+
+        for change in changes:
+            self.sequence += 1
+            change.sequence = self.sequence
+            change.batch = batch
+            batch.changes.append(change)
+
+    def write_pending(self) -> None:
+        """Write the pending changes now, inside the current transaction."""
+        changes = self._settle()
+        if not changes:
+            return
+        write_changes(changes, using=self.using)
+        rows = self._register(_Batch(self.connection, self._commit, rows=True))
+        rows.changes = changes
+
+    def _commit(self, batch: _Batch) -> None:
+        """Commit hook of a batch."""
+        batch.committed = True
+        if getattr(self.connection, "_audit_buffer", None) is self:
+            # Changes made from now on belong to the next transaction
+            self.connection._audit_buffer = None
+        write_changes(self._settle(batch), using=self.using)
+
+    def _register(self, batch: _Batch) -> _Batch:
+        self.batches.append(batch)
+        transaction.on_commit(batch.hook, using=self.using)
+        return batch
+
+    def _settle(self, last: Optional[_Batch] = None) -> List[PendingChange]:
+        """
+        Resolve the batches up to ``last`` (all by default).
+
+        Returns:
+            list: Changes to write: those of live batches not written yet,
+            and those of early rows rolled back without their changes
+        """
+        registered = {hook for _ids, hook, _robust in self.connection.run_on_commit}
+
+        def is_live(batch):
+            return batch.committed or batch.hook in registered
+
+        if last is None:
+            end = len(self.batches)
+        elif last in self.batches:
+            end = self.batches.index(last) + 1
+        else:
+            end = 0
+
+        changes = []
+        kept = []
+        for batch in self.batches[:end]:
+            live = is_live(batch)
+            if batch.rows and not live:
+                changes.extend(
+                    change for change in batch.changes if is_live(change.batch)
+                )
+                continue
+            if live and not batch.written:
+                changes.extend(batch.changes)
+                batch.written = True
+            if live and not batch.committed:
+                # Can still be rolled back with its savepoint
+                kept.append(batch)
+        self.batches = kept + self.batches[end:]
+        return changes
+
+
+def _get_buffer(connection) -> Optional[AuditBuffer]:
+    """Buffer of the current transaction of a connection, if any."""
+    if not connection.in_atomic_block:
+        # Being committed (its hook flushes it) or left by a rollback
+        return None
+    return getattr(connection, "_audit_buffer", None)
+
+
+def _enqueue(changes: List[PendingChange], using: str) -> None:
+    """
+    Add changes to the buffer of the current transaction.
+
+    In autocommit mode they are written immediately.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        write_changes(changes, using=using)
+        return
+
+    buffer = _get_buffer(connection) or AuditBuffer(connection)
+    buffer.add(changes)
+
+
+def flush_pending(using: str = "default") -> None:
+    """
+    Write the changes buffered in the current transaction.
+
+    Called before reading audit entries, so reads made in the transaction
+    that changed a record (e.g. a rollback after an update) see its
+    entries. Their rows are written in the transaction and committed or
+    rolled back with it.
+
+    Args:
+        using (str): Database alias
+    """
+    buffer = _get_buffer(connections[using])
+    if buffer is not None:
+        buffer.write_pending()
+
+
+def get_checkpoint_interval() -> int:
+    """Number of changes between two full snapshots of a record."""
+    return max(int(getattr(settings, "AUDIT_LOG_CHECKPOINT_INTERVAL", 20)), 1)
+
+
+def _get_last_versions(rows: List[AuditLog], using: str) -> Dict[Tuple[str, str], int]:
+    """
+    Latest stored version of every record in a batch, with one query.
+
+    Used to seed the version counters of records that have none yet.
+    Records whose first change in the batch is a create start from zero.
+    """
+    first_actions = {}
+    for row in rows:
+        first_actions.setdefault((row.table_name, row.record_id), row.action)
+
+    lookup: Dict[str, List[str]] = {}
+    for (table_name, record_id), action in first_actions.items():
+        if action != AuditLog.ACTION_CREATE:
+            lookup.setdefault(table_name, []).append(record_id)
+    if not lookup:
+        return {}
+
+    condition = Q()
+    for table_name, record_ids in lookup.items():
+        condition |= Q(table_name=table_name, record_id__in=record_ids)
+
+    stored = (
+        AuditLog._base_manager.using(using)
+        .filter(condition)
+        .order_by()
+        .values_list("table_name", "record_id")
+        .annotate(last_version=Max("version"))
+    )
+    return {
+        (table_name, record_id): last_version or 0
+        for table_name, record_id, last_version in stored
+    }
+
+
+def _lock_versions(keys, using: str) -> Dict[Tuple[str, str], AuditRecordVersion]:
+    """Lock the version counters of some records, in key order."""
+    lookup: Dict[str, List[str]] = {}
+    for table_name, record_id in keys:
+        lookup.setdefault(table_name, []).append(record_id)
+
+    condition = Q()
+    for table_name, record_ids in lookup.items():
+        condition |= Q(table_name=table_name, record_id__in=record_ids)
+
+    counters = (
+        AuditRecordVersion.objects.using(using)
+        .select_for_update()
+        .filter(condition)
+        .order_by("table_name", "record_id")
+    )
+    return {(counter.table_name, counter.record_id): counter for counter in counters}
+
+
+def reserve_versions(
+    rows: List[AuditLog], using: str
+) -> Dict[Tuple[str, str], AuditRecordVersion]:
+    """
+    Lock the version counters of the records of a batch.
+
+    Missing counters are created from the latest stored version first. The
+    locks are held until the transaction ends, so a concurrent batch for
+    the same records waits and numbers its rows after these.
+
+    Args:
+        rows (list): Unsaved AuditLog rows
+        using (str): Database alias; must be inside a transaction
+
+    Returns:
+        dict: (table_name, record_id) to its locked counter
+    """
+    keys = {(row.table_name, row.record_id) for row in rows}
+    counters = _lock_versions(keys, using)
+
+    missing = keys - counters.keys()
+    if missing:
+        versions = _get_last_versions(
+            [row for row in rows if (row.table_name, row.record_id) in missing],
+            using,
+        )
+        # A concurrent batch may create the same counter; its row wins
+        AuditRecordVersion.objects.using(using).bulk_create(
+            [
+                AuditRecordVersion(
+                    table_name=table_name,
+                    record_id=record_id,
+                    last_version=versions.get((table_name, record_id), 0),
+                )
+                for table_name, record_id in sorted(missing)
+            ],
+            ignore_conflicts=True,
+        )
+        counters.update(_lock_versions(missing, using))
+    return counters
+
+
+def number_rows(rows: List[AuditLog], snapshots: List[Optional[dict]], using: str):
+    """
+    Assign per-record versions to unsaved AuditLog rows.
+
+    Rows are numbered after the version counter of their record, which
+    stays locked until the transaction ends (see ``reserve_versions``);
+    creates and every N-th update or rollback become checkpoints carrying
+    the full state from ``snapshots``.
+
+    Args:
+        rows (list): Unsaved AuditLog rows, in change order
+        snapshots (list): Full encoded state after each row (or None)
+        using (str): Database alias; must be inside a transaction
+    """
+    interval = get_checkpoint_interval()
+    counters = reserve_versions(rows, using)
+    for row, snapshot in zip(rows, snapshots):
+        counter = counters[(row.table_name, row.record_id)]
+        counter.last_version += 1
+        row.version = counter.last_version
+        if snapshot is not None and (
+            row.action == AuditLog.ACTION_CREATE
+            or (
+                row.action in (AuditLog.ACTION_UPDATE, AuditLog.ACTION_ROLLBACK)
+                and row.version % interval == 0
+            )
+        ):
+            row.is_checkpoint = True
+            row.new_values = snapshot
+
+    AuditRecordVersion.objects.using(using).bulk_update(
+        list(counters.values()), ["last_version"]
+    )
+
+
+def write_changes(changes: List[PendingChange], using: str = "default") -> None:
+    """
+    Build and insert the AuditLog rows of several changes at once.
+
+    Rows are numbered per record after its version counter, in the order
+    the changes were enqueued, and inserted in the same transaction that
+    holds the counters; creates and every N-th update carry the full state
+    as a checkpoint.
+
+    Errors propagate: a change that can't be recorded fails the write (or
+    the commit hook) instead of leaving a gap in the history.
+    """
+    if not changes:
+        return
+
+    changes = sorted(changes, key=lambda change: change.sequence)
+    built = [(change, change.build()) for change in changes]
+    built = [(change, row) for change, row in built if row]
+    if not built:
+        return
+
+    rows = [row for _, row in built]
+    with transaction.atomic(using=using):
+        number_rows(rows, [change.snapshot for change, _ in built], using)
+        AuditLog.objects.using(using).bulk_create(rows)
+
+
+# ================================
+# Capture API (used by signals)
+# ================================
+
+
+def capture_save(instance, created: bool, using: str = "default") -> None:
+    """
+    Record a create or update of an instance.
+
+    Args:
+        instance: Saved model instance
+        created (bool): True if the instance was inserted
+        using (str): Database alias of the save
+    """
+    plan = get_audit_plan(type(instance))
+    new_raw = plan.raw_values(instance)
+
+    if instance.__dict__.pop("_audit_skip", False):
+        # Recorded by the caller (see capture_rollback)
+        instance._loaded_values = dict(new_raw)
+        return
+
+    if created:
+        change = PendingChange(plan, instance, AuditLog.ACTION_CREATE, None, new_raw)
+    else:
+        old_raw = _get_previous_values(plan, instance, new_raw, using)
+        change = PendingChange(plan, instance, AuditLog.ACTION_UPDATE, old_raw, new_raw)
+
+    _enqueue([change], using)
+
+    # The saved values are the baseline for the next save of this instance
+    instance._loaded_values = dict(new_raw)
+
+
+def capture_delete(instance, using: str = "default") -> None:
+    """
+    Record the deletion of an instance.
+
+    Args:
+        instance: Model instance being deleted
+        using (str): Database alias of the delete
+    """
+    plan = get_audit_plan(type(instance))
+    change = PendingChange(
+        plan, instance, AuditLog.ACTION_DELETE, plan.raw_values(instance), None
+    )
+    _enqueue([change], using)
+
+
+def capture_rollback(instance, old_raw, using: str = "default") -> None:
+    """
+    Record the restore of an instance by a single-record rollback.
+
+    The save restoring the instance is flagged with ``_audit_skip`` so it
+    is not recorded as an update; the ROLLBACK row is numbered and written
+    right away, like the rows of ``rollback.bulk_rollback``.
+
+    Args:
+        instance: Restored and saved instance
+        old_raw (dict): Raw values of the audited fields before the restore
+        using (str): Database alias of the save
+    """
+    plan = get_audit_plan(type(instance))
+    new_raw = plan.raw_values(instance)
+    # Number it after the changes still buffered in this transaction
+    flush_pending(using)
+    write_changes(
+        [PendingChange(plan, instance, AuditLog.ACTION_ROLLBACK, old_raw, new_raw)],
+        using=using,
+    )
+    instance._loaded_values = dict(new_raw)
+
+
+def capture_bulk_create(instances, using: str = "default") -> None:
+    """
+    Record the creation of instances inserted with ``bulk_create``.
+
+    ``bulk_create`` sends no model signals; the CREATE entries of all the
+    instances are written together (on commit inside a transaction).
+
+    Args:
+        instances (list): Inserted instances of one registered model
+        using (str): Database alias of the insert
+    """
+    changes = []
+    for instance in instances:
+        plan = get_audit_plan(type(instance))
+        new_raw = plan.raw_values(instance)
+        changes.append(
+            PendingChange(plan, instance, AuditLog.ACTION_CREATE, None, new_raw)
+        )
+        instance._loaded_values = dict(new_raw)
+
+    _enqueue(changes, using)
+
+
+def _get_previous_values(plan, instance, new_raw, using):
+    """
+    Values of the audited fields before the save.
+
+    Uses the loaded values of the instance; only fields that were never
+    loaded (deferred, or an instance not read from the database) are
+    fetched, after the save, from the values captured in pre_save.
+    """
+    previous = getattr(instance, "_audit_previous_values", None)
+    if previous is not None:
+        del instance._audit_previous_values
+        return previous
+
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    return {
+        attname: loaded.get(attname, new_raw[attname]) for _, attname, _ in plan.fields
+    }
+
+
+def prefetch_previous_values(instance, using: str = "default") -> None:
+    """
+    Load the stored values of fields the instance was not loaded with.
+
+    Called from pre_save; costs a query only for instances that were not
+    read from the database or have deferred fields.
+
+    Args:
+        instance: Model instance about to be saved
+        using (str): Database alias of the save
+    """
+    if instance._state.adding or instance.pk is None:
+        return
+
+    plan = get_audit_plan(type(instance))
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    missing = [attname for _, attname, _ in plan.fields if attname not in loaded]
+    if not missing:
+        return
+
+    stored = (
+        type(instance)
+        ._base_manager.using(using)
+        .filter(pk=instance.pk)
+        .values(*missing)
+        .first()
+    )
+    if stored is None:
+        return
+
+    previous = dict(loaded)
+    previous.update(stored)
+    instance._audit_previous_values = previous
+
+
+# ================================
+# State reconstruction
+# ================================
+
+
+def _apply(state: Optional[Dict[str, Any]], entry) -> Optional[Dict[str, Any]]:
+    """Apply one audit entry to a rebuilt state (None = no record)."""
+    if entry.action == AuditLog.ACTION_DELETE:
+        return None
+    if entry.is_checkpoint or entry.action == AuditLog.ACTION_CREATE:
+        return dict(entry.new_values or {})
+    state = dict(state or {})
+    state.update(entry.new_values or {})
+    return state
+
+
+# Entries that set the whole state instead of changing some fields; the
+# audit_checkpoint_idx index has the same condition
+BASE_ENTRY_Q = Q(is_checkpoint=True) | Q(
+    action__in=[AuditLog.ACTION_CREATE, AuditLog.ACTION_DELETE]
+)
+
+_REPLAY_FIELDS = (
+    "record_id",
+    "action",
+    "is_checkpoint",
+    "new_values",
+    "created_at",
+    "version",
+)
+
+
+def _is_base(entry) -> bool:
+    return entry.is_checkpoint or entry.action in (
+        AuditLog.ACTION_CREATE,
+        AuditLog.ACTION_DELETE,
+    )
+
+
+def _archived_states(table_name, record_ids, include) -> Dict[str, Optional[dict]]:
+    """
+    States of records rebuilt from the archive only.
+
+    Used for records whose table history has no checkpoint; each archived
+    month is read at most once for all of them.
+    """
+    from .audit_archive import AuditArchive
+
+    histories = AuditArchive().get_records_history(table_name, record_ids)
+    states = {}
+    for record_id, history in histories.items():
+        replay = []
+        for entry in history:
+            if not include(entry):
+                continue
+            replay.append(entry)
+            if _is_base(entry):
+                break
+
+        state = None
+        for entry in reversed(replay):
+            state = _apply(state, entry)
+        states[record_id] = state
+    return states
+
+
+def _rebuild(table_name, record_id, boundary: Q, include, using):
+    """
+    Replay the history of a record up to a boundary.
+
+    Starts at the latest checkpoint inside the boundary (an indexed lookup
+    that reads at most one checkpoint interval of rows). If the table holds
+    no checkpoint for the record, older entries are read from the archive.
+
+    Args:
+        boundary (Q): Entries to consider
+        include (callable): Same condition as ``boundary``, for archived entries
+    """
+    flush_pending(using)
+    record_id = str(record_id)
+    history = AuditLog._base_manager.using(using).filter(
+        boundary, table_name=table_name, record_id=record_id
+    )
+    base = history.filter(BASE_ENTRY_Q).order_by("-created_at", "-version").first()
+
+    entries = history.order_by("created_at", "version").only(*_REPLAY_FIELDS)
+    if base is not None:
+        state = _apply(None, base)
+        entries = entries.filter(
+            Q(created_at__gt=base.created_at)
+            | Q(created_at=base.created_at, version__gt=base.version)
+        )
+    else:
+        state = _archived_states(table_name, [record_id], include).get(record_id)
+
+    for entry in entries:
+        state = _apply(state, entry)
+    return state
+
+
+def get_state_as_of(model, record_id, as_of, using: str = "default"):
+    """
+    Rebuild the audited state of a record at a point in time.
+
+    Args:
+        model: Registered model class
+        record_id: Primary key of the record
+        as_of (datetime): Point in time (inclusive)
+        using (str): Database alias
+
+    Returns:
+        dict: Encoded field values keyed by field name, or None if the
+        record did not exist (or was deleted) at that time
+    """
+    return _rebuild(
+        get_audit_plan(model).table_name,
+        record_id,
+        Q(created_at__lte=as_of),
+        lambda entry: entry.created_at <= as_of,
+        using,
+    )
+
+
+def get_states_as_of(
+    model, as_of, record_ids=None, using: str = "default"
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Rebuild the audited state of many records at a point in time.
+
+    A single query reads, for every record, the entries from its latest
+    checkpoint up to ``as_of`` (the checkpoint is found with a correlated,
+    indexed lookup), and all records are replayed in one pass. Records with
+    no checkpoint in the table are completed from the archive together.
+
+    Args:
+        model: Registered model class
+        as_of (datetime): Point in time (inclusive)
+        record_ids (iterable): Records to rebuild (default: every record
+            with history up to ``as_of``)
+        using (str): Database alias
+
+    Returns:
+        dict: Record id (str) to encoded state, or None if the record did
+        not exist (or was deleted) at that time
+    """
+    flush_pending(using)
+    table_name = get_audit_plan(model).table_name
+    history = AuditLog._base_manager.using(using).filter(
+        table_name=table_name, created_at__lte=as_of
+    )
+    if record_ids is not None:
+        history = history.filter(record_id__in=[str(pk) for pk in record_ids])
+
+    latest_base = (
+        AuditLog._base_manager.using(using)
+        .filter(
+            BASE_ENTRY_Q,
+            table_name=table_name,
+            record_id=OuterRef("record_id"),
+            created_at__lte=as_of,
+        )
+        .order_by("-created_at", "-version")
+        .values("created_at")[:1]
+    )
+    entries = (
+        history.annotate(base_at=Subquery(latest_base))
+        .filter(Q(base_at__isnull=True) | Q(created_at__gte=F("base_at")))
+        .order_by("record_id", "created_at", "version")
+        .only(*_REPLAY_FIELDS)
+    )
+
+    histories: Dict[str, list] = {}
+    for entry in entries.iterator(chunk_size=2000):
+        histories.setdefault(entry.record_id, []).append(entry)
+
+    unanchored = [
+        record_id for record_id, replay in histories.items() if not _is_base(replay[0])
+    ]
+    states = (
+        _archived_states(
+            table_name, unanchored, lambda entry: entry.created_at <= as_of
+        )
+        if unanchored
+        else {}
+    )
+    for record_id, replay in histories.items():
+        state = states.get(record_id)
+        for entry in replay:
+            state = _apply(state, entry)
+        states[record_id] = state
+    return states
+
+
+def get_state_before(log, using: str = "default") -> Dict[str, Any]:
+    """
+    Rebuild the state of a record right before an audit entry.
+
+    The entry's own ``old_values`` are applied last, as they are the
+    authoritative previous values of the fields it changed.
+
+    Args:
+        log (AuditLog): Audit entry
+
+    Returns:
+        dict: Encoded field values keyed by field name
+    """
+    state = _rebuild(
+        log.table_name,
+        log.record_id,
+        Q(created_at__lt=log.created_at)
+        | Q(created_at=log.created_at, version__lt=log.version),
+        lambda entry: entry.created_at < log.created_at,
+        using,
+    )
+    state = dict(state or {})
+    state.update(log.old_values or {})
+    return state
+
+
+def get_states_before(logs, using: str = "default") -> Dict[str, Dict[str, Any]]:
+    """
+    Rebuild the state of several records right before an entry of each.
+
+    Bulk version of ``get_state_before`` for entries of one table (one per
+    record). The history of all records is read with one query, starting
+    at each record's latest checkpoint before the earliest entry.
+
+    Args:
+        logs (list): AuditLog entries of the same table, one per record
+
+    Returns:
+        dict: Record id to encoded field values keyed by field name
+    """
+    if not logs:
+        return {}
+
+    flush_pending(using)
+    table_name = logs[0].table_name
+    boundaries = {log.record_id: (log.created_at, log.version) for log in logs}
+    earliest = min(created_at for created_at, _ in boundaries.values())
+    latest = max(created_at for created_at, _ in boundaries.values())
+
+    latest_base = (
+        AuditLog._base_manager.using(using)
+        .filter(
+            BASE_ENTRY_Q,
+            table_name=table_name,
+            record_id=OuterRef("record_id"),
+            created_at__lt=earliest,
+        )
+        .order_by("-created_at", "-version")
+        .values("created_at")[:1]
+    )
+    entries = (
+        AuditLog._base_manager.using(using)
+        .filter(
+            table_name=table_name,
+            record_id__in=list(boundaries),
+            created_at__lte=latest,
+        )
+        .annotate(base_at=Subquery(latest_base))
+        .filter(Q(base_at__isnull=True) | Q(created_at__gte=F("base_at")))
+        .order_by("record_id", "created_at", "version")
+        .only(*_REPLAY_FIELDS)
+    )
+
+    histories: Dict[str, list] = {}
+    for entry in entries.iterator(chunk_size=2000):
+        if (entry.created_at, entry.version) < boundaries[entry.record_id]:
+            histories.setdefault(entry.record_id, []).append(entry)
+
+    states = {}
+    for log in logs:
+        replay = histories.get(log.record_id)
+        if not replay or not _is_base(replay[0]):
+            # No checkpoint in the table: rebuild this record on its own,
+            # which also looks into the archive
+            states[log.record_id] = get_state_before(log, using=using)
+            continue
+
+        state = None
+        for entry in replay:
+            state = _apply(state, entry)
+        state = dict(state or {})
+        state.update(log.old_values or {})
+        states[log.record_id] = state
+    return states
+
+
+# ================================
+# Signal handlers
+# ================================
+
+
+def _on_pre_save(sender, instance, using=None, **kwargs):
+    try:
+        prefetch_previous_values(instance, using=using or "default")
+    except Exception as e:
+        logger.error(f"Error in {sender.__name__} audit logging: {str(e)}")
+
+
+# A change that can't be recorded fails the save or delete; audit rows are
+# never dropped silently
+
+
+def _on_post_save(sender, instance, created, using=None, **kwargs):
+    capture_save(instance, created, using=using or "default")
+
+
+def _on_pre_delete(sender, instance, using=None, **kwargs):
+    capture_delete(instance, using=using or "default")
@@ -46,6 +46,8 @@ class AuditLogAdmin(admin.ModelAdmin):
         "old_values",
         "new_values",
         "changed_fields",
+        "version",
+        "is_checkpoint",
         "ip_address",
         "user_agent",
         "session_key",
@@ -76,6 +78,8 @@ class AuditLogAdmin(admin.ModelAdmin):
                     "changed_fields",
                     "old_values",
                     "new_values",
+                    "version",
+                    "is_checkpoint",
                     "reason",
                 )
             },
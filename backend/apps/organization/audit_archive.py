@@ -0,0 +1,203 @@
+"""
+Compressed JSONL archive of cold AuditLog months.
+
+Each archived month is a gzip file ``auditlog-YYYY-MM.jsonl.gz`` with one
+AuditLog row per line, plus an ``auditlog-YYYY-MM.keys.json`` sidecar
+listing the ``table_name:record_id`` keys it contains, so history lookups
+only decompress the months that hold the record.
+"""
+
+import gzip
+import json
+import os
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import AuditLog
+
+ARCHIVE_PREFIX = "auditlog-"
+
+
+def get_archive_dir() -> str:
+    """Directory of the audit archive, from AUDIT_LOG_ARCHIVE['directory']."""
+    return str(getattr(settings, "AUDIT_LOG_ARCHIVE", {}).get("directory", ""))
+
+
+def _record_key(table_name: str, record_id: str) -> str:
+    return f"{table_name}:{record_id}"
+
+
+class AuditArchive:
+    """
+    Reader and writer of the archived AuditLog months in a directory.
+
+    Args:
+        directory (str): Archive directory (defaults to the configured one)
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or get_archive_dir()
+        self._fields = {
+            field.attname: field for field in AuditLog._meta.concrete_fields
+        }
+        self._keys_cache: Dict[date, frozenset] = {}
+
+    # ---- Paths ----
+
+    def _stem(self, month: date) -> str:
+        return os.path.join(
+            self.directory, f"{ARCHIVE_PREFIX}{month.year:04d}-{month.month:02d}"
+        )
+
+    def data_path(self, month: date) -> str:
+        return self._stem(month) + ".jsonl.gz"
+
+    def keys_path(self, month: date) -> str:
+        return self._stem(month) + ".keys.json"
+
+    def months(self) -> List[date]:
+        """Archived months, newest first."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+
+        months = []
+        for name in os.listdir(self.directory):
+            if name.startswith(ARCHIVE_PREFIX) and name.endswith(".jsonl.gz"):
+                stamp = name[len(ARCHIVE_PREFIX):-len(".jsonl.gz")]
+                try:
+                    year, month = stamp.split("-")
+                    months.append(date(int(year), int(month), 1))
+                except ValueError:
+                    continue
+        return sorted(months, reverse=True)
+
+    # ---- Writing ----
+
+    def write_month(self, month: date, rows: Iterable[dict]) -> int:
+        """
+        Append rows of a month to its archive file.
+
+        The data file is written before the key sidecar, and gzip members
+        can be appended, so archiving the same month twice (e.g. rows that
+        arrived late) keeps both batches.
+
+        Args:
+            month (date): First day of the month
+            rows (iterable): AuditLog rows as dicts keyed by attname
+
+        Returns:
+            int: Number of rows written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        keys = set(self._read_keys(month))
+        count = 0
+
+        with gzip.open(self.data_path(month), "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder))
+                archive.write("\n")
+                keys.add(_record_key(row["table_name"], row["record_id"]))
+                count += 1
+
+        tmp_path = self.keys_path(month) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as sidecar:
+            json.dump(sorted(keys), sidecar)
+        os.replace(tmp_path, self.keys_path(month))
+        self._keys_cache.pop(month, None)
+        return count
+
+    # ---- Reading ----
+
+    def _read_keys(self, month: date) -> frozenset:
+        keys = self._keys_cache.get(month)
+        if keys is None:
+            try:
+                with open(self.keys_path(month), encoding="utf-8") as sidecar:
+                    keys = frozenset(json.load(sidecar))
+            except FileNotFoundError:
+                keys = frozenset()
+            self._keys_cache[month] = keys
+        return keys
+
+    def _iter_rows(self, month: date) -> Iterator[dict]:
+        with gzip.open(self.data_path(month), "rt", encoding="utf-8") as archive:
+            for line in archive:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _to_instance(self, row: dict) -> AuditLog:
+        values = {}
+        for attname, value in row.items():
+            field = self._fields.get(attname)
+            if field is not None:
+                values[attname] = field.to_python(value)
+        return AuditLog(**values)
+
+    def get_record_history(
+        self, table_name: str, record_id: str, limit: Optional[int] = None
+    ) -> List[AuditLog]:
+        """
+        Archived audit entries of a record, newest first.
+
+        Args:
+            table_name (str): Table of the record
+            record_id (str): Primary key of the record
+            limit (int): Maximum number of entries to return
+
+        Returns:
+            list: Unsaved AuditLog instances rebuilt from the archive
+        """
+        key = _record_key(table_name, str(record_id))
+        history = []
+
+        for month in self.months():
+            if key not in self._read_keys(month):
+                continue
+
+            entries = [
+                self._to_instance(row)
+                for row in self._iter_rows(month)
+                if row["table_name"] == table_name and row["record_id"] == str(record_id)
+            ]
+            entries.sort(key=lambda entry: entry.created_at, reverse=True)
+            history.extend(entries)
+
+            if limit and len(history) >= limit:
+                return history[:limit]
+        return history
+
+    def get_records_history(
+        self, table_name: str, record_ids: Iterable[str]
+    ) -> Dict[str, List[AuditLog]]:
+        """
+        Archived audit entries of several records, newest first.
+
+        Each archived month is decompressed at most once.
+
+        Args:
+            table_name (str): Table of the records
+            record_ids (iterable): Primary keys of the records
+
+        Returns:
+            dict: Record id to its list of unsaved AuditLog instances
+        """
+        record_ids = {str(record_id) for record_id in record_ids}
+        wanted = {_record_key(table_name, record_id) for record_id in record_ids}
+        histories: Dict[str, List[AuditLog]] = {}
+
+        for month in self.months():
+            if wanted.isdisjoint(self._read_keys(month)):
+                continue
+
+            entries = [
+                self._to_instance(row)
+                for row in self._iter_rows(month)
+                if row["table_name"] == table_name and row["record_id"] in record_ids
+            ]
+            entries.sort(key=lambda entry: entry.created_at, reverse=True)
+            for entry in entries:
+                histories.setdefault(entry.record_id, []).append(entry)
+        return histories
@@ -0,0 +1,33 @@
+"""
+Materialized counters of the Organization module.
+
+Registered in ``signals``; read with ``apps.common.counters.get()`` or the
+``counter_value()`` annotation.
+"""
+
+from django.db.models import Q
+
+from apps.common.counters import CounterSpec
+
+from .models import Location, Organization
+
+ORGANIZATIONS_TOTAL = "organizations.total"
+ORGANIZATION_ACTIVE_LOCATIONS = "organization.active_locations"
+
+# Same rows as Organization.objects (not soft deleted)
+organizations_total = CounterSpec(
+    ORGANIZATIONS_TOTAL,
+    Organization,
+    condition=Q(deleted_at__isnull=True),
+    matches=lambda values: values["deleted_at"] is None,
+    fields=["deleted_at"],
+)
+
+organization_active_locations = CounterSpec(
+    ORGANIZATION_ACTIVE_LOCATIONS,
+    Location,
+    condition=Q(is_active=True, deleted_at__isnull=True),
+    matches=lambda values: values["is_active"] and values["deleted_at"] is None,
+    fields=["is_active", "deleted_at"],
+    scope="organization_id",
+)
@@ -0,0 +1,502 @@
+"""
+Bulk import of organizations and locations.
+
+Rows are read from CSV or JSON Lines as a stream and handled in batches:
+
+1. Every row is validated with the import serializer (field formats and
+   the serializer's own rules), reusing one serializer instance.
+2. Rules that need the database are checked for the whole batch with one
+   query: NITs already registered or repeated in the file for
+   organizations; the organization NIT, the main location and repeated
+   location names for locations.
+3. Valid rows are inserted with ``bulk_create`` and their CREATE audit
+   entries written with one ``bulk_create`` when the batch commits; the
+   materialized counters are moved once per batch.
+
+Each batch is its own transaction, so rows of earlier batches stay
+imported if a later one fails. Invalid rows are skipped and reported with
+their line number and errors.
+
+Imports made through the API run in the requesting user's tenant (see
+``tenancy``): locations can only be added to the user's organizations, and
+a user who is not global becomes a member of the organizations they import.
+"""
+
+import codecs
+import csv
+import json
+import logging
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import IntegrityError, models, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from apps.common import counters as counter_store
+
+from . import audit
+from .counters import ORGANIZATION_ACTIVE_LOCATIONS, ORGANIZATIONS_TOTAL
+from .models import Location, Organization
+from .serializers import LocationImportSerializer, OrganizationImportSerializer
+from .signals import set_audit_context
+from .tenancy import add_members
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+DEFAULT_BATCH_SIZE = 500
+
+# Errors listed in a report; the failed count always covers every row
+MAX_REPORTED_ERRORS = 1000
+
+Record = Tuple[int, Dict[str, Any]]
+
+BATCH_CONFLICT_MESSAGE = _(
+    "El lote no se pudo guardar por un conflicto con otro registro. "
+    "Importe la fila de nuevo."
+)
+
+UNREADABLE_FILE_MESSAGE = _(
+    "El archivo no se pudo leer completo; verifique que sea CSV o JSONL en UTF-8."
+)
+
+
+# ================================
+# Readers
+# ================================
+
+
+def _clean(row: Dict) -> Dict[str, Any]:
+    # Empty cells are missing values, so model defaults apply
+    return {
+        key.strip(): value
+        for key, value in row.items()
+        if key is not None and value not in ("", None)
+    }
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Record]:
+    """Records of CSV lines (header first), with their line number."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, _clean(row)
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Record]:
+    """
+    Records of JSON Lines, with their line number.
+
+    Lines that are not a JSON object are returned as ``{None: message}``
+    and reported as errors.
+    """
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_num, {None: _("La línea no es un objeto JSON válido.")}
+            continue
+        yield line_num, _clean(row)
+
+
+def get_import_format(file_format: Optional[str] = None, filename: str = "") -> Optional[str]:
+    """
+    Format of an import: the one given, else from the file extension
+    (``.jsonl`` / ``.ndjson``), else CSV. None if the format is not supported.
+    """
+    value = (file_format or "").lower()
+    if not value:
+        value = "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    return value if value in IMPORT_FORMATS else None
+
+
+def read_records(stream, file_format: str) -> Iterator[Record]:
+    """
+    Records of a binary stream (e.g. an uploaded file), read line by line.
+
+    Args:
+        stream: Iterable of byte lines in UTF-8 (a BOM is ignored)
+        file_format (str): ``csv`` or ``jsonl``
+    """
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if file_format == "csv":
+        return read_csv(lines)
+    return read_jsonl(lines)
+
+
+def _batches(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _messages(detail) -> Dict[str, List[str]]:
+    """Plain error messages by field from a ValidationError detail."""
+    if not isinstance(detail, dict):
+        detail = {"error": detail}
+    return {
+        field: [str(message) for message in (
+            messages if isinstance(messages, list) else [messages]
+        )]
+        for field, messages in detail.items()
+    }
+
+
+# ================================
+# Report
+# ================================
+
+
+class ImportReport:
+    """
+    Outcome of an import.
+
+    Attributes:
+        total (int): Rows read
+        valid (int): Rows that passed validation
+        created (int): Rows inserted
+        errors (list): Line number and errors of the first failed rows
+        failed (int): Rows not imported
+        file_error (str): Why reading stopped before the end, if it did
+    """
+
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.total = 0
+        self.valid = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.file_error: Optional[str] = None
+
+    def add_error(self, line: int, errors: Dict[str, List[str]]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "dry_run": self.dry_run,
+            "total": self.total,
+            "valid": self.valid,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "file_error": self.file_error,
+        }
+
+
+# ================================
+# Importers
+# ================================
+
+
+class BaseImporter(ABC):
+    """
+    Validates and inserts the records of one model in batches.
+
+    Subclasses set ``model`` and ``serializer_class`` and implement
+    ``check_batch`` (the database rules) and ``build``. ``tenant`` (a
+    ``TenantContext``) limits the import to the user's organizations; None
+    imports without a tenant (e.g. from the management command).
+    """
+
+    model = None
+    serializer_class = None
+
+    def __init__(
+        self,
+        user=None,
+        request=None,
+        reason: Optional[str] = None,
+        dry_run: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        using: str = "default",
+        tenant=None,
+    ):
+        self.user = user
+        self.request = request
+        self.reason = reason or _("Importación masiva")
+        self.dry_run = dry_run
+        self.batch_size = max(int(batch_size), 1)
+        self.using = using
+        self.tenant = tenant
+
+    def run(self, records: Iterable[Record]) -> Dict[str, Any]:
+        """
+        Import records.
+
+        Args:
+            records (iterable): (line number, row data) pairs, read lazily
+
+        Returns:
+            dict: The ``ImportReport`` as a dict
+        """
+        report = ImportReport(self.dry_run)
+        # Fields are bound once; validating a row keeps no state on it
+        serializer = self.serializer_class()
+
+        try:
+            for batch in _batches(records, self.batch_size):
+                self.run_batch(batch, serializer, report)
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The rest of the file can not be read; earlier batches stay
+            logger.warning(f"Import stopped on unreadable input: {str(e)}")
+            report.file_error = str(UNREADABLE_FILE_MESSAGE)
+
+        logger.info(
+            f"Imported {report.created} of {report.total} {self.model._meta.model_name} rows"
+        )
+        return report.as_dict()
+
+    def run_batch(self, batch: List[Record], serializer, report: ImportReport) -> None:
+        valid = []
+        for line, data in batch:
+            report.total += 1
+            if None in data:
+                report.add_error(line, {"error": [str(data[None])]})
+                continue
+            try:
+                valid.append((line, serializer.run_validation(data)))
+            except ValidationError as exc:
+                report.add_error(line, _messages(exc.detail))
+
+        valid = self.check_batch(valid, report)
+        report.valid += len(valid)
+        if valid and not self.dry_run:
+            self.insert(valid, report)
+
+    @abstractmethod
+    def check_batch(self, valid: List[Record], report: ImportReport) -> List[Record]:
+        """Apply the database rules to the valid rows of a batch."""
+
+    @abstractmethod
+    def build(self, data: Dict[str, Any]) -> models.Model:
+        """Unsaved instance of a validated row."""
+
+    def update_counters(self, instances: List[models.Model]) -> None:
+        """Move the materialized counters (``bulk_create`` sends no signals)."""
+
+    def after_insert(self, instances: List[models.Model]) -> None:
+        """Further writes for the inserted rows, in the batch transaction."""
+
+    def insert(self, valid: List[Record], report: ImportReport) -> None:
+        instances = []
+        for _line, data in valid:
+            instance = self.build(data)
+            if self.user is not None:
+                instance.created_by = instance.updated_by = self.user
+            set_audit_context(
+                instance, user=self.user, request=self.request, reason=self.reason
+            )
+            instances.append(instance)
+
+        try:
+            with transaction.atomic(using=self.using):
+                self.model._base_manager.using(self.using).bulk_create(
+                    instances, batch_size=self.batch_size
+                )
+                audit.capture_bulk_create(instances, using=self.using)
+                self.update_counters(instances)
+                self.after_insert(instances)
+        except IntegrityError as e:
+            # Only a concurrent write can conflict after the batch checks
+            logger.warning(f"Import batch rolled back: {str(e)}")
+            for line, _data in valid:
+                report.add_error(line, {"error": [str(BATCH_CONFLICT_MESSAGE)]})
+            return
+        report.created += len(instances)
+
+
+class OrganizationImporter(BaseImporter):
+    """Imports organizations; NITs must be new and unique in the file."""
+
+    model = Organization
+    serializer_class = OrganizationImportSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen_nits = set()
+
+    def check_batch(self, valid, report):
+        nits = {data["nit"] for _line, data in valid}
+        # Soft deleted organizations still hold their NIT
+        registered = set(
+            Organization._base_manager.using(self.using)
+            .filter(nit__in=nits)
+            .values_list("nit", flat=True)
+        )
+
+        checked = []
+        for line, data in valid:
+            nit = data["nit"]
+            if nit in registered:
+                report.add_error(
+                    line, {"nit": [str(_("Ya existe una organización con este NIT."))]}
+                )
+            elif nit in self.seen_nits:
+                report.add_error(
+                    line, {"nit": [str(_("El NIT está repetido en el archivo."))]}
+                )
+            else:
+                self.seen_nits.add(nit)
+                checked.append((line, data))
+        return checked
+
+    def build(self, data):
+        return Organization(**data)
+
+    def update_counters(self, instances):
+        counter_store.increment(
+            ORGANIZATIONS_TOTAL, delta=len(instances), using=self.using
+        )
+
+    def after_insert(self, instances):
+        # Otherwise the importing user could not see the organizations
+        if self.tenant is not None and not self.tenant.is_global:
+            add_members(instances, self.user, using=self.using)
+
+
+class LocationImporter(BaseImporter):
+    """
+    Imports locations of existing organizations, given by NIT.
+
+    At most one main location per organization, and no two locations of an
+    organization with the same name (so a file imported twice is rejected
+    instead of duplicating every location).
+    """
+
+    model = Location
+    serializer_class = LocationImportSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.organization_ids: Dict[str, Any] = {}
+        self.main_locations = set()
+        self.names = set()
+        self.loaded_organizations = set()
+
+    def _resolve_organizations(self, nits) -> None:
+        missing = set(nits) - set(self.organization_ids)
+        if missing:
+            organizations = Organization.objects.using(self.using)
+            if self.tenant is not None:
+                # Organizations of other tenants are reported as unknown
+                organizations = self.tenant.scope(organizations)
+            self.organization_ids.update(
+                organizations.filter(nit__in=missing).values_list("nit", "id")
+            )
+
+    def check_batch(self, valid, report):
+        self._resolve_organizations(data["organization_nit"] for _line, data in valid)
+
+        # Main locations and names of organizations first seen in this batch
+        organization_ids = {
+            self.organization_ids[data["organization_nit"]]
+            for _line, data in valid
+            if data["organization_nit"] in self.organization_ids
+        } - self.loaded_organizations
+        if organization_ids:
+            existing = Location.objects.using(self.using).filter(
+                organization_id__in=organization_ids
+            )
+            for organization_id, nombre, es_principal in existing.values_list(
+                "organization_id", "nombre", "es_principal"
+            ):
+                self.names.add((organization_id, nombre))
+                if es_principal:
+                    self.main_locations.add(organization_id)
+            self.loaded_organizations |= organization_ids
+
+        checked = []
+        for line, data in valid:
+            organization_id = self.organization_ids.get(data["organization_nit"])
+            if organization_id is None:
+                report.add_error(
+                    line,
+                    {
+                        "organization_nit": [
+                            str(_("No existe una organización con este NIT."))
+                        ]
+                    },
+                )
+            elif data.get("es_principal") and organization_id in self.main_locations:
+                report.add_error(
+                    line,
+                    {
+                        "es_principal": [
+                            str(_("Ya existe una sede principal para esta organización."))
+                        ]
+                    },
+                )
+            elif (organization_id, data["nombre"]) in self.names:
+                report.add_error(
+                    line,
+                    {
+                        "nombre": [
+                            str(_("Ya existe una sede con este nombre en la organización."))
+                        ]
+                    },
+                )
+            else:
+                if data.get("es_principal"):
+                    self.main_locations.add(organization_id)
+                self.names.add((organization_id, data["nombre"]))
+                checked.append((line, data))
+
+        # bulk_create skips Location.save(), which makes the first location
+        # of an organization its main one
+        for _line, data in checked:
+            organization_id = self.organization_ids[data["organization_nit"]]
+            if organization_id not in self.main_locations:
+                data["es_principal"] = True
+                self.main_locations.add(organization_id)
+        return checked
+
+    def build(self, data):
+        data = dict(data)
+        nit = data.pop("organization_nit")
+        return Location(organization_id=self.organization_ids[nit], **data)
+
+    def update_counters(self, instances):
+        active: Dict[Any, int] = {}
+        for instance in instances:
+            if instance.is_active and instance.deleted_at is None:
+                active[instance.organization_id] = active.get(instance.organization_id, 0) + 1
+        for organization_id, delta in active.items():
+            counter_store.increment(
+                ORGANIZATION_ACTIVE_LOCATIONS, organization_id, delta, using=self.using
+            )
+
+
+IMPORTERS = {
+    "organizations": OrganizationImporter,
+    "locations": LocationImporter,
+}
+
+
+def import_records(kind: str, stream, file_format: str, **options) -> Dict[str, Any]:
+    """
+    Import organizations or locations from a CSV or JSON Lines stream.
+
+    Args:
+        kind (str): ``organizations`` or ``locations``
+        stream: Iterable of byte lines (e.g. an uploaded or open file)
+        file_format (str): ``csv`` or ``jsonl``
+        **options: ``BaseImporter`` options (user, request, dry_run, ...)
+
+    Returns:
+        dict: Import report
+    """
+    importer = IMPORTERS[kind](**options)
+    return importer.run(read_records(stream, file_format))
@@ -0,0 +1,113 @@
+"""
+Management command to archive cold audit log months in ZentraQMS.
+
+Creates the upcoming monthly partitions of the audit table and moves every
+month older than the hot window into compressed JSONL archive files, which
+AuditLog.get_record_history(include_archived=True) still reads.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from apps.organization.audit_archive import AuditArchive
+from apps.organization.models import AuditLog
+from apps.organization.partitioning import (
+    add_months,
+    drop_partition,
+    ensure_partitions,
+    iter_months,
+    month_bounds,
+    month_start,
+    oldest_month,
+)
+
+
+class Command(BaseCommand):
+    help = "Archive cold audit log months and prepare upcoming partitions"
+
+    def add_arguments(self, parser):
+        archive_settings = getattr(settings, "AUDIT_LOG_ARCHIVE", {})
+        parser.add_argument(
+            "--hot-months",
+            type=int,
+            default=archive_settings.get("hot_months", 12),
+            help="Number of recent months kept in the database",
+        )
+        parser.add_argument(
+            "--partitions-ahead",
+            type=int,
+            default=archive_settings.get("partitions_ahead", 3),
+            help="Number of future monthly partitions to create",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=None,
+            help="Archive directory (defaults to AUDIT_LOG_ARCHIVE['directory'])",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the months that would be archived without changing them",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        connection = connections[using]
+        dry_run = options["dry_run"]
+        archive = AuditArchive(options["archive_dir"])
+
+        if not dry_run:
+            for month in ensure_partitions(connection, options["partitions_ahead"]):
+                self.stdout.write(f"Created partition for {month:%Y-%m}")
+
+        cutoff = add_months(month_start(timezone.now()), -options["hot_months"])
+        oldest = oldest_month(connection, AuditLog)
+        if oldest is None or oldest >= cutoff:
+            self.stdout.write(self.style.SUCCESS("No audit months to archive."))
+            return
+
+        total = 0
+        for month in iter_months(oldest, cutoff):
+            start, end = month_bounds(month)
+            rows = AuditLog._base_manager.using(using).filter(
+                created_at__gte=start, created_at__lt=end
+            )
+
+            if dry_run:
+                count = rows.count()
+                if count:
+                    self.stdout.write(f"Would archive {count} entries of {month:%Y-%m}")
+                total += count
+                continue
+
+            if not rows.exists():
+                drop_partition(connection, month)
+                continue
+
+            # The file is written before the rows are removed, so a failure
+            # never loses entries (at worst a rerun archives them twice)
+            count = archive.write_month(
+                month, rows.order_by("created_at").values().iterator(chunk_size=2000)
+            )
+            with transaction.atomic(using=using):
+                drop_partition(connection, month)
+                # Rows of the month left in the default partition (or in an
+                # unpartitioned table)
+                rows.delete()
+
+            if count:
+                self.stdout.write(
+                    f"Archived {count} entries of {month:%Y-%m} "
+                    f"to {archive.data_path(month)}"
+                )
+            total += count
+
+        verb = "Would archive" if dry_run else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} audit log entries."))
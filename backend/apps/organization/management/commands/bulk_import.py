@@ -0,0 +1,98 @@
+"""
+Management command to import organizations or locations in ZentraQMS.
+
+Reads a CSV or JSON Lines file as a stream and imports it in batches (see
+apps.organization.imports); rows that fail validation are listed with
+their line number.
+"""
+
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from apps.organization.imports import (
+    DEFAULT_BATCH_SIZE,
+    IMPORT_FORMATS,
+    IMPORTERS,
+    get_import_format,
+    import_records,
+)
+
+
+class Command(BaseCommand):
+    help = "Import organizations or locations from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS), help="Records to import")
+        parser.add_argument("path", help="CSV or JSON Lines file")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=IMPORT_FORMATS,
+            default=None,
+            help="File format (defaults to the file extension, else csv)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows validated and inserted together",
+        )
+        parser.add_argument(
+            "--user",
+            default=None,
+            help="Email of the user recorded as creator and in the audit log",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the rows without importing them",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(email=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+
+        path = options["path"]
+        file_format = get_import_format(options["file_format"], path)
+        try:
+            with open(path, "rb") as stream:
+                report = import_records(
+                    options["kind"],
+                    stream,
+                    file_format,
+                    user=user,
+                    reason=f"Bulk import of {path}",
+                    dry_run=options["dry_run"],
+                    batch_size=options["batch_size"],
+                    using=options["database"],
+                )
+        except OSError as e:
+            raise CommandError(f"Can not read {path}: {e}")
+
+        for error in report["errors"]:
+            self.stdout.write(
+                f"Line {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}"
+            )
+        if report["errors_truncated"]:
+            self.stdout.write(f"... and {report['failed'] - len(report['errors'])} more")
+        if report["file_error"]:
+            self.stderr.write(report["file_error"])
+
+        verb = "would be imported" if report["dry_run"] else "imported"
+        count = report["valid"] if report["dry_run"] else report["created"]
+        style = self.style.SUCCESS if not report["failed"] else self.style.WARNING
+        self.stdout.write(
+            style(f"{count} of {report['total']} {options['kind']} {verb}, {report['failed']} failed.")
+        )
@@ -0,0 +1,140 @@
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+# Frozen copy of apps.organization.partitioning as of this migration, so
+# later changes to the app code do not change what it does.
+
+AUDIT_TABLE = "organization_auditlog"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(start, end):
+    month = month_start(start)
+    while month < end:
+        yield month
+        month = add_months(month, 1)
+
+
+def create_partition(cursor, qn, month):
+    next_month = add_months(month, 1)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS "
+        f"{qn(f'{AUDIT_TABLE}_p{month.year:04d}{month.month:02d}')} "
+        f"PARTITION OF {qn(AUDIT_TABLE)} FOR VALUES FROM (%s) TO (%s)",
+        [
+            datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc),
+            datetime(next_month.year, next_month.month, 1, tzinfo=dt_timezone.utc),
+        ],
+    )
+
+
+def partition_auditlog(apps, schema_editor):
+    """
+    Partition the audit table by month where the backend supports it.
+
+    The rows, indexes and foreign keys of the existing table are carried
+    over. The primary key becomes ``(id, created_at)`` because PostgreSQL
+    requires the partition key in every unique constraint.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    legacy = f"{AUDIT_TABLE}_legacy"
+    qn = connection.ops.quote_name
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [AUDIT_TABLE],
+        )
+        if cursor.fetchone() is not None:
+            return
+
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [AUDIT_TABLE, AUDIT_TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [AUDIT_TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            f"SELECT MIN(created_at), MAX(created_at) FROM {qn(AUDIT_TABLE)}"
+        )
+        oldest, newest = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {qn(AUDIT_TABLE)} RENAME TO {qn(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(AUDIT_TABLE)} "
+            f"(LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(
+            f"CREATE TABLE {qn(DEFAULT_PARTITION)} "
+            f"PARTITION OF {qn(AUDIT_TABLE)} DEFAULT"
+        )
+
+        current = month_start(timezone.now())
+        first = month_start(oldest) if oldest else current
+        last = month_start(newest) if newest else current
+        for month in iter_months(first, add_months(max(last, current), 3)):
+            create_partition(cursor, qn, month)
+
+        cursor.execute(
+            f"INSERT INTO {qn(AUDIT_TABLE)} SELECT * FROM {qn(legacy)}"
+        )
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+
+        cursor.execute(
+            f"ALTER TABLE {qn(AUDIT_TABLE)} "
+            f"ADD CONSTRAINT {qn(AUDIT_TABLE + '_pkey')} "
+            f"PRIMARY KEY (id, created_at)"
+        )
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {qn(AUDIT_TABLE)} "
+                f"ADD CONSTRAINT {qn(name)} {definition}"
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0005_remove_location_unique_main_location_per_organization_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="auditlog",
+            name="organizatio_table_n_179f78_idx",
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["table_name", "record_id", "-created_at"],
+                name="audit_record_history_idx",
+            ),
+        ),
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0006_auditlog_partitioning"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text=(
+                    "Número de cambio del registro (0 en entradas manuales)."
+                ),
+                verbose_name="versión",
+            ),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="is_checkpoint",
+            field=models.BooleanField(
+                default=False,
+                help_text=(
+                    "Indica si new_values contiene el estado completo del "
+                    "registro tras el cambio, en lugar de solo los campos "
+                    "modificados."
+                ),
+                verbose_name="punto de control",
+            ),
+        ),
+    ]
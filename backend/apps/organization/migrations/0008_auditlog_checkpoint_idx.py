@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0007_auditlog_version_is_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_checkpoint", True),
+                    ("action__in", ["CREATE", "DELETE"]),
+                    _connector="OR",
+                ),
+                fields=["table_name", "record_id", "-created_at"],
+                name="audit_checkpoint_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,229 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_audit_organizations(apps, schema_editor):
+    """Set the organization of the audit entries of organizations and locations."""
+    AuditLog = apps.get_model("organization", "AuditLog")
+    Organization = apps.get_model("organization", "Organization")
+    Location = apps.get_model("organization", "Location")
+    db_alias = schema_editor.connection.alias
+    entries = AuditLog._base_manager.using(db_alias)
+
+    organization_table = Organization._meta.db_table
+    for organization_id in (
+        Organization._base_manager.using(db_alias)
+        .values_list("id", flat=True)
+        .iterator()
+    ):
+        entries.filter(
+            table_name=organization_table, record_id=str(organization_id)
+        ).update(organization_id=organization_id)
+
+    locations = {}
+    for location_id, organization_id in (
+        Location._base_manager.using(db_alias)
+        .values_list("id", "organization_id")
+        .iterator()
+    ):
+        locations.setdefault(organization_id, []).append(str(location_id))
+    for organization_id, location_ids in locations.items():
+        entries.filter(
+            table_name=Location._meta.db_table, record_id__in=location_ids
+        ).update(organization_id=organization_id)
+
+
+def backfill_memberships(apps, schema_editor):
+    """
+    Make existing users members of the organizations they can work on.
+
+    Every organization is linked to the user who created it; the oldest one
+    becomes their default. With a single organization, every active user
+    becomes a member of it, since they all shared it until now.
+    """
+    Organization = apps.get_model("organization", "Organization")
+    Membership = apps.get_model("organization", "OrganizationMembership")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    db_alias = schema_editor.connection.alias
+
+    organizations = list(
+        Organization._base_manager.using(db_alias)
+        .filter(deleted_at__isnull=True)
+        .order_by("created_at")
+        .values_list("id", "created_by_id")
+    )
+
+    memberships = {}
+    defaults = set()
+    for organization_id, user_id in organizations:
+        if user_id is None:
+            continue
+        memberships[(user_id, organization_id)] = user_id not in defaults
+        defaults.add(user_id)
+
+    if len(organizations) == 1:
+        organization_id = organizations[0][0]
+        for user_id in (
+            User._base_manager.using(db_alias)
+            .filter(is_active=True)
+            .values_list("pk", flat=True)
+            .iterator()
+        ):
+            memberships.setdefault(
+                (user_id, organization_id), user_id not in defaults
+            )
+            defaults.add(user_id)
+
+    Membership._base_manager.using(db_alias).bulk_create(
+        [
+            Membership(
+                user_id=user_id,
+                organization_id=organization_id,
+                is_default=is_default,
+            )
+            for (user_id, organization_id), is_default in memberships.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def remove_memberships(apps, schema_editor):
+    """Remove the memberships created by ``backfill_memberships``."""
+    Membership = apps.get_model("organization", "OrganizationMembership")
+    db_alias = schema_editor.connection.alias
+    Membership._base_manager.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0008_auditlog_checkpoint_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrganizationMembership",
+            fields=[
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Date and time when the record was created.",
+                        verbose_name="created at",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Date and time when the record was last updated.",
+                        verbose_name="updated at",
+                    ),
+                ),
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        help_text="Unique identifier for the record.",
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "is_default",
+                    models.BooleanField(
+                        default=False,
+                        help_text=(
+                            "Indica si es la organización usada cuando la "
+                            "solicitud no indica otra."
+                        ),
+                        verbose_name="organización por defecto",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="User who created this record.",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="%(class)s_created",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="created by",
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        help_text="Organización a la que pertenece el usuario.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="organization.organization",
+                        verbose_name="organización",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="User who last updated this record.",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="%(class)s_updated",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="updated by",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="Usuario miembro de la organización.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="organization_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="usuario",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "miembro de organización",
+                "verbose_name_plural": "miembros de organizaciones",
+                "ordering": ["-is_default", "created_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "organization"),
+                        name="unique_membership_per_user_organization",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("is_default", True)),
+                        fields=("user",),
+                        name="unique_default_membership_per_user",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="organization_id",
+            field=models.UUIDField(
+                blank=True,
+                help_text="Organización a la que pertenece el registro afectado.",
+                null=True,
+                verbose_name="organización",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["organization_id", "-created_at"],
+                name="audit_tenant_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_audit_organizations, migrations.RunPython.noop),
+        migrations.RunPython(backfill_memberships, remove_memberships),
+    ]
@@ -0,0 +1,181 @@
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+AUDIT_TABLE = "organization_auditlog"
+
+UNIQUE_VERSION = models.UniqueConstraint(
+    fields=["table_name", "record_id", "version"],
+    condition=models.Q(version__gt=0),
+    name="unique_audit_record_version",
+)
+
+
+def is_partitioned(schema_editor):
+    """Whether the audit table is partitioned (see migration 0006)."""
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [AUDIT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def renumber_duplicate_versions(apps, schema_editor):
+    """
+    Renumber the entries of records that got the same version twice.
+
+    Concurrent transactions could both number their entries after the same
+    latest version. The entries of those records are numbered again from 1,
+    in (version, created_at, id) order; manual entries (version 0) are left
+    as they are.
+    """
+    AuditLog = apps.get_model("organization", "AuditLog")
+    db_alias = schema_editor.connection.alias
+    entries = AuditLog._base_manager.using(db_alias)
+
+    duplicated = (
+        entries.filter(version__gt=0)
+        .order_by()
+        .values_list("table_name", "record_id", "version")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    records = {(table_name, record_id) for table_name, record_id, _, _ in duplicated}
+
+    for table_name, record_id in sorted(records):
+        rows = list(
+            entries.filter(
+                table_name=table_name, record_id=record_id, version__gt=0
+            ).order_by("version", "created_at", "id")
+        )
+        for version, row in enumerate(rows, start=1):
+            row.version = version
+        entries.bulk_update(rows, ["version"], batch_size=1000)
+
+
+def seed_record_versions(apps, schema_editor):
+    """Store the latest version of every audited record."""
+    AuditLog = apps.get_model("organization", "AuditLog")
+    AuditRecordVersion = apps.get_model("organization", "AuditRecordVersion")
+    db_alias = schema_editor.connection.alias
+
+    latest = (
+        AuditLog._base_manager.using(db_alias)
+        .filter(version__gt=0)
+        .order_by()
+        .values_list("table_name", "record_id")
+        .annotate(last_version=Max("version"))
+    )
+    AuditRecordVersion._base_manager.using(db_alias).bulk_create(
+        (
+            AuditRecordVersion(
+                table_name=table_name,
+                record_id=record_id,
+                last_version=last_version,
+            )
+            for table_name, record_id, last_version in latest.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+def add_unique_version(apps, schema_editor):
+    """
+    Add the unique version constraint unless the audit table is partitioned.
+
+    A unique constraint of a partitioned PostgreSQL table must include the
+    partition key (created_at); there AuditRecordVersion alone keeps the
+    versions unique.
+    """
+    if is_partitioned(schema_editor):
+        return
+    schema_editor.add_constraint(
+        apps.get_model("organization", "AuditLog"), UNIQUE_VERSION
+    )
+
+
+def remove_unique_version(apps, schema_editor):
+    if is_partitioned(schema_editor):
+        return
+    schema_editor.remove_constraint(
+        apps.get_model("organization", "AuditLog"), UNIQUE_VERSION
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0009_organizationmembership_auditlog_organization_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditRecordVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "table_name",
+                    models.CharField(
+                        help_text="Nombre de la tabla del registro.",
+                        max_length=100,
+                        verbose_name="nombre de tabla",
+                    ),
+                ),
+                (
+                    "record_id",
+                    models.CharField(
+                        help_text="ID del registro auditado.",
+                        max_length=36,
+                        verbose_name="ID del registro",
+                    ),
+                ),
+                (
+                    "last_version",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text=(
+                            "Versión de la última entrada de auditoría del "
+                            "registro."
+                        ),
+                        verbose_name="última versión",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "versión de auditoría",
+                "verbose_name_plural": "versiones de auditoría",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="auditrecordversion",
+            constraint=models.UniqueConstraint(
+                fields=["table_name", "record_id"],
+                name="unique_audit_version_per_record",
+            ),
+        ),
+        migrations.RunPython(renumber_duplicate_versions, migrations.RunPython.noop),
+        migrations.RunPython(seed_record_versions, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="auditlog",
+                    constraint=UNIQUE_VERSION,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_unique_version, remove_unique_version),
+            ],
+        ),
+    ]
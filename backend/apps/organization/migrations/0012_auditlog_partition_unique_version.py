@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# Frozen copy of apps.organization.partitioning.add_unique_version_index, so
+# later changes to the app code do not change what this migration does.
+
+AUDIT_TABLE = "organization_auditlog"
+UNIQUE_VERSION_SUFFIX = "_version_uniq"
+
+
+def list_partition_tables(schema_editor):
+    """Partitions (the default one included) of the partitioned audit table."""
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s",
+            [AUDIT_TABLE],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_unique_version_indexes(apps, schema_editor):
+    """
+    Enforce unique_audit_record_version on every existing partition.
+
+    Migration 0010 skips the constraint on the partitioned table, whose
+    unique constraints must include created_at; the per-partition index
+    keeps versions unique within each month. Partitions created later get
+    it from ensure_partitions.
+    """
+    qn = schema_editor.connection.ops.quote_name
+    for table in list_partition_tables(schema_editor):
+        schema_editor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {qn(table + UNIQUE_VERSION_SUFFIX)} "
+            f"ON {qn(table)} (table_name, record_id, version) WHERE version > 0"
+        )
+
+
+def remove_unique_version_indexes(apps, schema_editor):
+    qn = schema_editor.connection.ops.quote_name
+    for table in list_partition_tables(schema_editor):
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {qn(table + UNIQUE_VERSION_SUFFIX)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organization", "0011_alter_auditlog_created_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_unique_version_indexes, remove_unique_version_indexes),
+    ]
@@ -7,15 +7,17 @@ This module handles all organization-related data including:
 - Organization configuration and settings
 """
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import (
     RegexValidator,
     MinLengthValidator,
     MaxLengthValidator,
 )
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
-from apps.common.models import FullBaseModel
+from apps.common.models import BaseModel, FullBaseModel, SoftDeleteManager
 
 
 class Organization(FullBaseModel):
@@ -444,6 +446,60 @@ class Location(FullBaseModel):
         super().save(*args, **kwargs)
 
 
+class OrganizationMembership(BaseModel):
+    """
+    Model linking users to the organizations (tenants) they work in.
+
+    A user can belong to several organizations; the default membership is
+    the organization used when a request does not choose one (see
+    ``apps.organization.tenancy``).
+    """
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name="memberships",
+        verbose_name=_("organización"),
+        help_text=_("Organización a la que pertenece el usuario."),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="organization_memberships",
+        verbose_name=_("usuario"),
+        help_text=_("Usuario miembro de la organización."),
+    )
+
+    is_default = models.BooleanField(
+        _("organización por defecto"),
+        default=False,
+        help_text=_(
+            "Indica si es la organización usada cuando la solicitud no indica otra."
+        ),
+    )
+
+    class Meta:
+        verbose_name = _("miembro de organización")
+        verbose_name_plural = _("miembros de organizaciones")
+        ordering = ["-is_default", "created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "organization"],
+                name="unique_membership_per_user_organization",
+            ),
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(is_default=True),
+                name="unique_default_membership_per_user",
+            ),
+        ]
+
+    def __str__(self):
+        """Return string representation of the membership."""
+        return f"{self.user_id} - {self.organization_id}"
+
+
 class SectorTemplate(FullBaseModel):
     """
     Model to store predefined templates for different economic sectors.
@@ -561,7 +617,6 @@ class SectorTemplate(FullBaseModel):
         Raises:
             ValidationError: If template cannot be applied
         """
-        from django.utils import timezone
         from django.db import transaction
 
         # Validar que el sector coincida
@@ -763,9 +818,52 @@ class SectorTemplate(FullBaseModel):
         return template
 
 
+class AuditLogQuerySet(models.QuerySet):
+    """
+    QuerySet that writes the audit entries buffered in the current transaction
+    before reading, so a transaction sees the entries of its own changes.
+    """
+
+    def _flush_pending(self):
+        from .audit import flush_pending
+
+        flush_pending(self.db)
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._flush_pending()
+        super()._fetch_all()
+
+    def count(self):
+        if self._result_cache is None:
+            self._flush_pending()
+        return super().count()
+
+    def exists(self):
+        if self._result_cache is None:
+            self._flush_pending()
+        return super().exists()
+
+    def aggregate(self, *args, **kwargs):
+        self._flush_pending()
+        return super().aggregate(*args, **kwargs)
+
+    def iterator(self, *args, **kwargs):
+        self._flush_pending()
+        return super().iterator(*args, **kwargs)
+
+    def update(self, **kwargs):
+        self._flush_pending()
+        return super().update(**kwargs)
+
+    def delete(self):
+        self._flush_pending()
+        return super().delete()
+
+
 class AuditLog(FullBaseModel):
     """
-    Model to store audit log entries for tracking changes to Organization records.
+    Model to store audit log entries for tracking changes to audited records.
 
     This model provides complete audit trail functionality including:
     - Who made the change (user)
@@ -787,6 +885,14 @@ class AuditLog(FullBaseModel):
         (ACTION_ROLLBACK, _("Rollback")),
     ]
 
+    # Time of the change: buffered entries are inserted after it (on commit)
+    created_at = models.DateTimeField(
+        _("created at"),
+        default=timezone.now,
+        editable=False,
+        help_text=_("Date and time when the record was created."),
+    )
+
     # Record Information
     table_name = models.CharField(
         _("nombre de tabla"),
@@ -830,6 +936,22 @@ class AuditLog(FullBaseModel):
         help_text=_("Lista de campos que fueron modificados."),
     )
 
+    # History Replay
+    version = models.PositiveIntegerField(
+        _("versión"),
+        default=0,
+        help_text=_("Número de cambio del registro (0 en entradas manuales)."),
+    )
+
+    is_checkpoint = models.BooleanField(
+        _("punto de control"),
+        default=False,
+        help_text=_(
+            "Indica si new_values contiene el estado completo del registro "
+            "tras el cambio, en lugar de solo los campos modificados."
+        ),
+    )
+
     # Context Information
     ip_address = models.GenericIPAddressField(
         _("dirección IP"),
@@ -861,16 +983,55 @@ class AuditLog(FullBaseModel):
         help_text=_("Razón o comentario sobre el cambio realizado."),
     )
 
+    # Tenant (no foreign key: entries outlive the organization)
+    organization_id = models.UUIDField(
+        _("organización"),
+        null=True,
+        blank=True,
+        help_text=_("Organización a la que pertenece el registro afectado."),
+    )
+
+    # Reads include the entries buffered in the current transaction
+    objects = SoftDeleteManager.from_queryset(AuditLogQuerySet)()
+
     class Meta:
         verbose_name = _("log de auditoría")
         verbose_name_plural = _("logs de auditoría")
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["table_name", "record_id"]),
+            # Covers get_record_history: filter by record, newest first
+            models.Index(
+                fields=["table_name", "record_id", "-created_at"],
+                name="audit_record_history_idx",
+            ),
+            # Latest checkpoint of a record before a point in time
+            models.Index(
+                fields=["table_name", "record_id", "-created_at"],
+                name="audit_checkpoint_idx",
+                condition=models.Q(is_checkpoint=True)
+                | models.Q(action__in=["CREATE", "DELETE"]),
+            ),
+            # Audit entries of a tenant, newest first
+            models.Index(
+                fields=["organization_id", "-created_at"],
+                name="audit_tenant_idx",
+            ),
             models.Index(fields=["action"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["created_by"]),
         ]
+        constraints = [
+            # Not created on the partitioned PostgreSQL table, where unique
+            # constraints must include created_at: each partition has the
+            # same unique index instead, so there versions are unique per
+            # month and AuditRecordVersion alone keeps them unique across
+            # months (see apps.organization.partitioning)
+            models.UniqueConstraint(
+                fields=["table_name", "record_id", "version"],
+                condition=models.Q(version__gt=0),
+                name="unique_audit_record_version",
+            ),
+        ]
 
     def __str__(self):
         """Return string representation of the audit log."""
@@ -910,7 +1071,35 @@ class AuditLog(FullBaseModel):
         # Get record ID
         record_id = str(instance.pk)
 
-        # Extract request information if available
+        from .audit import get_tenant_id
+
+        # Create audit log entry
+        audit_log = cls.objects.create(
+            table_name=table_name,
+            record_id=record_id,
+            organization_id=get_tenant_id(instance),
+            action=action,
+            old_values=old_values or {},
+            new_values=new_values or {},
+            changed_fields=changed_fields or [],
+            reason=reason,
+            created_by=user,
+            **cls.get_request_context(request),
+        )
+
+        return audit_log
+
+    @staticmethod
+    def get_request_context(request):
+        """
+        Extract the audit context fields from an HTTP request.
+
+        Args:
+            request: HTTP request object (optional)
+
+        Returns:
+            dict: ip_address, user_agent and session_key values
+        """
         ip_address = None
         user_agent = None
         session_key = None
@@ -932,46 +1121,66 @@ class AuditLog(FullBaseModel):
             if hasattr(request, "session") and request.session.session_key:
                 session_key = request.session.session_key
 
-        # Create audit log entry
-        audit_log = cls.objects.create(
-            table_name=table_name,
-            record_id=record_id,
-            action=action,
-            old_values=old_values or {},
-            new_values=new_values or {},
-            changed_fields=changed_fields or [],
-            ip_address=ip_address,
-            user_agent=user_agent,
-            session_key=session_key,
-            reason=reason,
-            created_by=user,
-        )
-
-        return audit_log
+        return {
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "session_key": session_key,
+        }
 
     @classmethod
-    def get_record_history(cls, instance, limit=None):
+    def get_record_history(
+        cls, instance, limit=None, include_archived=False, until=None
+    ):
         """
         Get audit history for a specific record.
 
         Args:
             instance: Model instance to get history for
             limit: Maximum number of entries to return
+            include_archived: Also read entries moved to the audit archive
+            until: Only return entries created up to this datetime
 
         Returns:
-            QuerySet: Audit log entries for the record
+            QuerySet: Audit log entries for the record, or a list of entries
+            (newest first) when include_archived is True
         """
         table_name = instance._meta.db_table
         record_id = str(instance.pk)
 
-        queryset = cls.objects.filter(
-            table_name=table_name, record_id=record_id
-        ).order_by("-created_at")
+        queryset = (
+            cls.objects.filter(table_name=table_name, record_id=record_id)
+            .select_related("created_by")
+            .order_by("-created_at")
+        )
+
+        if until:
+            queryset = queryset.filter(created_at__lte=until)
 
         if limit:
             queryset = queryset[:limit]
 
-        return queryset
+        if not include_archived:
+            return queryset
+
+        # Archived months are older than every row still in the table
+        from .audit_archive import AuditArchive
+
+        history = list(queryset)
+        if limit and len(history) >= limit:
+            return history
+        remaining = limit - len(history) if limit else None
+
+        if until:
+            archived = [
+                entry
+                for entry in AuditArchive().get_record_history(table_name, record_id)
+                if entry.created_at <= until
+            ][:remaining]
+        else:
+            archived = AuditArchive().get_record_history(
+                table_name, record_id, limit=remaining
+            )
+        return history + archived
 
     @classmethod
     def can_rollback(cls, instance, target_log_id):
@@ -1023,24 +1232,27 @@ class AuditLog(FullBaseModel):
         Returns:
             tuple: (success: bool, message: str, instance: Model or None)
         """
-        try:
-            # Get the model class
-            from django.apps import apps
+        from .audit import (
+            capture_rollback,
+            get_audit_plan,
+            get_model_for_table,
+            get_state_before,
+        )
+        from .signals import set_audit_context
 
-            # For organization table, map to Organization model
-            if self.table_name == "organization_organization":
-                model_class = Organization
-            else:
-                # For other tables, you can extend this mapping
+        try:
+            model_class = get_model_for_table(self.table_name)
+            if model_class is None:
                 return (
                     False,
                     f"Rollback not supported for table {self.table_name}",
                     None,
                 )
+            plan = get_audit_plan(model_class)
 
             # Get the instance
             try:
-                instance = model_class.objects.get(pk=self.record_id)
+                instance = model_class._default_manager.get(pk=self.record_id)
             except model_class.DoesNotExist:
                 return False, _("Registro no encontrado para rollback."), None
 
@@ -1049,37 +1261,72 @@ class AuditLog(FullBaseModel):
             if not can_rollback:
                 return False, rollback_reason, None
 
-            # Store current values before rollback
-            current_values = {}
-            changed_fields = []
-
-            # Apply old values from this audit log
-            for field_name, old_value in (self.old_values or {}).items():
-                if hasattr(instance, field_name):
-                    current_values[field_name] = getattr(instance, field_name)
+            # Audit rows only store changed fields, so the target state is
+            # rebuilt from the nearest checkpoint before this entry
+            target_values = get_state_before(self)
+            current_raw = plan.raw_values(instance)
 
-                    # Only update if value is different
-                    if current_values[field_name] != old_value:
-                        setattr(instance, field_name, old_value)
-                        changed_fields.append(field_name)
+            # Apply the rebuilt state
+            changed_fields = plan.restore(instance, target_values)
 
-            # Save the instance if there are changes
+            # Save the instance if there are changes, recording a single
+            # versioned ROLLBACK entry instead of an UPDATE
             if changed_fields:
-                instance.save()
-
-                # Create rollback audit log
-                AuditLog.log_change(
-                    instance=instance,
-                    action=AuditLog.ACTION_ROLLBACK,
+                set_audit_context(
+                    instance,
                     user=user,
-                    old_values=current_values,
-                    new_values=self.old_values,
-                    changed_fields=changed_fields,
                     request=request,
                     reason=f'Rollback to {self.created_at}: {reason or ""}',
                 )
+                instance._audit_skip = True
+                # The restore and its ROLLBACK entry commit together
+                with transaction.atomic():
+                    instance.save()
+                    capture_rollback(instance, current_raw)
 
             return True, _("Rollback realizado exitosamente."), instance
 
         except Exception as e:
             return False, f"Error durante rollback: {str(e)}", None
+
+
+class AuditRecordVersion(models.Model):
+    """
+    Latest audit version of each audited record.
+
+    ``audit.number_rows`` locks the rows of the records it numbers, so
+    concurrent transactions writing entries of the same record take their
+    versions one after the other instead of both reading the same maximum.
+    """
+
+    table_name = models.CharField(
+        _("nombre de tabla"),
+        max_length=100,
+        help_text=_("Nombre de la tabla del registro."),
+    )
+
+    record_id = models.CharField(
+        _("ID del registro"),
+        max_length=36,
+        help_text=_("ID del registro auditado."),
+    )
+
+    last_version = models.PositiveIntegerField(
+        _("última versión"),
+        default=0,
+        help_text=_("Versión de la última entrada de auditoría del registro."),
+    )
+
+    class Meta:
+        verbose_name = _("versión de auditoría")
+        verbose_name_plural = _("versiones de auditoría")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["table_name", "record_id"],
+                name="unique_audit_version_per_record",
+            ),
+        ]
+
+    def __str__(self):
+        """Return string representation of the record version."""
+        return f"{self.table_name}:{self.record_id} v{self.last_version}"
@@ -0,0 +1,214 @@
+"""
+Monthly partitioning of the AuditLog table.
+
+On PostgreSQL the audit table is range-partitioned by ``created_at`` with
+one partition per month (``<table>_pYYYYMM``) and a default partition that
+catches rows outside the created months. Other backends keep a single
+table; the helpers report that partitioning is unsupported and callers fall
+back to row-level operations.
+
+The partitioned table can't carry the ``unique_audit_record_version``
+constraint, because PostgreSQL requires the partition key in every unique
+constraint of a partitioned table. Every partition gets the equivalent
+unique index instead (see ``add_unique_version_index``), so a version is
+unique within a month; across months only the ``AuditRecordVersion``
+counters keep it unique.
+"""
+
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from typing import Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+AUDIT_TABLE = "organization_auditlog"
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+UNIQUE_VERSION_SUFFIX = "_version_uniq"
+
+
+# ================================
+# Months
+# ================================
+
+
+def month_start(value) -> date:
+    """First day of the month of a date or datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """Shift the first day of a month by a number of months."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> Tuple[datetime, datetime]:
+    """Aware datetimes [start, end) covering a month."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    next_month = add_months(month, 1)
+    end = datetime(next_month.year, next_month.month, 1, tzinfo=dt_timezone.utc)
+    return start, end
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """Months from ``start`` up to, not including, ``end``."""
+    month = month_start(start)
+    while month < end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding a month."""
+    return f"{AUDIT_TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+# ================================
+# Introspection
+# ================================
+
+
+def supports_partitioning(connection) -> bool:
+    """Whether the backend supports declarative partitioning."""
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned(connection) -> bool:
+    """Whether the audit table is already a partitioned table."""
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [AUDIT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection) -> List[date]:
+    """
+    Months that have their own partition, oldest first.
+
+    Returns:
+        list: First day of each partitioned month (empty if unpartitioned)
+    """
+    if not is_partitioned(connection):
+        return []
+    prefix = f"{AUDIT_TABLE}_p"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s",
+            [AUDIT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    months = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            months.append(date(int(suffix[:4]), int(suffix[4:]), 1))
+    return sorted(months)
+
+
+# ================================
+# Maintenance
+# ================================
+
+
+def add_unique_version_index(cursor, qn, table: str) -> None:
+    """
+    Enforce ``unique_audit_record_version`` on one partition.
+
+    Args:
+        cursor: Cursor of the audit table's connection
+        qn: Identifier quoting function of the connection
+        table (str): Name of the partition
+    """
+    cursor.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {qn(table + UNIQUE_VERSION_SUFFIX)} "
+        f"ON {qn(table)} (table_name, record_id, version) WHERE version > 0"
+    )
+
+
+def ensure_partitions(connection, months_ahead: int = 3) -> List[date]:
+    """
+    Create the partitions of the current month and the next ones.
+
+    Rows that already landed in the default partition for one of those
+    months are moved into the new partition.
+
+    Args:
+        connection: Database connection
+        months_ahead (int): Number of future months to prepare
+
+    Returns:
+        list: Months whose partition was created
+    """
+    if not is_partitioned(connection):
+        return []
+
+    existing = set(list_partitions(connection))
+    current = month_start(timezone.now())
+    qn = connection.ops.quote_name
+    created = []
+
+    for month in iter_months(current, add_months(current, months_ahead + 1)):
+        if month in existing:
+            continue
+
+        name = partition_name(month)
+        start, end = month_bounds(month)
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            # Attaching checks that the default partition holds no row of the
+            # range, so they are moved into the new table first
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} "
+                f"(LIKE {qn(AUDIT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                f"INSERT INTO {qn(name)} SELECT * FROM moved",
+                [start, end],
+            )
+            add_unique_version_index(cursor, qn, name)
+            cursor.execute(
+                f"ALTER TABLE {qn(AUDIT_TABLE)} ATTACH PARTITION {qn(name)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+        created.append(month)
+    return created
+
+
+def drop_partition(connection, month: date) -> bool:
+    """
+    Detach and drop the partition of a month.
+
+    Returns:
+        bool: True if the partition existed
+    """
+    if month not in list_partitions(connection):
+        return False
+
+    qn = connection.ops.quote_name
+    name = partition_name(month)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(AUDIT_TABLE)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"DROP TABLE {qn(name)}")
+    return True
+
+
+def oldest_month(connection, model) -> Optional[date]:
+    """First month holding audit rows, partitioned or not."""
+    oldest = (
+        model._base_manager.using(connection.alias)
+        .order_by("created_at")
+        .values_list("created_at", flat=True)
+        .first()
+    )
+    return month_start(oldest) if oldest else None
@@ -0,0 +1,322 @@
+"""
+Bulk rollback of audited records.
+
+Reverts every record changed in a time window, by a user or from a session
+to the state it had before the first of those changes. Target entries,
+current rows and rebuilt states are loaded per table with a fixed number of
+queries; the rows are written with ``bulk_update`` and the ROLLBACK audit
+entries with one ``bulk_create``, all in one transaction.
+
+``bulk_update`` sends no model signals, so ``records_rolled_back`` is sent
+once per model with the updated instances for code that reacts to saves
+(e.g. cache invalidation).
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from apps.common.signals import records_rolled_back
+
+from .audit import (
+    flush_pending,
+    get_audit_plan,
+    get_model_for_table,
+    get_states_before,
+    number_rows,
+)
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+ROLLBACK_ACTIONS = [
+    AuditLog.ACTION_CREATE,
+    AuditLog.ACTION_UPDATE,
+    AuditLog.ACTION_DELETE,
+]
+
+
+class RecordRollback:
+    """
+    Planned rollback of one record.
+
+    Attributes:
+        model: Model class of the record
+        instance: Current instance, with the restored values already set
+        target_log (AuditLog): First entry being reverted
+        state (dict): Full encoded state being restored
+        changes (dict): Field name to (current, restored) encoded values
+    """
+
+    def __init__(self, model, instance, target_log, state, changes):
+        self.model = model
+        self.instance = instance
+        self.target_log = target_log
+        self.state = state
+        self.changes = changes
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Describe the planned diff."""
+        return {
+            "table_name": self.target_log.table_name,
+            "record_id": self.target_log.record_id,
+            "rollback_to": self.target_log.created_at,
+            "changes": {
+                name: {"current": current, "restored": restored}
+                for name, (current, restored) in self.changes.items()
+            },
+        }
+
+
+def find_target_logs(
+    since=None,
+    until=None,
+    user=None,
+    session_key: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    table_names: Optional[List[str]] = None,
+    organization_ids: Optional[Iterable] = None,
+    using: str = "default",
+) -> List[AuditLog]:
+    """
+    First matching audit entry of every record changed by the criteria.
+
+    Args:
+        since (datetime): Changes made at or after this time
+        until (datetime): Changes made at or before this time
+        user: User who made the changes
+        session_key (str): Session the changes were made from
+        ip_address (str): IP address the changes were made from
+        table_names (list): Only records of these tables
+        organization_ids (iterable): Only records of these organizations
+            (tenants); None for every organization
+
+    Returns:
+        list: One AuditLog per record, ordered by table and record
+
+    Raises:
+        ValueError: If no criterion is given
+    """
+    filters = {}
+    if since is not None:
+        filters["created_at__gte"] = since
+    if until is not None:
+        filters["created_at__lte"] = until
+    if user is not None:
+        filters["created_by"] = user
+    if session_key:
+        filters["session_key"] = session_key
+    if ip_address:
+        filters["ip_address"] = ip_address
+    if not filters:
+        raise ValueError("At least one rollback criterion is required")
+    if table_names:
+        filters["table_name__in"] = table_names
+    if organization_ids is not None:
+        filters["organization_id__in"] = list(organization_ids)
+
+    flush_pending(using)
+    entries = (
+        AuditLog._base_manager.using(using)
+        .filter(action__in=ROLLBACK_ACTIONS, **filters)
+        .order_by("table_name", "record_id", "created_at", "version")
+        .only(
+            "id",
+            "table_name",
+            "record_id",
+            "action",
+            "old_values",
+            "created_at",
+            "version",
+        )
+    )
+
+    targets = []
+    seen = set()
+    for entry in entries.iterator(chunk_size=2000):
+        key = (entry.table_name, entry.record_id)
+        if key not in seen:
+            seen.add(key)
+            targets.append(entry)
+    return targets
+
+
+def plan_bulk_rollback(
+    lock: bool = False, using: str = "default", **criteria
+) -> Tuple[List[RecordRollback], List[Dict[str, Any]]]:
+    """
+    Work out the rollback of every record matching the criteria.
+
+    Args:
+        lock (bool): Lock the current rows (inside a transaction)
+        using (str): Database alias
+        **criteria: Arguments of ``find_target_logs``
+
+    Returns:
+        tuple: (planned rollbacks with changes, skipped records with reason)
+    """
+    plans: List[RecordRollback] = []
+    skipped: List[Dict[str, Any]] = []
+
+    by_table: Dict[str, List[AuditLog]] = {}
+    for log in find_target_logs(using=using, **criteria):
+        by_table.setdefault(log.table_name, []).append(log)
+
+    def skip(log, reason):
+        skipped.append(
+            {"table_name": log.table_name, "record_id": log.record_id, "reason": reason}
+        )
+
+    for table_name, logs in by_table.items():
+        model = get_model_for_table(table_name)
+        if model is None:
+            for log in logs:
+                skip(log, _("Rollback no soportado para esta tabla."))
+            continue
+
+        # Records created by the reverted changes have no previous state
+        candidates = []
+        for log in logs:
+            if log.action == AuditLog.ACTION_CREATE:
+                skip(log, _("El registro fue creado en los cambios a revertir."))
+            else:
+                candidates.append(log)
+        if not candidates:
+            continue
+
+        manager = model._base_manager.using(using)
+        if lock:
+            manager = manager.select_for_update()
+        instances = {
+            str(pk): instance
+            for pk, instance in manager.in_bulk(
+                [log.record_id for log in candidates]
+            ).items()
+        }
+
+        present = []
+        for log in candidates:
+            if log.record_id in instances:
+                present.append(log)
+            else:
+                skip(log, _("Registro no encontrado para rollback."))
+
+        audit_plan = get_audit_plan(model)
+        states = get_states_before(present, using=using)
+        for log in present:
+            instance = instances[log.record_id]
+            state = states[log.record_id]
+            current = audit_plan.encode(audit_plan.raw_values(instance))
+            changed_fields = audit_plan.restore(instance, state)
+            if not changed_fields:
+                continue
+            plans.append(
+                RecordRollback(
+                    model,
+                    instance,
+                    log,
+                    state,
+                    {name: (current[name], state[name]) for name in changed_fields},
+                )
+            )
+    return plans, skipped
+
+
+def bulk_rollback(
+    dry_run: bool = False,
+    performed_by=None,
+    request=None,
+    reason: Optional[str] = None,
+    using: str = "default",
+    **criteria,
+) -> Dict[str, Any]:
+    """
+    Revert every record matching the criteria in one transaction.
+
+    Args:
+        dry_run (bool): Only report the planned diff
+        performed_by: User performing the rollback
+        request: HTTP request object for the audit context
+        reason (str): Reason for the rollback
+        using (str): Database alias
+        **criteria: Arguments of ``find_target_logs``
+
+    Returns:
+        dict: dry_run flag, planned/applied records with their diff,
+        skipped records and the number of reverted records
+    """
+    with transaction.atomic(using=using):
+        plans, skipped = plan_bulk_rollback(lock=not dry_run, using=using, **criteria)
+
+        if not dry_run and plans:
+            _apply_rollbacks(plans, performed_by, request, reason, using)
+
+    return {
+        "dry_run": dry_run,
+        "count": len(plans),
+        "records": [plan.as_dict() for plan in plans],
+        "skipped": skipped,
+    }
+
+
+def _apply_rollbacks(plans, performed_by, request, reason, using):
+    now = timezone.now()
+    request_context = AuditLog.get_request_context(request)
+
+    by_model: Dict[type, List[RecordRollback]] = {}
+    for plan in plans:
+        by_model.setdefault(plan.model, []).append(plan)
+
+    rows = []
+    snapshots = []
+    for model, model_plans in by_model.items():
+        audit_plan = get_audit_plan(model)
+        attnames = {name: attname for name, attname, _encoder in audit_plan.fields}
+
+        fields = set()
+        for plan in model_plans:
+            fields.update(attnames[name] for name in plan.changes)
+
+        # bulk_update skips save(), so the bookkeeping fields are set here
+        for field in model._meta.concrete_fields:
+            if getattr(field, "auto_now", False):
+                fields.add(field.attname)
+                for plan in model_plans:
+                    setattr(plan.instance, field.attname, now)
+        if performed_by is not None and any(
+            field.name == "updated_by" for field in model._meta.concrete_fields
+        ):
+            fields.add("updated_by_id")
+            for plan in model_plans:
+                plan.instance.updated_by = performed_by
+
+        instances = [plan.instance for plan in model_plans]
+        model._base_manager.using(using).bulk_update(
+            instances, sorted(fields), batch_size=500
+        )
+
+        for plan in model_plans:
+            rows.append(
+                AuditLog(
+                    table_name=plan.target_log.table_name,
+                    record_id=plan.target_log.record_id,
+                    organization_id=audit_plan.tenant_of(plan.instance),
+                    action=AuditLog.ACTION_ROLLBACK,
+                    old_values={name: pair[0] for name, pair in plan.changes.items()},
+                    new_values={name: pair[1] for name, pair in plan.changes.items()},
+                    changed_fields=list(plan.changes),
+                    reason=f'Rollback to {plan.target_log.created_at}: {reason or ""}',
+                    created_by=performed_by,
+                    **request_context,
+                )
+            )
+            snapshots.append(audit_plan.encode(audit_plan.raw_values(plan.instance)))
+
+        records_rolled_back.send(sender=model, instances=instances)
+
+    number_rows(rows, snapshots, using)
+    AuditLog.objects.using(using).bulk_create(rows)
+    logger.info(f"Bulk rollback reverted {len(rows)} records")
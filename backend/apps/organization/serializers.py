@@ -6,8 +6,32 @@ providing API serialization and validation.
 """
 
 from rest_framework import serializers
+from django.core.validators import RegexValidator
+from django.db.models import Prefetch
 from django.utils.translation import gettext_lazy as _
+
+from apps.common import counters as counter_store
+from apps.common.counters import counter_value
+from apps.common.query_planning import requires
+from .counters import ORGANIZATION_ACTIVE_LOCATIONS
 from .models import Organization, Location, SectorTemplate, AuditLog
+from .tenancy import TenantContext
+
+ACTIVE_LOCATIONS_COUNTER = counter_value(ORGANIZATION_ACTIVE_LOCATIONS)
+
+
+class ActiveLocationsCountMixin:
+    """
+    Adds ``active_locations_count`` read from the materialized counter.
+    """
+
+    @requires(annotate={"active_locations_counter": ACTIVE_LOCATIONS_COUNTER})
+    def get_active_locations_count(self, obj):
+        """Get the number of active locations of the organization."""
+        value = getattr(obj, "active_locations_counter", None)
+        if value is None:
+            value = counter_store.get(ORGANIZATION_ACTIVE_LOCATIONS, obj.pk)
+        return value
 
 
 class LocationSerializer(serializers.ModelSerializer):
@@ -22,6 +46,10 @@ class LocationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Location
+        # Columns read by the model properties rendered as fields
+        source_columns = {
+            "direccion_completa": ("direccion", "ciudad", "departamento", "pais"),
+        }
         fields = [
             "id",
             "organization",
@@ -123,6 +151,11 @@ class LocationListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Location
+        source_columns = {
+            "direccion_completa": ("direccion", "ciudad", "departamento", "pais"),
+        }
+        # Listed from rows, see apps.common.compiled
+        compiled = True
         fields = [
             "id",
             "organization",
@@ -137,6 +170,10 @@ class LocationListSerializer(serializers.ModelSerializer):
             "is_active",
         ]
 
+    @requires(
+        select=["organization"],
+        columns=["organization__razon_social", "organization__nombre_comercial"],
+    )
     def get_organization(self, obj):
         """Get organization data."""
         return {
@@ -146,7 +183,7 @@ class LocationListSerializer(serializers.ModelSerializer):
         }
 
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(ActiveLocationsCountMixin, serializers.ModelSerializer):
     """
     Complete serializer for Organization model.
 
@@ -157,9 +194,11 @@ class OrganizationSerializer(serializers.ModelSerializer):
     nit_completo = serializers.ReadOnlyField()
     locations = LocationListSerializer(many=True, read_only=True)
     sede_principal = serializers.SerializerMethodField()
+    active_locations_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Organization
+        source_columns = {"nit_completo": ("nit", "digito_verificacion")}
         fields = [
             "id",
             "razon_social",
@@ -178,6 +217,7 @@ class OrganizationSerializer(serializers.ModelSerializer):
             "telefono_principal",
             "locations",
             "sede_principal",
+            "active_locations_count",
             "is_active",
             "created_at",
             "updated_at",
@@ -189,23 +229,38 @@ class OrganizationSerializer(serializers.ModelSerializer):
             "nit_completo",
             "locations",
             "sede_principal",
+            "active_locations_count",
             "created_at",
             "updated_at",
             "created_by",
             "updated_by",
         ]
 
+    @requires(
+        prefetch=[
+            Prefetch(
+                "locations",
+                queryset=Location.objects.filter(es_principal=True),
+                to_attr="main_locations",
+            )
+        ]
+    )
     def get_sede_principal(self, obj):
         """
         Get the main location for the organization.
 
+        Uses the ``main_locations`` prefetched by the view when available.
+
         Args:
             obj (Organization): Organization instance
 
         Returns:
             dict or None: Main location data or None if no main location
         """
-        main_location = obj.locations.filter(es_principal=True).first()
+        if hasattr(obj, "main_locations"):
+            main_location = obj.main_locations[0] if obj.main_locations else None
+        else:
+            main_location = obj.locations.filter(es_principal=True).first()
         if main_location:
             return LocationListSerializer(main_location).data
         return None
@@ -324,7 +379,49 @@ class OrganizationCreateSerializer(OrganizationSerializer):
         return super().create(validated_data)
 
 
-class OrganizationListSerializer(serializers.ModelSerializer):
+class OrganizationImportSerializer(OrganizationCreateSerializer):
+    """
+    Validates one row of an organization import.
+
+    NIT uniqueness is checked for the whole batch by the importer (see
+    ``imports``), so the per-row unique validator is left out.
+    """
+
+    class Meta(OrganizationCreateSerializer.Meta):
+        fields = [
+            field for field in OrganizationCreateSerializer.Meta.fields if field != "logo"
+        ]
+        # The model's format check, without the unique query of each row
+        extra_kwargs = {
+            "nit": {
+                "validators": [
+                    validator
+                    for validator in Organization._meta.get_field("nit").validators
+                    if isinstance(validator, RegexValidator)
+                ]
+            },
+        }
+
+
+class LocationImportSerializer(LocationCreateSerializer):
+    """
+    Validates one row of a location import.
+
+    The organization is given by its NIT and resolved, together with the
+    main location check, for the whole batch by the importer.
+    """
+
+    organization_nit = serializers.CharField(max_length=15, write_only=True)
+
+    class Meta(LocationCreateSerializer.Meta):
+        fields = LocationCreateSerializer.Meta.fields + ["organization_nit"]
+
+    def validate_organization_nit(self, value):
+        """Keep only the digits, as organization NITs are stored."""
+        return "".join(filter(str.isdigit, value))
+
+
+class OrganizationListSerializer(ActiveLocationsCountMixin, serializers.ModelSerializer):
     """
     Simplified serializer for organization listings.
 
@@ -332,9 +429,15 @@ class OrganizationListSerializer(serializers.ModelSerializer):
     """
 
     nit_completo = serializers.ReadOnlyField()
+    active_locations_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Organization
+        source_columns = {"nit_completo": ("nit", "digito_verificacion")}
+        compiled = True
+        expandable_fields = {
+            "locations": (LocationListSerializer, {"many": True}),
+        }
         fields = [
             "id",
             "razon_social",
@@ -345,6 +448,7 @@ class OrganizationListSerializer(serializers.ModelSerializer):
             "tipo_organizacion",
             "sector_economico",
             "is_active",
+            "active_locations_count",
         ]
 
 
@@ -503,6 +607,7 @@ class SectorTemplateSerializer(serializers.ModelSerializer):
             "updated_by",
         ]
 
+    @requires(columns=["data_json"])
     def get_elementos_template(self, obj):
         """
         Get summary of template elements.
@@ -583,6 +688,7 @@ class SectorTemplateListSerializer(serializers.ModelSerializer):
             "is_active",
         ]
 
+    @requires(columns=["data_json"])
     def get_total_elementos(self, obj):
         """
         Get total count of template elements.
@@ -648,6 +754,14 @@ class SectorTemplateApplySerializer(serializers.Serializer):
         help_text=_("ID de la organización a la que aplicar el template.")
     )
 
+    def get_organizations(self):
+        """Active organizations the requesting user may work on."""
+        organizations = Organization.objects.filter(is_active=True)
+        request = self.context.get("request")
+        if request is None:
+            return organizations
+        return TenantContext.for_request(request).scope(organizations)
+
     def validate_organization_id(self, value):
         """
         Validate that organization exists and is active.
@@ -661,9 +775,7 @@ class SectorTemplateApplySerializer(serializers.Serializer):
         Raises:
             ValidationError: If organization is invalid
         """
-        try:
-            organization = Organization.objects.get(id=value, is_active=True)
-        except Organization.DoesNotExist:
+        if not self.get_organizations().filter(id=value).exists():
             raise serializers.ValidationError(
                 _("Organización no encontrada o inactiva.")
             )
@@ -688,7 +800,7 @@ class SectorTemplateApplySerializer(serializers.Serializer):
 
         # Obtener la organización
         try:
-            organization = Organization.objects.get(id=organization_id, is_active=True)
+            organization = self.get_organizations().get(id=organization_id)
         except Organization.DoesNotExist:
             raise serializers.ValidationError(_("Organización no encontrada."))
 
@@ -746,6 +858,8 @@ class AuditLogSerializer(serializers.ModelSerializer):
             "old_values",
             "new_values",
             "changed_fields",
+            "version",
+            "is_checkpoint",
             "ip_address",
             "user_agent",
             "session_key",
@@ -756,12 +870,14 @@ class AuditLogSerializer(serializers.ModelSerializer):
             "created_at_formatted",
         ]
 
+    @requires(select=["created_by"])
     def get_user_name(self, obj):
         """Get user's full name or email."""
         if obj.created_by:
             return obj.created_by.get_full_name() or obj.created_by.email
         return _("Sistema")
 
+    @requires(select=["created_by"])
     def get_user_email(self, obj):
         """Get user's email."""
         if obj.created_by:
@@ -786,6 +902,7 @@ class AuditLogListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AuditLog
+        compiled = True
         fields = [
             "id",
             "table_name",
@@ -799,12 +916,17 @@ class AuditLogListSerializer(serializers.ModelSerializer):
             "created_at",
         ]
 
+    @requires(
+        select=["created_by"],
+        columns=["created_by__first_name", "created_by__last_name", "created_by__email"],
+    )
     def get_user_name(self, obj):
         """Get user's full name or email."""
         if obj.created_by:
             return obj.created_by.get_full_name() or obj.created_by.email
         return _("Sistema")
 
+    @requires(columns=["record_id"])
     def get_record_id_short(self, obj):
         """Get shortened record ID."""
         if obj.record_id:
@@ -837,6 +959,55 @@ class RollbackRequestSerializer(serializers.Serializer):
             raise serializers.ValidationError(_("Audit log no encontrado."))
 
 
+class BulkRollbackRequestSerializer(serializers.Serializer):
+    """
+    Serializer for bulk rollback requests.
+
+    Selects the changes to revert by time window, user and/or session;
+    at least one criterion is required.
+    """
+
+    since = serializers.DateTimeField(
+        required=False, help_text=_("Revertir cambios desde esta fecha.")
+    )
+    until = serializers.DateTimeField(
+        required=False, help_text=_("Revertir cambios hasta esta fecha.")
+    )
+    user_id = serializers.UUIDField(
+        required=False, help_text=_("Revertir cambios hechos por este usuario.")
+    )
+    session_key = serializers.CharField(
+        max_length=40,
+        required=False,
+        help_text=_("Revertir cambios hechos desde esta sesión."),
+    )
+    ip_address = serializers.IPAddressField(
+        required=False, help_text=_("Revertir cambios hechos desde esta IP.")
+    )
+    dry_run = serializers.BooleanField(
+        default=False, help_text=_("Solo reportar los cambios planeados.")
+    )
+    reason = serializers.CharField(
+        max_length=500,
+        required=False,
+        allow_blank=True,
+        help_text=_("Razón para el rollback."),
+    )
+
+    def validate(self, attrs):
+        """Validate that the changes to revert are selected."""
+        criteria = ("since", "until", "user_id", "session_key", "ip_address")
+        if not any(attrs.get(name) for name in criteria):
+            raise serializers.ValidationError(
+                _("Indique al menos un criterio: since, until, user_id, session_key o ip_address.")
+            )
+        if attrs.get("since") and attrs.get("until") and attrs["since"] > attrs["until"]:
+            raise serializers.ValidationError(
+                {"until": _("Debe ser posterior a since.")}
+            )
+        return attrs
+
+
 class OrganizationHistorySerializer(serializers.Serializer):
     """
     Serializer for organization history requests.
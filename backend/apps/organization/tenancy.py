@@ -0,0 +1,342 @@
+"""
+Tenant resolution for ZentraQMS.
+
+Users work in the organizations they are members of
+(``OrganizationMembership``). ``TenantContext`` resolves them once per
+request, from a cache entry keyed by the user id and a generation counter
+that is renewed whenever the user's memberships change, and:
+
+- scopes querysets of the tenant models (Organization, Location, AuditLog)
+  to those organizations (``scope``);
+- picks the organization the request works on: the one named in the
+  ``X-Organization-ID`` header, else the user's default membership, else
+  their only organization (``organization``).
+
+Superusers are global: their querysets are not scoped and the header may
+name any organization. ``TenantScopedMixin`` applies the scope to the
+queryset of a ViewSet and to the related-record fields of its serializers.
+"""
+
+import logging
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Organization, OrganizationMembership
+
+logger = logging.getLogger(__name__)
+
+TENANT_HEADER = "X-Organization-ID"
+
+# Lookup of the organization id of each tenant model
+_tenant_fields: Dict[type, str] = {}
+
+_UNSET = object()
+
+
+def register(model, field: str) -> None:
+    """
+    Scope a model by tenant.
+
+    Args:
+        model: Model class
+        field (str): Lookup of the organization id (``pk`` for Organization)
+    """
+    _tenant_fields[model] = field
+
+
+def get_tenant_field(model) -> Optional[str]:
+    """Lookup of the organization id of a model, or None if it is shared."""
+    return _tenant_fields.get(model)
+
+
+def _as_uuid(value) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class MembershipCache:
+    """
+    Cache of the organizations each user is a member of.
+
+    Entries embed the user's generation counter. Invalidating renews the
+    counter once the transaction commits, so an entry built concurrently
+    from the previous memberships is never served.
+    """
+
+    CACHE_PREFIX = "tenancy"
+    CACHE_TIMEOUT = getattr(settings, "TENANT_CACHE_TIMEOUT", 300)  # 5 minutes
+
+    @classmethod
+    def generation_key(cls, user_id) -> str:
+        return f"{cls.CACHE_PREFIX}:gen:{user_id}"
+
+    @classmethod
+    def get_generation(cls, user_id) -> int:
+        """
+        Get the current generation of a user, initializing it if missing.
+
+        A missing counter starts at a nanosecond timestamp, so it never
+        repeats a generation whose entries may still be cached.
+        """
+        key = cls.generation_key(user_id)
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, time.time_ns(), None)
+            generation = cache.get(key, 0)
+        return generation
+
+    @classmethod
+    def get(cls, user_id) -> Tuple[Tuple[str, ...], Optional[str]]:
+        """
+        Get the organizations of a user, loading them on a cache miss.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            tuple: (ids of the user's organizations not deleted, id of the
+            default one or None)
+        """
+        key = f"{cls.CACHE_PREFIX}:{user_id}:g{cls.get_generation(user_id)}"
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+        organization_ids = []
+        default_id = None
+        rows = (
+            OrganizationMembership.objects.filter(
+                user_id=user_id, organization__deleted_at__isnull=True
+            )
+            .order_by("-is_default", "created_at")
+            .values_list("organization_id", "is_default")
+        )
+        for organization_id, is_default in rows:
+            organization_ids.append(str(organization_id))
+            if is_default:
+                default_id = str(organization_id)
+
+        entry = (tuple(organization_ids), default_id)
+        cache.set(key, entry, cls.CACHE_TIMEOUT)
+        return entry
+
+    @classmethod
+    def invalidate(cls, user_ids: Iterable, using: str = "default") -> None:
+        """
+        Renew the generation of users once the current transaction commits.
+
+        Args:
+            user_ids: IDs of the users whose memberships changed
+            using (str): Database alias of the change
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+
+        def renew():
+            generation = time.time_ns()
+            cache.set_many(
+                {cls.generation_key(user_id): generation for user_id in user_ids},
+                None,
+            )
+            logger.debug(f"Tenant memberships invalidated: {len(user_ids)} users")
+
+        transaction.on_commit(renew, using=using)
+
+    @classmethod
+    def invalidate_organization(cls, organization_id, using: str = "default") -> None:
+        """Invalidate every member of an organization (e.g. when deleted)."""
+        cls.invalidate_organizations([organization_id], using=using)
+
+    @classmethod
+    def invalidate_organizations(
+        cls, organization_ids: Iterable, using: str = "default"
+    ) -> None:
+        """Invalidate every member of some organizations, with one query."""
+        cls.invalidate(
+            OrganizationMembership.objects.using(using)
+            .filter(organization_id__in=list(organization_ids))
+            .values_list("user_id", flat=True),
+            using=using,
+        )
+
+
+def add_members(organizations: Iterable[Organization], user, using: str = "default"):
+    """
+    Make a user a member of organizations (e.g. the ones they created).
+
+    If the user has no default organization yet, the first one becomes it.
+    Existing memberships are left as they are.
+
+    Args:
+        organizations (iterable): Saved organizations
+        user: User joining them
+        using (str): Database alias
+    """
+    organizations = list(organizations)
+    if not organizations or user is None or not user.is_authenticated:
+        return
+
+    memberships = OrganizationMembership.objects.using(using)
+    has_default = memberships.filter(user=user, is_default=True).exists()
+    memberships.bulk_create(
+        [
+            OrganizationMembership(
+                organization=organization,
+                user=user,
+                is_default=not has_default and index == 0,
+                created_by=user,
+                updated_by=user,
+            )
+            for index, organization in enumerate(organizations)
+        ],
+        ignore_conflicts=True,
+    )
+    # bulk_create sends no signals
+    MembershipCache.invalidate([user.pk], using=using)
+
+
+class TenantContext:
+    """
+    Organizations of the user of a request, resolved on first use.
+    """
+
+    def __init__(self, user, requested=None):
+        self.user = user
+        self.requested = requested
+        self._entry = None
+        self._organization = _UNSET
+
+    @classmethod
+    def for_request(cls, request) -> "TenantContext":
+        """
+        Get the context of a request, creating it if missing.
+
+        Accepts both ``HttpRequest`` and DRF's ``Request``; the context is
+        kept on the underlying ``HttpRequest`` and rebuilt if the user
+        changed (e.g. after DRF's JWT authentication).
+        """
+        http_request = getattr(request, "_request", request)
+        user = getattr(request, "user", None)
+
+        context = getattr(http_request, "_tenant_context", None)
+        if context is None or context.user is not user:
+            context = cls(user, requested=http_request.headers.get(TENANT_HEADER))
+            http_request._tenant_context = context
+        return context
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(self.user and self.user.is_authenticated)
+
+    @property
+    def is_global(self) -> bool:
+        """Whether the user sees every organization (superusers)."""
+        return self.is_authenticated and self.user.is_superuser
+
+    def _load(self) -> Tuple[Tuple[str, ...], Optional[str]]:
+        if self._entry is None:
+            self._entry = (
+                MembershipCache.get(self.user.pk) if self.is_authenticated else ((), None)
+            )
+        return self._entry
+
+    @property
+    def organization_ids(self) -> Tuple[str, ...]:
+        """IDs of the organizations the user is a member of."""
+        return self._load()[0]
+
+    def has_access(self, organization_id) -> bool:
+        """Whether the user may work on an organization."""
+        if self.is_global:
+            return True
+        return str(organization_id) in self.organization_ids
+
+    @property
+    def organization_id(self) -> Optional[str]:
+        """
+        ID of the organization the request works on, or None.
+
+        A header naming an organization the user can not access gives None
+        rather than falling back to another organization.
+        """
+        if self.requested:
+            requested = _as_uuid(self.requested)
+            if requested is None or not self.has_access(requested):
+                return None
+            return requested
+
+        organization_ids, default_id = self._load()
+        if default_id is not None:
+            return default_id
+        if len(organization_ids) == 1:
+            return organization_ids[0]
+        return None
+
+    @property
+    def organization(self) -> Optional[Organization]:
+        """The organization the request works on, loaded once per request."""
+        if self._organization is _UNSET:
+            organization_id = self.organization_id
+            self._organization = None
+            if organization_id is not None:
+                try:
+                    self._organization = Organization.objects.get(pk=organization_id)
+                except Organization.DoesNotExist:
+                    pass
+        return self._organization
+
+    def set_organization(self, organization: Organization) -> None:
+        """Use an organization just created for the rest of the request."""
+        self._organization = organization
+
+    def scope(self, queryset):
+        """
+        Limit a queryset of a tenant model to the user's organizations.
+
+        Querysets of shared models, and all querysets of global users, are
+        returned unchanged.
+        """
+        if self.is_global:
+            return queryset
+        field = get_tenant_field(queryset.model)
+        if field is None:
+            return queryset
+        if not self.organization_ids:
+            return queryset.none()
+        return queryset.filter(**{f"{field}__in": self.organization_ids})
+
+
+class TenantScopedMixin:
+    """
+    ViewSet mixin limiting the records of a tenant model to the user's
+    organizations.
+
+    The scope applies to ``get_queryset()`` (so list, detail, export and
+    conditional requests) and to the querysets of the related-record fields
+    of write serializers, so a record can not be attached to another
+    tenant's organization.
+    """
+
+    @property
+    def tenant(self) -> TenantContext:
+        return TenantContext.for_request(self.request)
+
+    def get_queryset(self):
+        return self.tenant.scope(super().get_queryset())
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if kwargs.get("data") is not None and hasattr(serializer, "fields"):
+            for field in serializer.fields.values():
+                queryset = getattr(field, "queryset", None)
+                if queryset is not None:
+                    field.queryset = self.tenant.scope(queryset)
+        return serializer
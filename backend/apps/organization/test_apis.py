@@ -24,6 +24,7 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.organization.audit import flush_pending
 from apps.organization.models import Organization, Location, SectorTemplate, AuditLog
 from apps.organization.serializers import OrganizationSerializer, LocationSerializer
 
@@ -171,6 +172,12 @@ class OrganizationAPITests(APITestCase):
 
     def test_organization_wizard_step1(self):
         """Test organization wizard step 1 endpoint."""
+        from apps.organization.models import OrganizationMembership
+
+        # The wizard updates the user's organization
+        OrganizationMembership.objects.create(
+            organization=self.existing_org, user=self.user, is_default=True
+        )
         url = reverse("organization:organization-wizard-step1")
         response = self.client.post(url, self.valid_organization_data, format="json")
 
@@ -209,6 +216,249 @@ class OrganizationAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class OrganizationAsOfAPITests(APITestCase):
+    """Test suite for point-in-time reads of organizations."""
+
+    def setUp(self):
+        """Set up test data with a dated audit history."""
+        from datetime import datetime, timezone as dt_timezone
+
+        self.user = User.objects.create_user(
+            email="asof@example.com", password="testpass123", is_superuser=True
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization = Organization.objects.create(
+                razon_social="Original Name",
+                nit="900555555",
+                digito_verificacion="5",
+                tipo_organizacion="empresa_privada",
+                sector_economico="salud",
+                tamaño_empresa="grande",
+            )
+        self.organization.razon_social = "Current Name"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization.save()
+
+        history = AuditLog.objects.filter(record_id=str(self.organization.pk))
+        history.filter(action=AuditLog.ACTION_CREATE).update(
+            created_at=datetime(2025, 1, 10, tzinfo=dt_timezone.utc)
+        )
+        history.filter(action=AuditLog.ACTION_UPDATE).update(
+            created_at=datetime(2025, 8, 1, tzinfo=dt_timezone.utc)
+        )
+
+    def test_retrieve_as_of(self):
+        """Test retrieving the state of an organization at a past date."""
+        url = reverse("organization:organization-detail", args=[self.organization.pk])
+
+        response = self.client.get(url, {"as_of": "2025-06-30"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["razon_social"], "Original Name")
+        self.assertEqual(response.data["nit"], "900555555")
+
+    def test_retrieve_before_creation_is_not_found(self):
+        """Test that no state exists before the organization was created."""
+        url = reverse("organization:organization-detail", args=[self.organization.pk])
+
+        response = self.client.get(url, {"as_of": "2024-12-31"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_as_of(self):
+        """Test that an invalid as_of value is rejected."""
+        url = reverse("organization:organization-detail", args=[self.organization.pk])
+
+        response = self.client.get(url, {"as_of": "not-a-date"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_as_of_in_bulk(self):
+        """Test rebuilding every organization at a date in bulk."""
+        url = reverse("organization:organization-list")
+
+        response = self.client.get(url, {"as_of": "2025-09-30T23:59:59Z"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [state["razon_social"] for state in response.data["results"]]
+        self.assertEqual(names, ["Current Name"])
+
+    def test_audit_history_as_of(self):
+        """Test that audit history stops at as_of and includes the state."""
+        url = reverse(
+            "organization:organization-audit-history", args=[self.organization.pk]
+        )
+
+        response = self.client.get(url, {"as_of": "2025-06-30"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["state"]["razon_social"], "Original Name")
+
+
+class KeysetPaginationAPITests(APITestCase):
+    """Test suite for cursor pagination of organization lists and history."""
+
+    def setUp(self):
+        """Set up organizations sharing ordering values."""
+        self.user = User.objects.create_user(
+            email="pages@example.com", password="testpass123", is_superuser=True
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        for i in range(5):
+            Organization.objects.create(
+                # Duplicate names exercise the primary key tie-breaker
+                razon_social=f"Organization {i // 2}",
+                nit=f"90012300{i}",
+                digito_verificacion="1",
+                tipo_organizacion="empresa_privada",
+                sector_economico="salud",
+                tamaño_empresa="grande",
+            )
+
+    def collect(self, url, params):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            if not response.data["next"]:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_walks_every_row_once(self):
+        """Test that following next links returns each organization once."""
+        url = reverse("organization:organization-list")
+
+        pages = self.collect(url, {"page_size": 2})
+
+        ids = [row["id"] for page in pages for row in page["results"]]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(pages[0]["count"], 5)
+
+    def test_previous_link_returns_prior_page(self):
+        """Test that the previous link of a page returns the page before it."""
+        url = reverse("organization:organization-list")
+        first = self.client.get(url, {"page_size": 2}).data
+        second = self.client.get(first["next"]).data
+
+        back = self.client.get(second["previous"]).data
+
+        self.assertEqual(
+            [row["id"] for row in back["results"]],
+            [row["id"] for row in first["results"]],
+        )
+
+    def test_count_opt_out(self):
+        """Test that count=false skips the total count."""
+        url = reverse("organization:organization-list")
+
+        response = self.client.get(url, {"page_size": 2, "count": "false"})
+
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        url = reverse("organization:organization-list")
+
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_audit_history_pages(self):
+        """Test that audit history is paged by cursor without a total."""
+        organization = Organization.objects.first()
+        # With the CREATE entry buffered in setUp, three entries
+        for i in range(2):
+            AuditLog.log_change(
+                instance=organization, action=AuditLog.ACTION_UPDATE, reason=str(i)
+            )
+        url = reverse("organization:organization-audit-history", args=[organization.pk])
+
+        first = self.client.get(url, {"limit": 2}).data
+        second = self.client.get(first["next"]).data
+
+        self.assertNotIn("total", first)
+        self.assertEqual(first["count"], 2)
+        self.assertEqual(second["count"], 1)
+        self.assertIsNone(second["next"])
+        ids = [log["id"] for log in first["audit_logs"] + second["audit_logs"]]
+        self.assertEqual(len(set(ids)), 3)
+        # The buffered entry keeps the time of the change, before the others
+        self.assertEqual(second["audit_logs"][0]["action"], AuditLog.ACTION_CREATE)
+
+
+class SerializerQueryPlanTests(TestCase):
+    """Test suite for serializer-driven query planning of organizations."""
+
+    def setUp(self):
+        """Set up organizations with a main and a secondary location."""
+        for i in range(3):
+            organization = Organization.objects.create(
+                razon_social=f"Planned Organization {i}",
+                nit=f"90045600{i}",
+                digito_verificacion="1",
+                tipo_organizacion="empresa_privada",
+                sector_economico="salud",
+                tamaño_empresa="grande",
+            )
+            for j, principal in enumerate((True, False)):
+                Location.objects.create(
+                    organization=organization,
+                    nombre=f"Sede {i}-{j}",
+                    tipo_sede="principal" if principal else "sucursal",
+                    es_principal=principal,
+                    direccion="Calle 1",
+                    ciudad="Bogotá",
+                    departamento="Cundinamarca",
+                )
+
+    def test_plan_prefetches_locations_and_main_location(self):
+        """Test that nested and method fields are loaded in bulk."""
+        from apps.common.query_planning import get_query_plan
+
+        plan = get_query_plan(OrganizationSerializer)
+
+        self.assertIn("locations", plan.prefetch)
+        self.assertIn("main_locations", plan.prefetch)
+        self.assertNotIn("organization", plan.select)
+
+    def test_organization_serializer_queries_do_not_grow(self):
+        """Test that serializing organizations costs a fixed number of queries."""
+        from apps.common.query_planning import plan_queryset
+
+        queryset = plan_queryset(Organization.objects.all(), OrganizationSerializer)
+
+        # Organizations + locations + main locations
+        with self.assertNumQueries(3):
+            data = OrganizationSerializer(queryset, many=True).data
+
+        self.assertEqual(len(data), 3)
+        for organization in data:
+            self.assertEqual(len(organization["locations"]), 2)
+            self.assertTrue(organization["sede_principal"]["es_principal"])
+
+    def test_location_list_selects_organization(self):
+        """Test that the location list joins the organization it renders."""
+        from apps.common.query_planning import plan_queryset
+        from apps.organization.serializers import LocationListSerializer
+
+        queryset = plan_queryset(Location.objects.all(), LocationListSerializer)
+
+        with self.assertNumQueries(1):
+            data = LocationListSerializer(queryset, many=True).data
+
+        self.assertEqual(len(data), 6)
+
+
 class LocationAPITests(APITestCase):
     """Test suite for Location API endpoints."""
 
@@ -396,6 +646,849 @@ class LocationAPITests(APITestCase):
         self.assertEqual(Location.objects.count(), 3)  # existing + 2 new
 
 
+class ConditionalRequestAPITests(APITestCase):
+    """Test ETags, 304 responses and If-Match checks on detail endpoints."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpass123", first_name="Test", last_name="User", is_superuser=True
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.organization = Organization.objects.create(
+            razon_social="Conditional Organization",
+            nit="900555555",
+            digito_verificacion="5",
+            tipo_organizacion="empresa_privada",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+        self.location = Location.objects.create(
+            organization=self.organization,
+            nombre="Sede Principal",
+            tipo_sede="principal",
+            es_principal=True,
+            direccion="Calle 1 # 2-3",
+            ciudad="Cali",
+            departamento="Valle del Cauca",
+        )
+        self.organization_url = reverse(
+            "organization:organization-detail", args=[self.organization.id]
+        )
+        self.location_url = reverse("organization:location-detail", args=[self.location.id])
+
+    def test_retrieve_returns_validators(self):
+        """Test detail responses carry ETag and Last-Modified."""
+        response = self.client.get(self.organization_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+    def test_if_none_match_returns_304(self):
+        """Test a current ETag is answered with 304 and no body."""
+        etag = self.client.get(self.organization_url)["ETag"]
+
+        response = self.client.get(self.organization_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+    def test_location_change_renews_organization_etag(self):
+        """Test the organization ETag covers its nested locations."""
+        etag = self.client.get(self.organization_url)["ETag"]
+
+        self.location.nombre = "Sede Renombrada"
+        self.location.save()
+
+        response = self.client.get(self.organization_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_soft_delete_renews_version(self):
+        """Test saves limited with update_fields also renew updated_at."""
+        etag = self.client.get(self.location_url)["ETag"]
+
+        self.location.deactivate()
+
+        response = self.client.get(self.location_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_patch_with_current_etag(self):
+        """Test an update conditioned on the current version succeeds."""
+        etag = self.client.get(self.organization_url)["ETag"]
+
+        response = self.client.patch(
+            self.organization_url,
+            {"nombre_comercial": "Nuevo Nombre"},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.nombre_comercial, "Nuevo Nombre")
+
+    def test_patch_with_stale_etag_is_rejected(self):
+        """Test the second of two concurrent edits gets 412 and changes nothing."""
+        etag = self.client.get(self.organization_url)["ETag"]
+
+        first = self.client.patch(
+            self.organization_url,
+            {"nombre_comercial": "Primera Edicion"},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+        second = self.client.patch(
+            self.organization_url,
+            {"nombre_comercial": "Segunda Edicion"},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.nombre_comercial, "Primera Edicion")
+        self.assertEqual(
+            AuditLog.objects.filter(
+                record_id=str(self.organization.id), action=AuditLog.ACTION_UPDATE
+            ).count(),
+            1,
+        )
+
+    def test_location_update_with_stale_etag_is_rejected(self):
+        """Test If-Match is enforced on location updates."""
+        etag = self.client.get(self.location_url)["ETag"]
+        self.location.nombre = "Editada en otra sesion"
+        self.location.save()
+
+        response = self.client.patch(
+            self.location_url, {"nombre": "Sobrescrita"}, format="json", HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.location.refresh_from_db()
+        self.assertEqual(self.location.nombre, "Editada en otra sesion")
+
+    def test_stale_expected_version_does_not_insert(self):
+        """Test a conditional save that matches no row raises instead of inserting."""
+        from apps.common.models import StaleVersionError
+
+        stale = Location.objects.get(pk=self.location.pk)
+        self.location.save()
+
+        stale.expect_version([stale.updated_at])
+        stale.nombre = "Sin efecto"
+        with self.assertRaises(StaleVersionError):
+            stale.save()
+        self.assertEqual(Location.objects.count(), 1)
+
+
+class SparseFieldsetAPITests(APITestCase):
+    """Test the fields and expand parameters on organization endpoints."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpass123", first_name="Test", last_name="User", is_superuser=True
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.organization = Organization.objects.create(
+            razon_social="Sparse Organization",
+            nit="900666666",
+            digito_verificacion="6",
+            tipo_organizacion="empresa_privada",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+        Location.objects.create(
+            organization=self.organization,
+            nombre="Sede Principal",
+            tipo_sede="principal",
+            es_principal=True,
+            direccion="Calle 1 # 2-3",
+            ciudad="Cali",
+            departamento="Valle del Cauca",
+        )
+
+    def test_list_with_fields(self):
+        """Test only the requested fields (and id) are rendered."""
+        url = reverse("organization:organization-list")
+        response = self.client.get(url, {"fields": "razon_social,nit_completo"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "razon_social", "nit_completo"}
+        )
+        self.assertEqual(response.data["results"][0]["nit_completo"], "900666666-6")
+
+    def test_list_with_expand(self):
+        """Test expandable relations are added on request."""
+        url = reverse("organization:organization-list")
+        response = self.client.get(url, {"fields": "razon_social", "expand": "locations"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"][0]["locations"]), 1)
+
+    def test_unknown_fields_are_rejected(self):
+        """Test unknown field and relation names get 400."""
+        url = reverse("organization:organization-list")
+
+        response = self.client.get(url, {"fields": "razon_social,no_existe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {"expand": "sede_principal"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_with_fields_has_own_etag(self):
+        """Test a sparse detail is tagged apart from the full representation."""
+        url = reverse("organization:organization-detail", args=[self.organization.id])
+        full = self.client.get(url)
+        sparse = self.client.get(url, {"fields": "razon_social"})
+
+        self.assertEqual(set(sparse.data), {"id", "razon_social"})
+        self.assertNotEqual(full["ETag"], sparse["ETag"])
+
+    def test_fieldset_plan_skips_relations_and_defers_columns(self):
+        """Test the query plan follows the requested fields."""
+        from apps.common.fieldsets import get_fieldset_plan
+        from apps.organization.serializers import SectorTemplateListSerializer
+
+        plan = get_fieldset_plan(OrganizationSerializer, ("razon_social",), ())
+        self.assertFalse(plan.prefetch)
+        self.assertFalse(plan.annotations)
+        self.assertIn("descripcion", plan.deferred(Organization))
+        self.assertNotIn("razon_social", plan.deferred(Organization))
+
+        # total_elementos reads data_json; without it the blob is deferred
+        plan = get_fieldset_plan(SectorTemplateListSerializer, None, ())
+        self.assertNotIn("data_json", plan.deferred(SectorTemplate))
+        plan = get_fieldset_plan(SectorTemplateListSerializer, ("nombre_template",), ())
+        self.assertIn("data_json", plan.deferred(SectorTemplate))
+
+
+class CompiledSerializerTests(APITestCase):
+    """Test list rendering with compiled serializers."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpass123", first_name="Test", last_name="User", is_superuser=True
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.organization = Organization.objects.create(
+            razon_social="Compiled Organization",
+            nit="900777777",
+            digito_verificacion="7",
+            tipo_organizacion="empresa_privada",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+        for i, ciudad in enumerate(["Cali", "Pasto"]):
+            Location.objects.create(
+                organization=self.organization,
+                nombre=f"Sede {i}",
+                tipo_sede="principal" if i == 0 else "sucursal",
+                es_principal=i == 0,
+                direccion=f"Calle {i} # 2-3",
+                ciudad=ciudad,
+                departamento="Valle del Cauca",
+            )
+        # One entry by a user and one by the system
+        AuditLog.log_change(
+            instance=self.organization, action=AuditLog.ACTION_UPDATE, user=self.user
+        )
+        AuditLog.log_change(instance=self.organization, action=AuditLog.ACTION_UPDATE)
+        # Write the entries buffered above, so tests count their own queries only
+        flush_pending()
+
+    def test_list_serializers_parity(self):
+        """Test compiled serializers render like the regular ones."""
+        from apps.common.compiled import assert_compiled_parity
+        from apps.common.query_planning import plan_queryset
+        from apps.organization.serializers import (
+            AuditLogListSerializer,
+            LocationListSerializer,
+            OrganizationListSerializer,
+        )
+
+        for serializer_class, queryset in [
+            (OrganizationListSerializer, Organization.objects.all()),
+            (LocationListSerializer, Location.objects.all()),
+            (AuditLogListSerializer, AuditLog.objects.order_by("-created_at", "-id")),
+        ]:
+            with self.subTest(serializer=serializer_class.__name__):
+                assert_compiled_parity(
+                    serializer_class,
+                    plan_queryset(queryset, serializer_class),
+                    self,
+                )
+
+    def test_list_is_one_query(self):
+        """Test a compiled list joins what the method fields read."""
+        from apps.common.compiled import get_compiled_serializer
+        from apps.organization.serializers import AuditLogListSerializer
+
+        compiled = get_compiled_serializer(AuditLogListSerializer)
+        with self.assertNumQueries(1):
+            rows = list(compiled.rows(AuditLog.objects.order_by("created_at")))
+            data = compiled.render(rows, AuditLogListSerializer(rows, many=True))
+
+        self.assertEqual(data[-1]["user_name"], "Sistema")
+        self.assertIn("Test User", [log["user_name"] for log in data])
+
+    def test_uncompilable_fieldset_falls_back(self):
+        """Test expanded fieldsets are rendered by the regular serializer."""
+        from apps.common.compiled import get_compiled_serializer
+        from apps.organization.serializers import OrganizationListSerializer
+
+        self.assertIsNotNone(
+            get_compiled_serializer(OrganizationListSerializer, (("razon_social",), ()))
+        )
+        self.assertIsNone(
+            get_compiled_serializer(
+                OrganizationListSerializer, (("razon_social",), ("locations",))
+            )
+        )
+
+    def test_location_list_pages(self):
+        """Test the compiled location list keeps keyset pages."""
+        url = reverse("organization:location-list")
+
+        first = self.client.get(url, {"page_size": 1}).data
+        second = self.client.get(first["next"]).data
+
+        self.assertEqual(first["results"][0]["nombre"], "Sede 0")
+        self.assertEqual(second["results"][0]["nombre"], "Sede 1")
+        self.assertEqual(
+            second["results"][0]["organization"]["razon_social"],
+            "Compiled Organization",
+        )
+        self.assertEqual(
+            second["results"][0]["direccion_completa"],
+            Location.objects.get(nombre="Sede 1").direccion_completa,
+        )
+
+
+class ExportAPITests(APITestCase):
+    """Test the streaming CSV and JSON Lines exports."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpass123", first_name="Test", last_name="User", is_superuser=True
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.organization = Organization.objects.create(
+            razon_social="Export Organization",
+            nit="900888888",
+            digito_verificacion="8",
+            tipo_organizacion="empresa_privada",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+        Organization.objects.create(
+            razon_social="Other Organization",
+            nit="900999999",
+            digito_verificacion="9",
+            tipo_organizacion="empresa_privada",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+        Location.objects.create(
+            organization=self.organization,
+            nombre="Sede Exportada",
+            tipo_sede="principal",
+            es_principal=True,
+            direccion="Calle 8 # 8-8",
+            ciudad="Cali",
+            departamento="Valle del Cauca",
+        )
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_organizations_csv_follows_list_filters(self):
+        """Test the CSV export has the list columns and search."""
+        import csv
+        import io
+
+        url = reverse("organization:organization-export")
+        response = self.client.get(url, {"search": "Export"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        self.assertIn("attachment;", response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["razon_social"], "Export Organization")
+        self.assertEqual(rows[0]["nit_completo"], "900888888-8")
+
+    def test_locations_jsonl(self):
+        """Test the JSON Lines export writes one object per location."""
+        url = reverse("organization:location-export")
+        response = self.client.get(
+            url, {"file_format": "jsonl", "organization": str(self.organization.id)}
+        )
+
+        lines = self.read(response).splitlines()
+        self.assertEqual(len(lines), 1)
+        location = json.loads(lines[0])
+        self.assertEqual(location["nombre"], "Sede Exportada")
+        self.assertEqual(location["organization"]["razon_social"], "Export Organization")
+
+    def test_audit_history_export_is_complete(self):
+        """Test the audit export writes every entry, newest first."""
+        for i in range(3):
+            AuditLog.log_change(
+                instance=self.organization, action=AuditLog.ACTION_UPDATE, reason=str(i)
+            )
+        url = reverse(
+            "organization:organization-audit-history-export",
+            args=[self.organization.pk],
+        )
+        response = self.client.get(url, {"file_format": "jsonl"})
+
+        entries = [json.loads(line) for line in self.read(response).splitlines()]
+        expected = AuditLog.objects.filter(record_id=str(self.organization.pk))
+        self.assertEqual(len(entries), expected.count())
+        self.assertEqual(
+            [entry["created_at"] for entry in entries],
+            sorted((entry["created_at"] for entry in entries), reverse=True),
+        )
+
+    def test_unknown_format_is_rejected(self):
+        """Test an unsupported format gets 400 before streaming."""
+        url = reverse("organization:organization-export")
+        response = self.client.get(url, {"file_format": "xlsx"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_authentication(self):
+        """Test anonymous exports are rejected."""
+        self.client.credentials()
+        response = self.client.get(reverse("organization:organization-export"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BulkImportAPITests(APITestCase):
+    """Test the bulk import of organizations and locations."""
+
+    HEADER = "razon_social,nit,digito_verificacion,tipo_organizacion,sector_economico,tamaño_empresa\n"
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpass123", first_name="Test", last_name="User", is_superuser=True
+        )
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.organization = Organization.objects.create(
+            razon_social="Red de Salud",
+            nit="900111222",
+            digito_verificacion="1",
+            tipo_organizacion="ips",
+            sector_economico="salud",
+            tamaño_empresa="grande",
+        )
+
+    def upload(self, url, name, content, **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        data["file"] = SimpleUploadedFile(name, content.encode("utf-8"))
+        return self.client.post(url, data, format="multipart")
+
+    def organization_rows(self, count, start=0):
+        return "".join(
+            f"Org {i},{900500000 + i},{i % 10},ips,salud,mediana\n"
+            for i in range(start, start + count)
+        )
+
+    def test_import_organizations_with_errors(self):
+        """Test valid rows are created and the others reported by line."""
+        from apps.common import counters as counter_store
+        from apps.organization.counters import ORGANIZATIONS_TOTAL
+
+        content = (
+            self.HEADER
+            + "Nueva IPS,900333444,3,ips,salud,mediana\n"
+            + "Repetida,900333444,3,ips,salud,mediana\n"
+            + "Existente,900111222,1,ips,salud,mediana\n"
+            + ",900555666,5,ips,salud,mediana\n"
+        )
+        url = reverse("organization:organization-bulk-import")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(url, "organizaciones.csv", content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 4)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(
+            {error["line"]: set(error["errors"]) for error in response.data["errors"]},
+            {3: {"nit"}, 4: {"nit"}, 5: {"razon_social"}},
+        )
+
+        created = Organization.objects.get(nit="900333444")
+        self.assertEqual(created.created_by, self.user)
+        self.assertTrue(
+            AuditLog.objects.filter(
+                record_id=str(created.pk), action=AuditLog.ACTION_CREATE
+            ).exists()
+        )
+        self.assertEqual(
+            counter_store.get(ORGANIZATIONS_TOTAL), Organization.objects.count()
+        )
+
+    def test_batch_checks_do_not_query_per_row(self):
+        """Test the queries of a batch do not grow with its rows."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from apps.organization.imports import OrganizationImporter, read_csv
+
+        def run(rows):
+            importer = OrganizationImporter(user=self.user, batch_size=100)
+            with CaptureQueriesContext(connection) as queries:
+                report = importer.run(read_csv((self.HEADER + rows).splitlines(True)))
+            return report, len(queries)
+
+        small, small_queries = run(self.organization_rows(2))
+        large, large_queries = run(self.organization_rows(20, start=2))
+
+        self.assertEqual((small["created"], large["created"]), (2, 20))
+        self.assertEqual(small_queries, large_queries)
+
+    def test_import_locations_jsonl(self):
+        """Test locations are matched by NIT with one main location each."""
+        from apps.common import counters as counter_store
+        from apps.organization.counters import ORGANIZATION_ACTIVE_LOCATIONS
+
+        rows = [
+            {"organization_nit": "900111222", "nombre": "Sede Centro", "tipo_sede": "principal",
+             "es_principal": True, "direccion": "Calle 1", "ciudad": "Cali", "departamento": "Valle"},
+            {"organization_nit": "900-111-222", "nombre": "Sede Norte", "tipo_sede": "sucursal",
+             "es_principal": True, "direccion": "Calle 2", "ciudad": "Cali", "departamento": "Valle"},
+            {"organization_nit": "900111222", "nombre": "Sede Sur", "tipo_sede": "sucursal",
+             "direccion": "Calle 3", "ciudad": "Cali", "departamento": "Valle"},
+            {"organization_nit": "999999999", "nombre": "Sede Perdida", "tipo_sede": "sucursal",
+             "direccion": "Calle 4", "ciudad": "Cali", "departamento": "Valle"},
+        ]
+        content = "\n".join(json.dumps(row) for row in rows) + "\nno es json\n"
+        url = reverse("organization:location-bulk-import")
+        response = self.upload(url, "sedes.jsonl", content)
+
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            {error["line"]: set(error["errors"]) for error in response.data["errors"]},
+            {2: {"es_principal"}, 4: {"organization_nit"}, 5: {"error"}},
+        )
+        self.assertEqual(
+            counter_store.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 2
+        )
+
+        # Importing the same file again duplicates nothing
+        response = self.upload(url, "sedes.jsonl", content)
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(self.organization.locations.count(), 2)
+
+    def test_first_imported_location_is_main(self):
+        """Test the first location of an organization becomes its main one."""
+        content = json.dumps(
+            {"organization_nit": "900111222", "nombre": "Sede Unica", "tipo_sede": "sucursal",
+             "direccion": "Calle 1", "ciudad": "Cali", "departamento": "Valle"}
+        )
+        url = reverse("organization:location-bulk-import")
+        response = self.upload(url, "sedes.jsonl", content)
+
+        self.assertEqual(response.data["created"], 1)
+        location = self.organization.locations.get()
+        self.assertTrue(location.es_principal)
+
+    def test_dry_run_creates_nothing(self):
+        """Test a dry run only validates."""
+        url = reverse("organization:organization-bulk-import")
+        response = self.upload(
+            url, "organizaciones.csv", self.HEADER + self.organization_rows(3), dry_run="true"
+        )
+
+        self.assertEqual(response.data["valid"], 3)
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(Organization.objects.count(), 1)
+
+    def test_import_requires_file(self):
+        """Test a request without file gets 400."""
+        response = self.client.post(
+            reverse("organization:organization-bulk-import"), {}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TenantAPITests(APITestCase):
+    """Test that users only reach the organizations they are members of."""
+
+    def setUp(self):
+        """Set up test data."""
+        from apps.authorization.models import Permission, Role, RolePermission, UserRole
+        from apps.organization.models import OrganizationMembership
+
+        self.user = User.objects.create_user(
+            email="tenant@example.com", password="testpass123", first_name="Tenant", last_name="User"
+        )
+        role = Role.objects.create(name="Gestor", code="org_manager")
+        for code in ("organization.read", "organization.create", "organization.update"):
+            permission = Permission.objects.create(name=code, code=code)
+            RolePermission.objects.create(role=role, permission=permission)
+        UserRole.objects.create(user=self.user, role=role)
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.own = self.create_organization("Propia", "900100100")
+        self.other = self.create_organization("Ajena", "900200200")
+        OrganizationMembership.objects.create(
+            organization=self.own, user=self.user, is_default=True
+        )
+        self.own_location = self.create_location(self.own)
+        self.other_location = self.create_location(self.other)
+
+    def create_organization(self, razon_social, nit):
+        return Organization.objects.create(
+            razon_social=razon_social,
+            nit=nit,
+            digito_verificacion="1",
+            tipo_organizacion="ips",
+            sector_economico="salud",
+            tamaño_empresa="mediana",
+        )
+
+    def create_location(self, organization):
+        return Location.objects.create(
+            organization=organization,
+            nombre="Sede Principal",
+            tipo_sede="principal",
+            es_principal=True,
+            direccion="Calle 1",
+            ciudad="Bogotá",
+            departamento="Cundinamarca",
+        )
+
+    def test_querysets_are_scoped(self):
+        """Test lists and details only include the user's organizations."""
+        response = self.client.get(reverse("organization:organization-list"))
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [str(self.own.id)]
+        )
+
+        response = self.client.get(reverse("organization:location-list"))
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [str(self.own_location.id)]
+        )
+
+        for url in (
+            reverse("organization:organization-detail", args=[self.other.id]),
+            reverse("organization:location-detail", args=[self.other_location.id]),
+        ):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(reverse("organization:organization-exists-check"))
+        self.assertEqual(response.data["count"], 1)
+
+    def test_wizard_uses_tenant_organization(self):
+        """Test the wizard works on the default or the requested organization."""
+        url = reverse("organization:organization-wizard-step1")
+
+        response = self.client.get(url)
+        self.assertEqual(response.data["organization"]["id"], str(self.own.id))
+
+        # Organizations of other tenants can not be chosen
+        response = self.client.get(url, HTTP_X_ORGANIZATION_ID=str(self.other.id))
+        self.assertIsNone(response.data["organization"])
+
+    def test_wizard_post_never_creates_for_unresolved_organization(self):
+        """Test step 1 only creates an organization for users without one."""
+        from apps.organization.models import OrganizationMembership
+
+        url = reverse("organization:organization-wizard-step1")
+        data = {
+            "razon_social": "Nueva",
+            "nit": "900300300",
+            "digito_verificacion": "1",
+            "tipo_organizacion": "empresa_privada",
+            "sector_economico": "tecnologia",
+            "tamaño_empresa": "mediana",
+        }
+        count = Organization.objects.count()
+
+        response = self.client.post(
+            url, data, format="json", HTTP_X_ORGANIZATION_ID=str(self.other.id)
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Several organizations and none of them the default
+        with self.captureOnCommitCallbacks(execute=True):
+            OrganizationMembership.objects.filter(user=self.user).update(
+                is_default=False
+            )
+            OrganizationMembership.objects.create(
+                organization=self.other, user=self.user
+            )
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Organization.objects.count(), count)
+
+        # Without memberships the organization is created
+        with self.captureOnCommitCallbacks(execute=True):
+            OrganizationMembership.objects.filter(user=self.user).delete()
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Organization.objects.count(), count + 1)
+
+    def test_location_is_created_in_tenant_organization(self):
+        """Test new locations go to the user's organization, never another one."""
+        url = reverse("organization:location-list")
+        data = {
+            "nombre": "Sucursal",
+            "tipo_sede": "sucursal",
+            "direccion": "Calle 2",
+            "ciudad": "Cali",
+            "departamento": "Valle del Cauca",
+        }
+
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Location.objects.get(id=response.data["id"]).organization_id, self.own.id
+        )
+
+        response = self.client.post(
+            url, {**data, "organization": str(self.other.id)}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Location.objects.filter(organization=self.other, nombre="Sucursal").exists()
+        )
+
+    def test_creator_becomes_member(self):
+        """Test an organization created by the user is in their scope."""
+        response = self.client.post(
+            reverse("organization:organization-list"),
+            {
+                "razon_social": "Nueva",
+                "nit": "900300300",
+                "digito_verificacion": "3",
+                "tipo_organizacion": "ips",
+                "sector_economico": "salud",
+                "tamaño_empresa": "mediana",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(reverse("organization:organization-list"))
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_memberships_are_cached(self):
+        """Test memberships are read once and dropped when they change."""
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        from apps.organization.models import OrganizationMembership
+        from apps.organization.tenancy import MembershipCache, TenantContext
+
+        locmem = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "tenancy-tests",
+            }
+        }
+        with override_settings(CACHES=locmem):
+            cache.clear()
+            self.assertEqual(MembershipCache.get(self.user.pk)[0], (str(self.own.id),))
+            with self.assertNumQueries(0):
+                context = TenantContext(self.user)
+                self.assertEqual(context.organization_id, str(self.own.id))
+                self.assertFalse(context.has_access(self.other.id))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                OrganizationMembership.objects.create(organization=self.other, user=self.user)
+            self.assertEqual(len(MembershipCache.get(self.user.pk)[0]), 2)
+
+            # Deleted organizations are left out
+            with self.captureOnCommitCallbacks(execute=True):
+                self.other.delete()
+            self.assertEqual(MembershipCache.get(self.user.pk)[0], (str(self.own.id),))
+
+    def test_bulk_rollback_drops_cached_memberships(self):
+        """Test a bulk rollback that restores an organization shows it again."""
+        from django.core.cache import cache
+        from django.test import override_settings
+        from django.utils import timezone
+
+        from apps.organization.models import OrganizationMembership
+        from apps.organization.rollback import bulk_rollback
+        from apps.organization.tenancy import MembershipCache
+
+        locmem = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "tenancy-rollback-tests",
+            }
+        }
+        with override_settings(CACHES=locmem):
+            cache.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                OrganizationMembership.objects.create(organization=self.other, user=self.user)
+            start = timezone.now()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.other.delete()
+            self.assertEqual(MembershipCache.get(self.user.pk)[0], (str(self.own.id),))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                result = bulk_rollback(
+                    since=start, table_names=[Organization._meta.db_table]
+                )
+
+            self.assertEqual(result["count"], 1)
+            self.assertEqual(len(MembershipCache.get(self.user.pk)[0]), 2)
+
+    def test_audit_entries_are_scoped(self):
+        """Test audit entries carry their organization and are scoped by it."""
+        from apps.organization.tenancy import TenantContext
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.own_location.nombre = "Sede Central"
+            self.own_location.save()
+            self.other_location.nombre = "Sede Remota"
+            self.other_location.save()
+
+        entries = TenantContext(self.user).scope(
+            AuditLog.objects.filter(action=AuditLog.ACTION_UPDATE)
+        )
+        self.assertEqual(
+            [entry.record_id for entry in entries], [str(self.own_location.id)]
+        )
+
+
 class SectorTemplateAPITests(APITestCase):
     """Test suite for SectorTemplate API endpoints."""
 
@@ -479,6 +1572,102 @@ class SectorTemplateAPITests(APITestCase):
         self.assertEqual(len(response.data["templates"]), 1)
         self.assertEqual(response.data["templates"][0]["sector"], "tecnologia")
 
+    def test_by_sector_answers_conditional_get(self):
+        """Test that a matching If-None-Match gets a 304 without a body."""
+        from unittest.mock import patch
+
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        url = reverse("organization:sectortemplate-by-sector")
+        locmem = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        # LocMemCache stands in for the shared cache (Redis) of production
+        shared = patch("apps.common.catalog_cache.cache_is_shared", return_value=True)
+        with override_settings(CACHES=locmem), shared:
+            cache.clear()
+            response = self.client.get(url, {"sector": "tecnologia"})
+            etag = response["ETag"]
+
+            response = self.client.get(
+                url, {"sector": "tecnologia"}, HTTP_IF_NONE_MATCH=etag
+            )
+            other = self.client.get(
+                url, {"sector": "salud"}, HTTP_IF_NONE_MATCH=etag
+            )
+            cache.clear()
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+
+    def test_by_sector_without_persistent_cache_skips_etag(self):
+        """Test that a cache without storage yields no ETag and no 304."""
+        url = reverse("organization:sectortemplate-by-sector")
+        first = self.client.get(url, {"sector": "tecnologia"})
+
+        self.assertNotIn("ETag", first)
+
+        response = self.client.get(
+            url, {"sector": "tecnologia"}, HTTP_IF_NONE_MATCH="*"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["templates"]), 1)
+
+    def test_by_sector_with_local_cache_skips_etag(self):
+        """Test that a per-process cache yields no ETag (bumps stay local)."""
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        url = reverse("organization:sectortemplate-by-sector")
+        locmem = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        with override_settings(CACHES=locmem):
+            cache.clear()
+            response = self.client.get(url, {"sector": "tecnologia"})
+            cache.clear()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+    def test_template_write_renews_catalog_version(self):
+        """Test that writing a template changes the ETag and the cached data."""
+        from unittest.mock import patch
+
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        url = reverse("organization:sectortemplate-by-sector")
+        locmem = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        # LocMemCache stands in for the shared cache (Redis) of production
+        shared = patch("apps.common.catalog_cache.cache_is_shared", return_value=True)
+        with override_settings(CACHES=locmem), shared:
+            cache.clear()
+            first = self.client.get(url, {"sector": "tecnologia"})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                SectorTemplate.objects.create(
+                    sector="tecnologia",
+                    nombre_template="Second Template",
+                    descripcion="Second template description",
+                    data_json={"procesos": [], "indicadores": [], "documentos": []},
+                )
+
+            response = self.client.get(
+                url, {"sector": "tecnologia"}, HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+            cache.clear()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(len(response.data["templates"]), 2)
+
     def test_apply_template_to_organization(self):
         """Test applying template to organization."""
         # Create template for same sector as organization
@@ -12,8 +12,10 @@ Date: 2025-08-14
 Coverage Target: >80%
 """
 
+import os
 import pytest
 from decimal import Decimal
+from io import StringIO
 from datetime import date, timedelta
 from django.test import TestCase
 from django.core.exceptions import ValidationError
@@ -702,6 +704,813 @@ class AuditLogModelTests(TestCase):
         self.assertTrue(str(audit_log).startswith(expected_start))
 
 
+class AuditPipelineTests(TestCase):
+    """Test suite for buffered audit logging of Organization changes."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username="audituser", email="audit@example.com", password="testpass123"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization = Organization.objects.create(
+                razon_social="Audit Organization",
+                nit="900123459",
+                digito_verificacion="1",
+                tipo_organizacion="empresa_privada",
+                sector_economico="tecnologia",
+                tamaño_empresa="mediana",
+            )
+
+    def history(self, action):
+        return AuditLog.objects.filter(
+            table_name="organization_organization",
+            record_id=str(self.organization.pk),
+            action=action,
+        )
+
+    def test_create_is_logged_on_commit(self):
+        """Test that creating an organization logs all its fields."""
+        log = self.history(AuditLog.ACTION_CREATE).get()
+
+        self.assertEqual(log.old_values, {})
+        self.assertEqual(log.new_values["razon_social"], "Audit Organization")
+        self.assertIn("nit", log.changed_fields)
+
+    def test_update_diffs_against_loaded_values(self):
+        """Test that updates diff against the loaded row without re-reading it."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+        organization.razon_social = "Renamed Organization"
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            # Only the UPDATE itself; no SELECT of the previous state
+            with self.assertNumQueries(1):
+                organization.save()
+
+        # Savepoint + version counter lock + counter UPDATE + INSERT + release
+        with self.assertNumQueries(5):
+            for callback in callbacks:
+                callback()
+
+        log = self.history(AuditLog.ACTION_UPDATE).get()
+        self.assertEqual(log.changed_fields, ["razon_social"])
+        self.assertEqual(log.old_values, {"razon_social": "Audit Organization"})
+        self.assertEqual(log.new_values, {"razon_social": "Renamed Organization"})
+        self.assertEqual(log.version, 2)
+        self.assertFalse(log.is_checkpoint)
+
+    def test_transaction_writes_one_batch(self):
+        """Test that all changes in a transaction are inserted together."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for i in range(3):
+                    organization.descripcion = f"Descripcion {i}"
+                    organization.save()
+
+        # The three saves share one hook, which inserts their rows together
+        with self.assertNumQueries(5):
+            for callback in callbacks:
+                callback()
+
+        logs = self.history(AuditLog.ACTION_UPDATE)
+        self.assertEqual(logs.count(), 3)
+        self.assertEqual(
+            sorted(log.new_values["descripcion"] for log in logs),
+            ["Descripcion 0", "Descripcion 1", "Descripcion 2"],
+        )
+
+    def test_concurrent_flushes_get_distinct_versions(self):
+        """Test that a flush between another's numbering and insert gets the next version."""
+        from unittest.mock import patch
+
+        from apps.organization import audit
+        from apps.organization.models import AuditRecordVersion
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+        plan = audit.get_audit_plan(Organization)
+
+        def change(name):
+            old_raw = plan.raw_values(organization)
+            organization.razon_social = name
+            return audit.PendingChange(
+                plan,
+                organization,
+                AuditLog.ACTION_UPDATE,
+                old_raw,
+                plan.raw_values(organization),
+            )
+
+        first, second = change("First Buffer"), change("Second Buffer")
+        number_rows = audit.number_rows
+        interleaved = []
+
+        def number_then_flush_other(rows, snapshots, using):
+            number_rows(rows, snapshots, using)
+            if not interleaved:
+                # The second buffer flushes before the first one inserts
+                interleaved.append(True)
+                audit.write_changes([second], using=using)
+
+        with patch.object(audit, "number_rows", number_then_flush_other):
+            audit.write_changes([first])
+
+        logs = self.history(AuditLog.ACTION_UPDATE)
+        self.assertEqual(
+            sorted(logs.values_list("version", flat=True)), [2, 3]
+        )
+        self.assertEqual(
+            AuditRecordVersion.objects.get(
+                table_name="organization_organization",
+                record_id=str(organization.pk),
+            ).last_version,
+            3,
+        )
+
+    def test_versions_are_unique_per_record(self):
+        """Test that two entries of a record can not share a version."""
+        log = self.history(AuditLog.ACTION_CREATE).get()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AuditLog.objects.create(
+                table_name=log.table_name,
+                record_id=log.record_id,
+                action=AuditLog.ACTION_UPDATE,
+                version=log.version,
+            )
+
+        # Manual entries are not numbered
+        for _ in range(2):
+            AuditLog.log_change(
+                instance=self.organization, action=AuditLog.ACTION_UPDATE
+            )
+
+    def test_rolled_back_savepoint_is_not_logged(self):
+        """Test that changes rolled back with a savepoint leave no audit rows."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    organization.razon_social = "Discarded Name"
+                    organization.save()
+                    raise ValueError("rollback")
+            except ValueError:
+                pass
+
+        self.assertFalse(self.history(AuditLog.ACTION_UPDATE).exists())
+
+    def test_nested_savepoint_rollback_keeps_outer_changes(self):
+        """Test that only the changes of a rolled back savepoint are dropped."""
+        from django.db import connection
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                organization.razon_social = "Kept Name"
+                organization.save()
+                try:
+                    with transaction.atomic():
+                        # Writes the pending row inside the savepoint
+                        AuditLog.get_record_history(organization)
+                        organization.descripcion = "Discarded"
+                        organization.save()
+                        raise ValueError("rollback")
+                except ValueError:
+                    pass
+
+        logs = self.history(AuditLog.ACTION_UPDATE)
+        self.assertEqual(
+            [(log.version, log.new_values) for log in logs],
+            [(2, {"razon_social": "Kept Name"})],
+        )
+        self.assertIsNone(getattr(connection, "_audit_buffer", None))
+
+    def test_rolled_back_hooks_still_referenced_are_not_logged(self):
+        """Test that a rolled back change is dropped even if its hook is kept."""
+        from django.db import connection
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    organization.razon_social = "Discarded Name"
+                    organization.save()
+                    # e.g. debug tooling or a traceback frame
+                    held = list(connection.run_on_commit)
+                    raise ValueError("rollback")
+            except ValueError:
+                pass
+            organization.descripcion = "Kept"
+            organization.save()
+
+        for callback in callbacks:
+            callback()
+
+        self.assertTrue(held)
+        self.assertEqual(
+            [log.changed_fields for log in self.history(AuditLog.ACTION_UPDATE)],
+            [["descripcion"]],
+        )
+
+    def test_reads_in_transaction_see_buffered_changes(self):
+        """Test that a rollback in the transaction of an update finds its entry."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                organization.razon_social = "Renamed In Transaction"
+                organization.save()
+
+                update = AuditLog.get_record_history(organization).get(
+                    action=AuditLog.ACTION_UPDATE
+                )
+                success, message, instance = update.perform_rollback(user=self.user)
+
+                instance.descripcion = "After Rollback"
+                instance.save()
+
+        self.assertTrue(success, message)
+        instance.refresh_from_db()
+        self.assertEqual(instance.razon_social, "Audit Organization")
+        self.assertEqual(
+            list(
+                AuditLog.objects.filter(
+                    table_name="organization_organization",
+                    record_id=str(organization.pk),
+                )
+                .order_by("version")
+                .values_list("action", "version")
+            ),
+            [
+                (AuditLog.ACTION_CREATE, 1),
+                (AuditLog.ACTION_UPDATE, 2),
+                (AuditLog.ACTION_ROLLBACK, 3),
+                (AuditLog.ACTION_UPDATE, 4),
+            ],
+        )
+
+    def test_unchanged_save_is_not_logged(self):
+        """Test that saving without changes does not create an audit row."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+
+        self.assertFalse(self.history(AuditLog.ACTION_UPDATE).exists())
+
+    def test_buffered_entry_keeps_change_time(self):
+        """Test that a buffered row is dated when the change was made."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            organization.razon_social = "Renamed Before Manual Entry"
+            organization.save()
+            changed_at = timezone.now()
+            manual = AuditLog.log_change(
+                instance=organization, action=AuditLog.ACTION_UPDATE
+            )
+
+        for callback in callbacks:
+            callback()
+
+        log = self.history(AuditLog.ACTION_UPDATE).get(version=2)
+        self.assertLessEqual(log.created_at, changed_at)
+        self.assertLess(log.created_at, manual.created_at)
+
+    def test_reads_include_buffered_entries(self):
+        """Test that the transaction reads the entries of its own changes."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks():
+            organization.razon_social = "Renamed And Read Back"
+            organization.save()
+
+            self.assertEqual(self.history(AuditLog.ACTION_UPDATE).count(), 1)
+
+    def test_write_errors_propagate(self):
+        """Test that a failed audit write is not swallowed."""
+        from unittest.mock import patch
+
+        from apps.organization import audit
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            organization.razon_social = "Unrecorded Name"
+            organization.save()
+
+        with patch.object(audit, "number_rows", side_effect=RuntimeError("down")):
+            with self.assertRaises(RuntimeError):
+                callbacks[0]()
+
+    def test_create_is_a_checkpoint(self):
+        """Test that the create row holds the full state."""
+        log = self.history(AuditLog.ACTION_CREATE).get()
+
+        self.assertTrue(log.is_checkpoint)
+        self.assertEqual(log.version, 1)
+
+    def test_checkpoint_every_interval(self):
+        """Test that every N-th change stores the full state."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+
+        with self.settings(AUDIT_LOG_CHECKPOINT_INTERVAL=3):
+            for i in range(4):
+                organization.descripcion = f"Descripcion {i}"
+                with self.captureOnCommitCallbacks(execute=True):
+                    organization.save()
+
+        logs = list(self.history(AuditLog.ACTION_UPDATE).order_by("version"))
+        self.assertEqual([log.version for log in logs], [2, 3, 4, 5])
+        self.assertEqual([log.is_checkpoint for log in logs], [False, True, False, False])
+        self.assertEqual(logs[1].new_values["razon_social"], "Audit Organization")
+        self.assertEqual(logs[0].new_values, {"descripcion": "Descripcion 0"})
+
+    def test_state_as_of_replays_from_checkpoint(self):
+        """Test rebuilding the state of a record at a point in time."""
+        from apps.organization.audit import get_state_as_of
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+        organization.razon_social = "First Rename"
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+        moment = AuditLog.objects.get(
+            table_name="organization_organization",
+            record_id=str(organization.pk),
+            version=2,
+        ).created_at
+
+        organization.razon_social = "Second Rename"
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+
+        state = get_state_as_of(Organization, organization.pk, moment)
+        self.assertEqual(state["razon_social"], "First Rename")
+        self.assertEqual(state["nit"], "900123459")
+
+        before = get_state_as_of(
+            Organization, organization.pk, moment - timedelta(days=365)
+        )
+        self.assertIsNone(before)
+
+    def test_rollback_rebuilds_full_state(self):
+        """Test that rollback restores the state before a delta entry."""
+        organization = Organization.objects.get(pk=self.organization.pk)
+        organization.razon_social = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+        organization.descripcion = "Nueva descripcion"
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+
+        first_update = self.history(AuditLog.ACTION_UPDATE).get(version=2)
+        success, message, instance = first_update.perform_rollback(user=self.user)
+
+        self.assertTrue(success)
+        instance.refresh_from_db()
+        self.assertEqual(instance.razon_social, "Audit Organization")
+        self.assertFalse(instance.descripcion)
+
+        # The restore is recorded once, numbered after the updates
+        rollback_log = self.history(AuditLog.ACTION_ROLLBACK).get()
+        self.assertEqual(rollback_log.version, 4)
+        self.assertEqual(
+            sorted(rollback_log.changed_fields), ["descripcion", "razon_social"]
+        )
+        self.assertEqual(self.history(AuditLog.ACTION_UPDATE).count(), 2)
+
+    def test_failed_rollback_entry_undoes_the_restore(self):
+        """Test that the record is not restored if its entry can't be written."""
+        from unittest.mock import patch
+
+        from apps.organization import audit
+
+        organization = Organization.objects.get(pk=self.organization.pk)
+        organization.razon_social = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.save()
+
+        update = self.history(AuditLog.ACTION_UPDATE).get()
+        with patch.object(audit, "capture_rollback", side_effect=RuntimeError("down")):
+            success, message, instance = update.perform_rollback(user=self.user)
+
+        self.assertFalse(success)
+        organization.refresh_from_db()
+        self.assertEqual(organization.razon_social, "Renamed")
+        self.assertFalse(self.history(AuditLog.ACTION_ROLLBACK).exists())
+
+
+class AuditRegistryTests(TestCase):
+    """Test suite for auditing of registered models other than Organization."""
+
+    def setUp(self):
+        """Set up test data."""
+        from apps.authorization.models import Role
+
+        self.user = User.objects.create_user(
+            username="registryuser", email="registry@example.com", password="testpass123"
+        )
+        self.organization = Organization.objects.create(
+            razon_social="Registry Organization",
+            nit="900123460",
+            digito_verificacion="2",
+            tipo_organizacion="empresa_privada",
+            sector_economico="tecnologia",
+            tamaño_empresa="mediana",
+        )
+        self.role = Role.objects.create(name="Auditor", code="auditor")
+
+    def test_registered_models(self):
+        """Test that organization and RBAC models are registered."""
+        from apps.authorization.models import RolePermission, UserRole
+        from apps.organization import audit
+
+        for model in (Organization, Location, SectorTemplate, UserRole, RolePermission):
+            self.assertTrue(audit.is_registered(model))
+            self.assertIs(audit.get_model_for_table(model._meta.db_table), model)
+
+        self.assertFalse(audit.is_registered(AuditLog))
+        self.assertIsNone(audit.get_model_for_table(AuditLog._meta.db_table))
+
+    def test_plan_excludes_fields(self):
+        """Test that excluded and non-editable fields are not snapshotted."""
+        from apps.organization.audit import AuditPlan
+
+        plan = AuditPlan(Location, exclude=["observaciones"])
+        names = [name for name, _, _ in plan.fields]
+
+        self.assertIn("nombre", names)
+        self.assertNotIn("observaciones", names)
+        self.assertNotIn("id", names)
+
+    def test_location_create_is_logged(self):
+        """Test that creating a location logs an encoded snapshot."""
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                organization=self.organization,
+                nombre="Sede Norte",
+                tipo_sede="principal",
+                es_principal=True,
+                direccion="Calle 1",
+                ciudad="Bogotá",
+                departamento="Cundinamarca",
+            )
+
+        log = AuditLog.objects.get(
+            table_name=Location._meta.db_table,
+            record_id=str(location.pk),
+            action=AuditLog.ACTION_CREATE,
+        )
+        self.assertEqual(log.new_values["nombre"], "Sede Norte")
+        self.assertEqual(log.new_values["organization"], str(self.organization.pk))
+
+    def test_entries_record_their_organization(self):
+        """Test that entries of tenant models keep the organization id."""
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(
+                organization=self.organization,
+                nombre="Sede Sur",
+                tipo_sede="principal",
+                direccion="Calle 2",
+                ciudad="Cali",
+                departamento="Valle del Cauca",
+            )
+            self.organization.razon_social = "Registry Organization S.A.S."
+            self.organization.save()
+            template = SectorTemplate.crear_template_basico(
+                sector="salud", nombre="Template Salud", descripcion="Básico"
+            )
+
+        for table_name, record_id, organization_id in (
+            (Location._meta.db_table, location.pk, self.organization.pk),
+            (Organization._meta.db_table, self.organization.pk, self.organization.pk),
+            (SectorTemplate._meta.db_table, template.pk, None),
+        ):
+            log = AuditLog.objects.filter(
+                table_name=table_name, record_id=str(record_id)
+            ).latest("created_at")
+            self.assertEqual(log.organization_id, organization_id)
+
+    def test_user_role_rollback(self):
+        """Test rollback of a registered RBAC model through the registry."""
+        from apps.authorization.models import UserRole
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user_role = UserRole.objects.create(user=self.user, role=self.role)
+
+        user_role = UserRole.objects.get(pk=user_role.pk)
+        user_role.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user_role.save()
+
+        log = AuditLog.objects.get(
+            table_name=UserRole._meta.db_table,
+            record_id=str(user_role.pk),
+            action=AuditLog.ACTION_UPDATE,
+        )
+        self.assertEqual(log.changed_fields, ["is_active"])
+        self.assertEqual(log.old_values, {"is_active": True})
+
+        success, message, instance = log.perform_rollback(user=self.user)
+
+        self.assertTrue(success)
+        instance.refresh_from_db()
+        self.assertTrue(instance.is_active)
+        self.assertEqual(instance.role_id, self.role.pk)
+        self.assertTrue(
+            AuditLog.objects.filter(
+                table_name=UserRole._meta.db_table,
+                record_id=str(user_role.pk),
+                action=AuditLog.ACTION_ROLLBACK,
+            ).exists()
+        )
+
+    def test_rollback_of_unregistered_table_is_rejected(self):
+        """Test that rollback fails for tables without a registered model."""
+        log = AuditLog.objects.create(
+            table_name="unknown_table",
+            record_id=str(self.organization.pk),
+            action=AuditLog.ACTION_UPDATE,
+            old_values={"razon_social": "Old Name"},
+        )
+
+        success, message, instance = log.perform_rollback()
+
+        self.assertFalse(success)
+        self.assertIsNone(instance)
+
+
+class BulkRollbackTests(TestCase):
+    """Test suite for rolling back many records in one transaction."""
+
+    def setUp(self):
+        """Set up test data."""
+        from apps.organization.signals import set_audit_context
+
+        self.user = User.objects.create_user(
+            username="bulkuser", email="bulk@example.com", password="testpass123"
+        )
+        self.organizations = []
+        for i in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.organizations.append(
+                    Organization.objects.create(
+                        razon_social=f"Bulk Organization {i}",
+                        nit=f"90012347{i}",
+                        digito_verificacion="1",
+                        tipo_organizacion="empresa_privada",
+                        sector_economico="tecnologia",
+                        tamaño_empresa="mediana",
+                    )
+                )
+        self.start = timezone.now()
+
+        for organization in self.organizations[:2]:
+            organization = Organization.objects.get(pk=organization.pk)
+            organization.razon_social = "Bulk Renamed"
+            set_audit_context(organization, user=self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                organization.save()
+            organization.descripcion = "Bulk descripcion"
+            with self.captureOnCommitCallbacks(execute=True):
+                organization.save()
+
+    def test_dry_run_reports_diff_without_saving(self):
+        """Test that a dry run returns the planned diff and changes nothing."""
+        from apps.organization.rollback import bulk_rollback
+
+        result = bulk_rollback(dry_run=True, since=self.start)
+
+        self.assertTrue(result["dry_run"])
+        self.assertEqual(result["count"], 2)
+        changes = result["records"][0]["changes"]
+        self.assertEqual(changes["razon_social"]["restored"][:17], "Bulk Organization")
+        self.assertEqual(changes["razon_social"]["current"], "Bulk Renamed")
+        self.assertEqual(
+            Organization.objects.filter(razon_social="Bulk Renamed").count(), 2
+        )
+        self.assertFalse(
+            AuditLog.objects.filter(action=AuditLog.ACTION_ROLLBACK).exists()
+        )
+
+    def test_rollback_time_window(self):
+        """Test that every record changed in a window is restored."""
+        from apps.organization.rollback import bulk_rollback
+
+        result = bulk_rollback(since=self.start, performed_by=self.user, reason="Bulk")
+
+        self.assertEqual(result["count"], 2)
+        for i, organization in enumerate(self.organizations):
+            organization.refresh_from_db()
+            self.assertEqual(organization.razon_social, f"Bulk Organization {i}")
+            self.assertFalse(organization.descripcion)
+
+        logs = AuditLog.objects.filter(action=AuditLog.ACTION_ROLLBACK)
+        self.assertEqual(logs.count(), 2)
+        for log in logs:
+            self.assertEqual(log.version, 4)
+            self.assertEqual(log.created_by, self.user)
+            self.assertIn("razon_social", log.changed_fields)
+
+    def test_rollback_by_user(self):
+        """Test that only the changes attributed to a user are selected."""
+        from apps.organization.rollback import bulk_rollback
+
+        result = bulk_rollback(dry_run=True, user=self.user)
+
+        self.assertEqual(
+            {record["record_id"] for record in result["records"]},
+            {str(organization.pk) for organization in self.organizations[:2]},
+        )
+
+    def test_created_records_are_skipped(self):
+        """Test that records created inside the window are not reverted."""
+        from apps.organization.rollback import bulk_rollback
+
+        result = bulk_rollback(dry_run=True, since=self.start - timedelta(days=1))
+
+        self.assertEqual(result["count"], 0)
+        self.assertEqual(len(result["skipped"]), 3)
+
+    def test_criteria_are_required(self):
+        """Test that a rollback without criteria is rejected."""
+        from apps.organization.rollback import bulk_rollback
+
+        with self.assertRaises(ValueError):
+            bulk_rollback(dry_run=True)
+
+
+class MaterializedCounterTests(TestCase):
+    """Test suite for the organization and location counters."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.organization = Organization.objects.create(
+            razon_social="Counter Organization",
+            nit="900123480",
+            digito_verificacion="1",
+            tipo_organizacion="empresa_privada",
+            sector_economico="tecnologia",
+            tamaño_empresa="mediana",
+        )
+
+    def create_location(self, nombre, principal=False):
+        return Location.objects.create(
+            organization=self.organization,
+            nombre=nombre,
+            tipo_sede="principal" if principal else "sucursal",
+            es_principal=principal,
+            direccion="Calle 1",
+            ciudad="Bogotá",
+            departamento="Cundinamarca",
+        )
+
+    def test_organizations_total_follows_soft_delete(self):
+        """Test that the organization total counts non-deleted rows."""
+        from apps.common import counters
+        from apps.organization.counters import ORGANIZATIONS_TOTAL
+
+        self.assertEqual(counters.get(ORGANIZATIONS_TOTAL), 1)
+
+        self.organization.delete()
+        self.assertEqual(counters.get(ORGANIZATIONS_TOTAL), 0)
+
+        self.organization.restore()
+        self.assertEqual(counters.get(ORGANIZATIONS_TOTAL), 1)
+
+    def test_active_locations_are_incremented(self):
+        """Test that activating, deactivating and deleting locations move the count."""
+        from apps.common import counters
+        from apps.organization.counters import ORGANIZATION_ACTIVE_LOCATIONS
+
+        main = self.create_location("Sede Principal", principal=True)
+        branch = self.create_location("Sucursal")
+        self.assertEqual(
+            counters.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 2
+        )
+
+        branch.deactivate()
+        self.assertEqual(
+            counters.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 1
+        )
+
+        main.delete()
+        branch.activate()
+        self.assertEqual(
+            counters.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 1
+        )
+
+        # Unrelated saves do not touch the counter
+        with self.assertNumQueries(1):
+            branch.nombre = "Sucursal Norte"
+            branch.save(update_fields=["nombre"])
+
+    def test_reconcile_repairs_drift(self):
+        """Test that the reconcile command repairs counts changed without signals."""
+        from django.core.management import call_command
+
+        from apps.common import counters
+        from apps.organization.counters import ORGANIZATION_ACTIVE_LOCATIONS
+
+        self.create_location("Sede Principal", principal=True)
+        Location.objects.filter(organization=self.organization).update(is_active=False)
+
+        out = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=out)
+        self.assertIn("1 -> 0", out.getvalue())
+        self.assertEqual(
+            counters.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 1
+        )
+
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertEqual(
+            counters.get(ORGANIZATION_ACTIVE_LOCATIONS, self.organization.pk), 0
+        )
+
+
+class AuditArchiveTests(TestCase):
+    """Test suite for archiving cold audit log months."""
+
+    def setUp(self):
+        """Set up test data."""
+        import tempfile
+
+        self.archive_dir = tempfile.mkdtemp()
+        self.organization = Organization.objects.create(
+            razon_social="Archive Organization",
+            nit="900123461",
+            digito_verificacion="3",
+            tipo_organizacion="empresa_privada",
+            sector_economico="tecnologia",
+            tamaño_empresa="mediana",
+        )
+
+        old = AuditLog.log_change(
+            instance=self.organization,
+            action=AuditLog.ACTION_CREATE,
+            new_values={"razon_social": "Archive Organization"},
+        )
+        AuditLog.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=800)
+        )
+        self.old_log_id = old.pk
+        self.recent_log = AuditLog.log_change(
+            instance=self.organization,
+            action=AuditLog.ACTION_UPDATE,
+            old_values={"razon_social": "Archive Organization"},
+            new_values={"razon_social": "Renamed"},
+            changed_fields=["razon_social"],
+        )
+
+    def tearDown(self):
+        """Remove the archive directory."""
+        import shutil
+
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def archive(self, *args):
+        from django.core.management import call_command
+
+        with self.settings(AUDIT_LOG_ARCHIVE={"directory": self.archive_dir}):
+            call_command("archive_audit_logs", "--hot-months", "12", *args, stdout=StringIO())
+
+    def test_dry_run_keeps_rows(self):
+        """Test that a dry run does not move any entry."""
+        self.archive("--dry-run")
+
+        self.assertTrue(AuditLog.objects.filter(pk=self.old_log_id).exists())
+        self.assertEqual(os.listdir(self.archive_dir), [])
+
+    def test_cold_months_are_archived(self):
+        """Test that old entries leave the table and recent ones stay."""
+        self.archive()
+
+        self.assertFalse(AuditLog.objects.filter(pk=self.old_log_id).exists())
+        self.assertTrue(AuditLog.objects.filter(pk=self.recent_log.pk).exists())
+
+    def test_history_reads_archive(self):
+        """Test that record history can reach into archived months."""
+        self.archive()
+
+        with self.settings(AUDIT_LOG_ARCHIVE={"directory": self.archive_dir}):
+            hot = AuditLog.get_record_history(self.organization)
+            full = AuditLog.get_record_history(self.organization, include_archived=True)
+            limited = AuditLog.get_record_history(
+                self.organization, limit=1, include_archived=True
+            )
+
+        self.assertNotIn(self.old_log_id, [log.pk for log in hot])
+        self.assertEqual([log.pk for log in full][-1], self.old_log_id)
+        self.assertEqual(full[-1].action, AuditLog.ACTION_CREATE)
+        self.assertEqual(full[-1].new_values, {"razon_social": "Archive Organization"})
+        self.assertEqual([log.pk for log in limited], [self.recent_log.pk])
+
+
 @pytest.mark.django_db
 class OrganizationModelPytestTests:
     """Additional pytest-style tests for Organization model."""
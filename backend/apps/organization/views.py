@@ -5,23 +5,48 @@ This module contains ViewSets and API views for Organization and Location models
 providing REST API endpoints for organization management.
 """
 
+from datetime import datetime, time
+from itertools import chain
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 
+from apps.common import counters as counter_store
+from apps.common.catalog_cache import catalog_response
+from apps.common.compiled import CompiledListMixin, get_compiled_serializer, render_list
+from apps.common.conditional import ConditionalRequestMixin
+from apps.common.exports import (
+    StreamingExportMixin,
+    export_columns,
+    export_response,
+    iter_representations,
+)
+from apps.common.fieldsets import SparseFieldsetMixin
+from apps.common.pagination import KeysetPagination
+from apps.common.query_planning import QueryPlanningMixin, count_of
 from apps.authorization.drf_permissions import (
     CanViewOrganization,
     CanCreateOrganization,
     CanUpdateOrganization,
     CanDeleteOrganization,
 )
+from .audit import get_state_as_of, get_states_as_of
+from .counters import ORGANIZATION_ACTIVE_LOCATIONS, ORGANIZATIONS_TOTAL
+from .imports import IMPORT_FORMATS, get_import_format, import_records
 from .models import Organization, Location, SectorTemplate, AuditLog
-from .signals import set_audit_context
+from .rollback import bulk_rollback as rollback_records
+from .signals import SECTOR_TEMPLATE_CATALOG, set_audit_context
+from .tenancy import TenantContext, TenantScopedMixin, add_members
 from .serializers import (
     OrganizationSerializer,
     OrganizationCreateSerializer,
@@ -38,16 +63,129 @@ from .serializers import (
     AuditLogSerializer,
     AuditLogListSerializer,
     RollbackRequestSerializer,
+    BulkRollbackRequestSerializer,
     OrganizationHistorySerializer,
 )
 
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+def parse_as_of(value):
+    """
+    Parse an ``as_of`` query parameter.
+
+    Accepts an ISO 8601 datetime, or a date meaning the end of that day.
+    Naive values are taken in the current time zone.
+
+    Args:
+        value (str): Raw parameter value
+
+    Returns:
+        datetime: Aware datetime, or None if the parameter is empty
+
+    Raises:
+        ValidationError: If the value is not a valid date or datetime
+    """
+    if not value:
+        return None
+
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is not None:
+                moment = datetime.combine(day, time.max)
+    except ValueError:
+        moment = None
+
+    if moment is None:
+        raise ValidationError(
+            {"as_of": [_("Fecha inválida. Use formato ISO 8601 (AAAA-MM-DD).")]}
+        )
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_flag(value):
+    """Whether a boolean query parameter is set (``1``, ``true`` or ``yes``)."""
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+def run_import(request, kind):
+    """
+    Import the file uploaded as ``file`` and answer with the import report.
+
+    ``file_format`` (csv or jsonl) defaults to the file extension and
+    ``dry_run`` only validates the rows.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        raise ValidationError({"file": [_("Adjunte un archivo CSV o JSONL.")]})
+
+    file_format = get_import_format(request.data.get("file_format"), upload.name)
+    if file_format is None:
+        raise ValidationError(
+            {
+                "file_format": [
+                    _("Formato no soportado. Use: {}").format(", ".join(IMPORT_FORMATS))
+                ]
+            }
+        )
+
+    report = import_records(
+        kind,
+        upload,
+        file_format,
+        user=request.user,
+        request=request,
+        dry_run=parse_flag(request.data.get("dry_run")),
+        tenant=TenantContext.for_request(request),
+    )
+    return Response(report, status=status.HTTP_200_OK)
+
+
+def iter_archived_history(instance, until=None):
+    """
+    Representations of the archived audit entries of a record, newest first.
+
+    The archive is only read when the generator is consumed.
+    """
+    from .audit_archive import AuditArchive
+
+    serializer = AuditLogListSerializer()
+    entries = AuditArchive().get_record_history(instance._meta.db_table, str(instance.pk))
+    for entry in entries:
+        if until is None or entry.created_at <= until:
+            yield serializer.to_representation(entry)
+
+
+class AuditHistoryPagination(KeysetPagination):
+    """
+    Keyset pages of audit history, newest first.
+
+    The page size comes from ``limit``; the total is only counted when
+    requested with ``count=true``.
+    """
+
+    page_size = 50
+    page_size_query_param = "limit"
+    include_count = False
+
+
+class OrganizationViewSet(
+    TenantScopedMixin,
+    ConditionalRequestMixin,
+    StreamingExportMixin,
+    CompiledListMixin,
+    SparseFieldsetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet for Organization model.
 
     Provides CRUD operations for organizations and special endpoints
-    for the configuration wizard.
+    for the configuration wizard. Users only reach the organizations they
+    are members of (see ``tenancy``).
 
     Permissions:
     - List/Read: CanViewOrganization
@@ -61,6 +199,22 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     search_fields = ["razon_social", "nombre_comercial", "nit"]
     ordering_fields = ["razon_social", "nombre_comercial", "created_at", "updated_at"]
     ordering = ["razon_social"]
+    pagination_class = KeysetPagination
+    export_serializer_class = OrganizationListSerializer
+    export_filename = "organizaciones"
+
+    # The detail renders the locations: their versions are part of the ETag
+    # (the count catches hard deletes, soft deletes renew updated_at)
+    version_annotations = {
+        "locations_version": Subquery(
+            Location._base_manager.filter(organization=OuterRef("pk"))
+            .order_by()
+            .values("organization")
+            .annotate(latest=Max("updated_at"))
+            .values("latest")[:1]
+        ),
+        "locations_count": count_of(Location._base_manager.all(), "organization"),
+    }
 
     def get_serializer_class(self):
         """
@@ -85,11 +239,17 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         Returns:
             list: Permission classes for the current action
         """
-        if self.action in ["list", "retrieve", "wizard_step1"]:
+        if self.action in [
+            "list",
+            "retrieve",
+            "wizard_step1",
+            "export",
+            "audit_history_export",
+        ]:
             permission_classes = [permissions.IsAuthenticated, CanViewOrganization]
-        elif self.action == "create":
+        elif self.action in ["create", "bulk_import"]:
             permission_classes = [permissions.IsAuthenticated, CanCreateOrganization]
-        elif self.action in ["update", "partial_update"]:
+        elif self.action in ["update", "partial_update", "bulk_rollback"]:
             permission_classes = [permissions.IsAuthenticated, CanUpdateOrganization]
         elif self.action == "destroy":
             permission_classes = [permissions.IsAuthenticated, CanDeleteOrganization]
@@ -98,9 +258,57 @@ class OrganizationViewSet(viewsets.ModelViewSet):
 
         return [permission() for permission in permission_classes]
 
+    def list(self, request, *args, **kwargs):
+        """
+        List organizations, or their state at a point in time with ``as_of``.
+
+        With ``as_of`` the states of all organizations are rebuilt from the
+        audit log in bulk; organizations deleted at that time are left out.
+        """
+        as_of = parse_as_of(request.query_params.get("as_of"))
+        if as_of is None:
+            return super().list(request, *args, **kwargs)
+
+        record_ids = None if self.tenant.is_global else self.tenant.organization_ids
+        states = [
+            {"id": record_id, **state}
+            for record_id, state in get_states_as_of(
+                Organization, as_of, record_ids=record_ids
+            ).items()
+            if state is not None and not state.get("deleted_at")
+        ]
+        states.sort(key=lambda state: state.get("razon_social") or "")
+
+        # The states are already in memory, so plain page numbers are enough
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(states, request, view=self)
+        response = paginator.get_paginated_response(page)
+        response.data["as_of"] = as_of.isoformat()
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve an organization, or its state at a point in time with ``as_of``.
+        """
+        as_of = parse_as_of(request.query_params.get("as_of"))
+        if as_of is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        record_id = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        state = None
+        if self.tenant.has_access(record_id):
+            state = get_state_as_of(Organization, record_id, as_of)
+        if state is None:
+            return Response(
+                {"detail": _("La organización no existía en la fecha indicada.")},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"id": record_id, "as_of": as_of.isoformat(), **state})
+
     def perform_create(self, serializer):
         """
-        Set audit fields when creating organization.
+        Set audit fields when creating organization; the creator becomes
+        a member of it.
 
         Args:
             serializer: Serializer instance with validated data
@@ -108,6 +316,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         instance = serializer.save(
             created_by=self.request.user, updated_by=self.request.user
         )
+        add_members([instance], self.request.user)
 
         # Set audit context for signal handlers
         set_audit_context(
@@ -137,17 +346,23 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def exists_check(self, request):
         """
-        Check if any organizations exist in the system.
+        Check if any organizations exist for the user.
 
         This is a lightweight endpoint to check organization existence
-        without fetching all data - useful for dashboard checks.
+        without fetching all data - useful for dashboard checks. Global
+        users count every organization; others their own.
 
         Returns:
             dict: Status indicating if organizations exist
         """
         try:
-            exists = Organization.objects.exists()
-            count = Organization.objects.count() if exists else 0
+            if self.tenant.is_global:
+                # Materialized counter: a single-row read instead of a COUNT
+                count = counter_store.get(ORGANIZATIONS_TOTAL)
+            else:
+                # The user's organizations are already resolved and cached
+                count = len(self.tenant.organization_ids)
+            exists = count > 0
 
             return Response(
                 {
@@ -181,19 +396,22 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         GET: Return current organization data or empty form
         POST: Create or update organization with step 1 data
 
+        The organization is the one the request works on (see
+        ``TenantContext.organization``). POST only creates a new one, and
+        makes the user a member of it, when the user has no organizations
+        yet: an ``X-Organization-ID`` the user can not access is refused,
+        and a user with several organizations and no default must choose one.
+
         Args:
             request: HTTP request object
 
         Returns:
             Response: Organization data or validation errors
         """
-        if request.method == "GET":
-            # Verificar si ya existe una organización para el usuario
-            # En el futuro, esto se basará en el contexto del usuario
-            organization = (
-                Organization.objects.first()
-            )  # Temporal: obtener primera organización
+        # Organización del usuario (o la indicada en X-Organization-ID)
+        organization = self.tenant.organization
 
+        if request.method == "GET":
             if organization:
                 serializer = self.get_serializer(organization)
                 return Response(
@@ -216,8 +434,21 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                 )
 
         elif request.method == "POST":
-            # Verificar si ya existe organización
-            organization = Organization.objects.first()  # Temporal
+            if organization is None and self.tenant.requested:
+                return Response(
+                    {"error": _("No tiene acceso a la organización indicada.")},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            if organization is None and self.tenant.organization_ids:
+                return Response(
+                    {
+                        "error": _(
+                            "Seleccione una organización con el encabezado "
+                            "X-Organization-ID."
+                        )
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
             if organization:
                 # Actualizar organización existente
@@ -234,6 +465,8 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                     message = _("Datos de organización actualizados correctamente.")
                 else:
                     serializer.save(created_by=request.user, updated_by=request.user)
+                    add_members([serializer.instance], request.user)
+                    self.tenant.set_organization(serializer.instance)
                     message = _("Organización creada correctamente.")
 
                 return Response(
@@ -270,11 +503,33 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             Response: List of locations for the organization
         """
         organization = self.get_object()
-        locations = organization.locations.all()
-        serializer = LocationListSerializer(locations, many=True)
+        locations = render_list(LocationListSerializer, organization.locations.all())
+
+        return Response(
+            {
+                "locations": locations,
+                "count": len(locations),
+                "active_count": counter_store.get(
+                    ORGANIZATION_ACTIVE_LOCATIONS, organization.pk
+                ),
+            }
+        )
 
-        return Response({"locations": serializer.data, "count": locations.count()})
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Import organizations from a CSV or JSON Lines file.
+
+        Rows are validated and inserted in batches; invalid rows are skipped
+        and listed in the report with their line number.
+
+        Args:
+            request: HTTP request with the ``file`` upload
 
+        Returns:
+            Response: Import report
+        """
+        return run_import(request, "organizations")
 
     @action(detail=True, methods=["get"], url_path="audit-history")
     def audit_history(self, request, pk=None):
@@ -298,18 +553,90 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         except (ValueError, TypeError):
             limit = 50
 
-        # Get audit history
-        audit_logs = AuditLog.get_record_history(organization, limit=limit)
+        # Entries moved to the audit archive are only read on request
+        include_archived = parse_flag(request.query_params.get("include_archived"))
+
+        # With as_of, only entries up to that moment and the state it left
+        as_of = parse_as_of(request.query_params.get("as_of"))
+
+        # Archived entries are appended to a single list; table history is
+        # paged with a (created_at, id) cursor instead
+        paginator = compiled = None
+        if include_archived:
+            audit_logs = AuditLog.get_record_history(
+                organization,
+                limit=limit,
+                include_archived=True,
+                until=as_of,
+            )
+        else:
+            paginator = AuditHistoryPagination()
+            queryset = AuditLog.get_record_history(organization, until=as_of)
+            # Rendered from rows; the cursor reads created_at and id
+            compiled = get_compiled_serializer(
+                AuditLogListSerializer, keep=("created_at",)
+            )
+            if compiled is not None:
+                queryset = compiled.rows(queryset)
+            audit_logs = paginator.paginate_queryset(
+                queryset.order_by("-created_at", "-id"), request, view=self
+            )
         serializer = AuditLogListSerializer(audit_logs, many=True)
+        if compiled is not None:
+            audit_data = compiled.render(audit_logs, serializer)
+        else:
+            audit_data = serializer.data
+
+        data = {
+            "organization_id": str(organization.id),
+            "organization_name": str(organization),
+            "audit_logs": audit_data,
+            "count": len(audit_logs),
+            "limit": limit,
+        }
+        if paginator is not None:
+            data["next"] = paginator.get_next_link()
+            data["previous"] = paginator.get_previous_link()
+            if paginator.count is not None:
+                data["total"] = paginator.count
+        if as_of is not None:
+            data["as_of"] = as_of.isoformat()
+            data["state"] = get_state_as_of(Organization, organization.pk, as_of)
+        return Response(data)
+
+    @action(detail=True, methods=["get"], url_path="audit-history/export")
+    def audit_history_export(self, request, pk=None):
+        """
+        Stream the complete audit history of an organization.
 
-        return Response(
-            {
-                "organization_id": str(organization.id),
-                "organization_name": str(organization),
-                "audit_logs": serializer.data,
-                "count": audit_logs.count(),
-                "limit": limit,
-            }
+        Entries are written newest first as CSV or JSON Lines
+        (``file_format``), without a limit. ``as_of`` and
+        ``include_archived`` work as in ``audit_history``.
+
+        Args:
+            request: HTTP request object
+            pk: Organization primary key
+
+        Returns:
+            StreamingHttpResponse: Audit history file
+        """
+        organization = self.get_object()
+        include_archived = parse_flag(request.query_params.get("include_archived"))
+        as_of = parse_as_of(request.query_params.get("as_of"))
+
+        queryset = AuditLog.get_record_history(organization, until=as_of)
+        rows = iter_representations(
+            AuditLogListSerializer, queryset.order_by("-created_at", "-id")
+        )
+        if include_archived:
+            # Archived months are older than every row still in the table
+            rows = chain(rows, iter_archived_history(organization, until=as_of))
+
+        return export_response(
+            request,
+            rows,
+            export_columns(AuditLogListSerializer),
+            f"auditoria-{organization.pk}",
         )
 
     @action(detail=True, methods=["post"], url_path="rollback")
@@ -341,8 +668,10 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         reason = serializer.validated_data.get("reason", "")
 
         try:
-            # Get the audit log
-            audit_log = AuditLog.objects.get(id=audit_log_id)
+            # Get the audit log (only entries of the user's organizations)
+            audit_log = self.tenant.scope(AuditLog.objects.all()).get(
+                id=audit_log_id
+            )
 
             # Verify it belongs to this organization
             if audit_log.record_id != str(organization.id):
@@ -392,6 +721,48 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @action(detail=False, methods=["post"], url_path="bulk-rollback")
+    def bulk_rollback(self, request):
+        """
+        Roll back every organization changed in a time window, by a user
+        or from a session, in one transaction.
+
+        With ``dry_run`` the planned diff is returned and nothing is saved.
+
+        Args:
+            request: HTTP request with the rollback criteria
+
+        Returns:
+            Response: Reverted (or planned) records and skipped records
+        """
+        serializer = BulkRollbackRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "error": _("Datos de rollback inválidos."),
+                    "errors": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = serializer.validated_data
+        result = rollback_records(
+            dry_run=data["dry_run"],
+            performed_by=request.user,
+            request=request,
+            reason=data.get("reason", ""),
+            since=data.get("since"),
+            until=data.get("until"),
+            user=data.get("user_id"),
+            session_key=data.get("session_key"),
+            ip_address=data.get("ip_address"),
+            table_names=[Organization._meta.db_table],
+            organization_ids=(
+                None if self.tenant.is_global else self.tenant.organization_ids
+            ),
+        )
+        return Response(result, status=status.HTTP_200_OK)
+
     def destroy(self, request, *args, **kwargs):
         """
         Soft delete an organization.
@@ -410,11 +781,20 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(
+    TenantScopedMixin,
+    ConditionalRequestMixin,
+    StreamingExportMixin,
+    CompiledListMixin,
+    SparseFieldsetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet for Location model.
 
-    Provides CRUD operations for organization locations/sedes.
+    Provides CRUD operations for organization locations/sedes, limited to
+    the organizations of the user (see ``tenancy``).
 
     Permissions:
     - List/Read: CanViewOrganization
@@ -428,6 +808,9 @@ class LocationViewSet(viewsets.ModelViewSet):
     search_fields = ["nombre", "direccion", "ciudad", "departamento"]
     ordering_fields = ["nombre", "ciudad", "created_at", "updated_at"]
     ordering = ["-es_principal", "nombre"]
+    pagination_class = KeysetPagination
+    export_serializer_class = LocationListSerializer
+    export_filename = "sedes"
 
     def get_serializer_class(self):
         """
@@ -452,9 +835,9 @@ class LocationViewSet(viewsets.ModelViewSet):
         Returns:
             list: Permission classes for the current action
         """
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "export"]:
             permission_classes = [permissions.IsAuthenticated, CanViewOrganization]
-        elif self.action == "create":
+        elif self.action in ["create", "bulk_import"]:
             permission_classes = [permissions.IsAuthenticated, CanCreateOrganization]
         elif self.action in ["update", "partial_update"]:
             permission_classes = [permissions.IsAuthenticated, CanUpdateOrganization]
@@ -491,18 +874,23 @@ class LocationViewSet(viewsets.ModelViewSet):
         from django.db import IntegrityError
         from rest_framework.exceptions import ValidationError
         
-        # En el futuro, obtener organización del contexto del usuario
-        # Por ahora, usar la organización del request o la primera disponible
+        # La organización indicada (entre las del usuario) o la del request
         organization_id = self.request.data.get("organization")
         if organization_id:
             try:
-                organization = Organization.objects.get(id=organization_id)
+                organization = self.tenant.scope(Organization.objects.all()).get(
+                    id=organization_id
+                )
             except Organization.DoesNotExist:
                 raise ValidationError({
                     "organization": [_("Organización no encontrada.")]
                 })
         else:
-            organization = Organization.objects.first()
+            organization = self.tenant.organization
+            if organization is None:
+                raise ValidationError({
+                    "organization": [_("Debe crear primero la organización.")]
+                })
 
         try:
             serializer.save(
@@ -541,8 +929,8 @@ class LocationViewSet(viewsets.ModelViewSet):
         Returns:
             Response: Location data or validation errors
         """
-        # Obtener organización (temporal - primera disponible)
-        organization = Organization.objects.first()
+        # Organización del usuario (o la indicada en X-Organization-ID)
+        organization = self.tenant.organization
 
         if not organization:
             return Response(
@@ -622,6 +1010,23 @@ class LocationViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Import locations from a CSV or JSON Lines file.
+
+        Each row names its organization with ``organization_nit``. Rows are
+        validated and inserted in batches; invalid rows are skipped and
+        listed in the report with their line number.
+
+        Args:
+            request: HTTP request with the ``file`` upload
+
+        Returns:
+            Response: Import report
+        """
+        return run_import(request, "locations")
+
     @action(detail=False, methods=["get"])
     def by_organization(self, request):
         """
@@ -642,7 +1047,9 @@ class LocationViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            organization = Organization.objects.get(id=organization_id)
+            organization = self.tenant.scope(Organization.objects.all()).get(
+                id=organization_id
+            )
             locations = self.get_queryset().filter(organization=organization)
             serializer = LocationListSerializer(locations, many=True)
 
@@ -650,7 +1057,7 @@ class LocationViewSet(viewsets.ModelViewSet):
                 {
                     "organization": OrganizationListSerializer(organization).data,
                     "locations": serializer.data,
-                    "count": locations.count(),
+                    "count": len(serializer.data),
                 }
             )
         except Organization.DoesNotExist:
@@ -677,7 +1084,9 @@ class LocationViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SectorTemplateViewSet(viewsets.ModelViewSet):
+class SectorTemplateViewSet(
+    SparseFieldsetMixin, QueryPlanningMixin, viewsets.ModelViewSet
+):
     """
     ViewSet for SectorTemplate model.
 
@@ -756,6 +1165,7 @@ class SectorTemplateViewSet(viewsets.ModelViewSet):
         serializer.save(updated_by=self.request.user)
 
     @action(detail=False, methods=["get"], url_path="by-sector")
+    @catalog_response(SECTOR_TEMPLATE_CATALOG)
     def by_sector(self, request):
         """
         Get templates filtered by sector.
@@ -794,7 +1204,7 @@ class SectorTemplateViewSet(viewsets.ModelViewSet):
                 "sector": sector,
                 "sector_display": valid_sectors[sector],
                 "templates": serializer.data,
-                "count": templates.count(),
+                "count": len(serializer.data),
             }
         )
 
@@ -905,6 +1315,7 @@ class SectorTemplateViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=["get"], url_path="sectors")
+    @catalog_response(SECTOR_TEMPLATE_CATALOG)
     def available_sectors(self, request):
         """
         Get all available sectors with their display names.
@@ -58,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.authentication.middleware.IPSecurityMiddleware',
     'apps.authorization.middleware.RBACMiddleware',
     'apps.authorization.middleware.PermissionCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -144,7 +145,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',  # Mantener para admin
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -237,10 +238,36 @@ CORS_ALLOW_HEADERS = [
     'origin',
     'user-agent',
     'x-csrftoken',
+    'x-organization-id',
     'x-requested-with',
 ]
 
+# Audit Log Storage
+# Audit rows store only the changed fields; creates and every
+# AUDIT_LOG_CHECKPOINT_INTERVAL-th change of a record store its full state.
+AUDIT_LOG_CHECKPOINT_INTERVAL = config('AUDIT_LOG_CHECKPOINT_INTERVAL', default=20, cast=int)
+
+# On PostgreSQL the audit table is partitioned by month. archive_audit_logs
+# keeps 'hot_months' months in the database, moves older ones to compressed
+# JSONL files in 'directory' and creates 'partitions_ahead' future partitions.
+AUDIT_LOG_ARCHIVE = {
+    'directory': config('AUDIT_ARCHIVE_DIR', default=str(BASE_DIR / 'audit_archive')),
+    'hot_months': config('AUDIT_HOT_MONTHS', default=12, cast=int),
+    'partitions_ahead': config('AUDIT_PARTITIONS_AHEAD', default=3, cast=int),
+}
+
 # Logging Configuration
+# Security, authentication and audit logs are written as JSON lines by a
+# background thread; request threads only enqueue records. When the buffer
+# is full the overflow policy applies: 'drop_new', 'drop_oldest' or 'block'
+# (waits up to 50 ms, then drops).
+SECURITY_LOG_BUFFER = {
+    'max_queue_size': config('SECURITY_LOG_QUEUE_SIZE', default=10000, cast=int),
+    'batch_size': config('SECURITY_LOG_BATCH_SIZE', default=256, cast=int),
+    'flush_interval': config('SECURITY_LOG_FLUSH_INTERVAL', default=1.0, cast=float),
+    'overflow': config('SECURITY_LOG_OVERFLOW', default='drop_new'),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -276,21 +303,21 @@ LOGGING = {
         },
         'security_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'apps.common.log_handlers.BatchedJSONLinesHandler',
             'filename': BASE_DIR / 'logs' / 'security.log',
-            'formatter': 'security',
+            **SECURITY_LOG_BUFFER,
         },
         'authentication_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'apps.common.log_handlers.BatchedJSONLinesHandler',
             'filename': BASE_DIR / 'logs' / 'authentication.log',
-            'formatter': 'json',
+            **SECURITY_LOG_BUFFER,
         },
         'audit_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'apps.common.log_handlers.BatchedJSONLinesHandler',
             'filename': BASE_DIR / 'logs' / 'audit.log',
-            'formatter': 'json',
+            **SECURITY_LOG_BUFFER,
         },
     },
     'root': {
@@ -349,3 +376,44 @@ CACHES = {
         'LOCATION': 'unique-snowflake',
     }
 }
+
+# RBAC Configuration
+# Trust compact RBAC claims (roles + permission bitset + version stamp) embedded
+# in JWT access tokens instead of resolving them per request. Stale claims fall
+# back to the regular permission lookup. Revocations are detected through a
+# version stamp kept in the cache, so the claims are only trusted when the
+# default cache is shared and persistent (e.g. Redis); with DummyCache or the
+# per-process LocMemCache a warning is logged and permissions come from the DB.
+RBAC_TRUST_TOKEN_CLAIMS = config('RBAC_TRUST_TOKEN_CLAIMS', default=False, cast=bool)
+
+# Catalog Responses
+# Rarely changing catalogs (permissions, roles, sector templates) are served
+# from the cache under a version stamp bumped on every write, with ETags for
+# conditional GET. Entries of retired versions expire after this timeout.
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Tenancy
+# The organizations of each user are cached under a per-user generation that
+# is renewed when their memberships change. Requests choose among them with
+# the X-Organization-ID header.
+TENANT_CACHE_TIMEOUT = config('TENANT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Rate Limiting
+# GCRA limits over the shared cache (atomic Lua script on Redis, process-local
+# lock elsewhere). Rates are "<requests>/<period>" with s, m, h or d periods;
+# 'key' selects what routed policies are keyed by: 'ip', 'user' or 'user_or_ip'.
+# Login is always limited; the API-wide 'api' policy is opt-in
+# (RATE_LIMIT_API_ROUTE=True). Its default budget, 1200 requests per 15
+# minutes per user, leaves room for the several requests a page of the
+# frontend makes while still stopping scripted abuse.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMIT_POLICIES = {
+    'api': {'rate': config('RATE_LIMIT_API', default='1200/15m'), 'key': 'user_or_ip'},
+    'login_ip': {'rate': config('RATE_LIMIT_LOGIN_IP', default='20/15m'), 'key': 'ip'},
+    'login_email': {'rate': config('RATE_LIMIT_LOGIN_EMAIL', default='10/15m'), 'key': 'email'},
+}
+# Path prefix -> policy, first match wins
+RATE_LIMIT_ROUTES = []
+if config('RATE_LIMIT_API_ROUTE', default=False, cast=bool):
+    RATE_LIMIT_ROUTES.append(('/api/', 'api'))
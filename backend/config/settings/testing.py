@@ -40,6 +40,10 @@ CACHES = {
     }
 }
 
+# The rate limiter keeps a process-local store under DummyCache, which would
+# carry quotas from one test to the next; its tests enable it explicitly
+RATE_LIMIT_ENABLED = False
+
 # Email backend for testing
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
@@ -76,7 +80,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 # REST Framework settings for testing - keep JWT authentication
 REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = [  # noqa: F405
-    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'apps.authentication.authentication.CachedJWTAuthentication',
     'rest_framework.authentication.SessionAuthentication',
 ]
 